@@ -0,0 +1,125 @@
+#!/usr/bin/python
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+# This is a script to compare the performance of the row-wise and the
+# columnar evaluation of instance queries on configuration data. It must be
+# run with the Ganeti library in the Python path.
+
+import optparse
+import timeit
+
+from ganeti import constants
+from ganeti import objects
+from ganeti import query
+
+
+_FIELDS = [
+  "name", "os", "hypervisor", "disk_template", "uuid", "serial_no",
+  "network_port", "admin_state", "status", "pnode", "tags", "ctime", "mtime",
+  "be/maxmem", "be/minmem", "be/vcpus", "be/auto_balance",
+  "nic.ips", "nic.macs", "nic.modes",
+  ]
+
+_FILTERS = [
+  ("none", None),
+  ("name", ["=", "name", "inst17"]),
+  ("regexp", ["=~", "name", r"^inst\d*7\."]),
+  ("compare", ["&", [">=", "be/maxmem", 2048], ["=", "os", "debian"]]),
+  ("negation", ["!", ["|", ["=", "admin_state", constants.ADMINST_UP],
+                           ["=[]", "tags", "tag3"]]]),
+  ]
+
+
+def _MakeData(count):
+  cluster = objects.Cluster(cluster_name="cluster.example.com",
+                            hvparams=constants.HVC_DEFAULTS,
+                            beparams={
+                              constants.PP_DEFAULT: constants.BEC_DEFAULTS,
+                              },
+                            nicparams={
+                              constants.PP_DEFAULT: constants.NICC_DEFAULTS,
+                              },
+                            os_hvp={}, osparams={})
+
+  nodes = dict(("node-uuid-%d" % i,
+                objects.Node(name="node%d.example.com" % i,
+                             uuid="node-uuid-%d" % i, group="group-uuid"))
+               for i in range(40))
+
+  instances = [
+    objects.Instance(name="inst%d.example.com" % i, uuid="inst-uuid-%d" % i,
+                     os=["debian", "centos"][i % 2],
+                     hypervisor=constants.HT_XEN_PVM,
+                     disk_template=constants.DT_PLAIN,
+                     primary_node="node-uuid-%d" % (i % 40),
+                     admin_state=[constants.ADMINST_UP,
+                                  constants.ADMINST_DOWN][i % 3 == 0],
+                     admin_state_source=constants.ADMIN_SOURCE,
+                     hvparams={}, osparams={},
+                     beparams={constants.BE_MAXMEM: 1024 * (1 + i % 4)},
+                     nics=[objects.NIC(ip="192.0.2.%d" % (i % 250),
+                                       mac="aa:00:00:00:%02x:%02x" %
+                                       (i // 256 % 256, i % 256),
+                                       nicparams={})],
+                     tags=["tag%d" % (i % 7)], network_port=None,
+                     ctime=1460000000 + i, mtime=1460000000 + i,
+                     serial_no=i)
+    for i in range(count)]
+
+  return query.InstanceQueryData(instances, cluster, None, [], [], {}, set(),
+                                 {}, nodes, {}, {})
+
+
+def main():
+  parser = optparse.OptionParser(usage="%prog [options]")
+  parser.add_option("-c", "--count", dest="count", type="int", default=10000,
+                    help="Number of instances")
+  parser.add_option("-n", "--repeat", dest="repeat", type="int", default=3,
+                    help="Number of repetitions")
+  (options, _) = parser.parse_args()
+
+  ctx = _MakeData(options.count)
+
+  print "%-10s %8s %10s %10s %8s" % ("Filter", "Rows", "Rows (ms)",
+                                     "Cols (ms)", "Speedup")
+  for (name, qfilter) in _FILTERS:
+    q = query.Query(query.INSTANCE_FIELDS, _FIELDS, qfilter=qfilter,
+                    namefield="name")
+    result = q.Query(ctx, columnar=False)
+    assert q.Query(ctx) == result
+    rows = timeit.Timer(lambda: q.Query(ctx, columnar=False)).timeit(
+      options.repeat)
+    cols = timeit.Timer(lambda: q.Query(ctx)).timeit(options.repeat)
+    print "%-10s %8d %10.2f %10.2f %8.2f" % \
+      (name, len(result), rows * 1000 / options.repeat,
+       cols * 1000 / options.repeat, rows / cols)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,113 @@
+#!/usr/bin/python
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+# This is a script to compare the performance of the JSON backends supported
+# by ganeti.serializer on data shaped like a cluster configuration, a job and
+# an RPC result. It must be run with the Ganeti library in the Python path.
+
+import optparse
+import timeit
+
+from ganeti import serializer
+
+
+def _MakeConfig(count):
+  return {
+    "version": 2160000,
+    "cluster": {"name": "cluster.example.com", "serial_no": 1,
+                "osparams_private_cluster": {"debian": {"password": "x"}}},
+    "instances": dict(("uuid-%d" % i, {
+      "name": "inst%d.example.com" % i,
+      "primary_node": "node%d" % (i % 40),
+      "disks": ["disk-%d" % i],
+      "nics": [{"mac": "aa:00:00:00:%02x:%02x" % (i // 256 % 256, i % 256),
+                "nicparams": {"mode": "bridged", "link": "br0"}}],
+      "beparams": {"maxmem": 1024, "minmem": 1024, "vcpus": 2},
+      "osparams_private": {"password": "secret%d" % i},
+      "tags": ["tag%d" % (i % 7)],
+      "serial_no": i,
+      }) for i in range(count)),
+    }
+
+
+def _MakeJob(count):
+  return {
+    "id": 1234,
+    "ops": [{
+      "input": {"OP_ID": "OP_INSTANCE_CREATE", "instance_name": "inst%d" % i,
+                "osparams_secret": {"key": "value"}},
+      "status": "success",
+      "result": ["inst%d.example.com" % i],
+      "log": [[j, [1460000000, j], "message", "Step %d" % j]
+              for j in range(10)],
+      } for i in range(count)],
+    }
+
+
+def _MakeRpcResult(count):
+  return dict(("node%d" % i, [True, {
+    "volumes": dict(("xenvg/disk%d" % j, [10240.0, "-wi-ao----"])
+                    for j in range(20)),
+    "hypervisor": {"memory_free": 1024, "cpu_total": 8},
+    }]) for i in range(count))
+
+
+_PAYLOADS = [
+  ("config", _MakeConfig),
+  ("job", _MakeJob),
+  ("rpc", _MakeRpcResult),
+  ]
+
+
+def main():
+  parser = optparse.OptionParser(usage="%prog [options]")
+  parser.add_option("-c", "--count", dest="count", type="int", default=1000,
+                    help="Number of items per payload")
+  parser.add_option("-n", "--repeat", dest="repeat", type="int", default=10,
+                    help="Number of repetitions")
+  (options, _) = parser.parse_args()
+
+  print "%-12s %-8s %10s %10s %10s" % ("Backend", "Payload", "Bytes",
+                                       "Dump (ms)", "Load (ms)")
+  for backend in serializer.GetJsonBackends():
+    serializer.SetJsonBackend(backend)
+    for (name, fn) in _PAYLOADS:
+      data = fn(options.count)
+      txt = serializer.DumpJson(data)
+      dump = timeit.Timer(lambda: serializer.DumpJson(data)).timeit(
+        options.repeat)
+      load = timeit.Timer(lambda: serializer.LoadJson(txt)).timeit(
+        options.repeat)
+      print "%-12s %-8s %10d %10.2f %10.2f" % \
+        (backend, name, len(txt), dump * 1000 / options.repeat,
+         load * 1000 / options.repeat)
+
+
+if __name__ == "__main__":
+  main()
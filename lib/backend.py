@@ -75,6 +75,8 @@ from ganeti.storage import bdev
 from ganeti.storage import drbd
 from ganeti.storage import extstorage
 from ganeti.storage import filestorage
+from ganeti.storage import imaging
+from ganeti.storage import lvm_cache
 from ganeti import objects
 from ganeti import ssconf
 from ganeti import serializer
@@ -84,9 +86,12 @@ from ganeti import compat
 from ganeti import pathutils
 from ganeti import vcluster
 from ganeti import ht
+from ganeti import jstore
 from ganeti.storage.base import BlockDev
+from ganeti.storage.base import GetBlockDevSize
 from ganeti.storage.drbd import DRBD8
 from ganeti import hooksmaster
+from ganeti import workerpool
 import ganeti.metad as metad
 
 
@@ -1110,15 +1115,158 @@ def _VerifySshClutter(node_status_list, my_name):
   return result
 
 
-def VerifyNodeNetTest(my_name, test_config):
+def _RunProbe(fn, args, kwargs, max_timeout, deadline, key, results):
+  """Runs a single connectivity probe and stores its outcome.
+
+  The probe isn't started once C{deadline} has passed. Otherwise C{fn} is
+  given the remaining time, limited to C{max_timeout}, as its C{timeout}
+  keyword argument.
+
+  @type max_timeout: number or None
+  @param max_timeout: the maximum timeout of the probe, or None for no limit
+  @type deadline: float
+  @param deadline: time (as returned by C{time.time}) by which all probes
+      must have finished
+  @type results: dict
+  @param results: probe keys as keys and, as values, C{None} for probes not
+      started or tuples of success, the probe's result or exception, and the
+      latency in seconds
+
+  """
+  remaining = deadline - time.time()
+  if remaining <= 0:
+    results[key] = None
+    return
+
+  if max_timeout is not None:
+    remaining = min(remaining, max_timeout)
+
+  start = time.time()
+  try:
+    outcome = (True, fn(*args, timeout=remaining, **kwargs))
+  except Exception, err: # pylint: disable=W0703
+    logging.exception("Connectivity probe %s failed", key)
+    outcome = (False, err)
+  results[key] = outcome + (time.time() - start, )
+
+
+class _ProbeWorker(workerpool.BaseWorker):
+  """Worker thread running one connectivity probe.
+
+  """
+  def RunTask(self, *args):
+    """Runs L{_RunProbe}.
+
+    """
+    _RunProbe(*args)
+
+
+def _RunProbes(probes, deadline):
+  """Runs connectivity probes concurrently.
+
+  At most L{constants.NODE_VERIFY_PROBE_THREADS} probes run at the same time,
+  so that one unreachable node doesn't delay the checks of all others.
+
+  @type probes: list of tuples
+  @param probes: probes to run, in order, as tuples of key, function,
+      positional and keyword arguments and maximum timeout, see
+      L{_RunProbe}
+  @type deadline: float
+  @param deadline: time (as returned by C{time.time}) by which all probes
+      must have finished
+  @rtype: dict
+  @return: see the C{results} parameter of L{_RunProbe}
+
+  """
+  results = {}
+  tasks = [(fn, args, kwargs, max_timeout, deadline, key, results)
+           for (key, fn, args, kwargs, max_timeout) in probes]
+
+  num_workers = min(len(tasks), constants.NODE_VERIFY_PROBE_THREADS)
+  if num_workers > 1:
+    pool = workerpool.WorkerPool("NodeVerify", num_workers, _ProbeWorker)
+    try:
+      pool.AddManyTasks(tasks)
+      pool.Quiesce()
+    finally:
+      pool.TerminateWorkers()
+  else:
+    for task in tasks:
+      _RunProbe(*task)
+
+  return results
+
+
+def _GetProbeDeadline():
+  """Returns the deadline for the connectivity probes of a node verify.
+
+  """
+  return time.time() + constants.NODE_VERIFY_PROBE_TIMEOUT
+
+
+def _VerifyNodeSsh(nodes, cluster_name, ssh_port_map, deadline, latency):
+  """Verify SSH connectivity to other nodes.
+
+  @type nodes: list of strings
+  @param nodes: names of the nodes to connect to, in this order
+  @type cluster_name: string
+  @param cluster_name: the cluster's name
+  @type ssh_port_map: dict
+  @param ssh_port_map: node names as keys, SSH ports as values
+  @type deadline: float
+  @param deadline: time (as returned by C{time.time}) by which all checks
+      must have finished
+  @type latency: dict
+  @param latency: node names as keys, dictionaries of probe kinds and
+      latencies as values; updated with the latency of successful checks
+
+  @rtype: dict
+  @return: a dictionary with node names as keys and error messages
+      as values
+
+  """
+  runner = _GetSshRunner(cluster_name)
+  results = _RunProbes([(node, runner.VerifyNodeHostname,
+                         (node, ssh_port_map[node]), {}, None)
+                        for node in nodes], deadline)
+
+  val = {}
+  for node in nodes:
+    outcome = results[node]
+    if outcome is None:
+      val[node] = ("not checked, time limit of %s seconds exceeded" %
+                   constants.NODE_VERIFY_PROBE_TIMEOUT)
+      continue
+
+    (success, value, secs) = outcome
+    if not success:
+      val[node] = "ssh problem: %s" % value
+    elif not value[0]:
+      val[node] = value[1]
+    else:
+      latency.setdefault(node, {})["ssh"] = secs
+
+  return val
+
+
+def VerifyNodeNetTest(my_name, test_config, deadline=None, latency=None):
   """Verify nodes are reachable.
 
+  The node daemon port of all nodes is probed concurrently.
+
   @type my_name: string
   @param my_name: name of the node this test is running on
 
   @type test_config: tuple (node_list, master_candidate_list)
   @param test_config: configuration for test as passed from
       LUClusterVerify() in what[constants.NV_NODENETTEST]
+  @type deadline: float
+  @param deadline: time (as returned by C{time.time}) by which all probes
+      must have finished; defaults to L{constants.NODE_VERIFY_PROBE_TIMEOUT}
+      seconds from now
+  @type latency: dict
+  @param latency: if given, updated with the latency of the successful
+      probes, see L{_VerifyNodeSsh}
 
   @rtype: dict
   @return: a dictionary with node names as keys and error messages
@@ -1140,16 +1288,43 @@ def VerifyNodeNetTest(my_name, test_config):
                        " in the node list")
     return result
 
+  if deadline is None:
+    deadline = _GetProbeDeadline()
+  if latency is None:
+    latency = {}
+
+  probes = []
+  for name, pip, sip in nodes:
+    probes.append(((name, "primary"), netutils.TcpPing, (pip, port),
+                   {"source": my_pip}, constants.TCP_PING_TIMEOUT))
+    if sip != pip:
+      probes.append(((name, "secondary"), netutils.TcpPing, (sip, port),
+                     {"source": my_sip}, constants.TCP_PING_TIMEOUT))
+
+  results = _RunProbes(probes, deadline)
+
   for name, pip, sip in nodes:
     fail = []
-    if not netutils.TcpPing(pip, port, source=my_pip):
-      fail.append("primary")
-      if sip != pip:
-        if not netutils.TcpPing(sip, port, source=my_sip):
-          fail.append("secondary")
-      if fail:
-        result[name] = ("failure using the %s interface(s)" %
-                        " and ".join(fail))
+    skipped = []
+    for kind in ["primary", "secondary"]:
+      if (name, kind) not in results:
+        continue
+      outcome = results[(name, kind)]
+      if outcome is None:
+        skipped.append(kind)
+        continue
+      (success, value, secs) = outcome
+      if success and value:
+        latency.setdefault(name, {})[kind] = secs
+      else:
+        fail.append(kind)
+    if fail:
+      result[name] = ("failure using the %s interface(s)" %
+                      " and ".join(fail))
+    elif skipped:
+      result[name] = ("%s interface(s) not checked, time limit of %s seconds"
+                      " exceeded" % (" and ".join(skipped),
+                                     constants.NODE_VERIFY_PROBE_TIMEOUT))
   return result
 
 
@@ -1178,6 +1353,100 @@ def VerifyMasterIP(my_name, test_config):
   return netutils.TcpPing(master_ip, port, source=source)
 
 
+#: Node verify results which change on every call and are therefore always
+#: returned in full by an incremental node verify
+_NV_VOLATILE = compat.UniqueFrozenset([
+  constants.NV_TIME,
+  constants.NV_LATENCY,
+  constants.NV_INCREMENTAL,
+  ])
+
+
+def _LoadNodeVerifyCache(cache_file=pathutils.NODE_VERIFY_CACHE_FILE):
+  """Loads the state of the last incremental node verify.
+
+  A missing or broken file results in an empty state.
+
+  @rtype: dict
+  @return: dictionary with the file fingerprint cache (see
+      L{utils.FingerprintFiles}), the last token and the section digests
+
+  """
+  try:
+    data = serializer.LoadJson(utils.ReadFile(cache_file))
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      logging.warning("Can't read node verify cache %s: %s", cache_file, err)
+    data = None
+  except Exception, err: # pylint: disable=W0703
+    logging.warning("Can't parse node verify cache %s: %s", cache_file, err)
+    data = None
+
+  if not isinstance(data, dict):
+    data = {}
+
+  data.setdefault("fingerprints", {})
+  data.setdefault("token", None)
+  data.setdefault("digests", {})
+
+  return data
+
+
+def _SaveNodeVerifyCache(data, cache_file=pathutils.NODE_VERIFY_CACHE_FILE):
+  """Saves the state of an incremental node verify.
+
+  """
+  try:
+    utils.WriteFile(cache_file, data=serializer.DumpJson(data),
+                    mode=constants.SECURE_FILE_MODE)
+  except EnvironmentError, err:
+    logging.warning("Can't write node verify cache %s: %s", cache_file, err)
+
+
+def _DigestVerifySection(value):
+  """Computes the digest of one section of a node verify result.
+
+  Equal values usually, but not necessarily, have the same digest, e.g. when
+  dictionaries are serialized in a different order. This only causes
+  sections to be returned although they didn't change.
+
+  """
+  return compat.sha1_hash(serializer.DumpJson(value)).hexdigest()
+
+
+def _MakeIncrementalResult(token, result, cache):
+  """Leaves out the sections unchanged since the given token.
+
+  Sections are only left out if C{token} is the one returned by the last
+  incremental node verify of this node, i.e. if the caller has kept the
+  results of that call.
+
+  @type token: string or None
+  @param token: token of the caller's last known result of this node
+  @type result: dict
+  @param result: the node verify result, modified in place
+  @type cache: dict
+  @param cache: the node verify state (see L{_LoadNodeVerifyCache}), updated
+      with the new token and digests
+
+  """
+  digests = dict((key, _DigestVerifySection(value))
+                 for (key, value) in result.items()
+                 if key not in _NV_VOLATILE)
+  new_token = \
+    compat.sha1_hash(serializer.DumpJson(sorted(digests.items()))).hexdigest()
+
+  if token is not None and token == cache["token"]:
+    for (key, digest) in digests.items():
+      if cache["digests"].get(key) == digest:
+        del result[key]
+
+  cache["token"] = new_token
+  cache["digests"] = digests
+
+  result[constants.NV_INCREMENTAL] = (new_token, digests)
+
+
 def VerifyNode(what, cluster_name, all_hvparams):
   """Verify the status of the local node.
 
@@ -1195,6 +1464,14 @@ def VerifyNode(what, cluster_name, all_hvparams):
   connectivity to the given nodes via both primary IP and, if
   applicable, secondary IPs.
 
+  The connectivity checks run concurrently and share a time limit. The
+  latency of each successful check is returned under the I{latency} key.
+
+  If the I{incremental} key is present, file fingerprints are only
+  recomputed for files whose inode number, modification time or size
+  changed, and sections which didn't change since the caller's last
+  known result are left out (see L{_MakeIncrementalResult}).
+
   @type what: C{dict}
   @param what: a dictionary of things to check:
       - filelist: list of files for which to compute checksums
@@ -1215,12 +1492,20 @@ def VerifyNode(what, cluster_name, all_hvparams):
   my_name = netutils.Hostname.GetSysName()
   vm_capable = my_name not in what.get(constants.NV_NONVMNODES, [])
 
+  if constants.NV_INCREMENTAL in what:
+    verify_cache = _LoadNodeVerifyCache()
+    fingerprint_cache = verify_cache["fingerprints"]
+  else:
+    verify_cache = None
+    fingerprint_cache = None
+
   _VerifyHypervisors(what, vm_capable, result, all_hvparams)
   _VerifyHvparams(what, vm_capable, result)
 
   if constants.NV_FILELIST in what:
     fingerprints = utils.FingerprintFiles(map(vcluster.LocalizeVirtualPath,
-                                              what[constants.NV_FILELIST]))
+                                              what[constants.NV_FILELIST]),
+                                          cache=fingerprint_cache)
     result[constants.NV_FILELIST] = \
       dict((vcluster.MakeVirtualPath(key), value)
            for (key, value) in fingerprints.items())
@@ -1236,6 +1521,10 @@ def VerifyNode(what, cluster_name, all_hvparams):
       result[constants.NV_SSH_CLUTTER] = \
         _VerifySshClutter(what[constants.NV_SSH_SETUP], my_name)
 
+  # Shared by the SSH and TCP connectivity checks
+  probe_deadline = _GetProbeDeadline()
+  latency = {}
+
   if constants.NV_NODELIST in what:
     (nodes, bynode, mcs) = what[constants.NV_NODELIST]
 
@@ -1248,25 +1537,26 @@ def VerifyNode(what, cluster_name, all_hvparams):
     # Use a random order
     random.shuffle(nodes)
 
-    # Try to contact all nodes
-    val = {}
-    ssh_port_map = ssconf.SimpleStore().GetSshPortMap()
-    for node in nodes:
-      # We only test if master candidates can communicate to other nodes.
-      # We cannot test if normal nodes cannot communicate with other nodes,
-      # because the administrator might have installed additional SSH keys,
-      # over which Ganeti has no power.
-      if my_name in mcs:
-        success, message = _GetSshRunner(cluster_name). \
-                              VerifyNodeHostname(node, ssh_port_map[node])
-        if not success:
-          val[node] = message
-
-    result[constants.NV_NODELIST] = val
+    # We only test if master candidates can communicate to other nodes.
+    # We cannot test if normal nodes cannot communicate with other nodes,
+    # because the administrator might have installed additional SSH keys,
+    # over which Ganeti has no power.
+    if my_name in mcs:
+      ssh_port_map = ssconf.SimpleStore().GetSshPortMap()
+      result[constants.NV_NODELIST] = \
+        _VerifyNodeSsh(nodes, cluster_name, ssh_port_map, probe_deadline,
+                       latency)
+    else:
+      result[constants.NV_NODELIST] = {}
 
   if constants.NV_NODENETTEST in what:
     result[constants.NV_NODENETTEST] = VerifyNodeNetTest(
-        my_name, what[constants.NV_NODENETTEST])
+        my_name, what[constants.NV_NODENETTEST], deadline=probe_deadline,
+        latency=latency)
+
+  if (constants.NV_NODELIST in what or
+      constants.NV_NODENETTEST in what):
+    result[constants.NV_LATENCY] = latency
 
   if constants.NV_MASTERIP in what:
     result[constants.NV_MASTERIP] = VerifyMasterIP(
@@ -1388,6 +1678,11 @@ def VerifyNode(what, cluster_name, all_hvparams):
     if pathresult:
       result[constants.NV_SHARED_FILE_STORAGE_PATH] = pathresult
 
+  if verify_cache is not None:
+    _MakeIncrementalResult(what[constants.NV_INCREMENTAL].get(my_name),
+                           result, verify_cache)
+    _SaveNodeVerifyCache(verify_cache)
+
   return result
 
 
@@ -2349,14 +2644,15 @@ def GetBlockDevSizes(devices):
       continue
 
     if stat.S_ISBLK(st.st_mode):
-      result = utils.RunCmd(["blockdev", "--getsize64", devpath])
-      if result.failed:
+      try:
+        size = GetBlockDevSize(devpath)
+      except EnvironmentError, err:
         # We don't want to fail, just do not list this device as available
-        logging.warning("Cannot get size for block device %s", devpath)
+        logging.warning("Cannot get size for block device %s: %s",
+                        devpath, err)
         continue
 
-      size = int(result.stdout) / (1024 * 1024)
-      blockdevs[devpath] = size
+      blockdevs[devpath] = size / (1024 * 1024)
   return blockdevs
 
 
@@ -2381,9 +2677,10 @@ def GetVolumeList(vg_names):
   sep = "|"
   if not vg_names:
     vg_names = []
-  result = utils.RunCmd(["lvs", "--noheadings", "--units=m", "--nosuffix",
-                         "--separator=%s" % sep,
-                         "-ovg_name,lv_name,lv_size,lv_attr"] + vg_names)
+  result = lvm_cache.RunReportCmd(["lvs", "--noheadings", "--units=m",
+                                   "--nosuffix", "--separator=%s" % sep,
+                                   "-ovg_name,lv_name,lv_size,lv_attr"] +
+                                  vg_names)
   if result.failed:
     _Fail("Failed to list logical volumes, lvs output: %s", result.output)
 
@@ -2436,9 +2733,9 @@ def NodeVolumes():
     multiple times.
 
   """
-  result = utils.RunCmd(["lvs", "--noheadings", "--units=m", "--nosuffix",
-                         "--separator=|",
-                         "--options=lv_name,lv_size,devices,vg_name"])
+  result = lvm_cache.RunReportCmd(["lvs", "--noheadings", "--units=m",
+                                   "--nosuffix", "--separator=|",
+                                   "--options=lv_name,lv_size,devices,vg_name"])
   if result.failed:
     _Fail("Failed to list logical volumes, lvs output: %s",
           result.output)
@@ -3388,6 +3685,9 @@ def _DumpDevice(source_path, target_path, offset, size, truncate):
 def _DownloadAndDumpDevice(source_url, target_path, size):
   """This function images a device using a downloaded image file.
 
+  The image is decompressed and written while it is being downloaded, see
+  L{imaging.ImageStream}.
+
   @type source_url: string
   @param source_url: URL of image to dump to disk
 
@@ -3397,44 +3697,48 @@ def _DownloadAndDumpDevice(source_url, target_path, size):
   @type size: int
   @param size: maximum size in MiB to write (data source might be smaller)
 
-  @rtype: NoneType
-  @return: None
+  @rtype: dict
+  @return: statistics about the written image
   @raise RPCFail: in case of download or write failures
 
   """
-  class DDParams(object):
-    def __init__(self, current_size, total_size):
-      self.current_size = current_size
-      self.total_size = total_size
-      self.image_size_error = False
+  errs = []
 
-  def dd_write(ddparams, out):
-    if ddparams.current_size < ddparams.total_size:
-      ddparams.current_size += len(out)
-      target_file.write(out)
-    else:
-      ddparams.image_size_error = True
+  def _Write(data):
+    try:
+      stream.Feed(data)
+    except errors.BlockDeviceError, err:
+      errs.append(err)
+      # Abort the transfer
       return -1
 
-  target_file = open(target_path, "r+")
-  ddparams = DDParams(0, 1024 * 1024 * size)
+  try:
+    stream = imaging.ImageStream(imaging.ImageWriter(target_path,
+                                                     1024 * 1024 * size))
+  except errors.BlockDeviceError, err:
+    _Fail("Can't image device %s: %s", target_path, err)
 
   curl = pycurl.Curl()
   curl.setopt(pycurl.VERBOSE, True)
   curl.setopt(pycurl.NOSIGNAL, True)
   curl.setopt(pycurl.USERAGENT, http.HTTP_GANETI_VERSION)
   curl.setopt(pycurl.URL, source_url)
-  curl.setopt(pycurl.WRITEFUNCTION, lambda out: dd_write(ddparams, out))
+  curl.setopt(pycurl.WRITEFUNCTION, _Write)
 
   try:
     curl.perform()
-  except pycurl.error:
-    if ddparams.image_size_error:
-      _Fail("Disk image larger than the disk")
-    else:
-      raise
+  except pycurl.error, err:
+    stream.Abort()
+    if errs:
+      _Fail("Can't image device %s: %s", target_path, errs[0])
+    _Fail("Can't download image '%s': %s", source_url, err)
+  finally:
+    curl.close()
 
-  target_file.close()
+  try:
+    return stream.Finish()
+  except errors.BlockDeviceError, err:
+    _Fail("Can't image device %s: %s", target_path, err)
 
 
 def BlockdevConvert(src_disk, target_disk):
@@ -3518,8 +3822,9 @@ def BlockdevImage(disk, image, size):
   @type size: int
   @param size: The size in MiB to write
 
-  @rtype: NoneType
-  @return: None
+  @rtype: dict
+  @return: statistics about the written image, see
+      L{imaging.ImageWriter.Close}
   @raise RPCFail: in case of failure
 
   """
@@ -3539,9 +3844,18 @@ def BlockdevImage(disk, image, size):
     _Fail("Image size is bigger than device size")
 
   if utils.IsUrl(image):
-    _DownloadAndDumpDevice(image, rdev.dev_path, size)
+    result = _DownloadAndDumpDevice(image, rdev.dev_path, size)
   else:
-    _DumpDevice(image, rdev.dev_path, 0, size, False)
+    try:
+      result = imaging.DumpImageFile(image, rdev.dev_path, 1024 * 1024 * size)
+    except errors.BlockDeviceError, err:
+      _Fail("Can't image device %s: %s", disk.iv_name, err)
+
+  logging.info("Imaged %s with %s image '%s': %d bytes in %.1f seconds,"
+               " %d bytes zeroed", rdev.dev_path, result["format"], image,
+               result["size"], result["duration"], result["zeroed"])
+
+  return result
 
 
 def BlockdevPauseResumeSync(disks, pause):
@@ -4126,7 +4440,8 @@ def _TryOSFromDisk(name, base_dir=None):
                      Defaults to a search in all the OS_SEARCH_PATH dirs.
   @rtype: tuple
   @return: success and either the OS instance if we find a valid one,
-      or error message
+      or error message; the result is cached as long as the OS directory
+      doesn't change and must not be modified
 
   """
   if base_dir is None:
@@ -4137,6 +4452,21 @@ def _TryOSFromDisk(name, base_dir=None):
   if os_dir is None:
     return False, "Directory for OS %s not found in search path" % name
 
+  return _OS_CACHE.Get(os_dir)
+
+
+def _LoadOSFromDir(os_dir):
+  """Create an OS instance from an OS directory.
+
+  @type os_dir: string
+  @param os_dir: the directory of the OS, whose name is the OS name
+  @rtype: tuple
+  @return: success and either the OS instance if it is a valid one,
+      or error message
+
+  """
+  name = os.path.basename(os_dir)
+
   status, api_versions = _OSOndiskAPIVersion(os_dir)
   if not status:
     # push the error up
@@ -4228,6 +4558,12 @@ def _TryOSFromDisk(name, base_dir=None):
   return True, os_obj
 
 
+#: OS definitions of this process, reloaded when their directory changes;
+#: only long-lived processes such as noded workers (C{--http-workers})
+#: benefit from it
+_OS_CACHE = utils.DirectoryCache(_LoadOSFromDir)
+
+
 def OSFromDisk(name, base_dir=None):
   """Create an OS instance from disk.
 
@@ -4839,6 +5175,55 @@ def JobQueueUpdate(file_name, content):
                   gid=getents.daemons_gid, mode=constants.JOB_QUEUE_FILES_PERMS)
 
 
+def JobQueueUpdateMany(updates):
+  """Updates several files in the queue directory.
+
+  Instead of the full contents, an update can contain the changes against
+  the version of the file the master last sent, see
+  L{jstore.MakeFileDelta}.
+
+  @type updates: list of tuples
+  @param updates: list of C{(file_name, base, content)}; if C{base} is None,
+    C{content} is the new file contents, otherwise it is the replacement
+    for the changed part of the file described by C{base}
+  @rtype: list
+  @return: the names of the files whose changes couldn't be applied, as
+    the current contents aren't the expected version; they need to be
+    sent in full
+
+  """
+  getents = runtime.GetEnts()
+  resync = []
+
+  for (virt_file_name, base, content) in updates:
+    file_name = vcluster.LocalizeVirtualPath(virt_file_name)
+    _EnsureJobQueueFile(file_name)
+
+    data = _Decompress(content)
+    if base is not None:
+      try:
+        old = utils.ReadFile(file_name)
+      except EnvironmentError, err:
+        if err.errno != errno.ENOENT:
+          raise
+        old = None
+      if old is not None:
+        data = jstore.ApplyFileDelta(old, base, data)
+      else:
+        data = None
+      if data is None:
+        logging.info("Job queue file %s is outdated, requesting it in full",
+                     file_name)
+        resync.append(virt_file_name)
+        continue
+
+    utils.WriteFile(file_name, data=data, uid=getents.masterd_uid,
+                    gid=getents.daemons_gid,
+                    mode=constants.JOB_QUEUE_FILES_PERMS)
+
+  return resync
+
+
 def JobQueueRename(old, new):
   """Renames a job queue file.
 
@@ -5182,6 +5567,32 @@ def RemoveX509Certificate(name, cryptodir=pathutils.CRYPTO_KEYS_DIR):
           cert_dir, err)
 
 
+def _GetDdRangeCommand(mode, filename, offset, size):
+  """Returns the command transferring a part of a file.
+
+  The parts of a file can be written in parallel, so the file must not be
+  truncated when writing one of them.
+
+  @param mode: Import/export mode
+  @type filename: string
+  @param filename: the file to read from or write to
+  @type offset: int
+  @param offset: offset in MiB of the part
+  @type size: int
+  @param size: size in MiB of the part
+  @rtype: list of strings
+
+  """
+  if mode == constants.IEM_IMPORT:
+    return [constants.DD_CMD, "of=%s" % filename,
+            "bs=%s" % constants.DD_BLOCK_SIZE, "seek=%d" % offset,
+            "count=%d" % size, "iflag=fullblock", "conv=notrunc"]
+  else:
+    return [constants.DD_CMD, "if=%s" % filename,
+            "bs=%s" % constants.DD_BLOCK_SIZE, "skip=%d" % offset,
+            "count=%d" % size]
+
+
 def _GetImportExportIoCommand(instance, mode, ieio, ieargs):
   """Returns the command for the requested input/output.
 
@@ -5200,7 +5611,7 @@ def _GetImportExportIoCommand(instance, mode, ieio, ieargs):
   exp_size = None
 
   if ieio == constants.IEIO_FILE:
-    (filename, ) = ieargs
+    filename = ieargs[0]
 
     if not utils.IsNormAbsPath(filename):
       _Fail("Path '%s' is not normalized or absolute", filename)
@@ -5217,7 +5628,20 @@ def _GetImportExportIoCommand(instance, mode, ieio, ieargs):
 
     quoted_filename = utils.ShellQuote(filename)
 
-    if mode == constants.IEM_IMPORT:
+    if len(ieargs) > 1:
+      # Only a part of the file is transferred, see L{_GetDdRangeCommand}
+      (offset, size) = ieargs[1]
+      if offset < 0 or size < 1:
+        _Fail("Invalid range %s+%s for file '%s'", offset, size, filename)
+      cmd = utils.ShellQuoteArgs(_GetDdRangeCommand(mode, filename, offset,
+                                                    size))
+      if mode == constants.IEM_IMPORT:
+        suffix = "| %s" % cmd
+      elif mode == constants.IEM_EXPORT:
+        prefix = "%s |" % cmd
+        exp_size = size
+
+    elif mode == constants.IEM_IMPORT:
       suffix = "> %s" % quoted_filename
     elif mode == constants.IEM_EXPORT:
       suffix = "< %s" % quoted_filename
@@ -5231,15 +5655,31 @@ def _GetImportExportIoCommand(instance, mode, ieio, ieargs):
         exp_size = utils.BytesToMebibyte(st.st_size)
 
   elif ieio == constants.IEIO_RAW_DISK:
-    (disk, ) = ieargs
+    disk = ieargs[0]
     real_disk = _OpenRealBD(disk)
 
-    if mode == constants.IEM_IMPORT:
-      suffix = "| %s" % utils.ShellQuoteArgs(real_disk.Import())
+    if len(ieargs) > 1:
+      # Only a part of the disk is transferred
+      (offset, size) = ieargs[1]
+      if offset < 0 or size < 1 or offset + size > disk.size:
+        _Fail("Invalid range %s+%s for disk of size %s", offset, size,
+              disk.size)
+      import_fn = compat.partial(real_disk.ImportRange, offset, size)
+      export_fn = compat.partial(real_disk.ExportRange, offset, size)
+    else:
+      size = disk.size
+      import_fn = real_disk.Import
+      export_fn = real_disk.Export
 
-    elif mode == constants.IEM_EXPORT:
-      prefix = "%s |" % utils.ShellQuoteArgs(real_disk.Export())
-      exp_size = disk.size
+    try:
+      if mode == constants.IEM_IMPORT:
+        suffix = "| %s" % utils.ShellQuoteArgs(import_fn())
+
+      elif mode == constants.IEM_EXPORT:
+        prefix = "%s |" % utils.ShellQuoteArgs(export_fn())
+        exp_size = size
+    except errors.BlockDeviceError, err:
+      _Fail("Can't transfer disk %s: %s", disk.iv_name, err)
 
   elif ieio == constants.IEIO_SCRIPT:
     (disk, disk_index, ) = ieargs
@@ -5952,6 +6392,10 @@ def GetFileInfo(file_path):
     return False, {}
 
 
+#: Number of bytes at the start of hook scripts searched for their flags
+_HOOKS_SCRIPT_HEADER_SIZE = 4096
+
+
 class HooksRunner(object):
   """Hook runner.
 
@@ -5986,22 +6430,132 @@ class HooksRunner(object):
     # Return values in the form expected by HooksMaster
     return {node: (None, False, results)}
 
+  @staticmethod
+  def _GetScriptFlags(path):
+    """Returns the flags a hook script declares.
+
+    Scripts declare their flags, separated by commas, on a line starting with
+    L{constants.HOOKS_SCRIPT_FLAGS_PREFIX} within their first
+    L{_HOOKS_SCRIPT_HEADER_SIZE} bytes.
+
+    @type path: str
+    @param path: the path of the script
+    @rtype: frozenset
+
+    """
+    try:
+      header = utils.ReadFile(path, size=_HOOKS_SCRIPT_HEADER_SIZE)
+    except EnvironmentError, err:
+      logging.warning("Can't read hook script %s: %s", path, err)
+      return frozenset()
+
+    flags = set()
+    for line in header.splitlines():
+      if line.startswith(constants.HOOKS_SCRIPT_FLAGS_PREFIX):
+        value = line[len(constants.HOOKS_SCRIPT_FLAGS_PREFIX):]
+        flags.update(flag.strip() for flag in value.split(","))
+    return frozenset(flags)
+
+  @staticmethod
+  def _RunScript(fname, env, results, relname, deadline=None):
+    """Runs a single hook script and stores its outcome.
+
+    @type deadline: float
+    @param deadline: if not None, the time (as returned by C{time.time}) by
+        which the script must have finished
+
+    """
+    timeout = None
+    if deadline is not None:
+      timeout = deadline - time.time()
+      if timeout <= 0:
+        results[relname] = (constants.RUNPARTS_ERR,
+                            "Not started within %s seconds" %
+                            constants.HOOKS_INDEPENDENT_TIMEOUT)
+        return
+
+    try:
+      result = utils.RunCmd([fname], env=env, reset_env=True, timeout=timeout)
+    except Exception, err: # pylint: disable=W0703
+      results[relname] = (constants.RUNPARTS_ERR, str(err))
+    else:
+      results[relname] = (constants.RUNPARTS_RUN, result)
+
+  @classmethod
+  def _RunScripts(cls, serial, independent, env):
+    """Runs hook scripts.
+
+    The independent scripts run concurrently with each other and with the
+    other scripts, which run one after the other. Independent scripts must
+    finish within L{constants.HOOKS_INDEPENDENT_TIMEOUT} seconds.
+
+    @type serial: list of tuples
+    @param serial: relative and full names of the scripts to run one after
+        the other, in order
+    @type independent: list of tuples
+    @param independent: relative and full names of the independent scripts
+    @rtype: dict
+    @return: relative script names as keys, tuples of one of
+        L{constants.RUNPARTS_STATUS} and the L{utils.RunResult} or error
+        message as values
+
+    """
+    results = {}
+    deadline = time.time() + constants.HOOKS_INDEPENDENT_TIMEOUT
+
+    tasks = []
+    if serial:
+      tasks.append((cls._RunSerialScripts, serial, env, results))
+    tasks.extend((cls._RunScript, fname, env, results, relname, deadline)
+                 for (relname, fname) in independent)
+
+    num_workers = min(len(tasks), constants.HOOKS_MAX_CONCURRENT)
+    if num_workers > 1:
+      pool = workerpool.WorkerPool("HooksRunner", num_workers,
+                                   _HookScriptWorker)
+      try:
+        pool.AddManyTasks(tasks)
+        pool.Quiesce()
+      finally:
+        pool.TerminateWorkers()
+    else:
+      for task in tasks:
+        task[0](*task[1:])
+
+    return results
+
+  @classmethod
+  def _RunSerialScripts(cls, scripts, env, results):
+    """Runs hook scripts one after the other.
+
+    """
+    for (relname, fname) in scripts:
+      cls._RunScript(fname, env, results, relname)
+
   def RunHooks(self, hpath, phase, env):
     """Run the scripts in the hooks directory.
 
+    Scripts declaring the L{constants.HOOKS_FLAG_INDEPENDENT} flag run
+    concurrently with the other scripts. In the post phase, scripts
+    declaring the L{constants.HOOKS_FLAG_ASYNC} flag are not run but
+    reported as deferred; they are run separately in the
+    L{constants.HOOKS_PHASE_POST_DEFERRED} phase.
+
     @type hpath: str
     @param hpath: the path to the hooks directory which
         holds the scripts
     @type phase: str
-    @param phase: either L{constants.HOOKS_PHASE_PRE} or
-        L{constants.HOOKS_PHASE_POST}
+    @param phase: either L{constants.HOOKS_PHASE_PRE},
+        L{constants.HOOKS_PHASE_POST} or
+        L{constants.HOOKS_PHASE_POST_DEFERRED}
     @type env: dict
     @param env: dictionary with the environment for the hook
     @rtype: list
     @return: list of 3-element tuples:
       - script path
-      - script result, either L{constants.HKR_SUCCESS} or
-        L{constants.HKR_FAIL}
+      - script result, either L{constants.HKR_SUCCESS},
+        L{constants.HKR_FAIL}, L{constants.HKR_SKIP} or
+        L{constants.HKR_DEFERRED}
       - output of the script
 
     @raise errors.ProgrammerError: for invalid input
@@ -6010,7 +6564,8 @@ class HooksRunner(object):
     """
     if phase == constants.HOOKS_PHASE_PRE:
       suffix = "pre"
-    elif phase == constants.HOOKS_PHASE_POST:
+    elif phase in (constants.HOOKS_PHASE_POST,
+                   constants.HOOKS_PHASE_POST_DEFERRED):
       suffix = "post"
     else:
       _Fail("Unknown hooks phase '%s'", phase)
@@ -6025,9 +6580,46 @@ class HooksRunner(object):
       # warning at every operation
       return results
 
-    runparts_results = utils.RunParts(dir_name, env=env, reset_env=True)
+    try:
+      dir_contents = utils.ListVisibleFiles(dir_name)
+    except OSError, err:
+      logging.warning("Skipping hooks directory %s (cannot list: %s)",
+                      dir_name, err)
+      return results
 
-    for (relname, relstatus, runresult) in runparts_results:
+    names = []
+    serial = []
+    independent = []
+    runparts_results = {}
+    for relname in sorted(dir_contents):
+      fname = utils.PathJoin(dir_name, relname)
+      if not (constants.EXT_PLUGIN_MASK.match(relname) is not None and
+              utils.IsExecutable(fname)):
+        flags = None
+      else:
+        flags = self._GetScriptFlags(fname)
+
+      if phase == constants.HOOKS_PHASE_POST_DEFERRED:
+        if flags is None or constants.HOOKS_FLAG_ASYNC not in flags:
+          continue
+      elif phase == constants.HOOKS_PHASE_POST and flags is not None:
+        if constants.HOOKS_FLAG_ASYNC in flags:
+          results.append(("%s/%s" % (subdir, relname),
+                          constants.HKR_DEFERRED, ""))
+          continue
+
+      names.append(relname)
+      if flags is None:
+        runparts_results[relname] = (constants.RUNPARTS_SKIP, None)
+      elif constants.HOOKS_FLAG_INDEPENDENT in flags:
+        independent.append((relname, fname))
+      else:
+        serial.append((relname, fname))
+
+    runparts_results.update(self._RunScripts(serial, independent, env))
+
+    for relname in names:
+      (relstatus, runresult) = runparts_results[relname]
       if relstatus == constants.RUNPARTS_SKIP:
         rrval = constants.HKR_SKIP
         output = ""
@@ -6039,12 +6631,27 @@ class HooksRunner(object):
           rrval = constants.HKR_FAIL
         else:
           rrval = constants.HKR_SUCCESS
-        output = utils.SafeEncode(runresult.output.strip())
+        output = runresult.output.strip()
+        if runresult.failed_by_timeout:
+          output = "\n".join(filter(None, [output, runresult.fail_reason]))
+        output = utils.SafeEncode(output)
       results.append(("%s/%s" % (subdir, relname), rrval, output))
 
+    results.sort()
     return results
 
 
+class _HookScriptWorker(workerpool.BaseWorker):
+  """Worker thread running hook scripts.
+
+  """
+  def RunTask(self, fn, *args): # pylint: disable=W0221
+    """Runs a function running hook scripts.
+
+    """
+    fn(*args)
+
+
 class IAllocatorRunner(object):
   """IAllocator runner.
 
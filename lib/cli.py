@@ -136,10 +136,6 @@ __all__ = [
  QR_UNKNOWN,
  QR_INCOMPLETE) = range(3)
 
-#: Maximum batch size for ChooseJob
-_CHOOSE_BATCH = 25
-
-
 # constants used to create InstancePolicy dictionary
 TISPECS_GROUP_TYPES = {
   constants.ISPECS_MIN: constants.VTYPE_INT,
@@ -1430,6 +1426,7 @@ def GenericInstanceCreate(mode, opts, args):
     no_install = opts.no_install
     identify_defaults = False
     compress = constants.IEC_NONE
+    transfer_streams = 1
     if opts.instance_communication is None:
       instance_communication = False
     else:
@@ -1446,6 +1443,7 @@ def GenericInstanceCreate(mode, opts, args):
     no_install = None
     identify_defaults = opts.identify_defaults
     compress = opts.compress
+    transfer_streams = opts.transfer_streams
     instance_communication = False
   else:
     raise errors.ProgrammerError("Invalid creation mode %s" % mode)
@@ -1480,6 +1478,7 @@ def GenericInstanceCreate(mode, opts, args):
     src_node=src_node,
     src_path=src_path,
     compress=compress,
+    transfer_streams=transfer_streams,
     tags=tags,
     no_install=no_install,
     identify_defaults=identify_defaults,
@@ -1912,6 +1911,28 @@ def FormatQueryResult(result, unit=None, format_override=None, separator=None,
   @type verbose: boolean
   @param verbose: whether to use verbose field descriptions or not
 
+  """
+  (columns, status_fn) = _PrepareQueryFormat(result.fields, unit,
+                                             format_override, separator,
+                                             verbose)
+
+  table = FormatTable(result.data, columns, header, separator)
+
+  return (status_fn(), table)
+
+
+def _PrepareQueryFormat(fdefs, unit, format_override, separator, verbose):
+  """Prepares the formatting of query results.
+
+  @type fdefs: list of L{objects.QueryFieldDefinition}
+  @param unit: see L{FormatQueryResult}
+  @param format_override: see L{FormatQueryResult}
+  @param separator: see L{FormatQueryResult}
+  @param verbose: see L{FormatQueryResult}
+  @rtype: tuple; (list of L{TableColumn}, callable)
+  @return: the table columns, and a function returning the overall status
+    (one of C{QR_*}) of the rows formatted with them so far
+
   """
   if unit is None:
     if separator:
@@ -1928,33 +1949,59 @@ def FormatQueryResult(result, unit=None, format_override=None, separator=None,
     if status in stats:
       stats[status] += 1
 
+  def _GetStatus():
+    # Every formatted row reports the status of its fields
+    return _GetQueryStatus(stats, fdefs, compat.any(stats.values()))
+
+  columns = _GetQueryColumns(fdefs, unit, format_override, _RecordStatus,
+                             verbose)
+
+  return (columns, _GetStatus)
+
+
+def _GetQueryColumns(fdefs, unit, format_override, status_fn, verbose):
+  """Returns the table columns for the fields of a query.
+
+  @type fdefs: list of L{objects.QueryFieldDefinition}
+  @param status_fn: Function to report fields' status
+  @rtype: list of L{TableColumn}
+
+  """
   columns = []
-  for fdef in result.fields:
+  for fdef in fdefs:
     assert fdef.title and fdef.name
     (fn, align_right) = _GetColumnFormatter(fdef, format_override, unit)
     columns.append(TableColumn(fdef.title,
-                               _QueryColumnFormatter(fn, _RecordStatus,
-                                                     verbose),
+                               _QueryColumnFormatter(fn, status_fn, verbose),
                                align_right))
 
-  table = FormatTable(result.data, columns, header, separator)
+  return columns
+
 
-  # Collect statistics
+def _GetQueryStatus(stats, fdefs, have_data):
+  """Determines the overall status of a query result.
+
+  @type stats: dict
+  @param stats: Number of fields per result status
+  @type fdefs: list of L{objects.QueryFieldDefinition}
+  @type have_data: bool
+  @param have_data: Whether the result contained any item
+  @return: One of C{QR_*}
+
+  """
   assert len(stats) == len(constants.RS_ALL)
   assert compat.all(count >= 0 for count in stats.values())
 
   # Determine overall status. If there was no data, unknown fields must be
   # detected via the field definitions.
   if (stats[constants.RS_UNKNOWN] or
-      (not result.data and _GetUnknownFields(result.fields))):
-    status = QR_UNKNOWN
+      (not have_data and _GetUnknownFields(fdefs))):
+    return QR_UNKNOWN
   elif compat.any(count > 0 for key, count in stats.items()
                   if key != constants.RS_NORMAL):
-    status = QR_INCOMPLETE
+    return QR_INCOMPLETE
   else:
-    status = QR_NORMAL
-
-  return (status, table)
+    return QR_NORMAL
 
 
 def _GetUnknownFields(fdefs):
@@ -1982,9 +2029,33 @@ def _WarnUnknownFields(fdefs):
   return False
 
 
+def _QueryPages(cl, resource, fields, qfilter, namefield, page_size):
+  """Queries the items of a resource page by page.
+
+  The names of all matching items are queried first, then the requested
+  fields for C{page_size} of them at a time.
+
+  @param namefield: Name of field identifying the items
+  @type page_size: int
+  @param page_size: Number of items per page
+  @return: Iterator over the result rows, in the order of the names
+
+  """
+  names = [value for ((status, value), ) in
+           cl.Query(resource, [namefield], qfilter).data
+           if status == constants.RS_NORMAL]
+
+  for start in range(0, len(names), page_size):
+    pfilter = qlang.MakeSimpleFilter(namefield,
+                                     names[start:start + page_size])
+    for row in cl.Query(resource, fields, pfilter).data:
+      yield row
+
+
 def GenericList(resource, fields, names, unit, separator, header, cl=None,
                 format_override=None, verbose=False, force_filter=False,
-                namefield=None, qfilter=None, isnumeric=False):
+                namefield=None, qfilter=None, isnumeric=False,
+                page_size=None):
   """Generic implementation for listing all items of a resource.
 
   @param resource: One of L{constants.QR_VIA_LUXI}
@@ -2016,8 +2087,16 @@ def GenericList(resource, fields, names, unit, separator, header, cl=None,
   @param isnumeric: Whether the namefield's type is numeric, and therefore
     any simple filters built by namefield should use integer values to
     reflect that
+  @type page_size: int or None
+  @param page_size: Query and print this many items at a time instead of all
+    items at once; without a separator, the column widths are computed from
+    the first page
 
   """
+  if page_size is not None and page_size < 1:
+    raise errors.OpPrereqError("Page size must be at least 1, not %s" %
+                               page_size, errors.ECODE_INVAL)
+
   if not names:
     names = None
 
@@ -2032,18 +2111,27 @@ def GenericList(resource, fields, names, unit, separator, header, cl=None,
   if cl is None:
     cl = GetClient()
 
-  response = cl.Query(resource, fields, qfilter)
+  if page_size:
+    if namefield is None:
+      namefield = "name"
 
-  found_unknown = _WarnUnknownFields(response.fields)
+    fdefs = cl.QueryFields(resource, fields).fields
+    rows = _QueryPages(cl, resource, fields, qfilter, namefield, page_size)
+  else:
+    response = cl.Query(resource, fields, qfilter)
+    (fdefs, rows) = (response.fields, response.data)
 
-  (status, data) = FormatQueryResult(response, unit=unit, separator=separator,
-                                     header=header,
-                                     format_override=format_override,
-                                     verbose=verbose)
+  found_unknown = _WarnUnknownFields(fdefs)
 
-  for line in data:
+  (columns, status_fn) = _PrepareQueryFormat(fdefs, unit, format_override,
+                                             separator, verbose)
+
+  for line in IterFormatTable(rows, columns, header, separator,
+                              width_sample=page_size):
     ToStdout(line)
 
+  status = status_fn()
+
   assert ((found_unknown and status == QR_UNKNOWN) or
           (not found_unknown and status != QR_UNKNOWN))
 
@@ -2154,30 +2242,62 @@ def FormatTable(rows, columns, header, separator):
   @param separator: String used to separate columns
 
   """
-  if header:
-    data = [[col.title for col in columns]]
-    colwidth = [len(col.title) for col in columns]
-  else:
-    data = []
-    colwidth = [0 for _ in columns]
+  return list(IterFormatTable(rows, columns, header, separator))
+
+
+def _FormatTableRow(row, columns):
+  """Formats the values of a table row.
+
+  """
+  assert len(row) == len(columns)
+
+  return [col.format(value) for value, col in zip(row, columns)]
 
-  # Format row data
-  for row in rows:
-    assert len(row) == len(columns)
 
-    formatted = [col.format(value) for value, col in zip(row, columns)]
+def IterFormatTable(rows, columns, header, separator, width_sample=None):
+  """Formats data as a table, one line at a time.
 
-    if separator is None:
-      # Update column widths
-      for idx, (oldwidth, value) in enumerate(zip(colwidth, formatted)):
-        # Modifying a list's items while iterating is fine
-        colwidth[idx] = max(oldwidth, len(value))
+  Rows are only consumed as far as needed for the lines generated so far,
+  so that a long table can be printed while its rows are being retrieved.
+
+  @type rows: iterable of lists
+  @param rows: Row data, one list per row
+  @type columns: list of L{TableColumn}
+  @param columns: Column descriptions
+  @type header: bool
+  @param header: Whether to show header row
+  @type separator: string or None
+  @param separator: String used to separate columns
+  @type width_sample: int or None
+  @param width_sample: Number of rows from which the column widths are
+    computed if no separator is used, all rows if C{None}; values of later
+    rows wider than their column are not shortened
 
-    data.append(formatted)
+  """
+  rows = iter(rows)
 
   if separator is not None:
-    # Return early if a separator is used
-    return [separator.join(row) for row in data]
+    if header:
+      yield separator.join(col.title for col in columns)
+
+    for row in rows:
+      yield separator.join(_FormatTableRow(row, columns))
+
+    return
+
+  if header:
+    colwidth = [len(col.title) for col in columns]
+  else:
+    colwidth = [0 for _ in columns]
+
+  # Format the rows used for computing the column widths
+  sample = [_FormatTableRow(row, columns)
+            for row in itertools.islice(rows, width_sample)]
+
+  for formatted in sample:
+    for idx, (oldwidth, value) in enumerate(zip(colwidth, formatted)):
+      # Modifying a list's items while iterating is fine
+      colwidth[idx] = max(oldwidth, len(value))
 
   if columns and not columns[-1].align_right:
     # Avoid unnecessary spaces at end of line
@@ -2187,7 +2307,16 @@ def FormatTable(rows, columns, header, separator):
   fmt = " ".join([_GetColFormatString(width, col.align_right)
                   for col, width in zip(columns, colwidth)])
 
-  return [fmt % tuple(row) for row in data]
+  if header:
+    yield fmt % tuple(col.title for col in columns)
+
+  for formatted in sample:
+    yield fmt % tuple(formatted)
+
+  del sample
+
+  for row in rows:
+    yield fmt % tuple(_FormatTableRow(row, columns))
 
 
 def FormatTimestamp(ts):
@@ -2476,29 +2605,32 @@ class JobExecutor(object):
     for ((status, data), (idx, name, _)) in zip(results, self.queue):
       self.jobs.append((idx, status, data, name))
 
-  def _ChooseJob(self):
-    """Choose a non-waiting/queued job to poll next.
+  def _WaitForFinishedJobs(self, statuses):
+    """Waits until at least one of the jobs is finalized or lost.
+
+    Uses a single LUXI call waiting for changes of any of the jobs rather
+    than polling them one after another.
+
+    @type statuses: dict
+    @param statuses: last known status by job ID, updated in place
+    @return: the finished jobs, which are removed from C{self.jobs}
 
     """
-    assert self.jobs, "_ChooseJob called with empty job list"
-
-    result = self.cl.QueryJobs([i[2] for i in self.jobs[:_CHOOSE_BATCH]],
-                               ["status"])
-    assert result
-
-    for job_data, status in zip(self.jobs, result):
-      if (isinstance(status, list) and status and
-          status[0] in (constants.JOB_STATUS_QUEUED,
-                        constants.JOB_STATUS_WAITING,
-                        constants.JOB_STATUS_CANCELING)):
-        # job is still present and waiting
-        continue
-      # good candidate found (either running job or lost job)
-      self.jobs.remove(job_data)
-      return job_data
+    assert self.jobs, "_WaitForFinishedJobs called with empty job list"
 
-    # no job found
-    return self.jobs.pop(0)
+    while True:
+      (finished, self.jobs) = \
+        compat.partition(self.jobs,
+                         lambda row: (statuses[int(row[2])] is None or
+                                      statuses[int(row[2])] in
+                                      constants.JOBS_FINALIZED))
+      if finished:
+        return finished
+
+      changes = self.cl.WaitForJobsChangeOnce([(row[2], statuses[int(row[2])])
+                                               for row in self.jobs])
+      for (job_id, status) in changes:
+        statuses[int(job_id)] = status
 
   def GetResults(self):
     """Wait for and return the results of all jobs.
@@ -2523,25 +2655,36 @@ class JobExecutor(object):
       ToStderr("Failed to submit job%s: %s", self._IfName(name, " for %s"), jid)
       results.append((idx, False, jid))
 
+    if self.jobs:
+      job_ids = [row[2] for row in self.jobs]
+      # Jobs unknown to the queue have a status of None
+      statuses = dict((int(job_id), (status or [None])[0])
+                      for (job_id, status) in
+                        zip(job_ids, self.cl.QueryJobs(job_ids, ["status"])))
+    else:
+      statuses = {}
+
     while self.jobs:
-      (idx, _, jid, name) = self._ChooseJob()
-      ToStdout("Waiting for job %s%s ...", jid, self._IfName(name, " for %s"))
-      try:
-        job_result = PollJob(jid, cl=self.cl, feedback_fn=self.feedback_fn)
-        success = True
-      except errors.JobLost, err:
-        _, job_result = FormatError(err)
-        ToStderr("Job %s%s has been archived, cannot check its result",
-                 jid, self._IfName(name, " for %s"))
-        success = False
-      except (errors.GenericError, rpcerr.ProtocolError), err:
-        _, job_result = FormatError(err)
-        success = False
-        # the error message will always be shown, verbose or not
-        ToStderr("Job %s%s has failed: %s",
-                 jid, self._IfName(name, " for %s"), job_result)
-
-      results.append((idx, success, job_result))
+      # Collect the results in the order in which the jobs finish
+      for (idx, _, jid, name) in self._WaitForFinishedJobs(statuses):
+        ToStdout("Collecting result of job %s%s ...", jid,
+                 self._IfName(name, " for %s"))
+        try:
+          job_result = PollJob(jid, cl=self.cl, feedback_fn=self.feedback_fn)
+          success = True
+        except errors.JobLost, err:
+          _, job_result = FormatError(err)
+          ToStderr("Job %s%s has been archived, cannot check its result",
+                   jid, self._IfName(name, " for %s"))
+          success = False
+        except (errors.GenericError, rpcerr.ProtocolError), err:
+          _, job_result = FormatError(err)
+          success = False
+          # the error message will always be shown, verbose or not
+          ToStderr("Job %s%s has failed: %s",
+                   jid, self._IfName(name, " for %s"), job_result)
+
+        results.append((idx, success, job_result))
 
     # sort based on the index, then drop it
     results.sort()
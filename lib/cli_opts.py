@@ -67,6 +67,7 @@ __all__ = [
   "COMMON_CREATE_OPTS",
   "COMMON_OPTS",
   "COMPRESS_OPT",
+  "TRANSFER_STREAMS_OPT",
   "COMPRESSION_TOOLS_OPT",
   "CONFIRM_OPT",
   "CP_SIZE_OPT",
@@ -213,6 +214,7 @@ __all__ = [
   "OSPARAMS_OPT",
   "OSPARAMS_PRIVATE_OPT",
   "OSPARAMS_SECRET_OPT",
+  "PAGE_SIZE_OPT",
   "POWER_DELAY_OPT",
   "PREALLOC_WIPE_DISKS_OPT",
   "PRIMARY_IP_VERSION_OPT",
@@ -269,6 +271,7 @@ __all__ = [
   "USEUNITS_OPT",
   "VERBOSE_OPT",
   "VERIFY_CLUTTER_OPT",
+  "VERIFY_INCREMENTAL_OPT",
   "VG_NAME_OPT",
   "WFSYNC_OPT",
   "YES_DOIT_OPT",
@@ -583,6 +586,12 @@ SEP_OPT = cli_option("--separator", default=None,
                      help=("Separator between output fields"
                            " (defaults to one space)"))
 
+PAGE_SIZE_OPT = cli_option("--page-size", default=None, dest="page_size",
+                           type="int", metavar="<count>",
+                           help=("Query and print the items this many at a"
+                                 " time; without a separator, column widths"
+                                 " are computed from the first page only"))
+
 USEUNITS_OPT = cli_option("--units", default=None,
                           dest="units", choices=("h", "m", "g", "t"),
                           help="Specify units for output (one of h/m/g/t)")
@@ -1284,6 +1293,12 @@ COMPRESS_OPT = cli_option("--compress", dest="compress",
                           type="string", default=constants.IEC_NONE,
                           help="The compression mode to use")
 
+TRANSFER_STREAMS_OPT = cli_option("--transfer-streams",
+                                  dest="transfer_streams", type="int",
+                                  default=1,
+                                  help="Number of parallel streams used to"
+                                  " copy each disk")
+
 TRANSPORT_COMPRESSION_OPT = \
     cli_option("--transport-compression", dest="transport_compression",
                type="string", default=constants.IEC_NONE,
@@ -1679,6 +1694,11 @@ VERIFY_CLUTTER_OPT = cli_option(
     help="Verify that Ganeti did not clutter"
     " up the 'authorized_keys' file", action="store_true")
 
+VERIFY_INCREMENTAL_OPT = cli_option(
+    "--incremental", default=False, dest="incremental",
+    help="Only re-check what changed since the last incremental"
+    " verification", action="store_true")
+
 LONG_SLEEP_OPT = cli_option(
     "--long-sleep", default=False, dest="long_sleep",
     help="Allow long shutdowns when backing up instances", action="store_true")
@@ -103,6 +103,7 @@ def ExportInstance(opts, args):
     instance_name=args[0],
     target_node=opts.node,
     compress=opts.transport_compression,
+    transfer_streams=opts.transfer_streams,
     shutdown=opts.shutdown,
     shutdown_timeout=opts.shutdown_timeout,
     remove_instance=opts.remove_instance,
@@ -149,6 +150,7 @@ import_opts = [
   SRC_DIR_OPT,
   SRC_NODE_OPT,
   COMPRESS_OPT,
+  TRANSFER_STREAMS_OPT,
   IGNORE_IPOLICY_OPT,
   HELPER_STARTUP_TIMEOUT_OPT,
   HELPER_SHUTDOWN_TIMEOUT_OPT,
@@ -167,9 +169,10 @@ commands = {
     "Lists all available fields for exports"),
   "export": (
     ExportInstance, ARGS_ONE_INSTANCE,
-    [FORCE_OPT, SINGLE_NODE_OPT, TRANSPORT_COMPRESSION_OPT, NOSHUTDOWN_OPT,
-     SHUTDOWN_TIMEOUT_OPT, REMOVE_INSTANCE_OPT, IGNORE_REMOVE_FAILURES_OPT,
-     DRY_RUN_OPT, PRIORITY_OPT, ZERO_FREE_SPACE_OPT, ZEROING_TIMEOUT_FIXED_OPT,
+    [FORCE_OPT, SINGLE_NODE_OPT, TRANSPORT_COMPRESSION_OPT,
+     TRANSFER_STREAMS_OPT, NOSHUTDOWN_OPT, SHUTDOWN_TIMEOUT_OPT,
+     REMOVE_INSTANCE_OPT, IGNORE_REMOVE_FAILURES_OPT, DRY_RUN_OPT,
+     PRIORITY_OPT, ZERO_FREE_SPACE_OPT, ZEROING_TIMEOUT_FIXED_OPT,
      ZEROING_TIMEOUT_PER_MIB_OPT, LONG_SLEEP_OPT] + SUBMIT_OPTS,
     "-n <target_node> [opts...] <name>",
     "Exports an instance to an image"),
@@ -774,7 +774,8 @@ def VerifyCluster(opts, args):
                                skip_checks=skip_checks,
                                ignore_errors=opts.ignore_errors,
                                group_name=opts.nodegroup,
-                               verify_clutter=opts.verify_clutter)
+                               verify_clutter=opts.verify_clutter,
+                               incremental=opts.incremental)
   result = SubmitOpCode(op, cl=cl, opts=opts)
 
   # Keep track of submitted jobs
@@ -2535,7 +2536,8 @@ commands = {
   "verify": (
     VerifyCluster, ARGS_NONE,
     [VERBOSE_OPT, DEBUG_SIMERR_OPT, ERROR_CODES_OPT, NONPLUS1_OPT,
-     PRIORITY_OPT, NODEGROUP_OPT, IGNORE_ERRORS_OPT, VERIFY_CLUTTER_OPT],
+     PRIORITY_OPT, NODEGROUP_OPT, IGNORE_ERRORS_OPT, VERIFY_CLUTTER_OPT,
+     VERIFY_INCREMENTAL_OPT],
     "", "Does a check on the cluster configuration"),
   "verify-disks": (
     VerifyDisks, ARGS_NONE, [PRIORITY_OPT, NODEGROUP_OPT, STRICT_OPT],
@@ -237,7 +237,8 @@ def ListInstances(opts, args):
   return GenericList(constants.QR_INSTANCE, selected_fields, args, opts.units,
                      opts.separator, not opts.no_headers,
                      format_override=fmtoverride, verbose=opts.verbose,
-                     force_filter=opts.force_filter, cl=cl)
+                     force_filter=opts.force_filter, cl=cl,
+                     page_size=opts.page_size)
 
 
 def ListInstanceFields(opts, args):
@@ -872,6 +873,7 @@ def MoveInstance(opts, args):
   op = opcodes.OpInstanceMove(instance_name=instance_name,
                               target_node=opts.node,
                               compress=opts.compress,
+                              transfer_streams=opts.transfer_streams,
                               shutdown_timeout=opts.shutdown_timeout,
                               ignore_consistency=opts.ignore_consistency,
                               ignore_ipolicy=opts.ignore_ipolicy)
@@ -1648,7 +1650,7 @@ commands = {
   "move": (
     MoveInstance, ARGS_ONE_INSTANCE,
     [FORCE_OPT] + SUBMIT_OPTS +
-    [SINGLE_NODE_OPT, COMPRESS_OPT,
+    [SINGLE_NODE_OPT, COMPRESS_OPT, TRANSFER_STREAMS_OPT,
      SHUTDOWN_TIMEOUT_OPT, DRY_RUN_OPT, PRIORITY_OPT, IGNORE_CONSIST_OPT,
      IGNORE_IPOLICY_OPT],
     "[-f] <instance>", "Move instance to an arbitrary node"
@@ -1661,7 +1663,7 @@ commands = {
   "list": (
     ListInstances, ARGS_MANY_INSTANCES,
     [NOHDR_OPT, SEP_OPT, USEUNITS_OPT, FIELDS_OPT, VERBOSE_OPT,
-     FORCE_FILTER_OPT],
+     FORCE_FILTER_OPT, PAGE_SIZE_OPT],
     "[<instance>...]",
     "Lists the instances and their status. The available fields can be shown"
     " using the \"list-fields\" command (see the man page for details)."
@@ -384,7 +384,8 @@ def ListNodes(opts, args):
   return GenericList(constants.QR_NODE, selected_fields, args, opts.units,
                      opts.separator, not opts.no_headers,
                      format_override=fmtoverride, verbose=opts.verbose,
-                     force_filter=opts.force_filter, cl=cl)
+                     force_filter=opts.force_filter, cl=cl,
+                     page_size=opts.page_size)
 
 
 def ListNodeFields(opts, args):
@@ -1209,7 +1210,7 @@ commands = {
   "list": (
     ListNodes, ARGS_MANY_NODES,
     [NOHDR_OPT, SEP_OPT, USEUNITS_OPT, FIELDS_OPT, VERBOSE_OPT,
-     FORCE_FILTER_OPT],
+     FORCE_FILTER_OPT, PAGE_SIZE_OPT],
     "[nodes...]",
     "Lists the nodes in the cluster. The available fields can be shown using"
     " the \"list-fields\" command (see the man page for details)."
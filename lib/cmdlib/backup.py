@@ -124,6 +124,15 @@ class LUBackupExport(LogicalUnit):
         raise errors.OpPrereqError("Missing destination X509 CA",
                                    errors.ECODE_INVAL)
 
+    if self.op.transfer_streams < 1:
+      raise errors.OpPrereqError("The number of transfer streams must be at"
+                                 " least 1", errors.ECODE_INVAL)
+    if (self.op.transfer_streams > 1 and
+        self.op.mode != constants.EXPORT_MODE_LOCAL):
+      raise errors.OpPrereqError("Several transfer streams can only be used"
+                                 " for exports within the cluster",
+                                 errors.ECODE_INVAL)
+
     if self.op.zero_free_space and not self.op.compress:
       raise errors.OpPrereqError("Zeroing free space does not make sense "
                                  "unless compression is used")
@@ -467,8 +476,9 @@ class LUBackupExport(LogicalUnit):
         if self.DoReboot() and snapshots_available:
           self.StartInstance(feedback_fn, src_node_uuid)
         if self.op.mode == constants.EXPORT_MODE_LOCAL:
-          (fin_resu, dresults) = helper.LocalExport(self.dst_node,
-                                                    self.op.compress)
+          (fin_resu, dresults) = \
+            helper.LocalExport(self.dst_node, self.op.compress,
+                               streams=self.op.transfer_streams)
         elif self.op.mode == constants.EXPORT_MODE_REMOTE:
           connect_timeout = constants.RIE_CONNECT_TIMEOUT
           timeouts = masterd.instance.ImportExportTimeouts(connect_timeout)
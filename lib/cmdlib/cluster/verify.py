@@ -29,6 +29,7 @@
 
 """Logical units for cluster verification."""
 
+import errno
 import itertools
 import logging
 import operator
@@ -41,7 +42,9 @@ from ganeti import compat
 from ganeti import constants
 from ganeti import errors
 from ganeti import locking
+from ganeti import objects
 from ganeti import pathutils
+from ganeti import serializer
 from ganeti import utils
 from ganeti import vcluster
 from ganeti import hypervisor
@@ -85,6 +88,143 @@ def _GetAllHypervisorParameters(cluster, instances):
   return hvp_data
 
 
+def _LoadVerifyCache(group_uuid):
+  """Loads the results of the last incremental verification of a group.
+
+  A missing or broken file results in empty results.
+
+  @type group_uuid: string
+  @param group_uuid: the node group's UUID
+  @rtype: dict
+  @return: dictionary with the cached node verify results (node UUIDs as keys,
+      dictionaries with the token and the payload as values) and the check
+      keys of the instances found to be fine (see
+      L{LUClusterVerifyGroup._ComputeInstanceCheckKey})
+
+  """
+  filename = pathutils.CLUSTER_VERIFY_GROUP_CACHE_FILE % group_uuid
+  try:
+    data = serializer.LoadJson(utils.ReadFile(filename))
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      logging.warning("Can't read verify cache %s: %s", filename, err)
+    data = None
+  except ValueError, err:
+    logging.warning("Can't parse verify cache %s: %s", filename, err)
+    data = None
+
+  if not isinstance(data, dict):
+    data = {}
+
+  data.setdefault("nodes", {})
+  data.setdefault("instances", {})
+
+  return data
+
+
+def _SaveVerifyCache(group_uuid, data):
+  """Saves the results of an incremental verification of a group.
+
+  """
+  filename = pathutils.CLUSTER_VERIFY_GROUP_CACHE_FILE % group_uuid
+  try:
+    utils.WriteFile(filename, data=serializer.DumpJson(data),
+                    mode=constants.SECURE_FILE_MODE)
+  except EnvironmentError, err:
+    logging.warning("Can't write verify cache %s: %s", filename, err)
+
+
+def _MergeIncrementalResults(all_nvinfo, cached_nodes):
+  """Completes incremental node verify results with cached sections.
+
+  The payloads in C{all_nvinfo} are modified in place.
+
+  @type all_nvinfo: dict
+  @param all_nvinfo: node UUIDs as keys, node verify RPC results as values
+  @type cached_nodes: dict
+  @param cached_nodes: the cached results of the nodes, see
+      L{_LoadVerifyCache}
+  @rtype: tuple; (dict, dict, list)
+  @return: the new cached results of the nodes, for nodes supporting
+      incremental verification the digests of their result sections, and the
+      UUIDs of the nodes whose results are incomplete, as they left out
+      sections which aren't cached
+
+  """
+  new_nodes = {}
+  node_digests = {}
+  incomplete = []
+
+  for (node_uuid, nres) in all_nvinfo.items():
+    if nres.fail_msg or not isinstance(nres.payload, dict):
+      continue
+
+    payload = nres.payload
+    incremental = payload.pop(constants.NV_INCREMENTAL, None)
+    if incremental is None:
+      # The node runs a version without incremental verification
+      continue
+
+    (token, digests) = incremental
+    cached = cached_nodes.get(node_uuid, {}).get("payload", {})
+    missing = [key for key in digests
+               if key not in payload and key not in cached]
+    if missing:
+      logging.warning("Node %s left out sections %s which aren't cached",
+                      node_uuid, utils.CommaJoin(missing))
+      incomplete.append(node_uuid)
+      continue
+
+    for key in digests:
+      if key not in payload:
+        payload[key] = cached[key]
+
+    new_nodes[node_uuid] = {
+      "token": token,
+      "payload": dict((key, payload[key]) for key in digests),
+      }
+    node_digests[node_uuid] = digests
+
+  return (new_nodes, node_digests, incomplete)
+
+
+class _PhaseTimer(object):
+  """Keeps track of the time spent in the phases of a verification.
+
+  """
+  def __init__(self, feedback_fn):
+    self._feedback_fn = feedback_fn
+    self._phase = None
+    self._start = None
+    self.timings = []
+
+  def Start(self, name):
+    """Ends the current phase and announces and starts a new one.
+
+    """
+    self.Stop()
+    self._feedback_fn("* %s" % name)
+    self._phase = name
+    self._start = time.time()
+
+  def Stop(self):
+    """Ends the current phase, if any.
+
+    """
+    if self._phase is not None:
+      self.timings.append((self._phase, time.time() - self._start))
+      self._phase = None
+
+  def Report(self):
+    """Ends the current phase and reports the time spent in each phase.
+
+    """
+    self.Stop()
+    self._feedback_fn("* Time spent per phase")
+    for (name, duration) in self.timings:
+      self._feedback_fn("  - %s: %.2f seconds" % (name, duration))
+
+
 class _VerifyErrors(object):
   """Mix-in for cluster/group verify LUs.
 
@@ -96,6 +236,9 @@ class _VerifyErrors(object):
   ETYPE_ERROR = constants.CV_ERROR
   ETYPE_WARNING = constants.CV_WARNING
 
+  #: Number of messages reported so far, including warnings
+  _message_count = 0
+
   def _ErrorMsgList(self, error_descriptor, object_name, message_list,
                     log_type=ETYPE_ERROR):
     """Format multiple error messages.
@@ -141,6 +284,7 @@ class _VerifyErrors(object):
     # Report messages via the feedback_fn
     # pylint: disable=E1101
     self._feedback_fn(constants.ELOG_MESSAGE_LIST, prefixed_list)
+    self._message_count += len(prefixed_list)
 
     # do not mark the operation as failed for WARN cases only
     if log_type == self.ETYPE_ERROR:
@@ -205,7 +349,8 @@ class LUClusterVerify(NoHooksLU):
       [opcodes.OpClusterVerifyGroup(group_name=group,
                                     ignore_errors=self.op.ignore_errors,
                                     depends=depends_fn(),
-                                    verify_clutter=self.op.verify_clutter)]
+                                    verify_clutter=self.op.verify_clutter,
+                                    incremental=self.op.incremental)]
       for group in groups)
 
     # Fix up all parameters
@@ -789,6 +934,21 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
                        (node, nresult[constants.NV_NODENETTEST][node]))
       self._ErrorMsgList(constants.CV_ENODENET, ninfo.name, msglist)
 
+    # Nodes running older versions don't report the latency
+    latency = nresult.get(constants.NV_LATENCY, {})
+    msglist = []
+    for node in utils.NiceSort(latency.keys()):
+      for kind, secs in sorted(latency[node].items()):
+        if kind == "ssh":
+          limit = constants.NODE_VERIFY_SLOW_SSH
+        else:
+          limit = constants.NODE_VERIFY_SLOW_TCP
+        if secs > limit:
+          msglist.append("slow %s communication with node '%s': %.2f seconds" %
+                         (kind, node, secs))
+    self._ErrorMsgList(constants.CV_ENODENET, ninfo.name, msglist,
+                       log_type=self.ETYPE_WARNING)
+
     if constants.NV_MASTERIP not in nresult:
       self._ErrorMsg(constants.CV_ENODENET, ninfo.name,
                      "node hasn't returned node master IP reachability data")
@@ -954,6 +1114,53 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
                     "instance lives on non-vm_capable node %s",
                     self.cfg.GetNodeName(node_uuid))
 
+  def _ComputeInstanceCheckKey(self, instance, node_digests, diskstatus):
+    """Computes a digest of everything the verification of an instance uses.
+
+    If the key is the same as in the last incremental verification, which
+    didn't report anything for the instance, the instance needn't be
+    verified again.
+
+    @type instance: L{objects.Instance}
+    @param instance: the instance
+    @type node_digests: dict
+    @param node_digests: node UUIDs as keys, digests of the node verify result
+        sections as values
+    @type diskstatus: dict
+    @param diskstatus: the instance's disk status, as returned by
+        L{_CollectDiskInfo}
+    @rtype: string or None
+    @return: the key, or None if not all nodes of the instance returned
+        digests
+
+    """
+    nodes = []
+    for node_uuid in self.cfg.GetInstanceNodes(instance.uuid):
+      digests = node_digests.get(node_uuid)
+      if digests is None:
+        return None
+      nodes.append((node_uuid, self.all_node_info[node_uuid].serial_no,
+                    [digests.get(key) for key in (constants.NV_INSTANCELIST,
+                                                  constants.NV_VGLIST,
+                                                  constants.NV_LVLIST)]))
+
+    disks = [(node_uuid,
+              [(success, status.ToDict()
+                if isinstance(status, objects.ConfigObject) else status)
+               for (success, status) in statuses])
+             for (node_uuid, statuses) in sorted(diskstatus.items())]
+
+    data = [
+      self.cfg.GetClusterInfo().serial_no,
+      self.group_info.serial_no,
+      instance.serial_no,
+      [disk.serial_no for disk in self.cfg.GetInstanceDisks(instance.uuid)],
+      nodes,
+      disks,
+      ]
+
+    return compat.sha1_hash(serializer.DumpJson(data)).hexdigest()
+
   def _VerifyOrphanVolumes(self, vg_name, node_vol_should, node_image,
                            reserved):
     """Verify if there are any unknown volumes in the cluster.
@@ -1904,6 +2111,7 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
     self.bad = False
     verbose = self.op.verbose
     self._feedback_fn = feedback_fn
+    timer = _PhaseTimer(feedback_fn)
 
     vg_name = self.cfg.GetVGName()
     drbd_helper = self.cfg.GetDRBDHelper()
@@ -1931,7 +2139,7 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
         node.name for node in node_data_list
         if (node.master_candidate and not node.offline))
 
-    feedback_fn("* Gathering data (%d nodes)" % len(self.my_node_uuids))
+    timer.Start("Gathering data (%d nodes)" % len(self.my_node_uuids))
 
     user_scripts = []
     if self.cfg.GetUseExternalMipScript():
@@ -2059,6 +2267,16 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
     if self._exclusive_storage:
       node_verify_param[constants.NV_EXCLUSIVEPVS] = True
 
+    if self.op.incremental:
+      verify_cache = _LoadVerifyCache(self.group_uuid)
+      node_verify_param[constants.NV_INCREMENTAL] = \
+        dict((node.name, verify_cache["nodes"][node.uuid]["token"])
+             for node in node_data_list
+             if node.uuid in verify_cache["nodes"])
+    else:
+      verify_cache = None
+    node_digests = {}
+
     # At this point, we have the in-memory data structures complete,
     # except for the runtime information, which we'll gather next
 
@@ -2073,7 +2291,7 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
     # WConfD, which is the only one who can otherwise ensure nobody
     # will modify the configuration during the check.
     with self.cfg.GetConfigManager(shared=True, forcelock=True):
-      feedback_fn("* Gathering information about nodes (%s nodes)" %
+      timer.Start("Gathering information about nodes (%s nodes)" %
                   len(self.my_node_uuids))
       # Force the configuration to be fully distributed before doing any tests
       self.cfg.FlushConfigGroup(self.group_uuid)
@@ -2096,8 +2314,30 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
                                              hvparams)
       nvinfo_endtime = time.time()
 
+      if verify_cache is not None:
+        (verify_cache["nodes"], node_digests, incomplete) = \
+          _MergeIncrementalResults(all_nvinfo, verify_cache["nodes"])
+        if incomplete:
+          # Without a token, the nodes return all sections
+          timer.Start("Gathering full information about nodes with"
+                      " incomplete results (%s nodes)" % len(incomplete))
+          full_param = node_verify_param.copy()
+          full_param[constants.NV_INCREMENTAL] = {}
+          full_nvinfo = self.rpc.call_node_verify(incomplete, full_param,
+                                                  cluster_name, hvparams)
+          (full_nodes, full_digests, still_incomplete) = \
+            _MergeIncrementalResults(full_nvinfo, {})
+          verify_cache["nodes"].update(full_nodes)
+          node_digests.update(full_digests)
+          all_nvinfo.update(full_nvinfo)
+          for node_uuid in still_incomplete:
+            all_nvinfo[node_uuid] = \
+              rpc.RpcResult(data="Node returned incomplete results",
+                            failed=True, node=node_uuid,
+                            call="node_verify")
+
       if self.extra_lv_nodes and vg_name is not None:
-        feedback_fn("* Gathering information about extra nodes (%s nodes)" %
+        timer.Start("Gathering information about extra nodes (%s nodes)" %
                     len(self.extra_lv_nodes))
         extra_lv_nvinfo = \
             self.rpc.call_node_verify(self.extra_lv_nodes,
@@ -2128,7 +2368,7 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
             break
         key = constants.NV_FILELIST
 
-        feedback_fn("* Gathering information about the master node")
+        timer.Start("Gathering information about the master node")
         vf_nvinfo.update(self.rpc.call_node_verify(
            additional_node_uuids, {key: node_verify_param[key]},
            self.cfg.GetClusterName(), self.cfg.GetClusterInfo().hvparams))
@@ -2138,19 +2378,19 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
 
     all_drbd_map = self.cfg.ComputeDRBDMap()
 
-    feedback_fn("* Gathering disk information (%s nodes)" %
+    timer.Start("Gathering disk information (%s nodes)" %
                 len(self.my_node_uuids))
     instdisk = self._CollectDiskInfo(self.my_node_info.keys(), node_image,
                                      self.my_inst_info)
 
-    feedback_fn("* Verifying configuration file consistency")
+    timer.Start("Verifying configuration file consistency")
 
     self._VerifyClientCertificates(self.my_node_info.values(), all_nvinfo)
     if self.cfg.GetClusterInfo().modify_ssh_setup:
       self._VerifySshSetup(self.my_node_info.values(), all_nvinfo)
     self._VerifyFiles(vf_node_info, master_node_uuid, vf_nvinfo, filemap)
 
-    feedback_fn("* Verifying node status")
+    timer.Start("Verifying node status")
 
     refos_img = None
 
@@ -2236,12 +2476,28 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
       self._UpdateNodeVolumes(self.all_node_info[node_uuid], result.payload,
                               node_image[node_uuid], vg_name)
 
-    feedback_fn("* Verifying instance status")
+    timer.Start("Verifying instance status")
+    checked_instances = {}
     for inst_uuid in self.my_inst_uuids:
       instance = self.my_inst_info[inst_uuid]
-      if verbose:
-        feedback_fn("* Verifying instance %s" % instance.name)
-      self._VerifyInstance(instance, node_image, instdisk[inst_uuid])
+      if verify_cache is None:
+        check_key = None
+      else:
+        check_key = self._ComputeInstanceCheckKey(instance, node_digests,
+                                                  instdisk[inst_uuid])
+
+      if (check_key is not None and
+          verify_cache["instances"].get(inst_uuid) == check_key):
+        if verbose:
+          feedback_fn("* Instance %s unchanged, skipping" % instance.name)
+        checked_instances[inst_uuid] = check_key
+      else:
+        if verbose:
+          feedback_fn("* Verifying instance %s" % instance.name)
+        message_count = self._message_count
+        self._VerifyInstance(instance, node_image, instdisk[inst_uuid])
+        if check_key is not None and self._message_count == message_count:
+          checked_instances[inst_uuid] = check_key
 
       # If the instance is not fully redundant we cannot survive losing its
       # primary node, so we are not N+1 compliant.
@@ -2252,7 +2508,7 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
       if not cluster.FillBE(instance)[constants.BE_AUTO_BALANCE]:
         i_non_a_balanced.append(instance)
 
-    feedback_fn("* Verifying orphan volumes")
+    timer.Start("Verifying orphan volumes")
     reserved = utils.FieldSet(*cluster.reserved_lvs)
 
     # We will get spurious "unknown volume" warnings if any node of this group
@@ -2268,12 +2524,20 @@ class LUClusterVerifyGroup(LogicalUnit, _VerifyErrors):
     self._VerifyOrphanVolumes(vg_name, node_vol_should, node_image, reserved)
 
     if constants.VERIFY_NPLUSONE_MEM not in self.op.skip_checks:
-      feedback_fn("* Verifying N+1 Memory redundancy")
+      timer.Start("Verifying N+1 Memory redundancy")
       self._VerifyNPlusOneMemory(node_image, self.my_inst_info)
 
+    timer.Stop()
+
+    if verify_cache is not None:
+      verify_cache["instances"] = checked_instances
+      _SaveVerifyCache(self.group_uuid, verify_cache)
+
     self._VerifyOtherNotes(feedback_fn, i_non_redundant, i_non_a_balanced,
                            i_offline, n_offline, n_drained)
 
+    timer.Report()
+
     return not self.bad
 
   def HooksCallBack(self, phase, hooks_results, feedback_fn, lu_result):
@@ -341,6 +341,11 @@ class LUInstanceMove(LogicalUnit):
   HTYPE = constants.HTYPE_INSTANCE
   REQ_BGL = False
 
+  def CheckArguments(self):
+    if self.op.transfer_streams < 1:
+      raise errors.OpPrereqError("The number of transfer streams must be at"
+                                 " least 1", errors.ECODE_INVAL)
+
   def ExpandNames(self):
     self._ExpandAndLockInstance()
     (self.op.target_node_uuid, self.op.target_node) = \
@@ -492,7 +497,8 @@ class LUInstanceMove(LogicalUnit):
                                             target_node.uuid,
                                             target_node.secondary_ip,
                                             self.op.compress,
-                                            self.instance, transfers)
+                                            self.instance, transfers,
+                                            streams=self.op.transfer_streams)
     if not compat.all(import_result):
       errs.append("Failed to transfer instance data")
 
@@ -259,6 +259,15 @@ class LUInstanceCreate(LogicalUnit):
 
     CheckOpportunisticLocking(self.op)
 
+    if self.op.transfer_streams < 1:
+      raise errors.OpPrereqError("The number of transfer streams must be at"
+                                 " least 1", errors.ECODE_INVAL)
+    if (self.op.transfer_streams > 1 and
+        self.op.mode != constants.INSTANCE_IMPORT):
+      raise errors.OpPrereqError("Several transfer streams can only be used"
+                                 " when importing an instance from a node of"
+                                 " this cluster", errors.ECODE_INVAL)
+
     if self.op.mode == constants.INSTANCE_IMPORT:
       # On import force_variant must be True, because if we forced it at
       # initial install, our only chance when importing it back is that it
@@ -1264,13 +1273,15 @@ class LUInstanceCreate(LogicalUnit):
                                              None)
           transfers.append(dt)
 
+        streams = self.op.transfer_streams
         import_result = \
           masterd.instance.TransferInstanceData(self, feedback_fn,
                                                 self.op.src_node_uuid,
                                                 self.pnode.uuid,
                                                 self.pnode.secondary_ip,
                                                 self.op.compress,
-                                                iobj, transfers)
+                                                iobj, transfers,
+                                                streams=streams)
         if not compat.all(import_result):
           self.LogWarning("Some disks for instance %s on node %s were not"
                           " imported successfully" % (self.op.instance_name,
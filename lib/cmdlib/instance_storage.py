@@ -1370,6 +1370,12 @@ def ImageDisks(lu, instance, image, disks=None):
                                           image, device.size)
       result.Raise("Could not image disk '%d' for instance '%s' on node '%s'" %
                    (idx, instance.name, node_name))
+      # Older nodes don't return any statistics
+      if result.payload:
+        stats = result.payload
+        lu.LogInfo("Imaged disk '%d' with %s of %s data in %.1f seconds",
+                   idx, utils.FormatUnit(stats["size"] / (1024.0 * 1024), "h"),
+                   stats["format"], stats["duration"])
   finally:
     logging.info("Resuming synchronization of disks for instance '%s'",
                  instance.name)
@@ -54,6 +54,8 @@ import time
 import threading
 import itertools
 
+from ganeti.config import delta as config_delta
+from ganeti.config.index import ConfigIndex
 from ganeti.config.temporary_reservations import TemporaryReservationManager
 from ganeti.config.utils import ConfigSync, ConfigManager
 from ganeti.config.verify import (VerifyType, VerifyNic, VerifyIpolicy,
@@ -70,6 +72,7 @@ from ganeti import netutils
 from ganeti import runtime
 from ganeti import pathutils
 from ganeti import network
+from ganeti import compat
 
 
 def GetWConfdContext(ec_id, livelock):
@@ -167,7 +170,10 @@ class ConfigWriter(object):
   def __init__(self, cfg_file=None, offline=False, _getents=runtime.GetEnts,
                accept_foreign=False, wconfdcontext=None, wconfd=None):
     self.write_count = 0
+    self._index = ConfigIndex()
     self._config_data = None
+    self._config_stale = False
+    self._config_baseline = None
     self._SetConfigData(None)
     self._offline = offline
     if cfg_file is None:
@@ -194,10 +200,19 @@ class ConfigWriter(object):
     return self._config_data
 
   def OutDate(self):
-    self._config_data = None
+    """Mark the configuration data as possibly outdated.
+
+    The data is kept, so that the next time the configuration is opened,
+    only the changes since need to be requested from WConfd.
+
+    """
+    self._config_stale = True
 
   def _SetConfigData(self, cfg):
     self._config_data = cfg
+    self._index.Invalidate()
+    self._config_stale = False
+    self._config_baseline = None
 
   def _GetWConfdContext(self):
     return self._wconfdcontext
@@ -360,6 +375,7 @@ class ConfigWriter(object):
 
     # Remove disk from config file
     del self._ConfigData().disks[disk_uuid]
+    self._index.Invalidate()
     self._ConfigData().cluster.serial_no += 1
 
   def RemoveInstanceDisk(self, inst_uuid, disk_uuid):
@@ -411,18 +427,14 @@ class ConfigWriter(object):
     @return: the disk object
 
     """
-    disk = None
-    count = 0
-    for d in self._ConfigData().disks.itervalues():
-      if d.name == disk_name:
-        count += 1
-        disk = d
-
-    if count > 1:
+    disk_uuids = self._index.LookupDisks(self._ConfigData(), disk_name)
+    if len(disk_uuids) > 1:
       raise errors.ConfigurationError("There are %s disks with this name: %s"
-                                      % (count, disk_name))
+                                      % (len(disk_uuids), disk_name))
+    elif not disk_uuids:
+      return None
 
-    return disk
+    return self._UnlockedGetDiskInfo(disk_uuids[0])
 
   @ConfigSync(shared=1)
   def GetDiskInfoByName(self, disk_name):
@@ -1486,6 +1498,7 @@ class ConfigWriter(object):
     group.UpgradeConfig()
 
     self._ConfigData().nodegroups[group.uuid] = group
+    self._index.Invalidate()
     self._ConfigData().cluster.serial_no += 1
 
   @ConfigSync()
@@ -1505,6 +1518,7 @@ class ConfigWriter(object):
             "Group '%s' is the only group, cannot be removed" % group_uuid
 
     del self._ConfigData().nodegroups[group_uuid]
+    self._index.Invalidate()
     self._ConfigData().cluster.serial_no += 1
 
   def _UnlockedLookupNodeGroup(self, target):
@@ -1525,9 +1539,9 @@ class ConfigWriter(object):
         return self._ConfigData().nodegroups.keys()[0]
     if target in self._ConfigData().nodegroups:
       return target
-    for nodegroup in self._ConfigData().nodegroups.values():
-      if nodegroup.name == target:
-        return nodegroup.uuid
+    group_uuid = self._index.LookupNodeGroup(self._ConfigData(), target)
+    if group_uuid is not None:
+      return group_uuid
     raise errors.OpPrereqError("Node group '%s' not found" % target,
                                errors.ECODE_NOENT)
 
@@ -1750,6 +1764,7 @@ class ConfigWriter(object):
 
     inst = self._ConfigData().instances[inst_uuid]
     inst.name = new_name
+    self._index.Invalidate()
 
     instance_disks = self._UnlockedGetInstanceDisks(inst_uuid)
     for (_, disk) in enumerate(instance_disks):
@@ -1826,7 +1841,13 @@ class ConfigWriter(object):
     """Attempt to expand an incomplete instance name.
 
     """
-    # Locking is done in L{ConfigWriter.GetAllInstancesInfo}
+    # Locking is done in L{ConfigWriter.GetInstanceInfoByName} and
+    # L{ConfigWriter.GetAllInstancesInfo}
+    inst = self.GetInstanceInfoByName(short_name)
+    if inst is not None:
+      # an exact match always wins, see L{utils.text.MatchNameComponent}
+      return (inst.uuid, inst.name)
+
     all_insts = self.GetAllInstancesInfo().values()
     expanded_name = _MatchNameComponentIgnoreCase(
                       short_name, [inst.name for inst in all_insts])
@@ -1980,10 +2001,10 @@ class ConfigWriter(object):
     return self._UnlockedGetInstanceInfoByName(inst_name)
 
   def _UnlockedGetInstanceInfoByName(self, inst_name):
-    for inst in self._UnlockedGetAllInstancesInfo().values():
-      if inst.name == inst_name:
-        return inst
-    return None
+    inst_uuid = self._index.LookupInstance(self._ConfigData(), inst_name)
+    if inst_uuid is None:
+      return None
+    return self._UnlockedGetInstanceInfo(inst_uuid)
 
   def _UnlockedGetInstanceName(self, inst_uuid):
     inst_info = self._UnlockedGetInstanceInfo(inst_uuid)
@@ -2039,6 +2060,7 @@ class ConfigWriter(object):
 
     """
     self._UnlockedGetDiskInfo(disk_uuid).nodes = nodes
+    self._index.Invalidate()
 
   @ConfigSync()
   def SetDiskLogicalID(self, disk_uuid, logical_id):
@@ -2081,6 +2103,7 @@ class ConfigWriter(object):
     self._UnlockedAddNodeToGroup(node.uuid, node.group)
     assert node.uuid in self._ConfigData().nodegroups[node.group].members
     self._ConfigData().nodes[node.uuid] = node
+    self._index.Invalidate()
     self._ConfigData().cluster.serial_no += 1
 
   @ConfigSync()
@@ -2105,13 +2128,20 @@ class ConfigWriter(object):
 
     self._UnlockedRemoveNodeFromGroup(self._ConfigData().nodes[node_uuid])
     del self._ConfigData().nodes[node_uuid]
+    self._index.Invalidate()
     self._ConfigData().cluster.serial_no += 1
 
   def ExpandNodeName(self, short_name):
     """Attempt to expand an incomplete node name into a node UUID.
 
     """
-    # Locking is done in L{ConfigWriter.GetAllNodesInfo}
+    # Locking is done in L{ConfigWriter.GetNodeInfoByName} and
+    # L{ConfigWriter.GetAllNodesInfo}
+    node = self.GetNodeInfoByName(short_name)
+    if node is not None:
+      # an exact match always wins, see L{utils.text.MatchNameComponent}
+      return (node.uuid, node.name)
+
     all_nodes = self.GetAllNodesInfo().values()
     expanded_name = _MatchNameComponentIgnoreCase(
                       short_name, [node.name for node in all_nodes])
@@ -2164,14 +2194,7 @@ class ConfigWriter(object):
     @return: a tuple with two lists: the primary and the secondary instances
 
     """
-    pri = []
-    sec = []
-    for inst in self._ConfigData().instances.values():
-      if inst.primary_node == node_uuid:
-        pri.append(inst.uuid)
-      if node_uuid in self._UnlockedGetInstanceSecondaryNodes(inst.uuid):
-        sec.append(inst.uuid)
-    return (pri, sec)
+    return self._index.LookupNodeInstances(self._ConfigData(), node_uuid)
 
   @ConfigSync(shared=1)
   def GetNodeGroupInstances(self, uuid, primary_only=False):
@@ -2313,10 +2336,10 @@ class ConfigWriter(object):
     return self._UnlockedGetAllNodesInfo()
 
   def _UnlockedGetNodeInfoByName(self, node_name):
-    for node in self._UnlockedGetAllNodesInfo().values():
-      if node.name == node_name:
-        return node
-    return None
+    node_uuid = self._index.LookupNode(self._ConfigData(), node_name)
+    if node_uuid is None:
+      return None
+    return self._UnlockedGetNodeInfo(node_uuid)
 
   @ConfigSync(shared=1)
   def GetNodeInfoByName(self, node_name):
@@ -2676,32 +2699,96 @@ class ConfigWriter(object):
       # Upgrade configuration if needed
       self._UpgradeConfig(saveafter=True)
     else:
+      # If we already have a copy of the configuration, only the changes since
+      # its version are requested
+      if self._config_data is None:
+        serial = None
+      else:
+        serial = self._config_data.serial_no
+      dict_data = None
+      delta_data = None
       if shared and not force:
-        if self._config_data is None:
+        if serial is None:
           logging.debug("Requesting config, as I have no up-to-date copy")
           dict_data = self._wconfd.ReadConfig()
           logging.debug("Configuration received")
-        else:
-          dict_data = None
+        elif self._config_stale:
+          logging.debug("Requesting config changes since serial %s", serial)
+          delta_data = self._wconfd.ReadConfigDelta(serial)
+          logging.debug("Configuration changes received")
       else:
         # poll until we acquire the lock
         while True:
-          logging.debug("Receiving config from WConfd.LockConfig [shared=%s]",
-                        bool(shared))
-          dict_data = \
-              self._wconfd.LockConfig(self._GetWConfdContext(), bool(shared))
-          if dict_data is not None:
-            logging.debug("Received config from WConfd.LockConfig")
+          if serial is None:
+            logging.debug("Receiving config from WConfd.LockConfig"
+                          " [shared=%s]", bool(shared))
+            dict_data = \
+                self._wconfd.LockConfig(self._GetWConfdContext(), bool(shared))
+            received = dict_data
+          else:
+            logging.debug("Receiving config changes since serial %s from"
+                          " WConfd.LockConfigDelta [shared=%s]", serial,
+                          bool(shared))
+            delta_data = \
+                self._wconfd.LockConfigDelta(self._GetWConfdContext(),
+                                             bool(shared), serial)
+            received = delta_data
+          if received is not None:
+            logging.debug("Received config from WConfd")
             break
           time.sleep(random.random())
+        if delta_data is not None and self._HasUnwrittenChanges():
+          # Objects modified without being written must not be written now,
+          # as they would have been discarded by reloading the configuration
+          logging.debug("Local copy of the config has been modified,"
+                        " requesting the whole config")
+          dict_data = self._wconfd.ReadConfig()
+          delta_data = None
 
       try:
         if dict_data is not None:
           self._SetConfigData(objects.ConfigData.FromDict(dict_data))
           self._UpgradeConfig()
+          self._config_baseline = \
+              config_delta.Baseline.FromConfig(self._ConfigData())
+        elif delta_data is not None:
+          self._ApplyConfigDelta(delta_data)
       except Exception, err:
         raise errors.ConfigurationError(err)
 
+  def _HasUnwrittenChanges(self):
+    """Check if any object of the config data was modified locally.
+
+    """
+    if self._config_baseline is None:
+      return True
+    return compat.any(self._config_baseline.Changes(name,
+                                                    getattr(self._ConfigData(),
+                                                            name))
+                      for (name, _) in config_delta.CONTAINERS)
+
+  def _ApplyConfigDelta(self, delta):
+    """Update the config data with the changes received from WConfd.
+
+    """
+    serial = self._ConfigData().serial_no
+    if not delta["full"] and delta["base"] != serial:
+      raise errors.ConfigurationError("Received configuration changes since"
+                                      " serial %s, but have serial %s" %
+                                      (delta["base"], serial))
+    baseline = self._config_baseline
+    (data, changes) = config_delta.ApplyDelta(self._ConfigData(), delta)
+    self._SetConfigData(data)
+    if (baseline is None or delta["full"] or not data.nodegroups or
+        not data.cluster.enabled_disk_templates):
+      # these upgrade steps need to look at the whole configuration
+      self._UpgradeConfig()
+      baseline = config_delta.Baseline.FromConfig(self._ConfigData())
+    else:
+      self._UpgradeConfigDelta(changes)
+      baseline.Update(changes)
+    self._config_baseline = baseline
+
   def _CloseConfig(self, save):
     """Release resources relating the config data.
 
@@ -2721,6 +2808,10 @@ class ConfigWriter(object):
       logging.debug("Unlocking configuration without writing")
       self._wconfd.UnlockConfig(self._GetWConfdContext())
       self._lock_forced = False
+      if not self._lock_current_shared:
+        # the objects might have been modified without being written, so
+        # request a fresh copy of the whole configuration next time
+        self._SetConfigData(None)
 
   # TODO: To WConfd
   def _UpgradeConfig(self, saveafter=False):
@@ -2773,6 +2864,54 @@ class ConfigWriter(object):
       if self._offline:
         self._UnlockedVerifyConfigAndLog()
 
+  def _UpgradeConfigDelta(self, changes):
+    """Run the upgrade steps for the objects changed by a delta.
+
+    This is the incremental counterpart of L{_UpgradeConfig}, for data that
+    has already been upgraded except for the given objects. The cluster
+    object is always part of a delta, so it is upgraded as well.
+
+    @type changes: dict
+    @param changes: the changed objects, as returned by
+        L{config_delta.ApplyDelta}
+
+    """
+    data = self._ConfigData()
+    changed = dict((name, dict((key, obj) for (key, obj) in objs.items()
+                               if obj is not None))
+                   for (name, objs) in changes.items())
+    # The node groups are few and their instance policies depend on the
+    # cluster, so all of them are upgraded
+    partial = objects.ConfigData(version=data.version,
+                                 cluster=data.cluster,
+                                 nodes=changed["nodes"],
+                                 nodegroups=data.nodegroups,
+                                 instances=changed["instances"],
+                                 networks=changed["networks"],
+                                 disks=changed["disks"],
+                                 filters=changed["filters"],
+                                 maintenance=data.maintenance)
+    partial.UpgradeConfig()
+
+    uuid_objects = [data.cluster]
+    for (name, _) in config_delta.CONTAINERS:
+      uuid_objects.extend(changed[name].values())
+    for instance in changed["instances"].values():
+      uuid_objects.extend(instance.nics)
+    for item in uuid_objects:
+      if item.uuid is None:
+        item.uuid = self._GenerateUniqueID(_UPGRADE_CONFIG_JID)
+
+    if changes["nodes"] or changes["nodegroups"]:
+      # The members lists aren't part of the serialized node groups, see
+      # L{_UpgradeConfig}
+      for nodegroup in data.nodegroups.values():
+        nodegroup.members = []
+      for node in data.nodes.values():
+        if not node.group:
+          node.group = self._UnlockedLookupNodeGroup(None)
+        self._UnlockedAddNodeToGroup(node.uuid, node.group)
+
   def _WriteConfig(self, destination=None, releaselock=False):
     """Write the configuration data to persistent storage.
 
@@ -2801,6 +2940,25 @@ class ConfigWriter(object):
         self._cfg_id = utils.GetFileID(fd=fd)
       finally:
         os.close(fd)
+    elif self._config_baseline is not None:
+      # Only send the objects that changed since they were received
+      (delta, changes) = config_delta.BuildDelta(self._ConfigData(),
+                                                 self._config_baseline)
+      try:
+        if releaselock:
+          res = self._wconfd.WriteConfigDeltaAndUnlock(
+            self._GetWConfdContext(), delta)
+          if not res:
+            logging.warning("WriteConfigDeltaAndUnlock indicates we already"
+                            " have released the lock; assuming this was just"
+                            " a retry and the initial call succeeded")
+        else:
+          self._wconfd.WriteConfigDelta(self._GetWConfdContext(), delta)
+      except errors.LockError:
+        raise errors.ConfigurationError("The configuration file has been"
+                                        " modified since the last write, cannot"
+                                        " update")
+      self._config_baseline.Update(changes)
     else:
       try:
         if releaselock:
@@ -3087,6 +3245,8 @@ class ConfigWriter(object):
         return result
     vals = utils.Retry(WithRetry, 0.1, 30)
     self.OutDate()
+    # the target may have been modified in ways affecting the indexes
+    self._index.Invalidate()
     target.serial_no = vals[0]
     target.mtime = float(vals[1])
 
@@ -3418,9 +3578,7 @@ class ConfigWriter(object):
     @rtype: string
     @return: uuid of instance the disk is attached to.
     """
-    for inst_uuid, inst_info in self._UnlockedGetAllInstancesInfo().items():
-      if disk_uuid in inst_info.disks:
-        return inst_uuid
+    return self._index.LookupDiskInstance(self._ConfigData(), disk_uuid)
 
   def SetMaintdRoundDelay(self, delay):
     """Set the minimal time the maintenance daemon should wait between rounds"""
@@ -0,0 +1,204 @@
+#
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Incremental configuration updates exchanged with WConfd.
+
+WConfd keeps a few previous versions of the configuration, so a client that
+already has a copy only needs to receive the objects that changed since, and
+only needs to send back the objects it changed itself.
+
+"""
+
+import hashlib
+
+from ganeti import objects
+from ganeti import serializer
+
+
+#: Containers of the configuration that are transferred object by object,
+#: together with the class of their objects
+CONTAINERS = [
+  ("nodes", objects.Node),
+  ("nodegroups", objects.NodeGroup),
+  ("instances", objects.Instance),
+  ("networks", objects.Network),
+  ("disks", objects.Disk),
+  ("filters", objects.Filter),
+  ]
+
+
+def Fingerprint(obj):
+  """Computes a fingerprint of a configuration object.
+
+  Equal fingerprints mean that the object hasn't changed. As the order of
+  dictionary keys isn't stable, differing fingerprints only mean that it
+  might have, which at worst causes an object to be sent needlessly.
+
+  @type obj: L{objects.ConfigObject}
+  @rtype: string
+
+  """
+  data = serializer.DumpJson(obj.ToDict(),
+                             private_encoder=serializer.EncodeWithPrivateFields)
+  return hashlib.sha1(data).digest()
+
+
+class Baseline(object):
+  """Fingerprints of the configuration objects as known to WConfd.
+
+  The objects themselves are kept as well, so that an object replaced by
+  another one is always considered changed.
+
+  """
+  def __init__(self):
+    self._known = dict((name, {}) for (name, _) in CONTAINERS)
+
+  @classmethod
+  def FromConfig(cls, config_data):
+    """Records all the objects of a configuration.
+
+    @type config_data: L{objects.ConfigData}
+
+    """
+    baseline = cls()
+    for (name, _) in CONTAINERS:
+      known = baseline._known[name] # pylint: disable=W0212
+      for (key, obj) in getattr(config_data, name).items():
+        known[key] = (obj, Fingerprint(obj))
+    return baseline
+
+  def Update(self, changes):
+    """Records the changes that are now known to WConfd.
+
+    @type changes: dict
+    @param changes: the changed objects of each container, as returned by
+        L{ApplyDelta} or L{BuildDelta}; C{None} stands for removed ones
+
+    """
+    for (name, objs) in changes.items():
+      known = self._known[name]
+      for (key, obj) in objs.items():
+        if obj is None:
+          known.pop(key, None)
+        else:
+          known[key] = (obj, Fingerprint(obj))
+
+  def Changes(self, name, container):
+    """Determines the objects of a container that changed locally.
+
+    @type name: string
+    @param name: the name of the container, see L{CONTAINERS}
+    @type container: dict
+    @param container: the current container
+    @rtype: dict
+    @return: the changed objects by their key, with C{None} for removed ones
+
+    """
+    known = self._known[name]
+    changes = {}
+    for (key, obj) in container.items():
+      entry = known.get(key)
+      if entry is None or entry[0] is not obj or entry[1] != Fingerprint(obj):
+        changes[key] = obj
+    for key in known:
+      if key not in container:
+        changes[key] = None
+    return changes
+
+
+def ApplyDelta(config_data, delta):
+  """Applies a delta received from WConfd to a configuration.
+
+  The given configuration is left untouched; the unchanged objects are
+  shared between it and the resulting one.
+
+  @type config_data: L{objects.ConfigData}
+  @param config_data: the configuration the delta is based on; ignored if
+      it is a full delta
+  @type delta: dict
+  @param delta: the delta, as returned by WConfd
+  @rtype: tuple; (L{objects.ConfigData}, dict)
+  @return: the new configuration and its changed objects, in the format
+      expected by L{Baseline.Update}
+
+  """
+  new_data = objects.ConfigData(
+    version=delta["version"],
+    cluster=objects.Cluster.FromDict(delta["cluster"]),
+    maintenance=objects.Maintenance.FromDict(delta["maintenance"]),
+    ctime=delta["ctime"],
+    mtime=delta["mtime"],
+    serial_no=delta["serial_no"])
+  changes = {}
+  for (name, cls) in CONTAINERS:
+    if delta["full"]:
+      container = {}
+    else:
+      container = getattr(config_data, name).copy()
+    changed = changes[name] = {}
+    for (key, value) in delta[name].items():
+      if value is None:
+        container.pop(key, None)
+        changed[key] = None
+      else:
+        changed[key] = container[key] = cls.FromDict(value)
+    setattr(new_data, name, container)
+  return (new_data, changes)
+
+
+def BuildDelta(config_data, baseline):
+  """Builds the delta of a locally modified configuration for WConfd.
+
+  @type config_data: L{objects.ConfigData}
+  @param config_data: the configuration
+  @type baseline: L{Baseline}
+  @param baseline: the objects as known to WConfd
+  @rtype: tuple; (dict, dict)
+  @return: the delta, and the changed objects in the format expected by
+      L{Baseline.Update}
+
+  """
+  delta = {
+    "base": config_data.serial_no,
+    "full": False,
+    "version": config_data.version,
+    "cluster": config_data.cluster.ToDict(),
+    "maintenance": config_data.maintenance.ToDict(),
+    "ctime": config_data.ctime,
+    "mtime": config_data.mtime,
+    "serial_no": config_data.serial_no,
+    }
+  changes = {}
+  for (name, _) in CONTAINERS:
+    changed = changes[name] = baseline.Changes(name,
+                                               getattr(config_data, name))
+    delta[name] = dict((key, None if obj is None else obj.ToDict())
+                       for (key, obj) in changed.items())
+  return (delta, changes)
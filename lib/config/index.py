@@ -0,0 +1,233 @@
+#
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Secondary indexes over the configuration data.
+
+"""
+
+from ganeti import compat
+
+
+def _IndexByName(container):
+  """Maps the names of the objects of a container to their UUIDs.
+
+  If several objects have the same name, the first one wins, like with a
+  linear search.
+
+  """
+  index = {}
+  for obj in container.values():
+    index.setdefault(obj.name, obj.uuid)
+  return index
+
+
+def _IndexDisksByName(config_data):
+  """Maps the names of disks to the list of UUIDs of disks with that name.
+
+  """
+  index = {}
+  for disk in config_data.disks.values():
+    index.setdefault(disk.name, []).append(disk.uuid)
+  return index
+
+
+def _IndexInstancesByDisk(config_data):
+  """Maps the UUIDs of disks to the UUID of the instance using them.
+
+  """
+  index = {}
+  for inst in config_data.instances.values():
+    for disk_uuid in inst.disks:
+      index.setdefault(disk_uuid, inst.uuid)
+  return index
+
+
+def _IndexInstancesByNode(config_data):
+  """Maps the UUIDs of nodes to the UUIDs of their instances.
+
+  @rtype: dict
+  @return: a dictionary mapping node UUIDs to a tuple of two lists, the
+      primary and the secondary instances of the node
+
+  """
+  index = {}
+  for inst in config_data.instances.values():
+    index.setdefault(inst.primary_node, ([], []))[0].append(inst.uuid)
+    secondaries = set()
+    for disk_uuid in inst.disks:
+      disk = config_data.disks.get(disk_uuid)
+      if disk is not None:
+        secondaries.update(disk.all_nodes)
+    secondaries.discard(inst.primary_node)
+    for node_uuid in secondaries:
+      index.setdefault(node_uuid, ([], []))[1].append(inst.uuid)
+  return index
+
+
+class ConfigIndex(object):
+  """Lazily built secondary indexes over the configuration data.
+
+  Each index is built on its first use and kept until the configuration data
+  is replaced or its serial number changes. As the serial number isn't
+  increased by changes made in place, code making such changes has to call
+  L{Invalidate}. Lookups by name and of the instance of a disk additionally
+  rebuild their index once if the entry is missing or outdated.
+
+  """
+  def __init__(self):
+    self._config_data = None
+    self._serial_no = None
+    self._indexes = {}
+
+  def Invalidate(self):
+    """Drops all indexes.
+
+    """
+    self._config_data = None
+    self._serial_no = None
+    self._indexes = {}
+
+  def _Get(self, config_data, name, build_fn):
+    """Returns an index, building it if necessary.
+
+    @type config_data: L{objects.ConfigData}
+    @param config_data: the current configuration data
+    @type name: string
+    @param name: the name of the index
+    @param build_fn: function computing the index from the configuration data
+
+    """
+    return self._GetChecked(config_data, name, build_fn)[0]
+
+  def _GetChecked(self, config_data, name, build_fn):
+    """Returns an index and whether it was built by this call.
+
+    An index that was just built can't be stale, so there is no point in
+    rebuilding it if an entry looked up in it turns out to be missing or
+    outdated.
+
+    @rtype: tuple; (dict, bool)
+
+    """
+    if (config_data is not self._config_data or
+        config_data.serial_no != self._serial_no):
+      self._config_data = config_data
+      self._serial_no = config_data.serial_no
+      self._indexes = {}
+
+    index = self._indexes.get(name)
+    if index is None:
+      index = self._indexes[name] = build_fn(config_data)
+      return (index, True)
+    return (index, False)
+
+  def _Lookup(self, config_data, name, build_fn, key, default, check_fn):
+    """Looks up an entry of an index, rebuilding a stale index once.
+
+    Objects can be added, renamed or removed in place without the index being
+    invalidated. Therefore an entry which is missing or doesn't pass
+    C{check_fn} causes the index to be rebuilt and the lookup to be repeated,
+    unless the index has just been built.
+
+    """
+    (index, built) = self._GetChecked(config_data, name, build_fn)
+    result = index.get(key, default)
+    if not (built or check_fn(result)):
+      del self._indexes[name]
+      result = self._Get(config_data, name, build_fn).get(key, default)
+    return result
+
+  def _LookupByName(self, config_data, container_name, name):
+    """Returns the UUID of the object with the given name, or C{None}.
+
+    """
+    container = getattr(config_data, container_name)
+
+    def _Check(uuid):
+      obj = container.get(uuid)
+      return obj is not None and obj.name == name
+
+    return self._Lookup(config_data, "%s-name" % container_name,
+                        lambda cfg: _IndexByName(getattr(cfg, container_name)),
+                        name, None, _Check)
+
+  def LookupInstance(self, config_data, name):
+    """Returns the UUID of the instance with the given name, or C{None}.
+
+    """
+    return self._LookupByName(config_data, "instances", name)
+
+  def LookupNode(self, config_data, name):
+    """Returns the UUID of the node with the given name, or C{None}.
+
+    """
+    return self._LookupByName(config_data, "nodes", name)
+
+  def LookupNodeGroup(self, config_data, name):
+    """Returns the UUID of the node group with the given name, or C{None}.
+
+    """
+    return self._LookupByName(config_data, "nodegroups", name)
+
+  def LookupDisks(self, config_data, name):
+    """Returns the UUIDs of the disks with the given name.
+
+    @rtype: list
+
+    """
+    def _Check(uuids):
+      disks = [config_data.disks.get(uuid) for uuid in uuids]
+      return bool(disks) and compat.all(disk is not None and disk.name == name
+                                        for disk in disks)
+
+    return list(self._Lookup(config_data, "disk-name", _IndexDisksByName,
+                             name, [], _Check))
+
+  def LookupDiskInstance(self, config_data, disk_uuid):
+    """Returns the UUID of the instance a disk is attached to, or C{None}.
+
+    """
+    def _Check(inst_uuid):
+      inst = config_data.instances.get(inst_uuid)
+      return inst is not None and disk_uuid in inst.disks
+
+    return self._Lookup(config_data, "disk-instance", _IndexInstancesByDisk,
+                        disk_uuid, None, _Check)
+
+  def LookupNodeInstances(self, config_data, node_uuid):
+    """Returns the primary and the secondary instances of a node.
+
+    @rtype: tuple; (list, list)
+    @return: the UUIDs of the primary and of the secondary instances
+
+    """
+    (pri, sec) = self._Get(config_data, "node-instances",
+                           _IndexInstancesByNode).get(node_uuid, ([], []))
+    return (list(pri), list(sec))
@@ -57,7 +57,7 @@ class HooksMaster(object):
   def __init__(self, opcode, hooks_path, nodes, hooks_execution_fn,
                hooks_results_adapt_fn, build_env_fn, prepare_post_nodes_fn,
                log_fn, htype=None, cluster_name=None, master_name=None,
-               master_uuid=None, job_id=None):
+               master_uuid=None, job_id=None, async_fn=None):
     """Base class for hooks masters.
 
     This class invokes the execution of hooks according to the behaviour
@@ -98,6 +98,14 @@ class HooksMaster(object):
     @param master_uuid: uuid of the master
     @type job_id: int
     @param job_id: the id of the job process (used in global post hooks)
+    @type async_fn: function that accepts a list of node UUIDs and two
+      functions
+    @param async_fn: function that runs the first given function, which runs
+      the post-phase scripts deferred by the given nodes, without waiting for
+      it, and later passes its result to the second given function; the first
+      function must be passed a replacement for C{hooks_execution_fn} that
+      doesn't use the configuration, as it may be called from another thread;
+      if None, the deferred scripts are run right away
 
     """
     self.opcode = opcode
@@ -112,6 +120,7 @@ class HooksMaster(object):
     self.master_name = master_name
     self.master_uuid = master_uuid
     self.job_id = job_id
+    self.async_fn = async_fn
 
     self.pre_env = self._BuildEnv(constants.HOOKS_PHASE_PRE)
     (self.pre_nodes, self.post_nodes) = nodes
@@ -158,9 +167,12 @@ class HooksMaster(object):
 
     return env
 
-  def _CheckParamsAndExecHooks(self, node_list, hpath, phase, env):
+  def _CheckParamsAndExecHooks(self, node_list, hpath, phase, env,
+                               execution_fn=None):
     """Check rpc parameters and call hooks_execution_fn (rpc).
 
+    @param execution_fn: if given, used instead of C{hooks_execution_fn}
+
     """
     if node_list is None or not node_list:
       return {}
@@ -172,14 +184,22 @@ class HooksMaster(object):
     for node in node_list:
       assert utils.UUID_RE.match(node), "Invalid node uuid %s" % node
 
-    return self.hooks_execution_fn(node_list, hpath, phase, env)
+    if execution_fn is None:
+      execution_fn = self.hooks_execution_fn
+
+    return execution_fn(node_list, hpath, phase, env)
 
   def _RunWrapper(self, node_list, hpath, phase, phase_env, is_global=False,
-                  post_status=None):
+                  post_status=None, deferred=False, execution_fn=None):
     """Simple wrapper over self.callfn.
 
     This method fixes the environment before executing the hooks.
 
+    @type deferred: bool
+    @param deferred: whether to run the post-phase scripts deferred by the
+        nodes
+    @param execution_fn: if given, used instead of C{hooks_execution_fn}
+
     """
     env = {
       "PATH": constants.HOOKS_PATH,
@@ -208,20 +228,29 @@ class HooksMaster(object):
     if phase_env:
       env = utils.algo.JoinDisjointDicts(env, phase_env)
 
+    if deferred:
+      assert phase == constants.HOOKS_PHASE_POST
+      phase = constants.HOOKS_PHASE_POST_DEFERRED
+
     if not is_global:
-      return self._CheckParamsAndExecHooks(node_list, hpath, phase, env)
+      return self._CheckParamsAndExecHooks(node_list, hpath, phase, env,
+                                           execution_fn=execution_fn)
 
     # For global hooks, we need to send different env values to master and
     # to the others
     ret = dict()
-    env["GANETI_IS_MASTER"] = constants.GLOBAL_HOOKS_MASTER
     master_set = frozenset([self.master_uuid])
-    ret.update(self._CheckParamsAndExecHooks(master_set, hpath, phase, env))
+    # Deferred scripts are only run on the nodes which reported them
+    if not deferred or self.master_uuid in node_list:
+      env["GANETI_IS_MASTER"] = constants.GLOBAL_HOOKS_MASTER
+      ret.update(self._CheckParamsAndExecHooks(master_set, hpath, phase, env,
+                                               execution_fn=execution_fn))
 
     if node_list:
       node_list = frozenset(set(node_list) - master_set)
     env["GANETI_IS_MASTER"] = constants.GLOBAL_HOOKS_NOT_MASTER
-    ret.update(self._CheckParamsAndExecHooks(node_list, hpath, phase, env))
+    ret.update(self._CheckParamsAndExecHooks(node_list, hpath, phase, env,
+                                             execution_fn=execution_fn))
 
     return ret
 
@@ -267,20 +296,47 @@ class HooksMaster(object):
     hooks_path = constants.GLOBAL_HOOKS_DIR if is_global else self.hooks_path
     results = self._RunWrapper(node_uuids, hooks_path, phase, env, is_global,
                                post_status)
+    self._ProcessResults(phase, results)
+
+    if phase == constants.HOOKS_PHASE_POST:
+      self._RunDeferred(results, hooks_path, env, is_global, post_status)
+
+    return results
+
+  def _ConvertResults(self, results):
+    """Converts hooks results to the form expected by L{_ProcessResults}.
+
+    """
+    if self.hooks_results_adapt_fn:
+      return self.hooks_results_adapt_fn(results)
+    return results
+
+  def _ProcessResults(self, phase, results, deferred=False):
+    """Logs the failures of a phase.
+
+    @type deferred: bool
+    @param deferred: whether the results are the ones of the post-phase
+        scripts deferred by the nodes
+    @raise errors.HooksFailure: on communication failure to the nodes
+    @raise errors.HooksAbort: on failure of one of the hooks
+
+    """
     if not results:
       msg = "Communication Failure"
       if phase == constants.HOOKS_PHASE_PRE:
         raise errors.HooksFailure(msg)
       else:
         self.log_fn(msg)
-        return results
+        return
 
-    converted_res = results
-    if self.hooks_results_adapt_fn:
-      converted_res = self.hooks_results_adapt_fn(results)
+    if deferred:
+      script_kind = "asynchronous script"
+    else:
+      script_kind = "script"
 
     errs = []
-    for node_name, (fail_msg, offline, hooks_results) in converted_res.items():
+    for node_name, (fail_msg, offline, hooks_results) in \
+        self._ConvertResults(results).items():
       if offline:
         continue
 
@@ -295,13 +351,48 @@ class HooksMaster(object):
           else:
             if not output:
               output = "(no output)"
-            self.log_fn("On %s script %s failed, output: %s" %
-                        (node_name, script, output))
+            self.log_fn("On %s %s %s failed, output: %s" %
+                        (node_name, script_kind, script, output))
 
     if errs and phase == constants.HOOKS_PHASE_PRE:
       raise errors.HooksAbort(errs)
 
-    return results
+  def _RunDeferred(self, results, hpath, env, is_global=False,
+                   post_status=None):
+    """Runs the post-phase scripts the nodes deferred.
+
+    Post-phase scripts declaring the L{constants.HOOKS_FLAG_ASYNC} flag are
+    reported as L{constants.HKR_DEFERRED} by the nodes. They are run by a
+    second call to these nodes only, either through L{async_fn} or right
+    away. Everything but the call itself is done before L{async_fn} is
+    invoked, as the call may happen in another thread.
+
+    """
+    if not results:
+      return
+
+    node_uuids = []
+    for node_uuid, (fail_msg, offline, hooks_results) in \
+        self._ConvertResults(results).items():
+      if not (offline or fail_msg or
+              compat.all(hkr != constants.HKR_DEFERRED
+                         for (_, hkr, _) in hooks_results)):
+        node_uuids.append(node_uuid)
+
+    if not node_uuids:
+      return
+
+    run_fn = compat.partial(self._RunWrapper, node_uuids, hpath,
+                            constants.HOOKS_PHASE_POST, env,
+                            is_global=is_global, post_status=post_status,
+                            deferred=True)
+    process_fn = compat.partial(self._ProcessResults,
+                                constants.HOOKS_PHASE_POST, deferred=True)
+
+    if self.async_fn is None:
+      process_fn(run_fn())
+    else:
+      self.async_fn(node_uuids, run_fn, process_fn)
 
   def RunConfigUpdate(self):
     """Run the special configuration update hook
@@ -313,10 +404,11 @@ class HooksMaster(object):
     phase = constants.HOOKS_PHASE_POST
     hpath = constants.HOOKS_NAME_CFGUPDATE
     nodes = [self.master_uuid]
-    self._RunWrapper(nodes, hpath, phase, self.pre_env)
+    results = self._RunWrapper(nodes, hpath, phase, self.pre_env)
+    self._RunDeferred(results, hpath, self.pre_env)
 
   @staticmethod
-  def BuildFromLu(hooks_execution_fn, lu, job_id=None):
+  def BuildFromLu(hooks_execution_fn, lu, job_id=None, async_fn=None):
     if lu.HPATH is None:
       nodes = (None, None)
     else:
@@ -335,7 +427,8 @@ class HooksMaster(object):
     return HooksMaster(lu.op.OP_ID, lu.HPATH, nodes, hooks_execution_fn,
                        RpcResultsToHooksResults, lu.BuildHooksEnv,
                        lu.PreparePostHookNodes, lu.LogWarning, lu.HTYPE,
-                       cluster_name, master_name, master_uuid, job_id)
+                       cluster_name, master_name, master_uuid, job_id,
+                       async_fn)
 
 
 def ExecGlobalPostHooks(opcode, master_name, rpc_runner, log_fn,
@@ -36,6 +36,7 @@ import logging
 import mimetools
 import select
 import socket
+import zlib
 
 from cStringIO import StringIO
 
@@ -62,6 +63,7 @@ HTTP_PUT = "PUT"
 HTTP_DELETE = "DELETE"
 
 HTTP_ETAG = "ETag"
+HTTP_IF_NONE_MATCH = "If-None-Match"
 HTTP_HOST = "Host"
 HTTP_SERVER = "Server"
 HTTP_DATE = "Date"
@@ -74,6 +76,21 @@ HTTP_WWW_AUTHENTICATE = "WWW-Authenticate"
 HTTP_AUTHORIZATION = "Authorization"
 HTTP_AUTHENTICATION_INFO = "Authentication-Info"
 HTTP_ALLOW = "Allow"
+HTTP_ACCEPT_ENCODING = "Accept-Encoding"
+HTTP_CONTENT_ENCODING = "Content-Encoding"
+HTTP_TRANSFER_ENCODING = "Transfer-Encoding"
+HTTP_VARY = "Vary"
+
+HTTP_ENCODING_IDENTITY = "identity"
+HTTP_ENCODING_GZIP = "gzip"
+HTTP_ENCODING_DEFLATE = "deflate"
+HTTP_TRANSFER_CHUNKED = "chunked"
+
+#: Content codings the server can apply, by order of preference
+HTTP_CONTENT_ENCODINGS = [HTTP_ENCODING_GZIP, HTTP_ENCODING_DEFLATE]
+
+#: zlib compression level for response bodies
+HTTP_COMPRESS_LEVEL = 6
 
 HTTP_APP_OCTET_STREAM = "application/octet-stream"
 HTTP_APP_JSON = "application/json"
@@ -133,6 +150,19 @@ class HttpException(Exception):
     self.headers = headers
 
 
+class HttpNotModified(HttpException):
+  """304 Not Modified
+
+  RFC2616, 10.3.5: If the client has performed a conditional GET request
+  and access is allowed, but the document has not been modified, the
+  server SHOULD respond with this status code.
+
+  This is not an error, but raised like one to skip sending a body.
+
+  """
+  code = 304
+
+
 class HttpBadRequest(HttpException):
   """400 Bad Request
 
@@ -333,6 +363,112 @@ class HttpVersionNotSupported(HttpException):
   code = 505
 
 
+def MatchesEntityTag(header, etag):
+  """Checks whether an entity tag is listed in an If-None-Match header.
+
+  @type header: string or None
+  @param header: value of the If-None-Match header
+  @type etag: string
+  @param etag: the quoted entity tag of the current document
+  @rtype: bool
+
+  """
+  if not header:
+    return False
+
+  for tag in header.split(","):
+    tag = tag.strip()
+    # Weak comparison is sufficient for GET requests (RFC7232, 3.2)
+    if tag.startswith("W/"):
+      tag = tag[2:]
+    if tag in ("*", etag):
+      return True
+
+  return False
+
+
+def SelectContentEncoding(header, supported=None):
+  """Chooses a content coding accepted by the client.
+
+  @type header: string or None
+  @param header: value of the Accept-Encoding header
+  @type supported: list of strings
+  @param supported: the codings to choose from, by order of preference,
+    defaults to L{HTTP_CONTENT_ENCODINGS}
+  @rtype: string or None
+  @return: the chosen coding or C{None} if the body should be sent as is
+
+  """
+  if not header:
+    return None
+
+  if supported is None:
+    supported = HTTP_CONTENT_ENCODINGS
+
+  qvalues = {}
+
+  for item in header.split(","):
+    parts = item.split(";")
+    coding = parts[0].strip().lower()
+    if not coding:
+      continue
+
+    qvalue = 1.0
+    for param in parts[1:]:
+      (name, _, value) = param.partition("=")
+      if name.strip().lower() == "q":
+        try:
+          qvalue = float(value)
+        except ValueError:
+          qvalue = 0.0
+
+    qvalues[coding] = qvalue
+
+  default = qvalues.get("*", 0.0)
+
+  (result, best) = (None, 0.0)
+  for coding in supported:
+    qvalue = qvalues.get(coding, default)
+    if qvalue > best:
+      (result, best) = (coding, qvalue)
+
+  # RFC7231, 5.3.4: the client may prefer an uncompressed body
+  if best < qvalues.get(HTTP_ENCODING_IDENTITY, 0.0):
+    return None
+
+  return result
+
+
+def CompressChunks(chunks, encoding, level=HTTP_COMPRESS_LEVEL):
+  """Compresses a message body in parts.
+
+  @type chunks: iterable of strings
+  @param chunks: the parts of the uncompressed body
+  @type encoding: string
+  @param encoding: one of L{HTTP_CONTENT_ENCODINGS}
+  @type level: int
+  @param level: zlib compression level
+  @return: a generator for the parts of the compressed body
+
+  """
+  if encoding == HTTP_ENCODING_GZIP:
+    wbits = 16 + zlib.MAX_WBITS
+  elif encoding == HTTP_ENCODING_DEFLATE:
+    # The "deflate" coding is the zlib format (RFC2616, 3.5)
+    wbits = zlib.MAX_WBITS
+  else:
+    raise HttpError("Unsupported content coding '%s'" % encoding)
+
+  compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+  for chunk in chunks:
+    data = compressor.compress(chunk)
+    if data:
+      yield data
+
+  yield compressor.flush()
+
+
 def ParseHeaders(buf):
   """Parses HTTP headers.
 
@@ -720,6 +856,16 @@ class HttpMessageWriter(object):
 
     buf = self._FormatMessage()
 
+    self._SendData(sock, buf, write_timeout)
+
+    if self.HasMessageBody() and not isinstance(msg.body, basestring):
+      self._SendChunks(sock, msg.body, write_timeout)
+
+  @staticmethod
+  def _SendData(sock, buf, write_timeout):
+    """Sends a string to a socket.
+
+    """
     pos = 0
     end = len(buf)
     while pos < end:
@@ -733,6 +879,29 @@ class HttpMessageWriter(object):
 
     assert pos == end, "Message wasn't sent completely"
 
+  def _SendChunks(self, sock, chunks, write_timeout):
+    """Sends a message body given as an iterable of strings.
+
+    Uses the chunked transfer coding if the message headers ask for it,
+    otherwise the end of the body is signalled by closing the connection.
+
+    """
+    chunked = (self._msg.headers.get(HTTP_TRANSFER_ENCODING) ==
+               HTTP_TRANSFER_CHUNKED)
+
+    for data in chunks:
+      if not data:
+        # An empty chunk would end the body
+        continue
+
+      if chunked:
+        data = "%x\r\n%s\r\n" % (len(data), data)
+
+      self._SendData(sock, data, write_timeout)
+
+    if chunked:
+      self._SendData(sock, "0\r\n\r\n", write_timeout)
+
   def _PrepareMessage(self):
     """Prepares the HTTP message by setting mandatory headers.
 
@@ -740,12 +909,14 @@ class HttpMessageWriter(object):
     # RFC2616, section 4.3: "The presence of a message-body in a request is
     # signaled by the inclusion of a Content-Length or Transfer-Encoding header
     # field in the request's message-headers."
-    if self._msg.body:
+    if self._msg.body and isinstance(self._msg.body, basestring):
       self._msg.headers[HTTP_CONTENT_LENGTH] = len(self._msg.body)
 
   def _FormatMessage(self):
     """Serializes the HTTP message into a string.
 
+    A body not given as a string isn't included, see L{_SendChunks}.
+
     """
     buf = StringIO()
 
@@ -762,7 +933,8 @@ class HttpMessageWriter(object):
 
     # Add message body if needed
     if self.HasMessageBody():
-      buf.write(self._msg.body)
+      if isinstance(self._msg.body, basestring):
+        buf.write(self._msg.body)
 
     elif self._msg.body:
       logging.warning("Ignoring message body")
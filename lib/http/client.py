@@ -314,6 +314,125 @@ class _PendingRequestMonitor(object):
     return result
 
 
+class CurlHandlePool(object):
+  """Keeps cURL handles and their connections for reuse.
+
+  libcurl keeps open connections in the connection cache of the multi object
+  a handle was added to, hence a single multi object is kept for the whole
+  lifetime of the pool. Easy handles are kept per host and port. Only one
+  thread at a time can use the pool.
+
+  """
+  #: Maximum number of idle handles kept per host and port
+  _MAX_IDLE_PER_HOST = 2
+
+  def __init__(self, max_connections=256, _curl=pycurl.Curl,
+               _curl_multi=pycurl.CurlMulti):
+    """Initializes this class.
+
+    @type max_connections: int
+    @param max_connections: Maximum number of connections kept open
+
+    """
+    self._max_connections = max_connections
+    self._curl_fn = _curl
+    self._curl_multi_fn = _curl_multi
+    self._lock = threading.Lock()
+    self._multi = None
+    self._idle = {}
+
+    # Statistics
+    self._requests = 0
+    self._reused = 0
+
+  def TryAcquire(self):
+    """Tries to get exclusive use of the pool without blocking.
+
+    @rtype: bool
+
+    """
+    return self._lock.acquire(False)
+
+  def Release(self):
+    """Releases the pool.
+
+    """
+    self._lock.release()
+
+  def GetMulti(self):
+    """Returns the cURL multi object.
+
+    """
+    if self._multi is None:
+      self._multi = self._curl_multi_fn()
+      if hasattr(pycurl, "M_MAXCONNECTS"):
+        self._multi.setopt(pycurl.M_MAXCONNECTS, self._max_connections)
+
+    return self._multi
+
+  def GetHandle(self, req):
+    """Returns a cURL handle for a request.
+
+    Handles used for earlier requests to the same host and port are reset
+    and reused, libcurl keeps their connections open.
+
+    @type req: L{HttpClientRequest}
+
+    """
+    try:
+      curl = self._idle[(req.host, req.port)].pop()
+    except (KeyError, IndexError):
+      return self._curl_fn()
+
+    curl.reset()
+
+    return curl
+
+  def ReturnHandle(self, req, curl):
+    """Returns a handle to the pool after its request finished.
+
+    @type req: L{HttpClientRequest}
+    @param req: Finished request
+    @type curl: pycurl.Curl
+    @param curl: cURL object used for the request
+
+    """
+    if req.success:
+      self._requests += 1
+
+      # No new connection was needed for the request
+      if curl.getinfo(pycurl.NUM_CONNECTS) == 0:
+        self._reused += 1
+
+    idle = self._idle.setdefault((req.host, req.port), [])
+    if req.success and len(idle) < self._MAX_IDLE_PER_HOST:
+      idle.append(curl)
+    else:
+      curl.close()
+
+  def Close(self):
+    """Closes all handles and connections.
+
+    """
+    for handles in self._idle.values():
+      for curl in handles:
+        curl.close()
+
+    self._idle.clear()
+
+    if self._multi is not None:
+      self._multi.close()
+      self._multi = None
+
+  def GetStatistics(self):
+    """Returns the number of finished requests and reused connections.
+
+    @rtype: tuple; (int, int)
+
+    """
+    return (self._requests, self._reused)
+
+
 def _ProcessCurlRequests(multi, requests):
   """cURL request processor.
 
@@ -362,14 +481,17 @@ def _ProcessCurlRequests(multi, requests):
     multi.select(1.0)
 
 
-def ProcessRequests(requests, lock_monitor_cb=None, _curl=pycurl.Curl,
-                    _curl_multi=pycurl.CurlMulti,
+def ProcessRequests(requests, lock_monitor_cb=None, pool=None,
+                    _curl=pycurl.Curl, _curl_multi=pycurl.CurlMulti,
                     _curl_process=_ProcessCurlRequests):
   """Processes any number of HTTP client requests.
 
   @type requests: list of L{HttpClientRequest}
   @param requests: List of all requests
   @param lock_monitor_cb: Callable for registering with lock monitor
+  @type pool: L{CurlHandlePool} or None
+  @param pool: Pool of cURL handles whose connections should be reused; not
+    used if another thread is already using it
 
   """
   assert compat.all((req.error is None and
@@ -378,29 +500,56 @@ def ProcessRequests(requests, lock_monitor_cb=None, _curl=pycurl.Curl,
                      req.resp_body is None)
                     for req in requests)
 
-  # Prepare all requests
-  curl_to_client = \
-    dict((client.GetCurlHandle(), client)
-         for client in [_StartRequest(_curl(), req) for req in requests])
+  if pool is not None and not pool.TryAcquire():
+    logging.debug("cURL handle pool is busy, not reusing connections")
+    pool = None
 
-  assert len(curl_to_client) == len(requests)
+  curl_to_client = {}
 
-  if lock_monitor_cb:
-    monitor = _PendingRequestMonitor(threading.currentThread(),
-                                     curl_to_client.values)
-    lock_monitor_cb(monitor)
-  else:
-    monitor = _NoOpRequestMonitor
+  try:
+    if pool is None:
+      get_curl_fn = lambda _: _curl()
+      multi = _curl_multi()
+    else:
+      get_curl_fn = pool.GetHandle
+      multi = pool.GetMulti()
 
-  # Process all requests and act based on the returned values
-  for (curl, msg) in _curl_process(_curl_multi(), curl_to_client.keys()):
-    monitor.acquire(shared=0)
-    try:
-      curl_to_client.pop(curl).Done(msg)
-    finally:
-      monitor.release()
+    # Prepare all requests
+    curl_to_client = \
+      dict((client.GetCurlHandle(), client)
+           for client in [_StartRequest(get_curl_fn(req), req)
+                          for req in requests])
+
+    assert len(curl_to_client) == len(requests)
 
-  assert not curl_to_client, "Not all requests were processed"
+    if lock_monitor_cb:
+      monitor = _PendingRequestMonitor(threading.currentThread(),
+                                       curl_to_client.values)
+      lock_monitor_cb(monitor)
+    else:
+      monitor = _NoOpRequestMonitor
+
+    # Process all requests and act based on the returned values
+    for (curl, msg) in _curl_process(multi, curl_to_client.keys()):
+      monitor.acquire(shared=0)
+      try:
+        client = curl_to_client.pop(curl)
+        client.Done(msg)
+      finally:
+        monitor.release()
+
+      if pool is not None:
+        pool.ReturnHandle(client.GetCurrentRequest(), curl)
+
+    assert not curl_to_client, "Not all requests were processed"
+
+  finally:
+    if pool is not None:
+      if curl_to_client:
+        # Processing was aborted, handles may still be attached to the multi
+        # object
+        pool.Close()
+      pool.Release()
 
   # Don't try to read information anymore as all requests have been processed
   monitor.Disable()
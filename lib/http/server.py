@@ -33,12 +33,15 @@
 
 import BaseHTTPServer
 import cgi
+import errno
 import logging
 import os
+import select
 import socket
 import time
 import signal
 import asyncore
+import collections
 
 from ganeti import http
 from ganeti import utils
@@ -225,6 +228,18 @@ class _HttpClientToServerMessageReader(http.HttpMessageReader):
 
     return http.HttpClientToServerStartLine(method, path, version)
 
+  def _ParseHeaders(self):
+    """Parses the headers.
+
+    """
+    http.HttpMessageReader._ParseHeaders(self)
+
+    # RFC2616, section 4.4: requests without a message body don't have a
+    # Content-Length header, this doesn't mean the client will close the
+    # connection
+    if self.content_length is None:
+      self.peer_will_close = self._WillPeerCloseConnection()
+
 
 def _HandleServerRequestInner(handler, req_msg, reader):
   """Calls the handler function for the current request.
@@ -255,8 +270,10 @@ def _HandleServerRequestInner(handler, req_msg, reader):
       logging.exception("Unknown exception")
       raise http.HttpInternalServerError(message="Unknown error")
 
-    if not isinstance(result, basestring):
-      raise http.HttpError("Handler function didn't return string type")
+    # Handlers can return the body in parts, e.g. as a generator
+    if not isinstance(result, (basestring, collections.Iterator)):
+      raise http.HttpError("Handler function didn't return string type or"
+                           " iterator")
 
     return (http.HTTP_OK, handler_context.resp_headers, result)
   finally:
@@ -264,6 +281,27 @@ def _HandleServerRequestInner(handler, req_msg, reader):
     handler_context.private = None
 
 
+def _IsPersistentConnection(keep_alive, reader, force_close):
+  """Determines whether a connection is kept open after a response.
+
+  @type keep_alive: bool
+  @param keep_alive: Whether the server allows another request on the
+    connection
+  @param reader: Request message reader or C{None}
+  @type force_close: bool
+  @param force_close: Whether the connection must be closed
+
+  """
+  return bool(keep_alive and not force_close and reader and
+              not reader.peer_will_close)
+
+
+class _ConnectionIdleClosed(Exception):
+  """Internal exception for a persistent connection closed by the client.
+
+  """
+
+
 class HttpResponder(object):
   # The default request version.  This only affects responses up until
   # the point where the request line is parsed, so it mainly decides what
@@ -273,19 +311,25 @@ class HttpResponder(object):
 
   responses = BaseHTTPServer.BaseHTTPRequestHandler.responses
 
+  # Smaller bodies aren't worth compressing
+  COMPRESS_MIN_SIZE = 1024
+
   def __init__(self, handler):
     """Initializes this class.
 
     """
     self._handler = handler
 
-  def __call__(self, fn):
+  def __call__(self, fn, keep_alive=False):
     """Handles a request.
 
     @type fn: callable
     @param fn: Callback for retrieving HTTP request, must return a tuple
       containing request message (L{http.HttpMessage}) and C{None} or the
       message reader (L{_HttpClientToServerMessageReader})
+    @type keep_alive: bool
+    @param keep_alive: Whether the connection may be kept open for another
+      request
 
     """
     response_msg = http.HttpMessage()
@@ -311,14 +355,72 @@ class HttpResponder(object):
       (response_msg.start_line.code, response_msg.headers,
        response_msg.body) = \
         _HandleServerRequestInner(self._handler, request_msg, req_msg_reader)
+    except http.HttpNotModified, err:
+      # Not an error, so the connection can be kept open
+      response_msg.start_line.code = err.code
+      response_msg.headers = dict(err.headers or {})
+      force_close = False
     except http.HttpException, err:
       self._SetError(self.responses, self._handler, response_msg, err)
     else:
       # Only wait for client to close if we didn't have any exception.
       force_close = False
 
+      self._EncodeBody(request_msg, response_msg)
+
+    persistent = _IsPersistentConnection(keep_alive, req_msg_reader,
+                                         force_close)
+
     return (request_msg, req_msg_reader, force_close,
-            self._Finalize(self.responses, response_msg))
+            self._Finalize(self.responses, response_msg, persistent))
+
+  @classmethod
+  def _EncodeBody(cls, request_msg, response_msg):
+    """Applies the content and transfer codings accepted by the client.
+
+    Bodies of at least L{COMPRESS_MIN_SIZE} bytes and bodies given as an
+    iterator are compressed if the client accepts gzip or deflate. Iterators
+    are sent using the chunked transfer coding, which requires HTTP/1.1;
+    for older clients they're joined into a string.
+
+    """
+    body = response_msg.body
+    headers = response_msg.headers
+
+    if not body:
+      return
+
+    streamed = not isinstance(body, basestring)
+
+    if ((streamed or len(body) >= cls.COMPRESS_MIN_SIZE) and
+        http.HTTP_CONTENT_ENCODING not in headers):
+      if request_msg.headers:
+        accept = request_msg.headers.get(http.HTTP_ACCEPT_ENCODING)
+      else:
+        accept = None
+
+      headers[http.HTTP_VARY] = http.HTTP_ACCEPT_ENCODING
+
+      encoding = http.SelectContentEncoding(accept)
+      if encoding:
+        if streamed:
+          body = http.CompressChunks(body, encoding)
+        else:
+          body = "".join(http.CompressChunks([body], encoding))
+        headers[http.HTTP_CONTENT_ENCODING] = encoding
+
+        # RFC7232, 2.1: a strong validator must change with the coding
+        etag = headers.get(http.HTTP_ETAG)
+        if etag and not etag.startswith("W/"):
+          headers[http.HTTP_ETAG] = "W/%s" % etag
+
+    if streamed:
+      if request_msg.start_line.version == http.HTTP_1_1:
+        headers[http.HTTP_TRANSFER_ENCODING] = http.HTTP_TRANSFER_CHUNKED
+      else:
+        body = "".join(body)
+
+    response_msg.body = body
 
   @staticmethod
   def _SetError(responses, handler, response_msg, err):
@@ -358,15 +460,25 @@ class HttpResponder(object):
     response_msg.body = body
 
   @staticmethod
-  def _Finalize(responses, msg):
+  def _Finalize(responses, msg, persistent=False):
     assert msg.start_line.reason is None
 
     if not msg.headers:
       msg.headers = {}
 
+    if persistent:
+      connection = "keep-alive"
+
+      # The client can only find the end of the response by its length,
+      # unless it's sent in chunks
+      if (msg.headers.get(http.HTTP_TRANSFER_ENCODING) !=
+          http.HTTP_TRANSFER_CHUNKED):
+        msg.headers[http.HTTP_CONTENT_LENGTH] = len(msg.body or "")
+    else:
+      connection = "close"
+
     msg.headers.update({
-      # TODO: Keep-alive is not supported
-      http.HTTP_CONNECTION: "close",
+      http.HTTP_CONNECTION: connection,
       http.HTTP_DATE: _DateTimeHeader(),
       http.HTTP_SERVER: http.HTTP_GANETI_VERSION,
       })
@@ -390,7 +502,7 @@ class HttpServerRequestExecutor(object):
   This class implements the server side of HTTP. It's based on code of
   Python's BaseHTTPServer, from both version 2.4 and 3k. It does not
   support non-ASCII character encodings. Keep-alive connections are
-  not supported.
+  supported if the server has a keep-alive timeout set.
 
   """
   # Timeouts in seconds for socket layer
@@ -398,6 +510,9 @@ class HttpServerRequestExecutor(object):
   READ_TIMEOUT = 10
   CLOSE_TIMEOUT = 1
 
+  # Maximum number of requests handled on a persistent connection
+  KEEP_ALIVE_MAX_REQUESTS = 100
+
   def __init__(self, server, handler, sock, client_addr):
     """Initializes this class.
 
@@ -428,16 +543,43 @@ class HttpServerRequestExecutor(object):
             # Ignore rest
             return
 
-        (request_msg, request_msg_reader, force_close, response_msg) = \
-          responder(compat.partial(self._ReadRequest, sock, self.READ_TIMEOUT))
-        if response_msg:
-          # HttpMessage.start_line can be of different types
-          # Instance of 'HttpClientToServerStartLine' has no 'code' member
-          # pylint: disable=E1103,E1101
-          logging.info("%s:%s %s %s", client_addr[0], client_addr[1],
-                       request_msg.start_line, response_msg.start_line.code)
-          self._SendResponse(sock, request_msg, response_msg,
-                             self.WRITE_TIMEOUT)
+        read_fn = compat.partial(self._ReadRequest, sock, self.READ_TIMEOUT)
+        keep_alive_timeout = server.keep_alive_timeout
+        count = 0
+
+        while True:
+          count += 1
+          keep_alive = bool(keep_alive_timeout and
+                            count < self.KEEP_ALIVE_MAX_REQUESTS)
+
+          try:
+            (request_msg, request_msg_reader, force_close, response_msg) = \
+              responder(read_fn, keep_alive=keep_alive)
+          except _ConnectionIdleClosed:
+            force_close = True
+            break
+
+          if response_msg:
+            # HttpMessage.start_line can be of different types
+            # Instance of 'HttpClientToServerStartLine' has no 'code' member
+            # pylint: disable=E1103,E1101
+            logging.info("%s:%s %s %s", client_addr[0], client_addr[1],
+                         request_msg.start_line, response_msg.start_line.code)
+            self._SendResponse(sock, request_msg, response_msg,
+                               self.WRITE_TIMEOUT)
+
+          if not _IsPersistentConnection(keep_alive, request_msg_reader,
+                                         force_close):
+            break
+
+          if not self._WaitForRequest(sock, keep_alive_timeout):
+            logging.debug("Closing idle connection from %s:%s after %s"
+                          " requests", client_addr[0], client_addr[1], count)
+            force_close = True
+            break
+
+          read_fn = compat.partial(self._ReadNextRequest, sock,
+                                   self.READ_TIMEOUT)
       finally:
         http.ShutdownConnection(sock, self.CLOSE_TIMEOUT, self.WRITE_TIMEOUT,
                                 request_msg_reader, force_close)
@@ -462,6 +604,35 @@ class HttpServerRequestExecutor(object):
 
     return (msg, reader)
 
+  @classmethod
+  def _ReadNextRequest(cls, sock, timeout):
+    """Reads a further request on a persistent connection.
+
+    The client may close a persistent connection at any time, hence errors
+    are not reported back.
+
+    """
+    try:
+      return cls._ReadRequest(sock, timeout)
+    except http.HttpError, err:
+      logging.debug("Persistent connection closed: %s", err)
+      raise _ConnectionIdleClosed()
+
+  @staticmethod
+  def _WaitForRequest(sock, timeout):
+    """Waits for the next request on a persistent connection.
+
+    @rtype: bool
+    @return: Whether data arrived before the timeout expired
+
+    """
+    # Data might already be buffered by OpenSSL
+    pending_fn = getattr(sock, "pending", None)
+    if pending_fn and pending_fn():
+      return True
+
+    return utils.WaitForFdCondition(sock, select.POLLIN, timeout) is not None
+
   @staticmethod
   def _SendResponse(sock, req_msg, msg, timeout):
     """Sends the response to the client.
@@ -478,11 +649,18 @@ class HttpServerRequestExecutor(object):
 class HttpServer(http.HttpBase, asyncore.dispatcher):
   """Generic HTTP server class
 
+  By default a new process is forked for every incoming connection. If
+  C{worker_count} is set, a fixed number of worker processes is forked when
+  the server is started instead. The workers accept connections themselves
+  and each of them handles requests one after another, avoiding the cost of
+  a fork per request.
+
   """
 
   def __init__(self, mainloop, local_address, port, max_clients, handler,
                ssl_params=None, ssl_verify_peer=False,
-               request_executor_class=None, ssl_verify_callback=None):
+               request_executor_class=None, ssl_verify_callback=None,
+               worker_count=0, worker_max_requests=0, keep_alive_timeout=0):
     """Initializes the HTTP server
 
     @type mainloop: ganeti.daemon.Mainloop
@@ -504,11 +682,25 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
     @type request_executor_class: class
     @param request_executor_class: a class derived from the
         HttpServerRequestExecutor class
+    @type worker_count: int
+    @param worker_count: Number of pre-forked worker processes; if zero, a
+        process is forked for every connection
+    @type worker_max_requests: int
+    @param worker_max_requests: Number of connections a worker process
+        handles before it exits and is replaced by a new one; zero for no
+        limit
+    @type keep_alive_timeout: number
+    @param keep_alive_timeout: How long to wait for further requests on a
+        persistent connection; zero disables persistent connections
 
     """
     http.HttpBase.__init__(self)
     asyncore.dispatcher.__init__(self)
 
+    assert worker_count >= 0
+    assert worker_max_requests >= 0
+    assert keep_alive_timeout >= 0
+
     if request_executor_class is None:
       self.request_executor = HttpServerRequestExecutor
     else:
@@ -529,15 +721,68 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
     self.set_socket(self.socket)
     self.accepting = True
     self.max_clients = max_clients
+    self.worker_count = worker_count
+    self.worker_max_requests = worker_max_requests
+    self.keep_alive_timeout = keep_alive_timeout
+
+    # Worker processes of the current generation (a subset of _children) and
+    # the pipe they use to detect the parent shutting down or replacing them
+    self._workers = set()
+    self._worker_pipe = None
+
     mainloop.RegisterSignal(self)
 
   def Start(self):
     self.socket.bind((self.local_address, self.port))
     self.socket.listen(1024)
 
+    if self.worker_count:
+      # Workers compete for incoming connections, the losers must not block
+      self.socket.setblocking(0)
+      self._worker_pipe = os.pipe()
+      self._SpawnWorkers()
+
   def Stop(self):
+    self._RetireWorkers()
     self.socket.close()
 
+  def RestartWorkers(self):
+    """Replaces all worker processes.
+
+    Must be called when data used by the request handler changed in the
+    parent process, as workers only see the state at the time they were
+    forked. Running requests are not interrupted.
+
+    """
+    if self._worker_pipe:
+      logging.info("Restarting HTTP worker processes")
+      self._RetireWorkers()
+      self._worker_pipe = os.pipe()
+      self._SpawnWorkers()
+
+  def _RetireWorkers(self):
+    """Asks the current worker processes to exit.
+
+    Workers finish their current request and exit once the write end of the
+    worker pipe is closed.
+
+    """
+    if self._worker_pipe:
+      (read_fd, write_fd) = self._worker_pipe
+      self._worker_pipe = None
+      os.close(write_fd)
+      os.close(read_fd)
+
+    self._workers.clear()
+
+  def readable(self):
+    """Whether the mainloop should wait for incoming connections.
+
+    In worker mode the workers accept connections themselves.
+
+    """
+    return not self.worker_count
+
   def handle_accept(self):
     self._IncomingConnection()
 
@@ -545,6 +790,10 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
     if signum == signal.SIGCHLD:
       self._CollectChildren(True)
 
+      if self._worker_pipe:
+        # Replace workers which exited
+        self._SpawnWorkers()
+
   def _CollectChildren(self, quick):
     """Checks whether any child processes are done
 
@@ -566,13 +815,108 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
         if pid and pid in self._children:
           self._children.remove(pid)
 
-    for child in self._children:
+    for child in self._children[:]:
       try:
         pid, _ = os.waitpid(child, os.WNOHANG)
       except os.error:
         pid = None
       if pid and pid in self._children:
         self._children.remove(pid)
+        self._workers.discard(pid)
+
+  def _SpawnWorkers(self):
+    """Forks worker processes until C{worker_count} of them are running.
+
+    """
+    while len(self._workers) < self.worker_count:
+      try:
+        pid = os.fork()
+      except OSError:
+        logging.exception("Failed to fork worker process")
+        return
+
+      if pid == 0:
+        # Child process
+        # pylint: disable=W0212
+        try:
+          self._RunWorker()
+        except Exception: # pylint: disable=W0703
+          logging.exception("Error in worker process")
+          os._exit(1)
+        os._exit(0)
+      else:
+        logging.debug("Started worker process %s", pid)
+        self._children.append(pid)
+        self._workers.add(pid)
+
+  def _RunWorker(self):
+    """Main loop of a worker process.
+
+    Returns after C{worker_max_requests} connections have been handled or
+    when the parent process closes the worker pipe.
+
+    """
+    (read_fd, write_fd) = self._worker_pipe
+    os.close(write_fd)
+
+    # The worker only reacts to its parent closing the pipe, the signal
+    # handlers installed by the mainloop belong to the parent
+    for signum in [signal.SIGCHLD, signal.SIGTERM, signal.SIGINT]:
+      signal.signal(signum, signal.SIG_DFL)
+
+    # In case the handler code uses temporary files
+    utils.ResetTempfileModule()
+
+    poller = select.poll()
+    poller.register(self.socket.fileno(), select.POLLIN)
+    poller.register(read_fd, select.POLLIN)
+
+    served = 0
+
+    while not (self.worker_max_requests and
+               served >= self.worker_max_requests):
+      try:
+        events = poller.poll()
+      except select.error, err:
+        if err.args[0] == errno.EINTR:
+          continue
+        raise
+
+      if compat.any(fd == read_fd for (fd, _) in events):
+        logging.debug("Parent process closed worker pipe, exiting")
+        break
+
+      t_start = time.time()
+      try:
+        (connection, client_addr) = self.socket.accept()
+      except socket.error, err:
+        if err.args[0] in (errno.EAGAIN, errno.EINTR, errno.ECONNABORTED):
+          # Another worker was faster
+          continue
+        raise
+
+      self._HandleConnection(connection, client_addr, t_start)
+      served += 1
+
+    logging.debug("Worker process exiting after %s requests", served)
+
+  def _HandleConnection(self, connection, client_addr, t_start):
+    """Runs the request executor for a connection.
+
+    """
+    try:
+      t_setup = time.time()
+      self.request_executor(self, self.handler, connection, client_addr)
+      t_end = time.time()
+      logging.debug("Request from %s:%s executed in: %.4f [setup: %.4f] "
+                    "[workers: %d]", client_addr[0], client_addr[1],
+                    t_end - t_start, t_setup - t_start, len(self._children))
+    except Exception: # pylint: disable=W0703
+      logging.exception("Error while handling request from %s:%s",
+                        client_addr[0], client_addr[1])
+      return False
+
+    return True
 
   def _IncomingConnection(self):
     """Called for each incoming connection
@@ -612,13 +956,8 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
         # In case the handler code uses temporary files
         utils.ResetTempfileModule()
 
-        t_setup = time.time()
-        self.request_executor(self, self.handler, connection, client_addr)
-        t_end = time.time()
-        logging.debug("Request from %s:%s executed in: %.4f [setup: %.4f] "
-                      "[workers: %d]", client_addr[0], client_addr[1],
-                      t_end - t_start, t_setup - t_start, len(self._children))
-
+        if not self._HandleConnection(connection, client_addr, t_start):
+          os._exit(1)
       except Exception: # pylint: disable=W0703
         logging.exception("Error while handling request from %s:%s",
                           client_addr[0], client_addr[1])
@@ -71,6 +71,7 @@ from ganeti import uidpool
 from ganeti import ssconf
 from ganeti import netutils
 from ganeti import pathutils
+from ganeti import workerpool
 from ganeti.hypervisor import hv_base
 from ganeti.utils import wrapper as utils_wrapper
 
@@ -168,18 +169,79 @@ _SCSI_BUS = "scsi.0"
 
 _MIGRATION_CAPS_DELIM = ":"
 
+#: Index of the start time in the fields of /proc/<pid>/stat following the
+#: process name
+_PROC_STAT_STARTTIME_IDX = 19
+
 
 def _with_qmp(fn):
   """Wrapper used on hotplug related methods"""
   def wrapper(self, instance, *args, **kwargs):
     """Create a QmpConnection and run the wrapped method"""
-    if not getattr(self, "qmp", None):
-      filename = self._InstanceQmpMonitor(instance.name)# pylint: disable=W0212
-      self.qmp = QmpConnection(filename)
+    self.qmp = self._GetQmpConnection(instance.name) # pylint: disable=W0212
     return fn(self, instance, *args, **kwargs)
   return wrapper
 
 
+def _GetProcessStartTime(pid):
+  """Returns the start time of a process.
+
+  Together with the pid, the start time identifies a process even if pids
+  are reused.
+
+  @type pid: int
+  @param pid: the process ID
+  @rtype: int or None
+  @return: the start time in clock ticks since boot, or None if the process
+      doesn't exist (or is a zombie)
+
+  """
+  if pid <= 0:
+    return None
+
+  try:
+    stat = utils.ReadFile(utils.PathJoin("/proc", str(pid), "stat"))
+  except EnvironmentError:
+    return None
+
+  # The process name is enclosed in parentheses and may contain spaces
+  fields = stat[stat.rfind(")") + 1:].split()
+  try:
+    if fields[0] == "Z":
+      return None
+    return int(fields[_PROC_STAT_STARTTIME_IDX])
+  except (IndexError, ValueError):
+    return None
+
+
+def _CollectInstanceInfo(fn, instance_name, results):
+  """Calls C{fn} for an instance and stores the result.
+
+  @param fn: function returning the information of an instance
+  @type instance_name: string
+  @param instance_name: the instance name
+  @type results: dict
+  @param results: instance names as keys, tuples of success and result or
+      exception as values
+
+  """
+  try:
+    results[instance_name] = (True, fn(instance_name))
+  except Exception, err: # pylint: disable=W0703
+    results[instance_name] = (False, err)
+
+
+class _InstanceInfoWorker(workerpool.BaseWorker):
+  """Worker thread retrieving the information of one instance.
+
+  """
+  def RunTask(self, *args):
+    """Runs L{_CollectInstanceInfo}.
+
+    """
+    _CollectInstanceInfo(*args)
+
+
 def _GetDriveURI(disk, link, uri):
   """Helper function to get the drive uri to be used in --drive kvm option
 
@@ -550,6 +612,17 @@ class KVMHypervisor(hv_base.BaseHypervisor):
 
   _VERSION_RE = re.compile(r"\b(\d+)\.(\d+)(\.(\d+))?\b")
 
+  #: How long (in seconds) the QMP-provided memory and vCPU count of a running
+  #: instance are cached
+  _INSTANCE_INFO_CACHE_TTL = 10.0
+  #: Maximum number of threads querying instances in L{GetAllInstancesInfo}
+  _INSTANCE_INFO_MAX_THREADS = 8
+
+  #: Cached instance information, shared by all objects of a process; keys
+  #: are instance names, values are tuples of pid, process start time, time
+  #: of the query, memory and vCPU count
+  _instance_info_cache = {}
+
   _CPU_INFO_RE = re.compile(r"cpu\s+\#(\d+).*thread_id\s*=\s*(\d+)", re.I)
   _CPU_INFO_CMD = "info cpus"
   _CONT_CMD = "cont"
@@ -628,6 +701,7 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     dirs = [(dname, constants.RUN_DIRS_MODE) for dname in self._DIRS]
     utils.EnsureDirs(dirs)
     self.qmp = None
+    self._qmp_connections = {}
 
   @staticmethod
   def VersionsSafeForMigration(src, target):
@@ -962,6 +1036,11 @@ class KVMHypervisor(hv_base.BaseHypervisor):
 
     """
     result = {}
+    if self._HasQmpMonitor(instance_name):
+      for cpu in self._CallQmpCommand(instance_name, "query-cpus"):
+        result[cpu["CPU"]] = cpu["thread_id"]
+      return result
+
     output = self._CallMonitorCommand(instance_name, self._CPU_INFO_CMD)
     for line in output.stdout.splitlines():
       match = self._CPU_INFO_RE.search(line)
@@ -1020,45 +1099,115 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     @return: (name, id, memory, vcpus, stat, times)
 
     """
-    _, pid, alive = self._InstancePidAlive(instance_name)
-    if not alive:
+    pid = utils.ReadPidFile(self._InstancePidFile(instance_name))
+    start_time = _GetProcessStartTime(pid)
+    resources = None
+    if start_time is not None:
+      resources = self._GetInstanceResources(instance_name, pid, start_time)
+
+    if resources is None:
       if self._IsUserShutdown(instance_name):
         return (instance_name, -1, 0, 0, hv_base.HvInstanceState.SHUTDOWN, 0)
       else:
         return None
 
-    _, memory, vcpus = self._InstancePidInfo(pid)
+    (memory, vcpus) = resources
     istat = hv_base.HvInstanceState.RUNNING
     times = 0
 
+    return (instance_name, pid, memory, vcpus, istat, times)
+
+  def _GetInstanceResources(self, instance_name, pid, start_time):
+    """Returns the memory and vCPU count of a running instance.
+
+    The values are cached for L{_INSTANCE_INFO_CACHE_TTL} seconds, keyed on
+    the pid and start time of the KVM process, so a restarted instance is
+    never served stale information.
+
+    @type instance_name: string
+    @param instance_name: the instance name
+    @type pid: int
+    @param pid: the pid of the KVM process
+    @type start_time: int
+    @param start_time: the start time of the KVM process
+    @rtype: tuple or None
+    @return: (memory, vcpus), or None if the process doesn't belong to the
+        instance
+
+    """
+    now = time.time()
+    cached = self._instance_info_cache.get(instance_name, None)
+    if cached is not None:
+      (cached_pid, cached_start_time, timestamp, memory, vcpus) = cached
+      if (cached_pid == pid and cached_start_time == start_time and
+          0 <= now - timestamp < self._INSTANCE_INFO_CACHE_TTL):
+        return (memory, vcpus)
+
     try:
-      qmp = QmpConnection(self._InstanceQmpMonitor(instance_name))
-      qmp.connect()
-      vcpus = len(qmp.Execute("query-cpus"))
+      (cmd_instance, memory, vcpus) = self._InstancePidInfo(pid)
+    except errors.HypervisorError:
+      return None
+    if cmd_instance != instance_name:
+      return None
+
+    try:
+      vcpus = len(self._CallQmpCommand(instance_name, "query-cpus"))
       # Will fail if ballooning is not enabled, but we can then just resort to
       # the value above.
-      mem_bytes = qmp.Execute("query-balloon")[qmp.ACTUAL_KEY]
+      mem_bytes = self._CallQmpCommand(instance_name,
+                                       "query-balloon")[QmpConnection.ACTUAL_KEY]
       memory = mem_bytes / 1048576
     except errors.HypervisorError:
       pass
 
-    return (instance_name, pid, memory, vcpus, istat, times)
+    self._instance_info_cache[instance_name] = \
+      (pid, start_time, now, memory, vcpus)
+
+    return (memory, vcpus)
+
+  @classmethod
+  def _InvalidateInstanceInfo(cls, instance_name):
+    """Removes the cached information of an instance.
+
+    """
+    cls._instance_info_cache.pop(instance_name, None)
 
   def GetAllInstancesInfo(self, hvparams=None):
     """Get properties of all instances.
 
+    Instances are queried concurrently by up to
+    L{_INSTANCE_INFO_MAX_THREADS} threads, as each query may have to talk
+    to the instance over QMP.
+
     @type hvparams: dict of strings
     @param hvparams: hypervisor parameters
     @return: list of tuples (name, id, memory, vcpus, stat, times)
 
     """
-    data = []
-    for name in os.listdir(self._PIDS_DIR):
+    names = sorted(os.listdir(self._PIDS_DIR))
+
+    results = {}
+    num_workers = min(len(names), self._INSTANCE_INFO_MAX_THREADS)
+    if num_workers > 1:
+      pool = workerpool.WorkerPool("KvmInfo", num_workers, _InstanceInfoWorker)
       try:
-        info = self.GetInstanceInfo(name)
-      except errors.HypervisorError:
-        # Ignore exceptions due to instances being shut down
-        continue
+        pool.AddManyTasks([(self.GetInstanceInfo, name, results)
+                           for name in names])
+        pool.Quiesce()
+      finally:
+        pool.TerminateWorkers()
+    else:
+      for name in names:
+        _CollectInstanceInfo(self.GetInstanceInfo, name, results)
+
+    data = []
+    for name in names:
+      (success, info) = results[name]
+      if not success:
+        if isinstance(info, errors.HypervisorError):
+          # Ignore exceptions due to instances being shut down
+          continue
+        raise info
       if info:
         data.append(info)
     return data
@@ -1924,8 +2073,9 @@ class KVMHypervisor(hv_base.BaseHypervisor):
       utils.WriteFile(self._InstanceNICFile(instance.name, nic_seq), data=tap)
 
     if vnc_pwd:
-      change_cmd = "change vnc password %s" % vnc_pwd
-      self._CallMonitorCommand(instance.name, change_cmd)
+      self._CallMonitor(instance.name, "set_password",
+                        {"protocol": "vnc", "password": vnc_pwd},
+                        "change vnc password %s" % vnc_pwd)
 
     # Setting SPICE password. We are not vulnerable to malicious passwordless
     # connection attempts because SPICE by default does not allow connections
@@ -1941,13 +2091,11 @@ class KVMHypervisor(hv_base.BaseHypervisor):
         raise errors.HypervisorError("Failed to open SPICE password file %s: %s"
                                      % (spice_password_file, err))
 
-      qmp = QmpConnection(self._InstanceQmpMonitor(instance.name))
-      qmp.connect()
       arguments = {
           "protocol": "spice",
           "password": spice_pwd,
       }
-      qmp.Execute("set_password", arguments)
+      self._CallQmpCommand(instance.name, "set_password", arguments)
 
     for filename in temp_files:
       utils.RemoveFile(filename)
@@ -1965,7 +2113,7 @@ class KVMHypervisor(hv_base.BaseHypervisor):
       # To control CPU pinning, ballooning, and vnc/spice passwords
       # the VM was started in a frozen state. If freezing was not
       # explicitly requested resume the vm status.
-      self._CallMonitorCommand(instance.name, self._CONT_CMD)
+      self._CallMonitor(instance.name, self._CONT_CMD, None, self._CONT_CMD)
 
   @staticmethod
   def _StartKvmd(hvparams):
@@ -2001,19 +2149,18 @@ class KVMHypervisor(hv_base.BaseHypervisor):
   def _CallMonitorCommand(cls, instance_name, command, timeout=None):
     """Invoke a command on the instance monitor.
 
+    Only used for instances started without a QMP socket and for commands
+    without a QMP counterpart: all calls to socat take at least 500ms and
+    likely more, as socat can't detect the end of the reply and waits for
+    500ms of no data received before exiting (500 ms is the default for the
+    "-t" parameter).
+
     """
     if timeout is not None:
       timeout_cmd = "timeout %s" % (timeout, )
     else:
       timeout_cmd = ""
 
-    # TODO: Replace monitor calls with QMP once KVM >= 0.14 is the minimum
-    # version. The monitor protocol is designed for human consumption, whereas
-    # QMP is made for programmatic usage. In the worst case QMP can also
-    # execute monitor commands. As it is, all calls to socat take at least
-    # 500ms and likely more: socat can't detect the end of the reply and waits
-    # for 500ms of no data received before exiting (500 ms is the default for
-    # the "-t" parameter).
     socat = ("echo %s | %s %s STDIO UNIX-CONNECT:%s" %
              (utils.ShellQuote(command),
               timeout_cmd,
@@ -2028,6 +2175,85 @@ class KVMHypervisor(hv_base.BaseHypervisor):
 
     return result
 
+  def _HasQmpMonitor(self, instance_name):
+    """Checks whether the instance was started with a QMP socket.
+
+    """
+    return os.path.exists(self._InstanceQmpMonitor(instance_name))
+
+  def _GetQmpConnection(self, instance_name):
+    """Returns the cached QMP connection of an instance.
+
+    QEMU serves a single QMP client at a time, so all QMP users of this
+    object share one connection per instance. The returned connection is
+    not necessarily connected yet.
+
+    @type instance_name: string
+    @param instance_name: the instance name
+    @rtype: L{QmpConnection}
+
+    """
+    qmp = self._qmp_connections.get(instance_name, None)
+    if qmp is None:
+      qmp = QmpConnection(self._InstanceQmpMonitor(instance_name))
+      self._qmp_connections[instance_name] = qmp
+    return qmp
+
+  def _CloseQmpConnection(self, instance_name):
+    """Closes and forgets the cached QMP connection of an instance.
+
+    """
+    qmp = self._qmp_connections.pop(instance_name, None)
+    if qmp is not None:
+      qmp.close()
+    if self.qmp is qmp:
+      self.qmp = None
+
+  def _CallQmpCommand(self, instance_name, command, arguments=None):
+    """Executes a QMP command using the cached instance connection.
+
+    The connection is opened on first use and kept for subsequent commands;
+    it is dropped on any error so that the next command reconnects.
+
+    @type instance_name: string
+    @param instance_name: the instance name
+    @type command: string
+    @param command: the QMP command to execute
+    @type arguments: dict
+    @param arguments: the arguments of the command
+    @return: the "return" value of the QMP response
+    @raise errors.HypervisorError: when the command fails
+
+    """
+    qmp = self._GetQmpConnection(instance_name)
+    try:
+      qmp.connect()
+      return qmp.Execute(command, arguments)
+    except errors.HypervisorError:
+      self._CloseQmpConnection(instance_name)
+      raise
+
+  def _CallMonitor(self, instance_name, command, arguments, hmp_command,
+                   timeout=None):
+    """Invokes a command via QMP, or via the human monitor as a fallback.
+
+    @type instance_name: string
+    @param instance_name: the instance name
+    @type command: string
+    @param command: the QMP command to execute
+    @type arguments: dict
+    @param arguments: the arguments of the QMP command
+    @type hmp_command: string
+    @param hmp_command: the equivalent human monitor command, used if the
+        instance has no QMP socket
+    @param timeout: timeout for the human monitor command
+
+    """
+    if self._HasQmpMonitor(instance_name):
+      self._CallQmpCommand(instance_name, command, arguments)
+    else:
+      self._CallMonitorCommand(instance_name, hmp_command, timeout)
+
   @_with_qmp
   def VerifyHotplugSupport(self, instance, action, dev_type):
     """Verifies that hotplug is supported.
@@ -2314,8 +2540,7 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     else:
       return "pc"
 
-  @classmethod
-  def _StopInstance(cls, instance, force=False, name=None, timeout=None):
+  def _StopInstance(self, instance, force=False, name=None, timeout=None):
     """Stop an instance.
 
     """
@@ -2328,13 +2553,14 @@ class KVMHypervisor(hv_base.BaseHypervisor):
       acpi = instance.hvparams[constants.HV_ACPI]
     else:
       acpi = False
-    _, pid, alive = cls._InstancePidAlive(name)
+    _, pid, alive = self._InstancePidAlive(name)
     if pid > 0 and alive:
       if force or not acpi:
         utils.KillProcess(pid)
       else:
-        cls._CallMonitorCommand(name, "system_powerdown", timeout)
-    cls._ClearUserShutdown(instance.name)
+        self._CallMonitor(name, "system_powerdown", None, "system_powerdown",
+                          timeout=timeout)
+    self._ClearUserShutdown(instance.name)
 
   def StopInstance(self, instance, force=False, retry=False, name=None,
                    timeout=None):
@@ -2469,24 +2695,29 @@ class KVMHypervisor(hv_base.BaseHypervisor):
       raise errors.HypervisorError("Instance not running, cannot migrate")
 
     if not live_migration:
-      self._CallMonitorCommand(instance_name, "stop")
+      self._CallMonitor(instance_name, "stop", None, "stop")
 
-    migrate_command = ("migrate_set_speed %dm" %
-                       instance.hvparams[constants.HV_MIGRATION_BANDWIDTH])
-    self._CallMonitorCommand(instance_name, migrate_command)
+    # The bandwidth is given in MiB/s, the downtime in milliseconds
+    bandwidth = instance.hvparams[constants.HV_MIGRATION_BANDWIDTH]
+    self._CallMonitor(instance_name, "migrate_set_speed",
+                      {"value": bandwidth * 1024 * 1024},
+                      "migrate_set_speed %dm" % bandwidth)
 
-    migrate_command = ("migrate_set_downtime %dms" %
-                       instance.hvparams[constants.HV_MIGRATION_DOWNTIME])
-    self._CallMonitorCommand(instance_name, migrate_command)
+    downtime = instance.hvparams[constants.HV_MIGRATION_DOWNTIME]
+    self._CallMonitor(instance_name, "migrate_set_downtime",
+                      {"value": downtime / 1000.0},
+                      "migrate_set_downtime %dms" % downtime)
 
     migration_caps = instance.hvparams[constants.HV_KVM_MIGRATION_CAPS]
     if migration_caps:
       for c in migration_caps.split(_MIGRATION_CAPS_DELIM):
-        migrate_command = ("migrate_set_capability %s on" % c)
-        self._CallMonitorCommand(instance_name, migrate_command)
+        self._CallMonitor(instance_name, "migrate-set-capabilities",
+                          {"capabilities": [{"capability": c, "state": True}]},
+                          "migrate_set_capability %s on" % c)
 
-    migrate_command = "migrate -d tcp:%s:%s" % (target, port)
-    self._CallMonitorCommand(instance_name, migrate_command)
+    uri = "tcp:%s:%s" % (target, port)
+    self._CallMonitor(instance_name, "migrate", {"uri": uri},
+                      "migrate -d %s" % uri)
 
   def FinalizeMigrationSource(self, instance, success, _):
     """Finalize the instance migration on the source node.
@@ -2507,7 +2738,7 @@ class KVMHypervisor(hv_base.BaseHypervisor):
       # migration.
       _, _, alive = self._InstancePidAlive(instance.name)
       if alive:
-        self._CallMonitorCommand(instance.name, self._CONT_CMD)
+        self._CallMonitor(instance.name, self._CONT_CMD, None, self._CONT_CMD)
       else:
         self.CleanupInstance(instance.name)
 
@@ -2522,33 +2753,76 @@ class KVMHypervisor(hv_base.BaseHypervisor):
              progress info that can be retrieved from the hypervisor
 
     """
-    info_command = "info migrate"
-    for _ in range(self._MIGRATION_INFO_MAX_BAD_ANSWERS):
-      result = self._CallMonitorCommand(instance.name, info_command)
-      match = self._MIGRATION_STATUS_RE.search(result.stdout)
-      if not match:
-        if not result.stdout:
-          logging.info("KVM: empty 'info migrate' result")
-        else:
-          logging.warning("KVM: unknown 'info migrate' result: %s",
-                          result.stdout)
-      else:
-        status = match.group(1)
-        if status in constants.HV_KVM_MIGRATION_VALID_STATUSES:
-          migration_status = objects.MigrationStatus(status=status)
-          match = self._MIGRATION_PROGRESS_RE.search(result.stdout)
-          if match:
-            migration_status.transferred_ram = match.group("transferred")
-            migration_status.total_ram = match.group("total")
-
-          return migration_status
+    if self._HasQmpMonitor(instance.name):
+      get_status_fn = self._GetQmpMigrationStatus
+    else:
+      get_status_fn = self._GetHmpMigrationStatus
 
-        logging.warning("KVM: unknown migration status '%s'", status)
+    for _ in range(self._MIGRATION_INFO_MAX_BAD_ANSWERS):
+      migration_status = get_status_fn(instance.name)
+      if migration_status:
+        return migration_status
 
       time.sleep(self._MIGRATION_INFO_RETRY_DELAY)
 
     return objects.MigrationStatus(status=constants.HV_MIGRATION_FAILED)
 
+  def _GetQmpMigrationStatus(self, instance_name):
+    """Get the migration status using the query-migrate QMP command.
+
+    @rtype: L{objects.MigrationStatus} or None
+    @return: the migration status, or None if the answer was not usable
+
+    """
+    info = self._CallQmpCommand(instance_name, "query-migrate")
+    status = info.get("status", None)
+    if not status:
+      logging.info("KVM: empty 'query-migrate' result")
+      return None
+
+    if status not in constants.HV_KVM_MIGRATION_VALID_STATUSES:
+      logging.warning("KVM: unknown migration status '%s'", status)
+      return None
+
+    migration_status = objects.MigrationStatus(status=status)
+    ram = info.get("ram", None)
+    if ram:
+      # Report kbytes, like the human monitor does
+      migration_status.transferred_ram = ram["transferred"] / 1024
+      migration_status.total_ram = ram["total"] / 1024
+
+    return migration_status
+
+  def _GetHmpMigrationStatus(self, instance_name):
+    """Get the migration status using the "info migrate" monitor command.
+
+    @rtype: L{objects.MigrationStatus} or None
+    @return: the migration status, or None if the answer was not usable
+
+    """
+    result = self._CallMonitorCommand(instance_name, "info migrate")
+    match = self._MIGRATION_STATUS_RE.search(result.stdout)
+    if not match:
+      if not result.stdout:
+        logging.info("KVM: empty 'info migrate' result")
+      else:
+        logging.warning("KVM: unknown 'info migrate' result: %s",
+                        result.stdout)
+      return None
+
+    status = match.group(1)
+    if status not in constants.HV_KVM_MIGRATION_VALID_STATUSES:
+      logging.warning("KVM: unknown migration status '%s'", status)
+      return None
+
+    migration_status = objects.MigrationStatus(status=status)
+    match = self._MIGRATION_PROGRESS_RE.search(result.stdout)
+    if match:
+      migration_status.transferred_ram = match.group("transferred")
+      migration_status.total_ram = match.group("total")
+
+    return migration_status
+
   def BalloonInstanceMemory(self, instance, mem):
     """Balloon an instance memory to a certain value.
 
@@ -2558,7 +2832,9 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     @param mem: actual memory size to use for instance runtime
 
     """
-    self._CallMonitorCommand(instance.name, "balloon %d" % mem)
+    self._CallMonitor(instance.name, "balloon", {"value": mem * 1048576},
+                      "balloon %d" % mem)
+    self._InvalidateInstanceInfo(instance.name)
 
   def GetNodeInfo(self, hvparams=None):
     """Return information about the node.
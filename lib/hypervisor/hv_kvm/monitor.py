@@ -284,6 +284,9 @@ class QmpConnection(MonitorSocket):
     @raise errors.ProgrammerError: when there are data serialization errors
 
     """
+    if self._connected:
+      return
+
     super(QmpConnection, self).connect()
     # Check if we receive a correct greeting message from the server
     # (As per the QEMU Protocol Specification 0.1 - section 2.2)
@@ -371,6 +374,9 @@ class QmpConnection(MonitorSocket):
       raise errors.HypervisorError("Unable to receive data from KVM using the"
                                    " QMP protocol: %s" % err)
 
+    raise errors.HypervisorError("QMP connection closed by the instance before"
+                                 " a complete message was received")
+
   def _Send(self, message):
     """Encodes and sends a message to KVM using QMP.
 
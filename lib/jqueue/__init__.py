@@ -73,6 +73,10 @@ from ganeti.cmdlib import cluster
 #: Retrieves "id" attribute
 _GetIdAttr = operator.attrgetter("id")
 
+#: Minimum interval in seconds between synchronizing a job's log segment to
+#: disk
+_LOG_SEGMENT_SYNC_INTERVAL = 1.0
+
 
 class CancelJob(Exception):
   """Special exception to cancel a job.
@@ -90,12 +94,11 @@ def TimeStampNow():
   return utils.SplitTime(time.time())
 
 
-def _CallJqUpdate(runner, names, file_name, content):
-  """Updates job queue file after virtualizing filename.
+def _CallJqUpdateMany(runner, names, updates):
+  """Updates several job queue files.
 
   """
-  virt_file_name = vcluster.MakeVirtualPath(file_name)
-  return runner.call_jobqueue_update(names, virt_file_name, content)
+  return runner.call_jobqueue_update_many(names, updates)
 
 
 class _QueuedOpCode(object):
@@ -623,10 +626,23 @@ class _OpExecCallbacks(mcpu.OpExecCbBase):
     else:
       log_msgs = [log_msgs]
 
+    op_idx = self._job.ops.index(self._op)
+    entries = []
     for msg in log_msgs:
       self._job.log_serial += 1
-      self._op.log.append((self._job.log_serial, timestamp, log_type, msg))
-    self._queue.UpdateJobUnlocked(self._job, replicate=False)
+      entry = (self._job.log_serial, timestamp, log_type, msg)
+      self._op.log.append(entry)
+      entries.append((op_idx, entry))
+    self._WriteLogEntries(entries)
+
+  def _WriteLogEntries(self, entries):
+    """Stores new log entries of the job.
+
+    @type entries: list of tuples
+    @param entries: list of C{(opcode index, log entry)} tuples
+
+    """
+    self._queue.AppendJobLogUnlocked(self._job, entries)
 
   # TODO: Cleanup calling conventions, make them explicit
   def Feedback(self, *args):
@@ -672,6 +688,148 @@ class _OpExecCallbacks(mcpu.OpExecCbBase):
     return self._queue.SubmitManyJobs(jobs)
 
 
+class _FinalizedJobCallbacks(_OpExecCallbacks):
+  """Callbacks for logging to a job which has already been finalized.
+
+  Finalized jobs have no log segment, so the job file is rewritten for
+  every message. This is only used for the few messages about work left
+  running in the background by the job's opcodes.
+
+  """
+  def _WriteLogEntries(self, _):
+    self._queue.UpdateFinalizedJobUnlocked(self._job)
+
+
+class _JobLogSegment(object):
+  """Append-only storage for the log entries of a running job.
+
+  Instead of rewriting the whole job file for every log message, new log
+  entries are appended to the job's log segment, one JSON-encoded
+  C{(opcode index, log entry)} pair per line. The job file is written as
+  before whenever the job changes otherwise; it then contains all log
+  entries and the segment is truncated. Readers merge the entries with a
+  serial higher than any in the job file, see L{_ParseJobLogSegment}.
+
+  """
+  def __init__(self, path):
+    """Initializes this class.
+
+    @type path: string
+    @param path: the path of the segment file
+
+    """
+    self._path = path
+    self._fd = None
+    self._last_sync = None
+
+  def _Open(self):
+    """Opens the segment file, creating it if necessary.
+
+    """
+    if self._fd is None:
+      getents = runtime.GetEnts()
+      fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                   constants.JOB_QUEUE_FILES_PERMS)
+      try:
+        os.fchmod(fd, constants.JOB_QUEUE_FILES_PERMS)
+        os.fchown(fd, getents.masterd_uid, getents.daemons_gid)
+      except:
+        os.close(fd)
+        raise
+      self._fd = fd
+      self._last_sync = time.time()
+
+    return self._fd
+
+  def Append(self, entries):
+    """Appends log entries to the segment.
+
+    All entries are written at once; the data is synchronized to disk at
+    most every L{_LOG_SEGMENT_SYNC_INTERVAL} seconds.
+
+    @type entries: list of tuples
+    @param entries: list of C{(opcode index, log entry)} tuples
+
+    """
+    fd = self._Open()
+    data = "".join(serializer.DumpJson(i) for i in entries)
+    if isinstance(data, unicode):
+      data = data.encode()
+
+    offset = 0
+    while offset < len(data):
+      offset += os.write(fd, buffer(data, offset))
+
+    now = time.time()
+    if now - self._last_sync >= _LOG_SEGMENT_SYNC_INTERVAL:
+      os.fsync(fd)
+      self._last_sync = now
+
+  def Truncate(self):
+    """Removes all entries from the segment.
+
+    Must only be called after the job file containing the entries has been
+    written. The file itself is kept, so that watches on it remain valid.
+
+    """
+    os.ftruncate(self._Open(), 0)
+
+  def Close(self):
+    """Closes the segment file.
+
+    """
+    if self._fd is not None:
+      os.close(self._fd)
+      self._fd = None
+
+
+def _ParseJobLogSegment(data):
+  """Parses the contents of a job's log segment.
+
+  An incomplete last line, as left by a concurrent or interrupted append,
+  is ignored.
+
+  @type data: string
+  @param data: the contents of the segment file
+  @rtype: list of tuples
+  @return: list of C{(opcode index, log entry)} tuples
+
+  """
+  result = []
+
+  for line in data.split("\n")[:-1]:
+    try:
+      (op_idx, entry) = serializer.LoadJson(line)
+      (_, _, _, _) = entry
+    except (ValueError, TypeError), err:
+      logging.warning("Ignoring invalid job log entry %r: %s", line, err)
+      continue
+    result.append((op_idx, entry))
+
+  return result
+
+
+def _MergeJobLogSegment(job, entries):
+  """Adds the log entries of a segment to a job.
+
+  Only entries with a serial higher than any in the job are added, as the
+  others are already part of the job file.
+
+  @type job: L{_QueuedJob}
+  @param job: the job as read from its job file
+  @type entries: list of tuples
+  @param entries: list of C{(opcode index, log entry)} tuples, see
+    L{_ParseJobLogSegment}
+
+  """
+  serial = job.log_serial
+
+  for (op_idx, entry) in entries:
+    if entry[0] > serial and 0 <= op_idx < len(job.ops):
+      job.ops[op_idx].log.append(entry)
+      job.log_serial = max(job.log_serial, entry[0])
+
+
 def _EncodeOpError(err):
   """Encodes an error which occurred while processing an opcode.
 
@@ -773,14 +931,21 @@ class _JobProcessor(object):
    WAITDEP,
    FINISHED) = range(1, 4)
 
-  def __init__(self, queue, opexec_fn, job,
+  def __init__(self, queue, opexec_fn, job, finalize_fn=None,
                _timeout_strategy_factory=mcpu.LockAttemptTimeoutStrategy):
     """Initializes this class.
 
+    @type finalize_fn: callable or None
+    @param finalize_fn: function called with the L{_FinalizedJobCallbacks}
+        of the last processed opcode after the job has been finalized and
+        written, e.g. to log the results of work the opcodes left running
+        in the background
+
     """
     self.queue = queue
     self.opexec_fn = opexec_fn
     self.job = job
+    self.finalize_fn = finalize_fn
     self._timeout_strategy_factory = _timeout_strategy_factory
 
   @staticmethod
@@ -1125,14 +1290,20 @@ class _JobProcessor(object):
           # All opcodes have been run, finalize job
           job.Finalize()
 
-        # Write to disk. If the job status is final, this is the final write
-        # allowed. Once the file has been written, it can be archived anytime.
+        # Write to disk. Once the file of a finalized job has been written,
+        # it can be archived anytime.
         queue.UpdateJobUnlocked(job)
 
         assert not waitjob
 
         if finalize:
           logging.info("Finished job %s, status = %s", job.id, job.CalcStatus())
+
+          if self.finalize_fn:
+            # The job is reported as finished already; messages about work
+            # still running in the background are added to its log later
+            self.finalize_fn(_FinalizedJobCallbacks(queue, job, op))
+
           return self.FINISHED
 
       assert not waitjob or queue.depmgr.JobWaiting(job)
@@ -1255,6 +1426,8 @@ class JobQueue(object):
     """
     self.context = context
     self._memcache = weakref.WeakValueDictionary()
+    self._log_segments = {}
+    self._replicated_files = {}
     self._my_hostname = netutils.Hostname.GetSysName()
 
     # Get initial list of nodes
@@ -1339,9 +1512,100 @@ class JobQueue(object):
                     mode=constants.JOB_QUEUE_FILES_PERMS)
 
     if replicate:
-      names, addrs = self._GetNodeIp()
-      result = _CallJqUpdate(self._GetRpc(addrs), names, file_name, data)
-      self._CheckRpcResult(result, self._nodes, "Updating %s" % file_name)
+      self._ReplicateJobQueueFiles([(file_name, data)])
+
+  def _SendJobQueueUpdates(self, updates, failmsg):
+    """Sends job queue file updates to the nodes.
+
+    Nodes receiving the same updates are sent them in a single RPC call.
+
+    @type updates: dict
+    @param updates: node name as key, list of C{(file_name, base, content)}
+      updates as value, see L{backend.JobQueueUpdateMany}
+    @type failmsg: str
+    @param failmsg: the identifier to be used for logging
+    @rtype: dict
+    @return: node name as key, None if the call failed or the list of files
+      which need to be sent in full as value
+
+    """
+    groups = {}
+    for (name, node_updates) in updates.items():
+      key = tuple((file_name, base is None)
+                  for (file_name, base, _) in node_updates)
+      groups.setdefault(key, []).append(name)
+
+    result = {}
+    for names in groups.values():
+      addrs = [self._nodes[name] for name in names]
+      rpcres = _CallJqUpdateMany(self._GetRpc(addrs), names,
+                                 updates[names[0]])
+      self._CheckRpcResult(rpcres, names, failmsg)
+      for name in names:
+        if rpcres[name].fail_msg:
+          result[name] = None
+        else:
+          result[name] = rpcres[name].payload
+
+    return result
+
+  def _ReplicateJobQueueFiles(self, files):
+    """Replicates new versions of job queue files to all nodes.
+
+    The version of each file last replicated is kept, together with the
+    nodes known to have it. These nodes are only sent the changes against
+    it (see L{jstore.MakeFileDelta}); if a node has another version, e.g.
+    because the file has been written by another process in the meantime,
+    it reports so and is sent the full contents.
+
+    @type files: list of tuples
+    @param files: list of C{(file_name, data)}
+
+    """
+    (names, _) = self._GetNodeIp()
+    if not names:
+      return
+
+    updates = dict((name, []) for name in names)
+    full_updates = {}
+
+    for (file_name, data) in files:
+      virt_file_name = vcluster.MakeVirtualPath(file_name)
+      full = (virt_file_name, None, data)
+      full_updates[virt_file_name] = full
+
+      (old_data, synced) = self._replicated_files.get(file_name,
+                                                      (None, frozenset()))
+      delta = None
+      if old_data is not None and synced:
+        (base, replacement) = jstore.MakeFileDelta(old_data, data)
+        # Applying a large delta isn't worth the digest computation
+        if len(replacement) < len(data) / 2:
+          delta = (virt_file_name, base, replacement)
+
+      for name in names:
+        if delta is not None and name in synced:
+          updates[name].append(delta)
+        else:
+          updates[name].append(full)
+
+    failmsg = "Updating %s" % utils.CommaJoin(name for (name, _) in files)
+    result = self._SendJobQueueUpdates(updates, failmsg)
+
+    # Nodes which didn't have the expected version get the full contents
+    resync = dict((name, [full_updates[i] for i in outdated])
+                  for (name, outdated) in result.items() if outdated)
+    if resync:
+      logging.debug("Sending full job queue files to nodes %s",
+                    utils.CommaJoin(resync.keys()))
+      result.update(self._SendJobQueueUpdates(resync, failmsg))
+
+    for (file_name, data) in files:
+      virt_file_name = vcluster.MakeVirtualPath(file_name)
+      synced = frozenset(name for (name, outdated) in result.items()
+                         if outdated is not None and
+                         virt_file_name not in outdated)
+      self._replicated_files[file_name] = (data, synced)
 
   def _RenameFilesUnlocked(self, rename):
     """Renames a file locally and then replicate the change.
@@ -1374,6 +1638,37 @@ class JobQueue(object):
     """
     return utils.PathJoin(pathutils.QUEUE_DIR, "job-%s" % job_id)
 
+  @staticmethod
+  def _GetJobLogPath(job_id):
+    """Returns the log segment file for a given job id.
+
+    @type job_id: str
+    @param job_id: the job identifier
+    @rtype: str
+    @return: the path to the job's log segment
+
+    """
+    return JobQueue._GetJobPath(job_id) + constants.JOB_LOG_SEGMENT_SUFFIX
+
+  @staticmethod
+  def _ReadJobLogSegment(job_id):
+    """Reads the log entries appended to a job since its last update.
+
+    @type job_id: int
+    @param job_id: job identifier
+    @rtype: list of tuples
+    @return: list of C{(opcode index, log entry)} tuples
+
+    """
+    try:
+      data = utils.ReadFile(JobQueue._GetJobLogPath(job_id))
+    except EnvironmentError, err:
+      if err.errno != errno.ENOENT:
+        raise
+      return []
+
+    return _ParseJobLogSegment(data)
+
   @staticmethod
   def _GetArchivedJobPath(job_id):
     """Returns the archived job file for a give job id.
@@ -1497,6 +1792,11 @@ class JobQueue(object):
     raw_data = None
     archived = None
 
+    # The log segment must be read before the job file; otherwise entries
+    # written to the job file and removed from the segment in between would
+    # be missed
+    log_entries = JobQueue._ReadJobLogSegment(job_id)
+
     for (fn, archived) in path_functions:
       filepath = fn(job_id)
       logging.debug("Loading job from %s", filepath)
@@ -1518,6 +1818,7 @@ class JobQueue(object):
     try:
       data = serializer.LoadJson(raw_data)
       job = _QueuedJob.Restore(queue, data, writable, archived)
+      _MergeJobLogSegment(job, log_entries)
     except Exception, err: # pylint: disable=W0703
       raise errors.JobFileCorrupted(err)
 
@@ -1629,6 +1930,70 @@ class JobQueue(object):
     logging.debug("Writing job %s to %s", job.id, filename)
     self._UpdateJobQueueFile(filename, data, replicate)
 
+    # The job file now contains all log entries
+    if job.CalcStatus() in constants.JOBS_FINALIZED:
+      segment = self._log_segments.pop(job.id, None)
+      if segment is not None:
+        segment.Close()
+      utils.RemoveFile(self._GetJobLogPath(job.id))
+      self._replicated_files.pop(filename, None)
+    else:
+      self._GetJobLogSegment(job).Truncate()
+
+  def UpdateFinalizedJobUnlocked(self, job):
+    """Writes the log entries added to a finalized job.
+
+    As a finalized job can be archived at any time, the job file is only
+    written if it's still in the queue directory.
+
+    @type job: L{_QueuedJob}
+    @param job: the finalized job
+
+    """
+    assert job.CalcStatus() in constants.JOBS_FINALIZED
+
+    if not os.path.exists(self._GetJobPath(job.id)):
+      logging.warning("Job %s has been archived, not adding log entries",
+                      job.id)
+      return
+
+    self.UpdateJobUnlocked(job)
+
+  def _GetJobLogSegment(self, job):
+    """Returns the log segment of a job, opening it if necessary.
+
+    @type job: L{_QueuedJob}
+    @param job: the job
+    @rtype: L{_JobLogSegment}
+
+    """
+    try:
+      return self._log_segments[job.id]
+    except KeyError:
+      segment = _JobLogSegment(self._GetJobLogPath(job.id))
+      self._log_segments[job.id] = segment
+      return segment
+
+  def AppendJobLogUnlocked(self, job, entries):
+    """Appends new log entries of a job to its log segment.
+
+    This avoids rewriting the whole job file for every log message; the
+    entries become part of the job file with its next update. As with
+    L{UpdateJobUnlocked} with C{replicate=False}, the entries are not
+    replicated to remote nodes on their own.
+
+    @type job: L{_QueuedJob}
+    @param job: the changed job
+    @type entries: list of tuples
+    @param entries: list of C{(opcode index, log entry)} tuples
+
+    """
+    assert job.writable, "Can't update read-only job"
+    assert not job.archived, "Can't update archived job"
+
+    logging.debug("Appending %s log entries to job %s", len(entries), job.id)
+    self._GetJobLogSegment(job).Append(entries)
+
   def HasJobBeenFinalized(self, job_id):
     """Checks if a job has been finalized.
 
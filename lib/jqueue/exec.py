@@ -141,8 +141,10 @@ def main():
         if hasattr(job.ops[i].input, "osparams_secret"):
           job.ops[i].input.osparams_secret = secret_params[i]
 
-    execfun = mcpu.Processor(context, job_id, job_id).ExecOpCode
-    proc = _JobProcessor(context.jobqueue, execfun, job)
+    processor = mcpu.Processor(context, job_id, job_id)
+    execfun = processor.ExecOpCode
+    finalizefun = processor.WaitForAsyncHooks
+    proc = _JobProcessor(context.jobqueue, execfun, job, finalizefun)
     result = _JobProcessor.DEFER
     while result != _JobProcessor.FINISHED:
       result = proc()
@@ -155,7 +157,7 @@ def main():
         logging.debug("Got cancel request, cancelling job %d", job_id)
         r = context.jobqueue.CancelJob(job_id)
         job = JobQueue.SafeLoadJobFromDisk(context.jobqueue, job_id, False)
-        proc = _JobProcessor(context.jobqueue, execfun, job)
+        proc = _JobProcessor(context.jobqueue, execfun, job, finalizefun)
         logging.debug("CancelJob result for job %d: %s", job_id, r)
         cancel[0] = False
       if prio_change[0]:
@@ -167,7 +169,7 @@ def main():
           logging.debug("Changing priority of job %d to %d", job_id, new_prio)
           r = context.jobqueue.ChangeJobPriority(job_id, new_prio)
           job = JobQueue.SafeLoadJobFromDisk(context.jobqueue, job_id, False)
-          proc = _JobProcessor(context.jobqueue, execfun, job)
+          proc = _JobProcessor(context.jobqueue, execfun, job, finalizefun)
           logging.debug("Result of changing priority of %d to %d: %s", job_id,
                         new_prio, r)
         except Exception: # pylint: disable=W0703
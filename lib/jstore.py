@@ -33,6 +33,7 @@
 import errno
 import os
 
+from ganeti import compat
 from ganeti import constants
 from ganeti import errors
 from ganeti import runtime
@@ -233,3 +234,73 @@ def ParseJobId(job_id):
     return int(job_id)
   except (ValueError, TypeError):
     raise errors.ParameterError("Invalid job ID '%s'" % job_id)
+
+
+def _CommonPrefixLength(a, b):
+  """Returns the length of the common prefix of two strings.
+
+  Comparing slices in a binary search is much faster than comparing the
+  strings character by character in Python.
+
+  """
+  (low, high) = (0, min(len(a), len(b)))
+  while low < high:
+    mid = (low + high + 1) // 2
+    if a[:mid] == b[:mid]:
+      low = mid
+    else:
+      high = mid - 1
+  return low
+
+
+def GetFileDigest(data):
+  """Returns the digest identifying a version of a job queue file.
+
+  @type data: str
+  @param data: the file contents
+
+  """
+  return compat.sha1_hash(data).hexdigest()
+
+
+def MakeFileDelta(old, new):
+  """Computes the changes between two versions of a job queue file.
+
+  The changes are described by the single range in which the versions
+  differ, as a job file update usually only touches one opcode.
+
+  @type old: str
+  @param old: the old file contents
+  @type new: str
+  @param new: the new file contents
+  @rtype: tuple
+  @return: C{((digest, prefix length, suffix length), replacement)}; the
+    new contents are the first C{prefix length} and the last
+    C{suffix length} characters of the old contents, with C{replacement}
+    in between
+
+  """
+  prefix = _CommonPrefixLength(old, new)
+  suffix = _CommonPrefixLength(old[prefix:][::-1], new[prefix:][::-1])
+  return ((GetFileDigest(old), prefix, suffix),
+          new[prefix:len(new) - suffix])
+
+
+def ApplyFileDelta(old, base, replacement):
+  """Applies changes computed by L{MakeFileDelta}.
+
+  @type old: str
+  @param old: the current file contents
+  @type base: tuple
+  @param base: C{(digest, prefix length, suffix length)}
+  @type replacement: str
+  @param replacement: the changed part of the file
+  @rtype: str or None
+  @return: the new file contents, or None if the current contents are not
+    the version the changes were computed against
+
+  """
+  (digest, prefix, suffix) = base
+  if prefix + suffix > len(old) or GetFileDigest(old) != digest:
+    return None
+  return old[:prefix] + replacement + old[len(old) - suffix:]
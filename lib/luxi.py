@@ -55,6 +55,7 @@ REQ_SUBMIT_JOB_TO_DRAINED_QUEUE = constants.LUXI_REQ_SUBMIT_JOB_TO_DRAINED_QUEUE
 REQ_SUBMIT_MANY_JOBS = constants.LUXI_REQ_SUBMIT_MANY_JOBS
 REQ_PICKUP_JOB = constants.LUXI_REQ_PICKUP_JOB
 REQ_WAIT_FOR_JOB_CHANGE = constants.LUXI_REQ_WAIT_FOR_JOB_CHANGE
+REQ_WAIT_FOR_JOBS_CHANGE = constants.LUXI_REQ_WAIT_FOR_JOBS_CHANGE
 REQ_CANCEL_JOB = constants.LUXI_REQ_CANCEL_JOB
 REQ_ARCHIVE_JOB = constants.LUXI_REQ_ARCHIVE_JOB
 REQ_CHANGE_JOB_PRIORITY = constants.LUXI_REQ_CHANGE_JOB_PRIORITY
@@ -189,6 +190,27 @@ class Client(cl.AbstractClient):
         break
     return result
 
+  def WaitForJobsChangeOnce(self, jobs, timeout=WFJC_TIMEOUT):
+    """Waits for the status of any of a number of jobs to change.
+
+    @type jobs: list of tuples
+    @param jobs: Job IDs with the previously received status of each job,
+                 C{None} if not yet known
+    @type timeout: int/float
+    @param timeout: Timeout in seconds (values larger than L{WFJC_TIMEOUT} will
+                    be capped to that value)
+    @rtype: list of pairs
+    @return: Job ID and current status of all jobs whose status differs from
+             the given one, C{None} for jobs which don't exist; an empty list
+             if no job changed before the timeout
+
+    """
+    assert timeout >= 0, "Timeout can not be negative"
+    jobs = [(Client._PrepareJobId(REQ_WAIT_FOR_JOBS_CHANGE, job_id), status)
+            for (job_id, status) in jobs]
+    return self.CallMethod(REQ_WAIT_FOR_JOBS_CHANGE,
+                           (jobs, min(WFJC_TIMEOUT, timeout)))
+
   def Query(self, what, fields, qfilter):
     """Query for resources/items.
 
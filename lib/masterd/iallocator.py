@@ -30,7 +30,9 @@
 
 """Module implementing the iallocator code."""
 
+import errno
 import logging
+import time
 
 from ganeti import compat
 from ganeti import constants
@@ -38,6 +40,7 @@ from ganeti import errors
 from ganeti import ht
 from ganeti import outils
 from ganeti import opcodes
+from ganeti import pathutils
 from ganeti import serializer
 from ganeti import utils
 
@@ -71,6 +74,54 @@ _INST_NAME = ("name", ht.TNonEmptyString)
 _INST_UUID = ("inst_uuid", ht.TNonEmptyString)
 
 
+def _LoadNodeData(key, now=None, cache_file=pathutils.IALLOCATOR_NODE_DATA_FILE):
+  """Loads the live node data kept by an earlier allocator run.
+
+  @type key: string
+  @param key: the key describing the requested data
+  @type now: float
+  @param now: the current time
+  @return: the cached data (see L{IAllocator._GetNodeData}), or None if the
+      data was requested with a different key or is older than
+      L{constants.IALLOCATOR_NODE_DATA_TTL} seconds
+
+  """
+  try:
+    (cached_key, timestamp, data) = \
+      serializer.LoadJson(utils.ReadFile(cache_file))
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      logging.warning("Can't read allocator node data %s: %s", cache_file, err)
+    return None
+  except (TypeError, ValueError), err:
+    logging.warning("Can't parse allocator node data %s: %s", cache_file, err)
+    return None
+
+  if now is None:
+    now = time.time()
+
+  if (cached_key != key or
+      not 0 <= now - timestamp < constants.IALLOCATOR_NODE_DATA_TTL):
+    return None
+
+  return data
+
+
+def _SaveNodeData(key, data, now=None,
+                  cache_file=pathutils.IALLOCATOR_NODE_DATA_FILE):
+  """Keeps live node data for later allocator runs.
+
+  """
+  if now is None:
+    now = time.time()
+
+  try:
+    utils.WriteFile(cache_file, data=serializer.DumpJson((key, now, data)),
+                    mode=constants.SECURE_FILE_MODE)
+  except EnvironmentError, err:
+    logging.warning("Can't write allocator node data %s: %s", cache_file, err)
+
+
 class _AutoReqParam(outils.AutoSlots):
   """Meta class for request definitions.
 
@@ -459,27 +510,90 @@ class IAllocator(object):
 
     self._BuildInputData(req)
 
-  def _ComputeClusterDataNodeInfo(self, disk_templates, node_list,
-                                  cluster_info, hypervisor_name):
-    """Prepare and execute node info call.
+  def _GetNodeInfoArgs(self, disk_templates, node_list, cluster_info,
+                       hypervisor_name):
+    """Computes the storage units and hypervisor specs for node info calls.
+
+    @rtype: tuple; (dict, list)
+    @return: the storage units by node UUID and the hypervisor specifications
 
+    """
+    storage_units_raw = utils.storage.GetStorageUnits(self.cfg, disk_templates)
+    storage_units = rpc.PrepareStorageUnitsForNodes(self.cfg, storage_units_raw,
+                                                    node_list)
+    hvspecs = [(hypervisor_name, cluster_info.hvparams[hypervisor_name])]
+    return (storage_units, hvspecs)
+
+  def _GetNodeData(self, cfg, disk_templates, node_cfg, node_list,
+                   cluster_info, hypervisor_name):
+    """Gets the live data of the online nodes.
+
+    As every allocation needs the data of all nodes, it's kept for
+    L{constants.IALLOCATOR_NODE_DATA_TTL} seconds and reused by allocator
+    runs asking for the same data, e.g. when many instances are created one
+    after another. Together with the data, the sizes and nodes of all disks
+    are kept, so that later runs can account for the disks created, grown or
+    moved in the meantime.
+
+    @type cfg: L{config.ConfigWriter}
+    @param cfg: the (detached) configuration
     @type disk_templates: list of string
     @param disk_templates: the disk templates of the instances to be allocated
+    @type node_cfg: dict
+    @param node_cfg: node UUIDs as keys, L{objects.Node} as values
     @type node_list: list of strings
-    @param node_list: list of nodes' UUIDs
+    @param node_list: the UUIDs of the nodes to get the data of
     @type cluster_info: L{objects.Cluster}
     @param cluster_info: the cluster's information from the config
     @type hypervisor_name: string
     @param hypervisor_name: the hypervisor name
-    @rtype: same as the result of the node info RPC call
-    @return: the result of the node info RPC call
+    @rtype: tuple; (dict, dict, dict)
+    @return: the payloads of the node info and instance info calls of the
+        online nodes by node UUID, and the disk sizes and nodes by disk UUID
+        at the time the data was retrieved
 
     """
-    storage_units_raw = utils.storage.GetStorageUnits(self.cfg, disk_templates)
-    storage_units = rpc.PrepareStorageUnitsForNodes(self.cfg, storage_units_raw,
-                                                    node_list)
-    hvspecs = [(hypervisor_name, cluster_info.hvparams[hypervisor_name])]
-    return self.rpc.call_node_info(node_list, storage_units, hvspecs)
+    (storage_units, hvspecs) = self._GetNodeInfoArgs(disk_templates, node_list,
+                                                     cluster_info,
+                                                     hypervisor_name)
+    online_nodes = [node_uuid for node_uuid in node_list
+                    if not node_cfg[node_uuid].offline]
+    key = compat.sha1_hash(serializer.DumpJson([
+      online_nodes,
+      storage_units,
+      hvspecs,
+      [(hv_name, cluster_info.hvparams[hv_name])
+       for hv_name in cluster_info.enabled_hypervisors],
+      ])).hexdigest()
+
+    data = _LoadNodeData(key)
+    if data is not None:
+      logging.debug("Using allocator node data kept by an earlier run")
+      return tuple(data)
+
+    node_data = self.rpc.call_node_info(node_list, storage_units, hvspecs)
+    node_iinfo = \
+      self.rpc.call_all_instances_info(node_list,
+                                       cluster_info.enabled_hypervisors,
+                                       cluster_info.hvparams)
+
+    node_info = {}
+    instances_info = {}
+    for node_uuid in online_nodes:
+      ninfo = node_cfg[node_uuid]
+      nresult = node_data[node_uuid]
+      nresult.Raise("Can't get data for node %s" % ninfo.name)
+      node_iinfo[node_uuid].Raise("Can't get node instance info from node %s" %
+                                  ninfo.name)
+      node_info[node_uuid] = nresult.payload
+      instances_info[node_uuid] = node_iinfo[node_uuid].payload
+
+    known_disks = dict((disk_uuid, (disk.size, disk.nodes))
+                       for (disk_uuid, disk) in cfg.GetAllDisksInfo().items())
+
+    _SaveNodeData(key, (node_info, instances_info, known_disks))
+
+    return (node_info, instances_info, known_disks)
 
   def _ComputeClusterData(self, disk_template=None):
     """Compute the generic allocator input data.
@@ -510,25 +624,27 @@ class IAllocator(object):
       hypervisor_name = self.req.hypervisor
     elif isinstance(self.req, IAReqRelocate):
       hypervisor_name = iinfo[self.req.inst_uuid].hypervisor
+    elif (isinstance(self.req, IAReqMultiInstanceAlloc) and
+          len(set(inst.hypervisor for inst in self.req.instances)) == 1):
+      hypervisor_name = self.req.instances[0].hypervisor
     else:
       hypervisor_name = cluster_info.primary_hypervisor
 
     if not disk_template:
       disk_template = cluster_info.enabled_disk_templates[0]
 
-    node_data = self._ComputeClusterDataNodeInfo([disk_template], node_list,
-                                                 cluster_info, hypervisor_name)
-
-    node_iinfo = \
-      self.rpc.call_all_instances_info(node_list,
-                                       cluster_info.enabled_hypervisors,
-                                       cluster_info.hvparams)
+    (node_info, instances_info, known_disks) = \
+      self._GetNodeData(cfg, [disk_template], ninfo, node_list, cluster_info,
+                        hypervisor_name)
+    new_disk_usage = \
+      self._ComputeNewDiskUsage(cfg.GetAllDisksInfo().values(), known_disks)
 
     data["nodegroups"] = self._ComputeNodeGroupData(cluster_info, ginfo)
 
     config_ndata = self._ComputeBasicNodeData(cfg, ninfo)
     data["nodes"] = self._ComputeDynamicNodeData(
-        ninfo, node_data, node_iinfo, i_list, config_ndata, disk_template)
+        ninfo, node_info, instances_info, i_list, config_ndata, disk_template,
+        new_disk_usage)
     assert len(data["nodes"]) == len(ninfo), \
         "Incomplete node data computed"
 
@@ -536,6 +652,55 @@ class IAllocator(object):
 
     self.in_data = data
 
+  @staticmethod
+  def _ComputeNewDiskUsage(disks, known_disks):
+    """Computes the disk space used since the node data was retrieved.
+
+    On nodes a disk was already on, only its growth is accounted for; on
+    nodes it was moved to, its whole size is.
+
+    @type disks: list of L{objects.Disk}
+    @param disks: all disks of the cluster
+    @type known_disks: dict
+    @param known_disks: disk UUIDs as keys, the sizes and node UUIDs of the
+        disks at the time the node data was retrieved as values
+    @rtype: dict
+    @return: node UUIDs as keys, dictionaries mapping storage types to the
+        disk space and spindles used since then as values
+
+    """
+    usage = {}
+    for disk in disks:
+      storage_type = constants.MAP_DISK_TEMPLATE_STORAGE_TYPE.get(disk.dev_type)
+      if storage_type is None:
+        continue
+
+      if disk.uuid in known_disks:
+        (known_size, known_nodes) = known_disks[disk.uuid]
+        grown_size = max(0, disk.size - known_size)
+      else:
+        known_nodes = []
+        grown_size = 0
+
+      for node_uuid in disk.nodes:
+        if node_uuid in known_nodes:
+          (size, spindles) = (grown_size, 0)
+        else:
+          size = gmi.ComputeDiskSize([{
+            constants.IDISK_TYPE: disk.dev_type,
+            constants.IDISK_SIZE: disk.size,
+            }])
+          spindles = disk.spindles or 0
+
+        if not (size or spindles):
+          continue
+
+        node_usage = usage.setdefault(node_uuid, {})
+        (used_size, used_spindles) = node_usage.get(storage_type, (0, 0))
+        node_usage[storage_type] = (used_size + size, used_spindles + spindles)
+
+    return usage
+
   @staticmethod
   def _ComputeNodeGroupData(cluster, ginfo):
     """Compute node groups data.
@@ -690,6 +855,10 @@ class IAllocator(object):
                              input_mem_free):
     """Compute memory used by primary instances.
 
+    @type node_instances_info: dict
+    @param node_instances_info: node UUIDs as keys, the instance info
+        payloads of the nodes as values
+
     @rtype: tuple (int, int, int)
     @returns: A tuple of three integers: 1. the sum of memory used by primary
       instances on the node (including the ones that are currently down), 2.
@@ -703,11 +872,11 @@ class IAllocator(object):
     for iinfo, beinfo in instance_list:
       if iinfo.primary_node == node_uuid:
         i_p_mem += beinfo[constants.BE_MAXMEM]
-        if iinfo.name not in node_instances_info[node_uuid].payload:
+        if iinfo.name not in node_instances_info[node_uuid]:
           i_used_mem = 0
         else:
           i_used_mem = int(node_instances_info[node_uuid]
-                           .payload[iinfo.name]["memory"])
+                           [iinfo.name]["memory"])
         i_mem_diff = beinfo[constants.BE_MAXMEM] - i_used_mem
         if iinfo.admin_state == constants.ADMINST_UP \
             and not iinfo.forthcoming:
@@ -715,26 +884,31 @@ class IAllocator(object):
           i_p_up_mem += beinfo[constants.BE_MAXMEM]
     return (i_p_mem, i_p_up_mem, mem_free)
 
-  def _ComputeDynamicNodeData(self, node_cfg, node_data, node_iinfo, i_list,
-                              node_results, disk_template):
+  def _ComputeDynamicNodeData(self, node_cfg, node_info, node_iinfo, i_list,
+                              node_results, disk_template, new_disk_usage):
     """Compute global node data.
 
+    @type node_info: dict
+    @param node_info: node UUIDs as keys, node info payloads as values
+    @type node_iinfo: dict
+    @param node_iinfo: node UUIDs as keys, instance info payloads as values
     @param node_results: the basic node structures as filled from the config
+    @type new_disk_usage: dict
+    @param new_disk_usage: disk usage not yet reflected in C{node_info}, see
+        L{_ComputeNewDiskUsage}
 
     """
     #TODO(dynmem): compute the right data on MAX and MIN memory
     # make a copy of the current dict
     node_results = dict(node_results)
-    for nuuid, nresult in node_data.items():
+    storage_type = constants.MAP_DISK_TEMPLATE_STORAGE_TYPE[disk_template]
+    for nuuid, payload in node_info.items():
       ninfo = node_cfg[nuuid]
       assert ninfo.name in node_results, "Missing basic data for node %s" % \
                                          ninfo.name
 
       if not ninfo.offline:
-        nresult.Raise("Can't get data for node %s" % ninfo.name)
-        node_iinfo[nuuid].Raise("Can't get node instance info from node %s" %
-                                ninfo.name)
-        (_, space_info, (hv_info, )) = nresult.payload
+        (_, space_info, (hv_info, )) = payload
 
         mem_free = self._GetAttributeFromHypervisorNodeData(hv_info, ninfo.name,
                                                             "memory_free")
@@ -745,6 +919,11 @@ class IAllocator(object):
             self._ComputeStorageDataFromSpaceInfoByTemplate(
                 space_info, ninfo.name, disk_template)
 
+        (new_disk, new_spindles) = \
+          new_disk_usage.get(nuuid, {}).get(storage_type, (0, 0))
+        free_disk = max(0, free_disk - new_disk)
+        free_spindles = max(0, free_spindles - new_spindles)
+
         # compute memory used by instances
         pnr_dyn = {
           "total_memory": self._GetAttributeFromHypervisorNodeData(
@@ -824,6 +1003,12 @@ class IAllocator(object):
       disk_template = request["disk_template"]
     elif isinstance(req, IAReqRelocate):
       disk_template = self.cfg.GetInstanceDiskTemplate(self.req.inst_uuid)
+    elif isinstance(req, IAReqMultiInstanceAlloc):
+      # All allocations share the node data, so it's computed for their disk
+      # template if they agree on it
+      disk_templates = set(inst.disk_template for inst in req.instances)
+      if len(disk_templates) == 1:
+        (disk_template, ) = disk_templates
     self._ComputeClusterData(disk_template=disk_template)
 
     request["type"] = req.MODE
@@ -1003,8 +1003,8 @@ def _GetInstDiskMagic(base, instance_name, index):
   @param base: Random seed value (can be the same for all disks of a transfer)
   @type instance_name: string
   @param instance_name: Name of instance
-  @type index: number
-  @param index: Disk index
+  @type index: number or string
+  @param index: Disk index, or disk and part index for split transfers
 
   """
   h = compat.sha1_hash()
@@ -1015,8 +1015,62 @@ def _GetInstDiskMagic(base, instance_name, index):
   return h.hexdigest()
 
 
+def _SplitDiskTransfer(transfer, streams):
+  """Splits a disk transfer into parts which can be transferred in parallel.
+
+  Transfers between raw disks and files are split, each part transferring a
+  range of the disk. Transfers using the import/export scripts of an OS
+  can't be split. The finished function of the transfer is called once all
+  parts have finished.
+
+  @type transfer: L{DiskTransfer}
+  @param transfer: the transfer to split
+  @type streams: int
+  @param streams: the maximum number of parts
+  @rtype: list of L{DiskTransfer}
+
+  """
+  splittable = frozenset([constants.IEIO_RAW_DISK, constants.IEIO_FILE])
+  if not (streams > 1 and
+          transfer.src_io in splittable and
+          transfer.dest_io in splittable):
+    return [transfer]
+
+  # Disk sizes are in MiB, which is also the smallest part
+  if transfer.src_io == constants.IEIO_RAW_DISK:
+    size = transfer.src_ioargs[0].size
+  elif transfer.dest_io == constants.IEIO_RAW_DISK:
+    size = transfer.dest_ioargs[0].size
+  else:
+    return [transfer]
+  part_size = (size + streams - 1) // streams
+  if part_size < 1:
+    return [transfer]
+
+  ranges = [(offset, min(part_size, size - offset))
+            for offset in range(0, size, part_size)]
+
+  if transfer.finished_fn:
+    pending = [len(ranges)]
+
+    def _PartFinished():
+      pending[0] -= 1
+      if not pending[0]:
+        transfer.finished_fn()
+    finished_fn = _PartFinished
+  else:
+    finished_fn = None
+
+  return [DiskTransfer("%s [%d/%d]" % (transfer.name, idx + 1, len(ranges)),
+                       transfer.src_io, tuple(transfer.src_ioargs) + (rng, ),
+                       transfer.dest_io, tuple(transfer.dest_ioargs) + (rng, ),
+                       finished_fn)
+          for (idx, rng) in enumerate(ranges)]
+
+
 def TransferInstanceData(lu, feedback_fn, src_node_uuid, dest_node_uuid,
-                         dest_ip, compress, instance, all_transfers):
+                         dest_ip, compress, instance, all_transfers,
+                         streams=1):
   """Transfers an instance's data from one node to another.
 
   @param lu: Logical unit instance
@@ -1033,6 +1087,9 @@ def TransferInstanceData(lu, feedback_fn, src_node_uuid, dest_node_uuid,
   @param instance: Instance object
   @type all_transfers: list of L{DiskTransfer} instances
   @param all_transfers: List of all disk transfers to be made
+  @type streams: int
+  @param streams: Number of parallel streams used for each raw disk transfer,
+                  see L{_SplitDiskTransfer}
   @rtype: list
   @return: List with a boolean (True=successful, False=failed) for success for
            each transfer
@@ -1062,22 +1119,34 @@ def TransferInstanceData(lu, feedback_fn, src_node_uuid, dest_node_uuid,
         feedback_fn("Exporting %s from %s to %s" %
                     (transfer.name, src_node_name, dest_node_name))
 
-        magic = _GetInstDiskMagic(base_magic, instance.name, idx)
-        opts = objects.ImportExportOptions(key_name=None, ca_pem=None,
-                                           compress=compress, magic=magic)
+        parts = _SplitDiskTransfer(transfer, streams)
+        dtps = []
+
+        for (part_idx, part) in enumerate(parts):
+          if len(parts) == 1:
+            magic = _GetInstDiskMagic(base_magic, instance.name, idx)
+            component = "disk%d" % idx
+          else:
+            magic = _GetInstDiskMagic(base_magic, instance.name,
+                                      "%d.%d" % (idx, part_idx))
+            component = "disk%d.%d" % (idx, part_idx)
+
+          opts = objects.ImportExportOptions(key_name=None, ca_pem=None,
+                                             compress=compress, magic=magic)
 
-        dtp = _DiskTransferPrivate(transfer, True, opts)
+          dtp = _DiskTransferPrivate(part, True, opts)
 
-        di = DiskImport(lu, dest_node_uuid, opts, instance, "disk%d" % idx,
-                        transfer.dest_io, transfer.dest_ioargs,
-                        timeouts, dest_cbs, private=dtp)
-        ieloop.Add(di)
+          di = DiskImport(lu, dest_node_uuid, opts, instance, component,
+                          part.dest_io, part.dest_ioargs,
+                          timeouts, dest_cbs, private=dtp)
+          ieloop.Add(di)
 
-        dtp.dest_import = di
+          dtp.dest_import = di
+          dtps.append(dtp)
       else:
-        dtp = _DiskTransferPrivate(None, False, None)
+        dtps = [_DiskTransferPrivate(None, False, None)]
 
-      all_dtp.append(dtp)
+      all_dtp.append(dtps)
 
     ieloop.Run()
   finally:
@@ -1088,10 +1157,11 @@ def TransferInstanceData(lu, feedback_fn, src_node_uuid, dest_node_uuid,
                       dtp.src_export.success is not None) and
                      (dtp.dest_import is None or
                       dtp.dest_import.success is not None)
-                     for dtp in all_dtp), \
+                     for dtps in all_dtp for dtp in dtps), \
          "Not all imports/exports are finalized"
 
-  return [bool(dtp.success) for dtp in all_dtp]
+  # A disk is only transferred successfully if all its parts were
+  return [compat.all(bool(dtp.success) for dtp in dtps) for dtps in all_dtp]
 
 
 class _RemoteExportCb(ImportExportCbBase):
@@ -1286,13 +1356,16 @@ class ExportInstanceHelper(object):
     else:
       return "disk/%d" % idx
 
-  def LocalExport(self, dest_node, compress):
+  def LocalExport(self, dest_node, compress, streams=1):
     """Intra-cluster instance export.
 
     @type dest_node: L{objects.Node}
     @param dest_node: Destination node
     @type compress: string
     @param compress: Compression tool to use
+    @type streams: int
+    @param streams: Number of parallel streams used for each disk, see
+                    L{TransferInstanceData}
 
     """
     disks_to_transfer = self._GetDisksToTransfer()
@@ -1325,7 +1398,7 @@ class ExportInstanceHelper(object):
                                     src_node_uuid, dest_node.uuid,
                                     dest_node.secondary_ip,
                                     compress,
-                                    instance, transfers)
+                                    instance, transfers, streams=streams)
 
     assert len(dresults) == len(instance.disks)
 
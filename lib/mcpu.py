@@ -40,6 +40,7 @@ are two kinds of classes defined:
 import sys
 import logging
 import random
+import threading
 import time
 import itertools
 import traceback
@@ -48,6 +49,7 @@ from ganeti import opcodes
 from ganeti import opcodes_base
 from ganeti import constants
 from ganeti import errors
+from ganeti import compat
 from ganeti import hooksmaster
 from ganeti import cmdlib
 from ganeti import locking
@@ -305,6 +307,7 @@ class Processor(object):
     self.rpc = context.GetRpc(self.cfg)
     self.hmclass = hooksmaster.HooksMaster
     self._hm = None
+    self._async_hooks = []
     self._enable_locks = enable_locks
     self.wconfd = wconfd # Indirection to allow testing
     self._wconfdcontext = context.GetWConfdContext(ec_id)
@@ -483,7 +486,8 @@ class Processor(object):
     lu.cfg.OutDate()
     lu.CheckPrereq()
 
-    self._hm = self.BuildHooksManager(lu)
+    async_fn = compat.partial(self._RunHooksAsync, lu.rpc)
+    self._hm = self.BuildHooksManager(lu, async_fn=async_fn)
     try:
       # Run hooks twice: first for the global hooks, then for the usual hooks.
       self._hm.RunPhase(constants.HOOKS_PHASE_PRE, is_global=True)
@@ -526,9 +530,60 @@ class Processor(object):
 
     return result
 
-  def BuildHooksManager(self, lu):
+  def BuildHooksManager(self, lu, async_fn=None):
     return self.hmclass.BuildFromLu(lu.rpc.call_hooks_runner, lu,
-                                    self.GetECId())
+                                    self.GetECId(), async_fn=async_fn)
+
+  def _RunHooksAsync(self, rpc_runner, node_uuids, run_fn, process_fn):
+    """Runs hooks in the background.
+
+    The nodes are resolved before starting the background thread, which
+    therefore doesn't use the configuration, as L{config.ConfigWriter} can't
+    be used by two threads at once. The results are passed to C{process_fn}
+    by L{WaitForAsyncHooks}.
+
+    """
+    execution_fn = rpc_runner.GetDetachedRunner(node_uuids).call_hooks_runner
+    result = []
+
+    def _Run():
+      try:
+        result.append((True, run_fn(execution_fn=execution_fn)))
+      except Exception, err: # pylint: disable=W0703
+        logging.exception("Running asynchronous hooks failed")
+        result.append((False, err))
+
+    thread = threading.Thread(target=_Run, name="AsyncHooks")
+    thread.setDaemon(True)
+    thread.start()
+    self._async_hooks.append((thread, result, process_fn))
+
+  def WaitForAsyncHooks(self, cbs):
+    """Waits for the hooks run in the background and logs their results.
+
+    Jobs call this after they have been finalized, so that their completion
+    doesn't wait for the hooks.
+
+    @type cbs: L{OpExecCbBase}
+    @param cbs: the callbacks used for logging the results
+
+    """
+    (pending, self._async_hooks) = (self._async_hooks, [])
+    if not pending:
+      return
+
+    prev_cbs = self._cbs
+    self._cbs = cbs
+    try:
+      for (thread, result, process_fn) in pending:
+        thread.join()
+        ((success, value), ) = result
+        if success:
+          process_fn(value)
+        else:
+          self.LogWarning("Running asynchronous hooks failed: %s", value)
+    finally:
+      self._cbs = prev_cbs
 
   def _LockAndExecLU(self, lu, level, calc_timeout, pending=None):
     """Execute a Logical Unit, with the needed locks.
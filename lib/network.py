@@ -32,9 +32,10 @@
 
 """
 
-import ipaddr
+import bisect
+import re
 
-from bitarray import bitarray
+import ipaddr
 
 from ganeti import errors
 
@@ -47,12 +48,215 @@ def _ComputeIpv4NumHosts(network_size):
 
 
 IPV4_NETWORK_MIN_SIZE = 30
-# FIXME: This limit is for performance reasons. Remove when refactoring
-# for performance tuning was successful.
-IPV4_NETWORK_MAX_SIZE = 16
+IPV4_NETWORK_MAX_SIZE = 8
 IPV4_NETWORK_MIN_NUM_HOSTS = _ComputeIpv4NumHosts(IPV4_NETWORK_MIN_SIZE)
 IPV4_NETWORK_MAX_NUM_HOSTS = _ComputeIpv4NumHosts(IPV4_NETWORK_MAX_SIZE)
 
+_RESERVED_RUN_RE = re.compile("1+")
+
+
+class _Reservations(object):
+  """A set of reserved addresses, given by their index in a network.
+
+  The reservations are kept as the sorted first and last indices of disjoint,
+  non-adjacent ranges of reserved addresses, so their size depends on how
+  fragmented the reservations are, not on the size of the network. Looking up
+  an address takes logarithmic time; reserving or releasing one only changes
+  the range it belongs to.
+
+  The compact string representation is C{size:ranges}, where the ranges are
+  separated by commas and given as C{first-last}, or just as the index of a
+  single address (e.g. C{256:0-1,255}).
+
+  """
+  def __init__(self, size, ranges=None):
+    """Initializes the reservations.
+
+    @type size: int
+    @param size: the number of addresses
+    @type ranges: list of tuples; (int, int)
+    @param ranges: the first and last index of the ranges to reserve
+
+    """
+    self.size = size
+    self._starts = []
+    self._ends = []
+    self._count = 0
+
+    for (first, last) in ranges or []:
+      if not 0 <= first <= last < size:
+        raise errors.AddressPoolError("Range %s-%s is outside of a pool with"
+                                      " %s address(es)" % (first, last, size))
+      self.AddRange(first, last)
+
+  @classmethod
+  def FromString(cls, value):
+    """Parses reservations.
+
+    Both the compact representation and the former one, a string of C{0} and
+    C{1} for every address, are accepted.
+
+    @type value: string
+    @rtype: L{_Reservations}
+
+    """
+    if ":" not in value:
+      if value.strip("01"):
+        raise errors.AddressPoolError("Invalid address pool %r" % value)
+      return cls(len(value), [(m.start(), m.end() - 1)
+                              for m in _RESERVED_RUN_RE.finditer(value)])
+
+    (size, ranges) = value.split(":", 1)
+    try:
+      parsed = []
+      for item in filter(None, ranges.split(",")):
+        (first, _, last) = item.partition("-")
+        parsed.append((int(first), int(last or first)))
+      return cls(int(size), parsed)
+    except ValueError:
+      raise errors.AddressPoolError("Invalid address pool %r" % value)
+
+  def ToString(self):
+    """Returns the compact representation of the reservations.
+
+    """
+    ranges = []
+    for (first, last) in self.GetRanges():
+      if first == last:
+        ranges.append(str(first))
+      else:
+        ranges.append("%s-%s" % (first, last))
+    return "%s:%s" % (self.size, ",".join(ranges))
+
+  def ToBitString(self):
+    """Returns the former representation of the reservations.
+
+    This is a string of C{0} and C{1} for every address, as used up to
+    Ganeti 2.17.
+
+    """
+    parts = []
+    pos = 0
+    for (first, last) in self.GetRanges():
+      parts.append("0" * (first - pos))
+      parts.append("1" * (last - first + 1))
+      pos = last + 1
+    parts.append("0" * (self.size - pos))
+    return "".join(parts)
+
+  def __contains__(self, idx):
+    pos = bisect.bisect_right(self._starts, idx) - 1
+    return pos >= 0 and self._ends[pos] >= idx
+
+  def __len__(self):
+    return self._count
+
+  def AddRange(self, first, last):
+    """Reserves a range of addresses.
+
+    """
+    # The ranges overlapping with or adjacent to the new one are merged
+    lo = bisect.bisect_left(self._ends, first - 1)
+    hi = bisect.bisect_right(self._starts, last + 1)
+    if lo < hi:
+      self._count -= sum(self._ends[i] - self._starts[i] + 1
+                         for i in range(lo, hi))
+      first = min(first, self._starts[lo])
+      last = max(last, self._ends[hi - 1])
+    self._starts[lo:hi] = [first]
+    self._ends[lo:hi] = [last]
+    self._count += last - first + 1
+
+  def Add(self, idx):
+    """Reserves an address.
+
+    """
+    self.AddRange(idx, idx)
+
+  def Remove(self, idx):
+    """Releases an address.
+
+    """
+    pos = bisect.bisect_right(self._starts, idx) - 1
+    if pos < 0 or self._ends[pos] < idx:
+      return
+
+    (first, last) = (self._starts[pos], self._ends[pos])
+    starts = []
+    ends = []
+    if first < idx:
+      starts.append(first)
+      ends.append(idx - 1)
+    if idx < last:
+      starts.append(idx + 1)
+      ends.append(last)
+    self._starts[pos:pos + 1] = starts
+    self._ends[pos:pos + 1] = ends
+    self._count -= 1
+
+  def Union(self, other):
+    """Returns the addresses reserved in either of two reservations.
+
+    @type other: L{_Reservations}
+    @rtype: L{_Reservations}
+
+    """
+    result = _Reservations(max(self.size, other.size), self.GetRanges())
+    for (first, last) in other.GetRanges():
+      result.AddRange(first, last)
+    return result
+
+  def GetRanges(self):
+    """Returns the first and last index of all ranges of reserved addresses.
+
+    """
+    return zip(self._starts, self._ends)
+
+  def GetIndices(self):
+    """Returns the indices of all reserved addresses.
+
+    """
+    for (first, last) in self.GetRanges():
+      for idx in xrange(first, last + 1):
+        yield idx
+
+  def GetFirstFree(self):
+    """Returns the index of the first free address.
+
+    @return: the index, or None if all addresses are reserved
+
+    """
+    if not self._starts or self._starts[0] > 0:
+      idx = 0
+    else:
+      idx = self._ends[0] + 1
+
+    if idx < self.size:
+      return idx
+    else:
+      return None
+
+
+def ReservationsToBitString(value, max_size=None):
+  """Converts reservations to the representation used up to Ganeti 2.17.
+
+  @type value: string
+  @param value: the reservations in either representation
+  @type max_size: int or None
+  @param max_size: if given, the maximum number of addresses
+  @rtype: string
+  @return: a string of C{0} and C{1} for every address
+  @raise errors.AddressPoolError: if the reservations are invalid or there
+      are more than C{max_size} addresses
+
+  """
+  reservations = _Reservations.FromString(value)
+  if max_size is not None and reservations.size > max_size:
+    raise errors.AddressPoolError("Address pool has %s addresses, more than"
+                                  " the maximum of %s" %
+                                  (reservations.size, max_size))
+  return reservations.ToBitString()
+
 
 class AddressPool(object):
   """Address pool class, wrapping an C{objects.Network} object.
@@ -61,9 +265,6 @@ class AddressPool(object):
   L{objects.Network} objects.
 
   """
-  FREE = bitarray("0")
-  RESERVED = bitarray("1")
-
   def __init__(self, network):
     """Initialize a new IPv4 address pool from an L{objects.Network} object.
 
@@ -101,21 +302,18 @@ class AddressPool(object):
       self.gateway6 = ipaddr.IPv6Address(self.net.gateway6)
 
     if self.net.reservations:
-      self.reservations = bitarray(self.net.reservations)
+      self.reservations = _Reservations.FromString(self.net.reservations)
     else:
-      self.reservations = bitarray(self.network.numhosts)
-      # pylint: disable=E1103
-      self.reservations.setall(False)
+      self.reservations = _Reservations(self.network.numhosts)
 
     if self.net.ext_reservations:
-      self.ext_reservations = bitarray(self.net.ext_reservations)
+      self.ext_reservations = \
+        _Reservations.FromString(self.net.ext_reservations)
     else:
-      self.ext_reservations = bitarray(self.network.numhosts)
-      # pylint: disable=E1103
-      self.ext_reservations.setall(False)
+      self.ext_reservations = _Reservations(self.network.numhosts)
 
-    assert len(self.reservations) == self.network.numhosts
-    assert len(self.ext_reservations) == self.network.numhosts
+    assert self.reservations.size == self.network.numhosts
+    assert self.ext_reservations.size == self.network.numhosts
 
   def Contains(self, address):
     if address is None:
@@ -137,16 +335,20 @@ class AddressPool(object):
     """Write address pools back to the network object.
 
     """
-    # pylint: disable=E1103
-    self.net.ext_reservations = self.ext_reservations.to01()
-    self.net.reservations = self.reservations.to01()
+    self.net.ext_reservations = self.ext_reservations.ToString()
+    self.net.reservations = self.reservations.ToString()
 
   def _Mark(self, address, value=True, external=False):
     idx = self._GetAddrIndex(address)
     if external:
-      self.ext_reservations[idx] = value
+      reservations = self.ext_reservations
     else:
-      self.reservations[idx] = value
+      reservations = self.reservations
+
+    if value:
+      reservations.Add(idx)
+    else:
+      reservations.Remove(idx)
     self.Update()
 
   def _GetSize(self):
@@ -157,11 +359,11 @@ class AddressPool(object):
     """Return a combined map of internal and external reservations.
 
     """
-    return (self.reservations | self.ext_reservations)
+    return self.reservations.Union(self.ext_reservations)
 
   def Validate(self):
-    assert len(self.reservations) == self._GetSize()
-    assert len(self.ext_reservations) == self._GetSize()
+    assert self.reservations.size == self._GetSize()
+    assert self.ext_reservations.size == self._GetSize()
 
     if self.gateway is not None:
       assert self.gateway in self.network
@@ -173,25 +375,34 @@ class AddressPool(object):
     """Check whether the network is full.
 
     """
-    return self.all_reservations.all()
+    return self.all_reservations.GetFirstFree() is None
 
   def GetReservedCount(self):
     """Get the count of reserved addresses.
 
     """
-    return self.all_reservations.count(True)
+    return len(self.all_reservations)
 
   def GetFreeCount(self):
     """Get the count of unused addresses.
 
     """
-    return self.all_reservations.count(False)
+    all_reservations = self.all_reservations
+    return all_reservations.size - len(all_reservations)
 
   def GetMap(self):
     """Return a textual representation of the network's occupation status.
 
     """
-    return self.all_reservations.to01().replace("1", "X").replace("0", ".")
+    all_reservations = self.all_reservations
+    parts = []
+    idx = 0
+    for (first, last) in all_reservations.GetRanges():
+      parts.append("." * (first - idx))
+      parts.append("X" * (last - first + 1))
+      idx = last + 1
+    parts.append("." * (all_reservations.size - idx))
+    return "".join(parts)
 
   def IsReserved(self, address, external=False):
     """Checks if the given IP is reserved.
@@ -199,9 +410,9 @@ class AddressPool(object):
     """
     idx = self._GetAddrIndex(address)
     if external:
-      return self.ext_reservations[idx]
+      return idx in self.ext_reservations
     else:
-      return self.reservations[idx]
+      return idx in self.reservations
 
   def Reserve(self, address, external=False):
     """Mark an address as used.
@@ -233,10 +444,10 @@ class AddressPool(object):
     """Returns the first available address.
 
     """
-    if self.IsFull():
+    idx = self.all_reservations.GetFirstFree()
+    if idx is None:
       raise errors.AddressPoolError("%s is full" % self.network)
 
-    idx = self.all_reservations.index(False)
     address = str(self.network[idx])
     self.Reserve(address)
     return address
@@ -247,19 +458,18 @@ class AddressPool(object):
     @raise errors.AddressPoolError: Pool is full
 
     """
-    idx = self.all_reservations.search(self.FREE, 1)
-    if idx:
-      return str(self.network[idx[0]])
-    else:
+    idx = self.all_reservations.GetFirstFree()
+    if idx is None:
       raise errors.AddressPoolError("%s is full" % self.network)
 
+    return str(self.network[idx])
+
   def GetExternalReservations(self):
     """Returns a list of all externally reserved addresses.
 
     """
-    # pylint: disable=E1103
-    idxs = self.ext_reservations.search(self.RESERVED)
-    return [str(self.network[idx]) for idx in idxs]
+    return [str(self.network[idx])
+            for idx in self.ext_reservations.GetIndices()]
 
   @classmethod
   def InitializeNetwork(cls, net):
@@ -51,7 +51,9 @@ import ConfigParser
 import re
 import copy
 import logging
+import operator
 import time
+import types
 from cStringIO import StringIO
 from socket import AF_INET
 
@@ -209,13 +211,37 @@ class ConfigObject(outils.ValidatedSlots):
   __slots__ = []
 
   def __getattr__(self, name):
-    if name not in self.GetAllSlots():
+    if name not in self._GetSlotCache()[1]:
       raise AttributeError("Invalid object attribute %s.%s" %
                            (type(self).__name__, name))
     return None
 
+  @classmethod
+  def _GetSlotGetters(cls):
+    """Return the getters of all slots, computing them only once.
+
+    Reading a slot through its descriptor avoids the generic attribute
+    lookup, which falls back to L{__getattr__} for unset slots.
+
+    @rtype: list of tuples; (string, callable)
+    @return: the slot names and functions returning their value for an
+        object, or raising C{AttributeError} if the slot is unset
+
+    """
+    getters = cls.__dict__.get("_slot_getters", None)
+    if getters is None:
+      getters = []
+      for name in utils.UniqueSequence(cls._GetSlotCache()[0]):
+        attr = getattr(cls, name, None)
+        if isinstance(attr, types.MemberDescriptorType):
+          getters.append((name, attr.__get__))
+        else:
+          getters.append((name, operator.attrgetter(name)))
+      setattr(cls, "_slot_getters", getters)
+    return getters
+
   def __setstate__(self, state):
-    slots = self.GetAllSlots()
+    slots = self._GetSlotCache()[1]
     for name in state:
       if name in slots:
         setattr(self, name, state[name])
@@ -255,8 +281,11 @@ class ConfigObject(outils.ValidatedSlots):
 
     """
     result = {}
-    for name in self.GetAllSlots():
-      value = getattr(self, name, None)
+    for (name, getter) in self._GetSlotGetters():
+      try:
+        value = getter(self)
+      except AttributeError:
+        continue
       if value is not None:
         result[name] = value
     return result
@@ -279,8 +308,13 @@ class ConfigObject(outils.ValidatedSlots):
     if not isinstance(val, dict):
       raise errors.ConfigurationError("Invalid object passed to FromDict:"
                                       " expected dict, got %s" % type(val))
-    val_str = dict([(str(k), v) for k, v in val.iteritems()])
-    obj = cls(**val_str)
+    if cls.__init__.im_func is outils.ValidatedSlots.__init__.im_func:
+      # Fast path, avoiding the conversion to keyword arguments
+      obj = cls.__new__(cls)
+      obj._SetSlots(val) # pylint: disable=W0212
+    else:
+      val_str = dict([(str(k), v) for k, v in val.iteritems()])
+      obj = cls(**val_str)
     return obj
 
   def Copy(self):
@@ -439,20 +473,28 @@ class ConfigData(ConfigObject):
     return mydict
 
   @classmethod
-  def FromDict(cls, val):
+  def FromDict(cls, val, lazy=False):
     """Custom function for top-level config data
 
+    @type lazy: bool
+    @param lazy: if True, the nodes, instances, node groups, networks, disks
+        and filters are only converted to objects when they are accessed,
+        see L{outils.LazyContainer}; this is useful for reading just a part
+        of a large configuration
+
     """
     obj = super(ConfigData, cls).FromDict(val)
     obj.cluster = Cluster.FromDict(obj.cluster)
-    obj.nodes = outils.ContainerFromDicts(obj.nodes, dict, Node)
+    obj.nodes = outils.ContainerFromDicts(obj.nodes, dict, Node, lazy=lazy)
     obj.instances = \
-      outils.ContainerFromDicts(obj.instances, dict, Instance)
+      outils.ContainerFromDicts(obj.instances, dict, Instance, lazy=lazy)
     obj.nodegroups = \
-      outils.ContainerFromDicts(obj.nodegroups, dict, NodeGroup)
-    obj.networks = outils.ContainerFromDicts(obj.networks, dict, Network)
-    obj.disks = outils.ContainerFromDicts(obj.disks, dict, Disk)
-    obj.filters = outils.ContainerFromDicts(obj.filters, dict, Filter)
+      outils.ContainerFromDicts(obj.nodegroups, dict, NodeGroup, lazy=lazy)
+    obj.networks = outils.ContainerFromDicts(obj.networks, dict, Network,
+                                             lazy=lazy)
+    obj.disks = outils.ContainerFromDicts(obj.disks, dict, Disk, lazy=lazy)
+    obj.filters = outils.ContainerFromDicts(obj.filters, dict, Filter,
+                                            lazy=lazy)
     obj.maintenance = Maintenance.FromDict(obj.maintenance)
     return obj
 
@@ -81,22 +81,49 @@ class ValidatedSlots(object):
     __slots__ attribute for this class.
 
     """
-    slots = self.GetAllSlots()
-    for (key, value) in kwargs.items():
+    self._SetSlots(kwargs)
+
+  def _SetSlots(self, values):
+    """Sets the given slots, refusing unknown ones.
+
+    @type values: dict
+    @param values: the values of the slots to set
+
+    """
+    slots = self._GetSlotCache()[1]
+    for (key, value) in values.iteritems():
       if key not in slots:
         raise TypeError("Object %s doesn't support the parameter '%s'" %
                         (self.__class__.__name__, key))
       setattr(self, key, value)
 
+  @classmethod
+  def _GetSlotCache(cls):
+    """Return the slots of a class, computing them only once.
+
+    The cache is stored in the class itself, and lookups only consider the
+    class's own dictionary, so that subclasses don't share the cache of their
+    parents.
+
+    @rtype: tuple; (tuple, frozenset)
+    @return: the slots in their declaration order, and as a set
+
+    """
+    cache = cls.__dict__.get("_slot_cache", None)
+    if cache is None:
+      slots = []
+      for parent in cls.__mro__:
+        slots.extend(getattr(parent, "__slots__", []))
+      cache = (tuple(slots), frozenset(slots))
+      setattr(cls, "_slot_cache", cache)
+    return cache
+
   @classmethod
   def GetAllSlots(cls):
     """Compute the list of all declared slots for a class.
 
     """
-    slots = []
-    for parent in cls.__mro__:
-      slots.extend(getattr(parent, "__slots__", []))
-    return slots
+    return list(cls._GetSlotCache()[0])
 
   def Validate(self):
     """Validates the slots.
@@ -136,7 +163,94 @@ def ContainerToDicts(container):
   return ret
 
 
-def ContainerFromDicts(source, c_type, e_type):
+class LazyContainer(dict):
+  """Dictionary converting its values to objects on first access.
+
+  The values are kept in their serialized form until they are retrieved, so
+  that objects which are never looked at don't need to be created. Note that
+  copying such a container with C{dict()} returns the serialized form of the
+  values that haven't been accessed yet; use L{copy} instead.
+
+  """
+  def __init__(self, e_type, source=None):
+    """Initializes the container.
+
+    @type e_type: element type class
+    @param e_type: Item type for the values (must have a C{FromDict} class
+      method)
+    @type source: None or dict
+    @param source: the values in their serialized form
+
+    """
+    dict.__init__(self, source or {})
+    self._e_type = e_type
+
+  def _Convert(self, value):
+    if type(value) is dict:
+      value = self._e_type.FromDict(value)
+    return value
+
+  def _Materialize(self, key, value):
+    if type(value) is dict:
+      value = self._e_type.FromDict(value)
+      dict.__setitem__(self, key, value)
+    return value
+
+  def _MaterializeAll(self):
+    for (key, value) in dict.items(self):
+      self._Materialize(key, value)
+
+  def __getitem__(self, key):
+    return self._Materialize(key, dict.__getitem__(self, key))
+
+  def get(self, key, default=None):
+    if key in self:
+      return self[key]
+    return default
+
+  def setdefault(self, key, default=None):
+    if key not in self:
+      self[key] = default
+    return self[key]
+
+  def pop(self, key, *args):
+    return self._Convert(dict.pop(self, key, *args))
+
+  def popitem(self):
+    (key, value) = dict.popitem(self)
+    return (key, self._Convert(value))
+
+  def values(self):
+    self._MaterializeAll()
+    return dict.values(self)
+
+  def itervalues(self):
+    self._MaterializeAll()
+    return dict.itervalues(self)
+
+  def items(self):
+    self._MaterializeAll()
+    return dict.items(self)
+
+  def iteritems(self):
+    self._MaterializeAll()
+    return dict.iteritems(self)
+
+  def copy(self):
+    return LazyContainer(self._e_type, self)
+
+  def __eq__(self, other):
+    self._MaterializeAll()
+    return dict.__eq__(self, other)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __reduce__(self):
+    return (LazyContainer, (self._e_type, dict(self)))
+
+
+def ContainerFromDicts(source, c_type, e_type, lazy=False):
   """Convert a container from standard python types.
 
   This method converts a container with standard Python types to objects. If
@@ -149,6 +263,9 @@ def ContainerFromDicts(source, c_type, e_type):
   @type e_type: element type class
   @param e_type: Item type for elements in returned container (must have a
     C{FromDict} class method)
+  @type lazy: bool
+  @param lazy: if the container is a dict, return a L{LazyContainer} which
+    only converts its values when they are accessed
 
   """
   if not isinstance(c_type, type):
@@ -157,7 +274,9 @@ def ContainerFromDicts(source, c_type, e_type):
   if source is None:
     source = c_type()
 
-  if c_type is dict:
+  if c_type is dict and lazy:
+    ret = LazyContainer(e_type, source)
+  elif c_type is dict:
     ret = dict([(k, e_type.FromDict(v)) for k, v in source.items()])
   elif c_type in _SEQUENCE_TYPES:
     ret = c_type(map(e_type.FromDict, source))
@@ -91,6 +91,7 @@ SSH_HOST_RSA_PUB = _constants.SSH_HOST_RSA_PUB
 SSH_PUB_KEYS = DATA_DIR + "/ganeti_pub_keys"
 
 BDEV_CACHE_DIR = RUN_DIR + "/bdev-cache"
+LVM_CACHE_DIR = RUN_DIR + "/lvm-cache"
 DISK_LINKS_DIR = RUN_DIR + "/instance-disks"
 SOCKET_DIR = RUN_DIR + "/socket"
 CRYPTO_KEYS_DIR = RUN_DIR + "/crypto"
@@ -152,6 +153,16 @@ WATCHER_GROUP_INSTANCE_STATUS_FILE = DATA_DIR + "/watcher.%s.instance-status"
 #: File containing Unix timestamp until which watcher should be paused
 WATCHER_PAUSEFILE = DATA_DIR + "/watcher.pause"
 
+#: Results of the last incremental node verify, kept on every node
+NODE_VERIFY_CACHE_FILE = DATA_DIR + "/node-verify.data"
+
+#: Node verify results of the last incremental verify of a group, kept on the
+#: master node
+CLUSTER_VERIFY_GROUP_CACHE_FILE = DATA_DIR + "/cluster-verify.%s.data"
+
+#: Live node data of the last allocator run, kept on the master node
+IALLOCATOR_NODE_DATA_FILE = DATA_DIR + "/iallocator-node-data"
+
 #: User-provided master IP setup script
 EXTERNAL_MASTER_SETUP_SCRIPT = USER_SCRIPTS_DIR + "/master-ip-setup"
 
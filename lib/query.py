@@ -61,6 +61,7 @@ How it works:
 
 """
 
+import itertools
 import logging
 import operator
 import re
@@ -360,6 +361,85 @@ def _WrapNot(fn, lhs, rhs):
   return not fn(lhs, rhs)
 
 
+def _ColumnAnd(sentences, data, indices):
+  """Column-wise implementation of L{qlang.OP_AND}.
+
+  Every sentence is only evaluated for the items matched by all previous
+  ones.
+
+  """
+  for fn in sentences:
+    if not indices:
+      break
+    indices = fn(data, indices)
+
+  return indices
+
+
+def _ColumnOr(sentences, data, indices):
+  """Column-wise implementation of L{qlang.OP_OR}.
+
+  Every sentence is only evaluated for the items not matched by any previous
+  one.
+
+  """
+  matched = set()
+  remaining = indices
+
+  for fn in sentences:
+    if not remaining:
+      break
+    matched.update(fn(data, remaining))
+    remaining = [idx for idx in remaining if idx not in matched]
+
+  return [idx for idx in indices if idx in matched]
+
+
+def _ColumnNot(inner, data, indices):
+  """Column-wise implementation of L{qlang.OP_NOT}.
+
+  """
+  matched = frozenset(inner(data, indices))
+
+  return [idx for idx in indices if idx not in matched]
+
+
+def _ColumnTruth(retrieval_fn, data, indices):
+  """Column-wise implementation of L{qlang.OP_TRUE}.
+
+  """
+  return [idx for (idx, value) in zip(indices, data.Get(retrieval_fn, indices))
+          if value]
+
+
+def _ColumnBinaryOp(op_fn, retrieval_fn, value, data, indices):
+  """Column-wise wrapper for binary operator functions.
+
+  """
+  column = data.Get(retrieval_fn, indices)
+
+  return [idx for (idx, match) in
+          zip(indices, map(op_fn, column, itertools.repeat(value,
+                                                           len(column))))
+          if match]
+
+
+def _ColumnRegexp(pattern, retrieval_fn, data, indices):
+  """Column-wise implementation of L{qlang.OP_REGEXP}.
+
+  """
+  return [idx for (idx, match) in
+          zip(indices, map(pattern.search, data.Get(retrieval_fn, indices)))
+          if match]
+
+
+def _MatchRegexp(lhs, rhs):
+  """Searches a compiled regular expression in a value.
+
+  """
+  return rhs.search(lhs)
+
+
 def _PrepareRegex(pattern):
   """Compiles a regular expression.
 
@@ -466,7 +546,7 @@ class _FilterCompilerHelper(object):
     qlang.OP_GT: (_OPTYPE_BINARY, _MakeComparisonChecks(operator.gt)),
     qlang.OP_GE: (_OPTYPE_BINARY, _MakeComparisonChecks(operator.ge)),
     qlang.OP_REGEXP: (_OPTYPE_BINARY, [
-      (None, lambda lhs, rhs: rhs.search(lhs), _PrepareRegex),
+      (None, _MatchRegexp, _PrepareRegex),
       ]),
     qlang.OP_CONTAINS: (_OPTYPE_BINARY, [
       (None, operator.contains, None),
@@ -566,8 +646,16 @@ class _FilterCompilerHelper(object):
     if hints_fn:
       hints_fn(op)
 
-    return compat.partial(_WrapLogicOp, op_fn,
-                          [self._Compile(op, level + 1) for op in operands])
+    return self._BuildLogicOp(op, op_fn,
+                              [self._Compile(op, level + 1)
+                               for op in operands])
+
+  @staticmethod
+  def _BuildLogicOp(op, op_fn, sentences): # pylint: disable=W0613
+    """Builds the function evaluating a logic operator.
+
+    """
+    return compat.partial(_WrapLogicOp, op_fn, sentences)
 
   def _HandleUnaryOp(self, hints_fn, level, op, op_fn, operands):
     """Handles unary operators.
@@ -607,6 +695,13 @@ class _FilterCompilerHelper(object):
     else:
       raise errors.ProgrammerError("Can't handle operator '%s'" % op)
 
+    return self._BuildUnaryOp(op, op_fn, arg)
+
+  @staticmethod
+  def _BuildUnaryOp(op, op_fn, arg): # pylint: disable=W0613
+    """Builds the function evaluating a unary operator.
+
+    """
     return compat.partial(_WrapUnaryOp, op_fn, arg)
 
   def _HandleBinaryOp(self, hints_fn, level, op, op_data, operands):
@@ -652,11 +747,60 @@ class _FilterCompilerHelper(object):
         if valprepfn:
           value = valprepfn(value)
 
-        return compat.partial(_WrapBinaryOp, fn, retrieval_fn, value)
+        return self._BuildBinaryOp(fn, retrieval_fn, value)
 
     raise errors.ProgrammerError("Unable to find operator implementation"
                                  " (op '%s', flags %s)" % (op, field_flags))
 
+  @staticmethod
+  def _BuildBinaryOp(op_fn, retrieval_fn, value):
+    """Builds the function evaluating a binary operator.
+
+    """
+    return compat.partial(_WrapBinaryOp, op_fn, retrieval_fn, value)
+
+
+class _ColumnFilterCompilerHelper(_FilterCompilerHelper):
+  """Converts a query filter to a callable filtering columns.
+
+  The resulting function receives a L{_ColumnData} instance and a list of
+  item indices and returns the indices of the items matching the filter.
+
+  """
+  @staticmethod
+  def _BuildLogicOp(op, op_fn, sentences):
+    """Builds the function evaluating a logic operator on columns.
+
+    """
+    if op == qlang.OP_OR:
+      return compat.partial(_ColumnOr, sentences)
+    elif op == qlang.OP_AND:
+      return compat.partial(_ColumnAnd, sentences)
+    else:
+      raise errors.ProgrammerError("Can't handle operator '%s'" % op)
+
+  @staticmethod
+  def _BuildUnaryOp(op, op_fn, arg):
+    """Builds the function evaluating a unary operator on columns.
+
+    """
+    if op == qlang.OP_TRUE:
+      return compat.partial(_ColumnTruth, arg)
+    elif op == qlang.OP_NOT:
+      return compat.partial(_ColumnNot, arg)
+    else:
+      raise errors.ProgrammerError("Can't handle operator '%s'" % op)
+
+  @staticmethod
+  def _BuildBinaryOp(op_fn, retrieval_fn, value):
+    """Builds the function evaluating a binary operator on columns.
+
+    """
+    if op_fn is _MatchRegexp:
+      return compat.partial(_ColumnRegexp, value, retrieval_fn)
+    else:
+      return compat.partial(_ColumnBinaryOp, op_fn, retrieval_fn, value)
+
 
 def _CompileFilter(fields, hints, qfilter):
   """Converts a query filter into a callable function.
@@ -669,6 +813,113 @@ def _CompileFilter(fields, hints, qfilter):
   return _FilterCompilerHelper(fields)(hints, qfilter)
 
 
+def _CompileColumnFilter(fields, qfilter):
+  """Converts a query filter into a callable filtering columns.
+
+  See L{_ColumnFilterCompilerHelper} for details.
+
+  @rtype: callable
+
+  """
+  return _ColumnFilterCompilerHelper(fields)(None, qfilter)
+
+
+#: Placeholder for values not yet retrieved by L{_ColumnData}
+_MISSING = object()
+
+
+class _ColumnData(object):
+  """Column-wise access to the items of a query data container.
+
+  The container is iterated once. Data containers setting per-item
+  attributes while iterating list them in C{ITEM_ATTRS}; their values are
+  recorded for every item and restored before calling retrieval functions.
+  Retrieved values are cached per retrieval function, so a field used in both
+  the filter and the result is only retrieved once per item.
+
+  """
+  def __init__(self, ctx):
+    """Initializes this class.
+
+    @param ctx: Data container, see L{Query.Query}
+
+    """
+    self._ctx = ctx
+    self._attrs = getattr(ctx, "ITEM_ATTRS", ())
+    self._states = []
+    self._columns = {}
+
+    self.items = []
+
+    for item in ctx:
+      self.items.append(item)
+      if self._attrs:
+        self._states.append([getattr(ctx, name) for name in self._attrs])
+
+  def _Restore(self, idx):
+    """Restores the per-item attributes of the data container.
+
+    """
+    for (name, value) in zip(self._attrs, self._states[idx]):
+      setattr(self._ctx, name, value)
+
+  def _GetColumn(self, fn):
+    """Returns the cached values of a retrieval function.
+
+    """
+    try:
+      return self._columns[fn]
+    except KeyError:
+      column = self._columns[fn] = [_MISSING] * len(self.items)
+      return column
+
+  def GetMany(self, fns, indices):
+    """Returns the values of a number of retrieval functions.
+
+    @type fns: list of callables
+    @param fns: Retrieval functions
+    @type indices: list of integers
+    @param indices: Indices of the items, in ascending order
+    @rtype: list of lists
+    @return: One list of values per retrieval function
+
+    """
+    ctx = self._ctx
+    items = self.items
+    columns = [self._GetColumn(fn) for fn in fns]
+    todo = [(fn, column, [idx for idx in indices if column[idx] is _MISSING])
+            for (fn, column) in zip(fns, columns)]
+
+    if self._attrs:
+      # Restore the attributes only once per item
+      missing = sorted(set(idx for (_, _, idxs) in todo for idx in idxs))
+      for idx in missing:
+        self._Restore(idx)
+        item = items[idx]
+        for (fn, column, _) in todo:
+          if column[idx] is _MISSING:
+            column[idx] = fn(ctx, item)
+    else:
+      for (fn, column, idxs) in todo:
+        if idxs:
+          values = map(compat.partial(fn, ctx), [items[idx] for idx in idxs])
+          for (idx, value) in zip(idxs, values):
+            column[idx] = value
+
+    if len(indices) == len(items):
+      return columns
+    else:
+      return [[column[idx] for idx in indices] for column in columns]
+
+  def Get(self, fn, indices):
+    """Returns the values of a retrieval function.
+
+    See L{GetMany}.
+
+    """
+    return self.GetMany([fn], indices)[0]
+
+
 class Query(object):
   def __init__(self, fieldlist, selected, qfilter=None, namefield=None):
     """Initializes this class.
@@ -694,6 +945,7 @@ class Query(object):
     self._fields = _GetQueryFields(fieldlist, selected)
 
     self._filter_fn = None
+    self._column_filter_fn = None
     self._requested_names = None
     self._filter_datakinds = frozenset()
 
@@ -706,6 +958,7 @@ class Query(object):
 
       # Build filter function
       self._filter_fn = _CompileFilter(fieldlist, hints, qfilter)
+      self._column_filter_fn = _CompileColumnFilter(fieldlist, qfilter)
       if hints:
         self._requested_names = hints.RequestedNames()
         self._filter_datakinds = hints.ReferencedData()
@@ -744,7 +997,7 @@ class Query(object):
     """
     return GetAllFields(self._fields)
 
-  def Query(self, ctx, sort_by_name=True):
+  def Query(self, ctx, sort_by_name=True, columnar=True):
     """Execute a query.
 
     @param ctx: Data container passed to field retrieval functions, must
@@ -752,6 +1005,59 @@ class Query(object):
     @type sort_by_name: boolean
     @param sort_by_name: Whether to sort by name or keep the input data's
       ordering
+    @type columnar: boolean
+    @param columnar: Whether to evaluate the filter and retrieve the fields
+      column by column instead of item by item; both give the same result
+
+    """
+    if columnar:
+      return self._QueryColumns(ctx, sort_by_name)
+    else:
+      return self._QueryRows(ctx, sort_by_name)
+
+  def _QueryColumns(self, ctx, sort_by_name):
+    """Executes a query column by column.
+
+    See L{Query} for arguments.
+
+    """
+    sort = (self._name_fn and sort_by_name)
+
+    data = _ColumnData(ctx)
+
+    indices = range(len(data.items))
+    if self._column_filter_fn is not None:
+      indices = self._column_filter_fn(data, indices)
+
+    columns = [_ProcessColumn(values) for values in
+               data.GetMany([fn for (_, _, _, fn) in self._fields], indices)]
+
+    # Verify result
+    if __debug__:
+      for (column, (fdef, _, _, _)) in zip(columns, self._fields):
+        _VerifyResultColumn(fdef, column)
+
+    if columns:
+      rows = map(list, zip(*columns))
+    else:
+      rows = [[] for _ in indices]
+
+    if not sort:
+      return rows
+
+    names = data.Get(self._name_fn, indices)
+    assert compat.all(_ProcessResult(name)[0] == constants.RS_NORMAL
+                      for name in names)
+
+    result = zip(map(utils.NiceSortKey, names), indices, rows)
+    result.sort()
+
+    return map(operator.itemgetter(2), result)
+
+  def _QueryRows(self, ctx, sort_by_name):
+    """Executes a query item by item.
+
+    See L{Query} for arguments.
 
     """
     sort = (self._name_fn and sort_by_name)
@@ -822,6 +1128,38 @@ def _ProcessResult(value):
     return (RS_NORMAL, value)
 
 
+def _ProcessColumn(values):
+  """Converts a column of result values, see L{_ProcessResult}.
+
+  """
+  return [_ProcessResult(value)
+          if (value is _FS_UNKNOWN or value is _FS_NODATA or
+              value is _FS_UNAVAIL or value is _FS_OFFLINE)
+          else (RS_NORMAL, value)
+          for value in values]
+
+
+def _VerifyResultColumn(fdef, column):
+  """Verifies the contents of a query result column.
+
+  @type fdef: L{objects.QueryFieldDefinition}
+  @param fdef: Field definition
+  @type column: list of tuples
+  @param column: Column data
+
+  """
+  verify_fn = _VERIFY_FN[fdef.kind]
+  errs = []
+  for (status, value) in column:
+    if status == RS_NORMAL:
+      if not verify_fn(value):
+        errs.append("normal field %s fails validation (value is %s)" %
+                    (fdef.name, value))
+    elif value is not None:
+      errs.append("abnormal field %s has a non-None value" % fdef.name)
+  assert not errs, ("Failed validation: %s" % utils.CommaJoin(errs))
+
+
 def _VerifyResultRow(fields, row):
   """Verifies the contents of a query result row.
 
@@ -1105,6 +1443,9 @@ class NodeQueryData(object):
   """Data container for node data queries.
 
   """
+  #: Attributes set by L{__iter__} for the current node
+  ITEM_ATTRS = ("ndparams", "curlive_data")
+
   def __init__(self, nodes, live_data, master_uuid, node_to_primary,
                node_to_secondary, inst_uuid_to_inst_name, groups, oob_support,
                cluster):
@@ -1404,6 +1745,10 @@ class InstanceQueryData(object):
   """Data container for instance data queries.
 
   """
+  #: Attributes set by L{__iter__} for the current instance
+  ITEM_ATTRS = ("inst_hvparams", "inst_beparams", "inst_osparams",
+                "inst_nicparams")
+
   def __init__(self, instances, cluster, disk_usage, offline_node_uuids,
                bad_node_uuids, live_data, wrongnode_inst, console, nodes,
                groups, networks):
@@ -2344,6 +2689,9 @@ class GroupQueryData(object):
   """Data container for node group data queries.
 
   """
+  #: Attributes set by L{__iter__} for the current node group
+  ITEM_ATTRS = ("group_ipolicy", "ndparams", "group_dp")
+
   def __init__(self, cluster, groups, group_to_nodes, group_to_instances,
                want_diskparams):
     """Initializes this class.
@@ -2801,6 +3149,9 @@ class NetworkQueryData(object):
   """Data container for network data queries.
 
   """
+  #: Attributes set by L{__iter__} for the current network
+  ITEM_ATTRS = ("curstats", )
+
   def __init__(self, networks, network_to_groups,
                network_to_instances, stats):
     """Initializes this class.
@@ -40,7 +40,6 @@ except ImportError:
   import pyinotify
 
 from ganeti import asyncnotifier
-from ganeti import compat
 from ganeti import http
 from ganeti.http.auth import HttpServerRequestAuthentication
 from ganeti import pathutils
@@ -108,6 +107,9 @@ class BasicAuthenticator(auth.RapiAuthenticator):
                     instead of the default users_file interface.
 
     """
+    # Called after the users file has been reloaded
+    self.reload_fn = None
+
     if user_fn:
       self.user_fn = user_fn
       return
@@ -115,12 +117,19 @@ class BasicAuthenticator(auth.RapiAuthenticator):
     self.users = users_file.RapiUsers()
     self.user_fn = self.users.Get
     # Setup file watcher (it'll be driven by asyncore)
-    SetupFileWatcher(pathutils.RAPI_USERS_FILE,
-                     compat.partial(self.users.Load,
-                                    pathutils.RAPI_USERS_FILE))
+    SetupFileWatcher(pathutils.RAPI_USERS_FILE, self._ReloadUsers)
+
+    self.users.Load(pathutils.RAPI_USERS_FILE)
 
+  def _ReloadUsers(self):
+    """Reloads the users file after it changed.
+
+    """
     self.users.Load(pathutils.RAPI_USERS_FILE)
 
+    if self.reload_fn:
+      self.reload_fn()
+
   def ValidateRequest(self, req, handler_access, realm):
     """Checks whether a user can access a resource.
 
@@ -388,6 +388,52 @@ class ResourceBase(object):
     """
     return bool(self._checkIntVariable("bulk"))
 
+  def getBulkFields(self, default, allowed=None):
+    """Returns the fields requested for a bulk query.
+
+    @type default: list of strings
+    @param default: the fields returned if the request doesn't specify any
+    @type allowed: list of strings
+    @param allowed: the fields which may be requested, C{default} if not given
+    @rtype: list of strings
+
+    """
+    fields = self._checkStringVariable("fields")
+    if not fields:
+      return default
+
+    if allowed is None:
+      allowed = default
+
+    fields = [i.strip() for i in fields.split(",")]
+    unknown = utils.FindDuplicates(fields) + \
+              sorted(frozenset(fields) - frozenset(allowed))
+    if unknown:
+      raise http.HttpBadRequest("Unknown or duplicate fields: %s" %
+                                utils.CommaJoin(unknown))
+
+    return fields
+
+  def getPage(self, items):
+    """Returns the part of a list selected by the C{offset} and C{limit}.
+
+    @type items: list
+    @param items: all items, in the order they are returned in
+
+    """
+    offset = self._checkIntVariable("offset")
+    if offset < 0:
+      raise http.HttpBadRequest("The 'offset' parameter must not be negative")
+
+    if self.queryargs.get("limit"):
+      limit = self._checkIntVariable("limit")
+      if limit < 0:
+        raise http.HttpBadRequest("The 'limit' parameter must not be"
+                                  " negative")
+      return items[offset:offset + limit]
+
+    return items[offset:]
+
   def useForce(self):
     """Check if the request specifies a forced operation.
 
@@ -65,6 +65,7 @@ HTTP_GET = "GET"
 HTTP_PUT = "PUT"
 HTTP_POST = "POST"
 HTTP_OK = 200
+HTTP_NOT_MODIFIED = 304
 HTTP_NOT_FOUND = 404
 HTTP_APP_JSON = "application/json"
 
@@ -239,6 +240,16 @@ def _AppendForceIf(container, condition):
   return _AppendIf(container, condition, (_QPARAM_FORCE, 1))
 
 
+def _AppendPage(container, fields, limit, offset):
+  """Appends the parameters selecting parts of a bulk result.
+
+  """
+  if fields is not None:
+    container.append(("fields", ",".join(fields)))
+  _AppendIf(container, limit is not None, ("limit", limit))
+  _AppendIf(container, offset, ("offset", offset))
+
+
 def _AppendReason(container, reason):
   """Appends an element to the reason trail.
 
@@ -382,6 +393,21 @@ def GenericCurlConfig(verbose=False, use_signal=False,
   return _ConfigCurl
 
 
+def _GetEntityTag(headers):
+  """Returns the entity tag from the header lines of a response.
+
+  @type headers: list of strings
+  @param headers: the header lines as passed to C{pycurl.HEADERFUNCTION}
+  @rtype: string or None
+
+  """
+  for line in headers:
+    (name, sep, value) = line.partition(":")
+    if sep and name.strip().lower() == "etag":
+      return value.strip()
+  return None
+
+
 class GanetiRapiClient(object): # pylint: disable=R0904
   """Ganeti RAPI client.
 
@@ -391,7 +417,7 @@ class GanetiRapiClient(object): # pylint: disable=R0904
 
   def __init__(self, host, port=GANETI_RAPI_PORT,
                username=None, password=None, logger=logging,
-               curl_config_fn=None, curl_factory=None):
+               curl_config_fn=None, curl_factory=None, use_etags=False):
     """Initializes this class.
 
     @type host: string
@@ -405,6 +431,9 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     @type curl_config_fn: callable
     @param curl_config_fn: Function to configure C{pycurl.Curl} object
     @param logger: Logging object
+    @type use_etags: bool
+    @param use_etags: Whether to remember the responses to GET requests and
+      only have them sent again by the server if they changed
 
     """
     self._username = username
@@ -413,6 +442,12 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     self._curl_config_fn = curl_config_fn
     self._curl_factory = curl_factory
 
+    if use_etags:
+      # URL -> (entity tag, encoded response body)
+      self._etag_cache = {}
+    else:
+      self._etag_cache = None
+
     try:
       socket.inet_pton(socket.AF_INET6, host)
       address = "[%s]:%s" % (host, port)
@@ -445,10 +480,9 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     curl.setopt(pycurl.USERAGENT, self.USER_AGENT)
     curl.setopt(pycurl.SSL_VERIFYHOST, 0)
     curl.setopt(pycurl.SSL_VERIFYPEER, False)
-    curl.setopt(pycurl.HTTPHEADER, [
-      "Accept: %s" % HTTP_APP_JSON,
-      "Content-type: %s" % HTTP_APP_JSON,
-      ])
+    curl.setopt(pycurl.HTTPHEADER, self._GetHeaders())
+    # Let cURL ask for and decode all compressed encodings it supports
+    curl.setopt(pycurl.ENCODING, "")
 
     assert ((self._username is None and self._password is None) ^
             (self._username is not None and self._password is not None))
@@ -465,6 +499,16 @@ class GanetiRapiClient(object): # pylint: disable=R0904
 
     return curl
 
+  @staticmethod
+  def _GetHeaders():
+    """Returns the HTTP headers sent with all requests.
+
+    """
+    return [
+      "Accept: %s" % HTTP_APP_JSON,
+      "Content-type: %s" % HTTP_APP_JSON,
+      ]
+
   @staticmethod
   def _EncodeQuery(query):
     """Encode query values for RAPI URL.
@@ -537,6 +581,7 @@ class GanetiRapiClient(object): # pylint: disable=R0904
 
     # Buffer for response
     encoded_resp_body = StringIO()
+    resp_headers = []
 
     # Configure cURL
     curl.setopt(pycurl.CUSTOMREQUEST, str(method))
@@ -544,6 +589,15 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     curl.setopt(pycurl.POSTFIELDS, str(encoded_content))
     curl.setopt(pycurl.WRITEFUNCTION, encoded_resp_body.write)
 
+    if self._etag_cache is not None and method == HTTP_GET:
+      cached = self._etag_cache.get(url)
+      if cached:
+        curl.setopt(pycurl.HTTPHEADER,
+                    self._GetHeaders() + ["If-None-Match: %s" % cached[0]])
+      curl.setopt(pycurl.HEADERFUNCTION, resp_headers.append)
+    else:
+      cached = None
+
     try:
       # Send request and wait for response
       try:
@@ -559,16 +613,29 @@ class GanetiRapiClient(object): # pylint: disable=R0904
       # between requests
       curl.setopt(pycurl.POSTFIELDS, "")
       curl.setopt(pycurl.WRITEFUNCTION, lambda _: None)
+      curl.setopt(pycurl.HEADERFUNCTION, lambda _: None)
 
     # Get HTTP response code
     http_code = curl.getinfo(pycurl.RESPONSE_CODE)
 
+    if http_code == HTTP_NOT_MODIFIED and cached:
+      self._logger.debug("Response to %s %s didn't change", method, url)
+      return simplejson.loads(cached[1])
+
     # Was anything written to the response buffer?
     if encoded_resp_body.tell():
       response_content = simplejson.loads(encoded_resp_body.getvalue())
     else:
       response_content = None
 
+    if (http_code == HTTP_OK and method == HTTP_GET and
+        self._etag_cache is not None):
+      etag = _GetEntityTag(resp_headers)
+      if etag:
+        self._etag_cache[url] = (etag, encoded_resp_body.getvalue())
+      else:
+        self._etag_cache.pop(url, None)
+
     if http_code != HTTP_OK:
       if isinstance(response_content, dict):
         msg = ("%s %s: %s" %
@@ -725,13 +792,20 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     return self._SendRequest(HTTP_DELETE, "/%s/tags" % GANETI_RAPI_VERSION,
                              query, None)
 
-  def GetInstances(self, bulk=False, reason=None):
+  def GetInstances(self, bulk=False, reason=None, fields=None, limit=None,
+                   offset=0):
     """Gets information about instances on the cluster.
 
     @type bulk: bool
     @param bulk: whether to return all information about all instances
     @type reason: string
     @param reason: the reason for executing this operation
+    @type fields: list of strings
+    @param fields: with C{bulk}, the fields to return instead of all of them
+    @type limit: int
+    @param limit: the maximum number of instances to return
+    @type offset: int
+    @param offset: the number of instances to skip, by order of their names
 
     @rtype: list of dict or list of str
     @return: if bulk is True, info about the instances, else a list of instances
@@ -739,6 +813,7 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     """
     query = []
     _AppendIf(query, bulk, ("bulk", 1))
+    _AppendPage(query, fields, limit, offset)
     _AppendReason(query, reason)
 
     instances = self._SendRequest(HTTP_GET,
@@ -1456,11 +1531,17 @@ class GanetiRapiClient(object): # pylint: disable=R0904
                              ("/%s/instances/%s/console" %
                               (GANETI_RAPI_VERSION, instance)), query, None)
 
-  def GetJobs(self, bulk=False):
+  def GetJobs(self, bulk=False, fields=None, limit=None, offset=0):
     """Gets all jobs for the cluster.
 
     @type bulk: bool
     @param bulk: Whether to return detailed information about jobs.
+    @type fields: list of strings
+    @param fields: With C{bulk}, the fields to return instead of the default
+    @type limit: int
+    @param limit: The maximum number of jobs to return
+    @type offset: int
+    @param offset: The number of jobs to skip, by order of their IDs
     @rtype: list of int
     @return: List of job ids for the cluster or list of dicts with detailed
              information about the jobs if bulk parameter was true.
@@ -1468,6 +1549,7 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     """
     query = []
     _AppendIf(query, bulk, ("bulk", 1))
+    _AppendPage(query, fields, limit, offset)
 
     if bulk:
       return self._SendRequest(HTTP_GET,
@@ -1477,7 +1559,7 @@ class GanetiRapiClient(object): # pylint: disable=R0904
       return [int(j["id"])
               for j in self._SendRequest(HTTP_GET,
                                          "/%s/jobs" % GANETI_RAPI_VERSION,
-                                         None, None)]
+                                         query or None, None)]
 
   def GetJobStatus(self, job_id):
     """Gets the status of a job.
@@ -1550,6 +1632,26 @@ class GanetiRapiClient(object): # pylint: disable=R0904
                              "/%s/jobs/%s/wait" % (GANETI_RAPI_VERSION, job_id),
                              None, body)
 
+  def WaitForJobsChange(self, jobs):
+    """Waits for the status of any of a number of jobs to change.
+
+    @type jobs: dict
+    @param jobs: the previously received status by job ID, C{None} for jobs
+      whose status isn't known yet
+    @rtype: dict
+    @return: the current status by job ID of the jobs whose status changed;
+      empty if no job changed before the server-side timeout
+
+    """
+    body = {
+      "jobs": dict((str(job_id), status)
+                   for (job_id, status) in jobs.items()),
+      }
+
+    return self._SendRequest(HTTP_GET,
+                             "/%s/jobs/wait" % GANETI_RAPI_VERSION,
+                             None, body)
+
   def CancelJob(self, job_id, dry_run=False):
     """Cancels a job.
 
@@ -1568,13 +1670,20 @@ class GanetiRapiClient(object): # pylint: disable=R0904
                              "/%s/jobs/%s" % (GANETI_RAPI_VERSION, job_id),
                              query, None)
 
-  def GetNodes(self, bulk=False, reason=None):
+  def GetNodes(self, bulk=False, reason=None, fields=None, limit=None,
+               offset=0):
     """Gets all nodes in the cluster.
 
     @type bulk: bool
     @param bulk: whether to return all information about all instances
     @type reason: string
     @param reason: the reason for executing this operation
+    @type fields: list of strings
+    @param fields: with C{bulk}, the fields to return instead of all of them
+    @type limit: int
+    @param limit: the maximum number of nodes to return
+    @type offset: int
+    @param offset: the number of nodes to skip, by order of their names
 
     @rtype: list of dict or str
     @return: if bulk is true, info about nodes in the cluster,
@@ -1583,6 +1692,7 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     """
     query = []
     _AppendIf(query, bulk, ("bulk", 1))
+    _AppendPage(query, fields, limit, offset)
     _AppendReason(query, reason)
 
     nodes = self._SendRequest(HTTP_GET, "/%s/nodes" % GANETI_RAPI_VERSION,
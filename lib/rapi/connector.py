@@ -261,6 +261,7 @@ def GetHandlers(node_name_pattern, instance_name_pattern,
       rlib2.R_2_groups_name_tags,
 
     "/2/jobs": rlib2.R_2_jobs,
+    "/2/jobs/wait": rlib2.R_2_jobs_wait,
     translate_fn("/2/jobs/", job_id):
       rlib2.R_2_jobs_id,
     translate_fn("/2/jobs/", job_id, "/wait"):
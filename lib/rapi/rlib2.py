@@ -472,10 +472,12 @@ class R_2_jobs(baserlib.ResourceBase):
     client = self.GetClient()
 
     if self.useBulk():
-      bulkdata = client.QueryJobs(None, J_FIELDS_BULK)
-      return baserlib.MapBulkFields(bulkdata, J_FIELDS_BULK)
+      fields = self.getBulkFields(J_FIELDS_BULK, allowed=J_FIELDS)
+      bulkdata = self.getPage(client.QueryJobs(None, fields))
+      return baserlib.MapBulkFields(bulkdata, fields)
     else:
-      jobdata = map(compat.fst, client.QueryJobs(None, ["id"]))
+      jobdata = self.getPage(sorted(map(compat.fst,
+                                        client.QueryJobs(None, ["id"]))))
       return baserlib.BuildUriList(jobdata, "/2/jobs/%s",
                                    uri_fields=("id", "uri"))
 
@@ -561,6 +563,47 @@ class R_2_jobs_id_wait(baserlib.ResourceBase):
       }
 
 
+class R_2_jobs_wait(baserlib.ResourceBase):
+  """/2/jobs/wait resource.
+
+  """
+  # Like /2/jobs/[job_id]/wait, this is a blocking call
+  GET_ACCESS = [rapi.RAPI_ACCESS_WRITE]
+
+  def GET(self):
+    """Waits for the status of any of a number of jobs to change.
+
+    The body parameter C{jobs} maps job IDs to the previously received
+    status of each job, or C{None} if not yet known. Returns the same
+    mapping for all jobs whose status changed, which is empty if none
+    changed in a while.
+
+    """
+    jobs = self.getBodyParameter("jobs")
+
+    if not (isinstance(jobs, dict) and jobs):
+      raise http.HttpBadRequest("The 'jobs' parameter should be a non-empty"
+                                " dictionary")
+
+    prev = []
+    for (job_id, status) in jobs.items():
+      try:
+        job_id = int(job_id)
+      except (TypeError, ValueError):
+        raise http.HttpBadRequest("Invalid job ID '%s'" % job_id)
+
+      if not (status is None or isinstance(status, basestring)):
+        raise http.HttpBadRequest("The previous status of job %s should be"
+                                  " a string or null" % job_id)
+
+      prev.append((job_id, status))
+
+    client = self.GetClient()
+    result = client.WaitForJobsChangeOnce(prev, timeout=_WFJC_TIMEOUT)
+
+    return dict((str(job_id), status) for (job_id, status) in result)
+
+
 class R_2_nodes(baserlib.OpcodeResource):
   """/2/nodes resource.
 
@@ -573,11 +616,12 @@ class R_2_nodes(baserlib.OpcodeResource):
     client = self.GetClient()
 
     if self.useBulk():
-      bulkdata = client.QueryNodes([], N_FIELDS, False)
-      return baserlib.MapBulkFields(bulkdata, N_FIELDS)
+      fields = self.getBulkFields(N_FIELDS)
+      bulkdata = self.getPage(client.QueryNodes([], fields, False))
+      return baserlib.MapBulkFields(bulkdata, fields)
     else:
       nodesdata = client.QueryNodes([], ["name"], False)
-      nodeslist = [row[0] for row in nodesdata]
+      nodeslist = self.getPage(sorted(row[0] for row in nodesdata))
       return baserlib.BuildUriList(nodeslist, "/2/nodes/%s",
                                    uri_fields=("id", "uri"))
 
@@ -1102,11 +1146,15 @@ class R_2_instances(baserlib.OpcodeResource):
 
     use_locking = self.useLocking()
     if self.useBulk():
-      bulkdata = client.QueryInstances([], I_FIELDS, use_locking)
-      return map(_UpdateBeparams, baserlib.MapBulkFields(bulkdata, I_FIELDS))
+      fields = self.getBulkFields(I_FIELDS)
+      bulkdata = self.getPage(client.QueryInstances([], fields, use_locking))
+      result = baserlib.MapBulkFields(bulkdata, fields)
+      if "beparams" in fields:
+        result = map(_UpdateBeparams, result)
+      return result
     else:
       instancesdata = client.QueryInstances([], ["name"], use_locking)
-      instanceslist = [row[0] for row in instancesdata]
+      instanceslist = self.getPage(sorted(row[0] for row in instancesdata))
       return baserlib.BuildUriList(instanceslist, "/2/instances/%s",
                                    uri_fields=("id", "uri"))
 
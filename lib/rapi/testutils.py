@@ -210,10 +210,16 @@ class FakeCurl(object):
         "%s %s" % (http.auth.HTTP_BASIC_AUTH, base64.b64encode(userpwd))
 
     path = _GetPathFromUri(url)
-    (code, _, resp_body) = \
+    (code, resp_headers, resp_body) = \
       self._handler.FetchResponse(path, method, headers, request_body)
 
     self._info[pycurl.RESPONSE_CODE] = code
+
+    headerfn = self._opts.get(pycurl.HEADERFUNCTION)
+    if headerfn and isinstance(resp_headers, dict):
+      for (name, value) in resp_headers.items():
+        headerfn("%s: %s\r\n" % (name, value))
+
     if resp_body is not None:
       writefn(resp_body)
 
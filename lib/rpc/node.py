@@ -77,6 +77,9 @@ _RPC_CLIENT_HEADERS = [
 #: Special value to describe an offline host
 _OFFLINE = object()
 
+#: Module-global pool of cURL handles, keeps connections to nodes open
+_curl_pool = None
+
 
 def Init():
   """Initializes the module-global HTTP client manager.
@@ -95,6 +98,9 @@ def Init():
 
   pycurl.global_init(pycurl.GLOBAL_ALL)
 
+  global _curl_pool # pylint: disable=W0603
+  _curl_pool = http.client.CurlHandlePool()
+
 
 def Shutdown():
   """Stops the module-global HTTP client manager.
@@ -103,6 +109,15 @@ def Shutdown():
   running.
 
   """
+  global _curl_pool # pylint: disable=W0603
+
+  if _curl_pool is not None:
+    (requests, reused) = _curl_pool.GetStatistics()
+    logging.debug("RPC connections reused for %s of %s requests",
+                  reused, requests)
+    _curl_pool.Close()
+    _curl_pool = None
+
   pycurl.global_cleanup()
 
 
@@ -167,6 +182,19 @@ def _Compress(_, data):
           base64.b64encode(zlib.compress(data, 3)))
 
 
+def _EncodeJobQueueUpdates(_, updates):
+  """Encodes a list of job queue file updates.
+
+  @type updates: list of tuples
+  @param updates: list of C{(file_name, base, content)}
+  @rtype: list of tuples
+  @return: the updates with compressed contents
+
+  """
+  return [(file_name, base, _Compress(None, content))
+          for (file_name, base, content) in updates]
+
+
 class RpcResult(object):
   """RPC Result class.
 
@@ -459,7 +487,8 @@ class _RpcProcessor(object):
       "Missing RPC read timeout for procedure '%s'" % procedure
 
     if _req_process_fn is None:
-      _req_process_fn = http.client.ProcessRequests
+      _req_process_fn = compat.partial(http.client.ProcessRequests,
+                                       pool=_curl_pool)
 
     (results, requests) = \
       self._PrepareRequests(self._resolver(nodes, resolver_opts), self._port,
@@ -786,6 +815,7 @@ _ENCODERS = {
   rpc_defs.ED_OBJECT_DICT: _ObjectToDict,
   rpc_defs.ED_OBJECT_DICT_LIST: _ObjectListToDict,
   rpc_defs.ED_COMPRESS: _Compress,
+  rpc_defs.ED_JQUEUE_UPDATES: _EncodeJobQueueUpdates,
   rpc_defs.ED_FINALIZE_EXPORT_DISKS: _PrepareFinalizeExportDisks,
   rpc_defs.ED_BLOCKDEV_RENAME: _EncodeBlockdevRename,
   }
@@ -809,6 +839,8 @@ class RpcRunner(_RpcClientBase,
 
     """
     self._cfg = cfg
+    self._lock_monitor_cb = lock_monitor_cb
+    self._req_process_fn = _req_process_fn
 
     encoders = _ENCODERS.copy()
 
@@ -848,6 +880,22 @@ class RpcRunner(_RpcClientBase,
     _generated_rpc.RpcClientDnsOnly.__init__(self)
     _generated_rpc.RpcClientDefault.__init__(self)
 
+  def GetDetachedRunner(self, node_uuids):
+    """Returns a runner for calls to the given nodes not using the config.
+
+    The nodes are resolved right away. The returned runner can therefore be
+    used from other threads, but only for calls whose arguments are encoded
+    without the configuration, e.g. C{call_hooks_runner}.
+
+    @type node_uuids: list of string
+    @param node_uuids: the nodes the calls will be made to
+
+    """
+    hosts = _NodeConfigResolver(self._cfg.GetNodeInfo,
+                                self._cfg.GetAllNodesInfo, node_uuids, None)
+    return _DetachedRunner(hosts, lock_monitor_cb=self._lock_monitor_cb,
+                           _req_process_fn=self._req_process_fn)
+
   def _NicDict(self, _, nic):
     """Convert the given nic to a dict and encapsulate netinfo
 
@@ -968,8 +1016,10 @@ class RpcRunner(_RpcClientBase,
 
     """
     if ieio == constants.IEIO_RAW_DISK:
-      assert len(ieioargs) == 2
-      return (ieio, (self._SingleDiskDictDP(node, ieioargs), ))
+      # An optional third element selects the part of the disk to transfer
+      assert len(ieioargs) in (2, 3)
+      return (ieio, (self._SingleDiskDictDP(node, ieioargs[:2]), ) +
+              tuple(ieioargs[2:]))
 
     if ieio == constants.IEIO_SCRIPT:
       assert len(ieioargs) == 2
@@ -978,6 +1028,29 @@ class RpcRunner(_RpcClientBase,
     return (ieio, ieioargs)
 
 
+class _DetachedRunner(_RpcClientBase, _generated_rpc.RpcClientDefault):
+  """RPC runner for nodes resolved beforehand.
+
+  See L{RpcRunner.GetDetachedRunner}.
+
+  """
+  def __init__(self, hosts, lock_monitor_cb=None, _req_process_fn=None):
+    """Initializes this class.
+
+    @type hosts: list of tuples
+    @param hosts: the resolved nodes as (name, IP address, node UUID)
+
+    """
+    addresses = dict((uuid, (name, ip, uuid)) for (name, ip, uuid) in hosts)
+    resolver = lambda node_uuids, _: [addresses[uuid] for uuid in node_uuids]
+
+    # pylint: disable=W0233
+    _RpcClientBase.__init__(self, resolver, _ENCODERS.get,
+                            lock_monitor_cb=lock_monitor_cb,
+                            _req_process_fn=_req_process_fn)
+    _generated_rpc.RpcClientDefault.__init__(self)
+
+
 class JobQueueRunner(_RpcClientBase, _generated_rpc.RpcClientJobQueue):
   """RPC wrappers for job queue.
 
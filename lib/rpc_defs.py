@@ -82,7 +82,8 @@ ACCEPT_OFFLINE_NODE = object()
  ED_MULTI_DISKS_DICT_DP,
  ED_SINGLE_DISK_DICT_DP,
  ED_NIC_DICT,
- ED_DEVICE_DICT) = range(1, 17)
+ ED_DEVICE_DICT,
+ ED_JQUEUE_UPDATES) = range(1, 18)
 
 
 def _Prepare(calls):
@@ -649,6 +650,10 @@ CALLS = {
       ("file_name", None, None),
       ("content", ED_COMPRESS, None),
       ], None, None, "Update job queue file"),
+    ("jobqueue_update_many", MULTI, None, constants.RPC_TMO_URGENT, [
+      ("updates", ED_JQUEUE_UPDATES,
+       "List of (file name, delta base or None, content)"),
+      ], None, None, "Update several job queue files, possibly as deltas"),
     ("jobqueue_purge", SINGLE, None, constants.RPC_TMO_NORMAL, [], None, None,
      "Purge job queue"),
     ("jobqueue_rename", MULTI, None, constants.RPC_TMO_URGENT, [
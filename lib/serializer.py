@@ -38,6 +38,7 @@ backend (currently json).
 # C0103: Invalid name, since pylint doesn't see that Dump points to a
 # function and not a constant
 
+import logging
 import re
 
 # Python 2.6 and above contain a JSON module based on simplejson. Unfortunately
@@ -53,6 +54,100 @@ from ganeti import constants
 
 _RE_EOLSP = re.compile("[ \t]+$", re.MULTILINE)
 
+_PRIVATE_FIELDS = frozenset(constants.PRIVATE_PARAMETERS_BLACKLIST)
+
+#: Approximate size of the parts returned by L{DumpJsonChunks}
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+class _JsonBackend(object):
+  """A JSON implementation usable by this module.
+
+  """
+  def __init__(self, name, module):
+    """Initializes this class.
+
+    @type name: string
+    @param name: the name of the backend
+    @param module: a module with simplejson-compatible C{dumps} and C{loads}
+
+    """
+    self.name = name
+    self.module = module
+
+  def Dumps(self, data, default):
+    return self.module.dumps(data, default=default)
+
+  def Loads(self, txt, object_hook):
+    return self.module.loads(txt, object_hook=object_hook)
+
+
+def _GetSimplejsonBackend():
+  return _JsonBackend("simplejson", simplejson)
+
+
+def _GetJsonBackend():
+  import json # pylint: disable=W0404
+  return _JsonBackend("json", json)
+
+
+#: Functions returning the available JSON backends, by order of preference;
+#: the standard library module returns unicode strings where simplejson
+#: returns byte strings, so it is only used if selected explicitly
+_BACKENDS = [
+  _GetSimplejsonBackend,
+  _GetJsonBackend,
+  ]
+
+
+def _FindJsonBackends():
+  """Returns all usable JSON backends, in the order of L{_BACKENDS}.
+
+  """
+  backends = []
+  for fn in _BACKENDS:
+    try:
+      backends.append(fn())
+    except ImportError, err:
+      logging.debug("JSON backend %s is not available: %s", fn.__name__, err)
+  return backends
+
+
+_available_backends = _FindJsonBackends()
+_backend = _available_backends[0]
+
+
+def GetJsonBackends():
+  """Returns the names of the available JSON backends.
+
+  @rtype: list of strings
+  @return: the backend names, the one used by default first
+
+  """
+  return [backend.name for backend in _available_backends]
+
+
+def GetJsonBackend():
+  """Returns the name of the JSON backend in use.
+
+  """
+  return _backend.name
+
+
+def SetJsonBackend(name):
+  """Selects the JSON backend to use.
+
+  @type name: string
+  @param name: the name of the backend, see L{GetJsonBackends}
+
+  """
+  global _backend # pylint: disable=W0603
+  for backend in _available_backends:
+    if backend.name == name:
+      _backend = backend
+      return
+  raise errors.ProgrammerError("Unknown JSON backend '%s'" % name)
+
 
 def DumpJson(data, private_encoder=None):
   """Serialize a given object.
@@ -67,15 +162,60 @@ def DumpJson(data, private_encoder=None):
   if private_encoder is None:
     # Do not leak private fields by default.
     private_encoder = EncodeWithoutPrivateFields
-  encoded = simplejson.dumps(data, default=private_encoder)
+  txt = _backend.Dumps(data, private_encoder)
 
-  txt = _RE_EOLSP.sub("", encoded)
+  # Compact JSON contains no line breaks, so only look for trailing whitespace
+  # if there are any
+  if "\n" in txt:
+    txt = _RE_EOLSP.sub("", txt)
   if not txt.endswith("\n"):
     txt += "\n"
 
   return txt
 
 
+def DumpJsonChunks(data, private_encoder=None, chunk_size=JSON_CHUNK_SIZE):
+  """Serialize a given object in parts.
+
+  Lists are encoded one element at a time, so large query results don't
+  have to be encoded into a single string. Joining the parts gives the same
+  result as L{DumpJson}.
+
+  @param data: the data to serialize
+  @param private_encoder: see L{DumpJson}
+  @type chunk_size: int
+  @param chunk_size: the size from which on a part is returned
+  @return: a generator for the parts of the string representation
+
+  """
+  if not isinstance(data, (list, tuple)):
+    yield DumpJson(data, private_encoder=private_encoder)
+    return
+
+  if private_encoder is None:
+    private_encoder = EncodeWithoutPrivateFields
+
+  buf = ["["]
+  size = 1
+
+  for (idx, item) in enumerate(data):
+    if idx:
+      # Same separator as used by the backends for compact output
+      buf.append(", ")
+    txt = _backend.Dumps(item, private_encoder)
+    buf.append(txt)
+    size += len(txt) + 2
+
+    if size >= chunk_size:
+      yield "".join(buf)
+      buf = []
+      size = 0
+
+  buf.append("]\n")
+
+  yield "".join(buf)
+
+
 def LoadJson(txt):
   """Unserialize data from a string.
 
@@ -84,12 +224,30 @@ def LoadJson(txt):
   @raise JSONDecodeError: if L{txt} is not a valid JSON document
 
   """
-  values = simplejson.loads(txt)
+  # Private fields are wrapped while decoding, see L{_WrapPrivateFields}
+  return _backend.Loads(txt, _WrapPrivateFields)
+
 
-  # Hunt and seek for Private fields and wrap them.
-  WrapPrivateValues(values)
+def _WrapPrivateFields(data):
+  """Wraps the private fields of a decoded JSON object.
 
-  return values
+  This is used as the object hook when decoding, so it is called for every
+  JSON object, innermost first, and the decoded document doesn't need to be
+  crawled again (see L{WrapPrivateValues}).
+
+  @type data: dict
+  @param data: the decoded object
+  @return: the object, with its private fields wrapped
+
+  """
+  for field in _PRIVATE_FIELDS.intersection(data):
+    value = data[field]
+    if not field.endswith("_cluster"):
+      data[field] = PrivateDict(value)
+    elif value is not None:
+      for os in value:
+        value[os] = PrivateDict(value[os])
+  return data
 
 
 def WrapPrivateValues(json):
@@ -173,8 +331,6 @@ def LoadSignedJson(txt, key):
   """
   signed_dict = LoadJson(txt)
 
-  WrapPrivateValues(signed_dict)
-
   if not isinstance(signed_dict, dict):
     raise errors.SignatureError("Invalid external message")
   try:
@@ -118,8 +118,8 @@ def _DecodeImportExportIO(ieio, ieioargs):
 
   """
   if ieio == constants.IEIO_RAW_DISK:
-    assert len(ieioargs) == 1
-    return (objects.Disk.FromDict(ieioargs[0]), )
+    assert len(ieioargs) in (1, 2)
+    return (objects.Disk.FromDict(ieioargs[0]), ) + tuple(ieioargs[1:])
 
   if ieio == constants.IEIO_SCRIPT:
     assert len(ieioargs) == 2
@@ -1200,6 +1200,15 @@ class NodeRequestHandler(http.server.HttpServerHandler):
     (file_name, content) = params
     return backend.JobQueueUpdate(file_name, content)
 
+  @staticmethod
+  @_RequireJobQueueLock
+  def perspective_jobqueue_update_many(params):
+    """Update several job queue files.
+
+    """
+    (updates, ) = params
+    return backend.JobQueueUpdateMany(updates)
+
   @staticmethod
   @_RequireJobQueueLock
   def perspective_jobqueue_purge(params):
@@ -1325,6 +1334,16 @@ def CheckNoded(options, args):
                           sys.argv[0])
     sys.exit(constants.EXIT_FAILURE)
 
+  if options.http_workers < 0 or options.http_worker_max_requests < 0:
+    print >> sys.stderr, ("%s --http-workers and --http-worker-max-requests"
+                          " arguments must be >= 0" % sys.argv[0])
+    sys.exit(constants.EXIT_FAILURE)
+
+  if options.http_keep_alive_timeout < 0:
+    print >> sys.stderr, ("%s --http-keep-alive-timeout argument must be"
+                          " >= 0" % sys.argv[0])
+    sys.exit(constants.EXIT_FAILURE)
+
   try:
     codecs.lookup("string-escape")
   except LookupError:
@@ -1441,7 +1460,10 @@ def PrepNoded(options, _):
       mainloop, options.bind_address, options.port, options.max_clients,
       handler, ssl_params=ssl_params, ssl_verify_peer=True,
       request_executor_class=request_executor_class,
-      ssl_verify_callback=SSLVerifyPeer)
+      ssl_verify_callback=SSLVerifyPeer,
+      worker_count=options.http_workers,
+      worker_max_requests=options.http_worker_max_requests,
+      keep_alive_timeout=options.http_keep_alive_timeout)
   server.Start()
 
   return (mainloop, server)
@@ -1474,6 +1496,20 @@ def Main():
                     default=20, type="int",
                     help="Number of simultaneous connections accepted"
                     " by noded")
+  parser.add_option("--http-workers", dest="http_workers",
+                    default=0, type="int",
+                    help="Number of pre-forked worker processes handling"
+                    " requests (0 forks a new process for every connection)")
+  parser.add_option("--http-worker-max-requests",
+                    dest="http_worker_max_requests",
+                    default=1000, type="int",
+                    help="Number of connections handled by a worker process"
+                    " before it is replaced (0 for no limit)")
+  parser.add_option("--http-keep-alive-timeout",
+                    dest="http_keep_alive_timeout",
+                    default=0, type="float",
+                    help="Seconds to keep idle connections open for further"
+                    " requests (0 disables persistent connections)")
 
   daemon.GenericMain(constants.NODED, parser, CheckNoded, PrepNoded, ExecNoded,
                      default_ssl_cert=pathutils.NODED_CERT_FILE,
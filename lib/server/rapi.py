@@ -39,6 +39,7 @@ import logging
 import optparse
 import sys
 
+from ganeti import compat
 from ganeti import constants
 from ganeti import http
 from ganeti import daemon
@@ -197,9 +198,31 @@ class RemoteApiHandler(http.auth.HttpServerRequestAuthentication,
     except rpcerr.ProtocolError, err:
       raise http.HttpBadGateway(str(err))
 
+    # Encoding errors must be reported before the response is started, hence
+    # the body is encoded first and only compressed and sent in parts
+    chunks = list(serializer.DumpJsonChunks(result))
+
+    if req.request_method.upper() == http.HTTP_GET:
+      # Clients polling a resource can send the entity tag of the last
+      # response to only receive the body if it changed
+      digest = compat.sha1_hash()
+      for chunk in chunks:
+        digest.update(chunk)
+      etag = "\"%s\"" % digest.hexdigest()
+      if req.request_headers:
+        if_none_match = req.request_headers.get(http.HTTP_IF_NONE_MATCH)
+      else:
+        if_none_match = None
+      if http.MatchesEntityTag(if_none_match, etag):
+        raise http.HttpNotModified(headers={http.HTTP_ETAG: etag})
+      req.resp_headers[http.HTTP_ETAG] = etag
+
     req.resp_headers[http.HTTP_CONTENT_TYPE] = http.HTTP_APP_JSON
 
-    return serializer.DumpJson(result)
+    if len(chunks) == 1:
+      return chunks[0]
+
+    return iter(chunks)
 
 
 def CheckRapi(options, args):
@@ -216,6 +239,11 @@ def CheckRapi(options, args):
                           sys.argv[0])
     sys.exit(constants.EXIT_FAILURE)
 
+  if options.http_workers < 0 or options.http_worker_max_requests < 0:
+    print >> sys.stderr, ("%s --http-workers and --http-worker-max-requests"
+                          " arguments must be >= 0" % sys.argv[0])
+    sys.exit(constants.EXIT_FAILURE)
+
   ssconf.CheckMaster(options.debug)
 
   # Read SSL certificate (this is a little hackish to read the cert as root)
@@ -242,7 +270,14 @@ def PrepRapi(options, _):
 
   server = http.server.HttpServer(
       mainloop, options.bind_address, options.port, options.max_clients,
-      handler, ssl_params=options.ssl_params, ssl_verify_peer=False)
+      handler, ssl_params=options.ssl_params, ssl_verify_peer=False,
+      worker_count=options.http_workers,
+      worker_max_requests=options.http_worker_max_requests)
+
+  if options.http_workers and not options.pamauth:
+    # Workers only know the users file contents at the time they were forked
+    authenticator.reload_fn = server.RestartWorkers
+
   server.Start()
 
   return (mainloop, server)
@@ -282,6 +317,15 @@ def Main():
                     default=20, type="int",
                     help="Number of simultaneous connections accepted"
                     " by ganeti-rapi")
+  parser.add_option("--http-workers", dest="http_workers",
+                    default=0, type="int",
+                    help="Number of pre-forked worker processes handling"
+                    " requests (0 forks a new process for every connection)")
+  parser.add_option("--http-worker-max-requests",
+                    dest="http_worker_max_requests",
+                    default=1000, type="int",
+                    help="Number of connections handled by a worker process"
+                    " before it is replaced (0 for no limit)")
 
   daemon.GenericMain(constants.RAPI, parser, CheckRapi, PrepRapi, ExecRapi,
                      default_ssl_cert=pathutils.RAPI_CERT_FILE,
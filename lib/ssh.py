@@ -904,7 +904,7 @@ class SshRunner(object):
 
     return not result.failed
 
-  def VerifyNodeHostname(self, node, ssh_port):
+  def VerifyNodeHostname(self, node, ssh_port, timeout=None):
     """Verify hostname consistency via SSH.
 
     This functions connects via ssh to a node and compares the hostname
@@ -918,6 +918,9 @@ class SshRunner(object):
     @param node: nodename of a host to check; can be short or
         full qualified hostname
     @param ssh_port: the port of a SSH daemon running on the node
+    @type timeout: int or float
+    @param timeout: if not None, the time in seconds after which the ssh
+        process is killed and the check fails
 
     @return: (success, detail), where:
         - success: True/False
@@ -929,8 +932,9 @@ class SshRunner(object):
            "else"
            "  echo \"$GANETI_HOSTNAME\";"
            "fi")
-    retval = self.Run(node, constants.SSH_LOGIN_USER, cmd,
-                      quiet=False, port=ssh_port)
+    retval = utils.RunCmd(self.BuildCmd(node, constants.SSH_LOGIN_USER, cmd,
+                                        quiet=False, port=ssh_port),
+                          timeout=timeout)
 
     if retval.failed:
       msg = "ssh problem"
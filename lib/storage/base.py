@@ -30,7 +30,12 @@
 
 """Block device abstraction - base class and utility functions"""
 
+import errno
+import fcntl
 import logging
+import os
+import stat
+import struct
 
 from ganeti import objects
 from ganeti import constants
@@ -38,6 +43,16 @@ from ganeti import utils
 from ganeti import errors
 
 
+#: Directory with the sysfs entries of block devices by device number
+_SYSFS_BLOCK_DIR = "/sys/dev/block"
+
+#: Size of the sectors in which sysfs reports block device sizes
+_SYSFS_SECTOR_SIZE = 512
+
+#: Returns the size of a block device in bytes (see linux/fs.h)
+_BLKGETSIZE64 = 0x80081272
+
+
 class BlockDev(object):
   """Block device abstract class.
 
@@ -258,6 +273,61 @@ class BlockDev(object):
             "count=%s" % self.size,
             "iflag=direct"]
 
+  def _CheckRangeTransfer(self):
+    """Checks whether parts of the device can be imported or exported.
+
+    This relies on the dd(1) commands used by L{Import} and L{Export}, so
+    devices overriding them don't support transferring parts of their data.
+
+    """
+    if (self.Import.im_func is not BlockDev.Import.im_func or
+        self.Export.im_func is not BlockDev.Export.im_func):
+      ThrowError("Device %s doesn't support transferring parts of its data",
+                 self.dev_path)
+
+  def ImportRange(self, offset, size):
+    """Builds the shell command for importing data to a part of the device.
+
+    This allows several parts of the device to be imported in parallel.
+
+    @type offset: int
+    @param offset: offset in MiB of the part
+    @type size: int
+    @param size: size in MiB of the part
+    @rtype: list of strings
+    @return: List containing the import command for the part
+
+    """
+    self._CheckRangeTransfer()
+
+    assert size > 0
+
+    # The input is a pipe, only write full blocks as direct I/O requires them
+    return self.Import() + ["seek=%d" % offset, "iflag=fullblock"]
+
+  def ExportRange(self, offset, size):
+    """Builds the shell command for exporting data from a part of the device.
+
+    @type offset: int
+    @param offset: offset in MiB of the part
+    @type size: int
+    @param size: size in MiB of the part
+    @rtype: list of strings
+    @return: List containing the export command for the part
+
+    """
+    self._CheckRangeTransfer()
+
+    if not self.minor and not self.Attach():
+      ThrowError("Can't attach to source device during Export()")
+
+    return [constants.DD_CMD,
+            "if=%s" % self.dev_path,
+            "bs=%s" % constants.DD_BLOCK_SIZE,
+            "skip=%d" % offset,
+            "count=%d" % size,
+            "iflag=direct"]
+
   def Snapshot(self, snap_name, snap_size):
     """Creates a snapshot of the block device.
 
@@ -416,15 +486,10 @@ class BlockDev(object):
 
     """
     assert self.attached, "BlockDevice not attached in GetActualSize()"
-    result = utils.RunCmd(["blockdev", "--getsize64", self.dev_path])
-    if result.failed:
-      ThrowError("blockdev failed (%s): %s",
-                  result.fail_reason, result.output)
     try:
-      sz = int(result.output.strip())
-    except (ValueError, TypeError), err:
-      ThrowError("Failed to parse blockdev output: %s", str(err))
-    return sz
+      return GetBlockDevSize(self.dev_path)
+    except EnvironmentError, err:
+      ThrowError("Can't get the size of %s: %s", self.dev_path, err)
 
   def GetActualSpindles(self):
     """Return the actual number of spindles used.
@@ -496,3 +561,41 @@ def IgnoreError(fn, *args, **kwargs):
   except errors.BlockDeviceError, err:
     logging.warning("Caught BlockDeviceError but ignoring: %s", str(err))
     return False
+
+
+def GetBlockDevSize(path, _stat_fn=os.stat, _sysfs_dir=_SYSFS_BLOCK_DIR,
+                    _ioctl_fn=fcntl.ioctl):
+  """Returns the size of a block device in bytes.
+
+  The size is read from sysfs, which doesn't require opening the device.
+  If that fails, it is queried with the C{BLKGETSIZE64} ioctl.
+
+  @type path: string
+  @param path: the path of the block device
+  @rtype: int
+  @return: the size of the device in bytes
+  @raise EnvironmentError: if the path isn't a block device or its size
+    can't be determined
+
+  """
+  st = _stat_fn(path)
+  if not stat.S_ISBLK(st.st_mode):
+    raise EnvironmentError(errno.ENOTBLK, "Not a block device", path)
+
+  sysfs_file = utils.PathJoin(_sysfs_dir,
+                              "%d:%d" % (os.major(st.st_rdev),
+                                         os.minor(st.st_rdev)),
+                              "size")
+  try:
+    return int(utils.ReadFile(sysfs_file).strip()) * _SYSFS_SECTOR_SIZE
+  except (EnvironmentError, ValueError), err:
+    logging.debug("Can't read the size of %s from %s, using an ioctl: %s",
+                  path, sysfs_file, err)
+
+  fd = os.open(path, os.O_RDONLY)
+  try:
+    buf = _ioctl_fn(fd, _BLKGETSIZE64, struct.pack("Q", 0))
+  finally:
+    os.close(fd)
+
+  return struct.unpack("Q", buf)[0]
@@ -46,6 +46,7 @@ from ganeti import compat
 from ganeti import serializer
 from ganeti.storage import base
 from ganeti.storage import drbd
+from ganeti.storage import lvm_cache
 from ganeti.storage.filestorage import FileStorage
 from ganeti.storage.gluster import GlusterStorage
 from ganeti.storage.extstorage import ExtStorageDevice
@@ -69,6 +70,22 @@ def _CheckResult(result):
                     result.cmd, result.fail_reason, result.output)
 
 
+def _RunLvmChangeCmd(cmd):
+  """Runs an LVM command changing volumes or volume groups.
+
+  Cached outputs of LVM reporting commands are invalidated afterwards,
+  even if the command failed.
+
+  @param cmd: the command
+  @return: result from RunCmd
+
+  """
+  try:
+    return utils.RunCmd(cmd)
+  finally:
+    lvm_cache.Invalidate()
+
+
 class LogicalVolume(base.BlockDev):
   """Logical Volume block device.
 
@@ -217,7 +234,8 @@ class LogicalVolume(base.BlockDev):
     # stripes
     cmd = ["lvcreate", "-L%dm" % size, "-n%s" % lv_name]
     for stripes_arg in range(stripes, 0, -1):
-      result = utils.RunCmd(cmd + ["-i%d" % stripes_arg] + [vg_name] + pvlist)
+      result = _RunLvmChangeCmd(cmd + ["-i%d" % stripes_arg] + [vg_name] +
+                                pvlist)
       if not result.failed:
         break
     if result.failed:
@@ -242,7 +260,7 @@ class LogicalVolume(base.BlockDev):
     cmd = [lvm_cmd, "--noheadings", "--nosuffix", "--units=m", "--unbuffered",
            "--separator=%s" % sep, "-o%s" % ",".join(fields)]
 
-    result = utils.RunCmd(cmd)
+    result = lvm_cache.RunReportCmd(cmd)
     if result.failed:
       raise errors.CommandError("Can't get the volume information: %s - %s" %
                                 (result.fail_reason, result.output))
@@ -419,8 +437,8 @@ class LogicalVolume(base.BlockDev):
     if not self.minor and not self.Attach():
       # the LV does not exist
       return
-    result = utils.RunCmd(["lvremove", "-f", "%s/%s" %
-                           (self._vg_name, self._lv_name)])
+    result = _RunLvmChangeCmd(["lvremove", "-f", "%s/%s" %
+                               (self._vg_name, self._lv_name)])
     if result.failed:
       base.ThrowError("Can't lvremove: %s - %s",
                       result.fail_reason, result.output)
@@ -436,7 +454,7 @@ class LogicalVolume(base.BlockDev):
       raise errors.ProgrammerError("Can't move a logical volume across"
                                    " volume groups (from %s to to %s)" %
                                    (self._vg_name, new_vg))
-    result = utils.RunCmd(["lvrename", new_vg, self._lv_name, new_name])
+    result = _RunLvmChangeCmd(["lvrename", new_vg, self._lv_name, new_name])
     if result.failed:
       base.ThrowError("Failed to rename the logical volume: %s", result.output)
     self._lv_name = new_name
@@ -491,7 +509,7 @@ class LogicalVolume(base.BlockDev):
     return (path, (status, major, minor, pe_size, stripes, pv_names))
 
   @staticmethod
-  def GetLvGlobalInfo(_run_cmd=utils.RunCmd):
+  def GetLvGlobalInfo(_run_cmd=lvm_cache.RunReportCmd):
     """Obtain the current state of the existing LV disks.
 
     @return: a dict containing the state of each disk with the disk path as key
@@ -546,7 +564,7 @@ class LogicalVolume(base.BlockDev):
     (also possibly after disk issues).
 
     """
-    result = utils.RunCmd(["lvchange", "-ay", self.dev_path])
+    result = _RunLvmChangeCmd(["lvchange", "-ay", self.dev_path])
     if result.failed:
       base.ThrowError("Can't activate lv %s: %s", self.dev_path, result.output)
 
@@ -637,8 +655,8 @@ class LogicalVolume(base.BlockDev):
       base.ThrowError("Not enough free space: required %s,"
                       " available %s", snap_size, free_size)
 
-    _CheckResult(utils.RunCmd(["lvcreate", "-L%dm" % snap_size, "-s",
-                               "-n%s" % snap_name, self.dev_path]))
+    _CheckResult(_RunLvmChangeCmd(["lvcreate", "-L%dm" % snap_size, "-s",
+                                   "-n%s" % snap_name, self.dev_path]))
 
     return (self._vg_name, snap_name)
 
@@ -653,8 +671,8 @@ class LogicalVolume(base.BlockDev):
     raw_tags = result.stdout.strip()
     if raw_tags:
       for tag in raw_tags.split(","):
-        _CheckResult(utils.RunCmd(["lvchange", "--deltag",
-                                   tag.strip(), self.dev_path]))
+        _CheckResult(_RunLvmChangeCmd(["lvchange", "--deltag",
+                                       tag.strip(), self.dev_path]))
 
   def SetInfo(self, text):
     """Update metadata with info text.
@@ -671,7 +689,8 @@ class LogicalVolume(base.BlockDev):
     # Only up to 128 characters are allowed
     text = text[:128]
 
-    _CheckResult(utils.RunCmd(["lvchange", "--addtag", text, self.dev_path]))
+    _CheckResult(_RunLvmChangeCmd(["lvchange", "--addtag", text,
+                                   self.dev_path]))
 
   def _GetGrowthAvaliabilityExclStor(self):
     """Return how much the disk can grow with exclusive storage.
@@ -724,8 +743,8 @@ class LogicalVolume(base.BlockDev):
     # they have less constraints); also note that only recent LVM
     # supports 'cling'
     for alloc_policy in "contiguous", "cling", "normal":
-      result = utils.RunCmd(cmd + ["--alloc", alloc_policy, self.dev_path] +
-                            pvlist)
+      result = _RunLvmChangeCmd(cmd + ["--alloc", alloc_policy,
+                                       self.dev_path] + pvlist)
       if not result.failed:
         return
     base.ThrowError("Can't grow LV %s: %s", self.dev_path, result.output)
@@ -46,6 +46,7 @@ import logging
 from ganeti import errors
 from ganeti import constants
 from ganeti import utils
+from ganeti.storage import lvm_cache
 
 
 def _ParseSize(value):
@@ -315,7 +316,7 @@ class _LvmBase(_Base): # pylint: disable=W0223
     """Run LVM command.
 
     """
-    result = utils.RunCmd(args)
+    result = lvm_cache.RunReportCmd(args)
 
     if result.failed:
       raise errors.StorageError("Failed to run %r, command output: %s" %
@@ -393,6 +394,7 @@ class LvmPvStorage(_LvmBase): # pylint: disable=W0223
     args.append(name)
 
     result = utils.RunCmd(args)
+    lvm_cache.Invalidate()
     if result.failed:
       raise errors.StorageError("Failed to modify physical volume,"
                                 " pvchange output: %s" %
@@ -453,6 +455,8 @@ class LvmVgStorage(_LvmBase):
                            "--force", name])
       vgreduce_output += "\n" + result.output
 
+    lvm_cache.Invalidate()
+
     result = _runcmd_fn([self.LIST_COMMAND, "--noheadings",
                          "--nosuffix", name])
     # we also need to check the output
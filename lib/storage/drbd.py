@@ -270,15 +270,10 @@ class DRBD8Dev(base.BlockDev):
     @param meta_device: the path to the device to check
 
     """
-    result = utils.RunCmd(["blockdev", "--getsize", meta_device])
-    if result.failed:
-      base.ThrowError("Failed to get device size: %s - %s",
-                      result.fail_reason, result.output)
     try:
-      sectors = int(result.stdout)
-    except (TypeError, ValueError):
-      base.ThrowError("Invalid output from blockdev: '%s'", result.stdout)
-    num_bytes = sectors * 512
+      num_bytes = base.GetBlockDevSize(meta_device)
+    except EnvironmentError, err:
+      base.ThrowError("Failed to get device size: %s", err)
     if num_bytes < 128 * 1024 * 1024: # less than 128MiB
       base.ThrowError("Meta device too small (%.2fMib)",
                       (num_bytes / 1024 / 1024))
@@ -444,7 +444,8 @@ def ExtStorageFromDisk(name, base_dir=None):
                      Defaults to a search in all the ES_SEARCH_PATH dirs.
   @rtype: tuple
   @return: True and the ExtStorage instance if we find a valid one, or
-      False and the diagnose message on error
+      False and the diagnose message on error; the result is cached as long
+      as the provider directory doesn't change and must not be modified
 
   """
   if base_dir is None:
@@ -458,6 +459,22 @@ def ExtStorageFromDisk(name, base_dir=None):
     return False, ("Directory for External Storage Provider %s not"
                    " found in search path" % name)
 
+  return _ES_CACHE.Get(es_dir)
+
+
+def _LoadExtStorageFromDir(es_dir):
+  """Create an ExtStorage instance from an ExtStorage directory.
+
+  @type es_dir: string
+  @param es_dir: the directory of the provider, whose name is the provider
+      name
+  @rtype: tuple
+  @return: True and the ExtStorage instance if it is a valid one, or
+      False and the diagnose message on error
+
+  """
+  name = os.path.basename(es_dir)
+
   # ES Files dictionary: this will be populated later with the absolute path
   # names for each script; currently we denote for each script if it is
   # required (True) or optional (False)
@@ -506,6 +523,12 @@ def ExtStorageFromDisk(name, base_dir=None):
   return True, es_obj
 
 
+#: ExtStorage providers of this process, reloaded when their directory
+#: changes; only long-lived processes such as noded workers
+#: (C{--http-workers}) benefit from it
+_ES_CACHE = utils.DirectoryCache(_LoadExtStorageFromDir)
+
+
 def _ExtStorageEnvironment(unique_id, ext_params,
                            size=None, grow=None, metadata=None,
                            name=None, uuid=None,
@@ -0,0 +1,540 @@
+#
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Streaming of disk images onto block devices.
+
+Images are read in chunks, decompressed on the fly if needed and written in
+large aligned blocks, bypassing the page cache where possible. Writing happens
+in a separate thread, so that downloading and decompressing the next blocks
+overlaps with writing the previous ones.
+
+"""
+
+import errno
+import fcntl
+import mmap
+import os
+import Queue
+import stat
+import struct
+import threading
+import time
+import zlib
+
+try:
+  import lzma # pylint: disable=F0401
+except ImportError:
+  try:
+    from backports import lzma # pylint: disable=F0401
+  except ImportError:
+    lzma = None
+
+try:
+  import zstandard # pylint: disable=F0401
+except ImportError:
+  zstandard = None
+
+from ganeti import errors
+
+
+#: Size of the blocks written to the device
+BLOCK_SIZE = 4 * 1024 * 1024
+
+#: Number of blocks being filled, queued or written at the same time
+QUEUE_DEPTH = 4
+
+#: Alignment required for writes bypassing the page cache
+_DIRECT_ALIGNMENT = 4096
+
+#: Zeroes a range of a block device (see linux/fs.h)
+_BLKZEROOUT = 0x127f
+
+IMAGE_RAW = "raw"
+IMAGE_GZIP = "gzip"
+IMAGE_XZ = "xz"
+IMAGE_ZSTD = "zstd"
+
+#: Magic numbers of compressed image formats
+_MAGIC = [
+  ("\x1f\x8b", IMAGE_GZIP),
+  ("\xfd7zXZ\x00", IMAGE_XZ),
+  ("\x28\xb5\x2f\xfd", IMAGE_ZSTD),
+  ]
+
+_MAGIC_LEN = max(len(magic) for (magic, _) in _MAGIC)
+
+
+class _RawDecompressor(object):
+  """Passes uncompressed images through.
+
+  """
+  def Decompress(self, data): # pylint: disable=R0201
+    yield data
+
+  def Flush(self): # pylint: disable=R0201
+    return []
+
+
+class _GzipDecompressor(object):
+  """Decompresses gzip images, possibly consisting of several members.
+
+  """
+  def __init__(self):
+    self._obj = self._NewObj()
+
+  @staticmethod
+  def _NewObj():
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+  def Decompress(self, data):
+    while data:
+      # Limit the output, highly compressed images would otherwise need a lot
+      # of memory
+      try:
+        yield self._obj.decompress(data, BLOCK_SIZE)
+      except zlib.error, err:
+        raise errors.BlockDeviceError("Invalid gzip image: %s" % err)
+
+      if self._obj.unconsumed_tail:
+        data = self._obj.unconsumed_tail
+      else:
+        data = self._obj.unused_data
+        if data:
+          self._obj = self._NewObj()
+
+  def Flush(self):
+    return [self._obj.flush()]
+
+
+class _XzDecompressor(object):
+  """Decompresses xz images.
+
+  """
+  def __init__(self):
+    if lzma is None:
+      raise errors.BlockDeviceError("Can't decompress xz images, the lzma"
+                                    " module is not available")
+    self._obj = lzma.LZMADecompressor()
+
+  def Decompress(self, data):
+    try:
+      yield self._obj.decompress(data)
+    except lzma.LZMAError, err:
+      raise errors.BlockDeviceError("Invalid xz image: %s" % err)
+
+  def Flush(self): # pylint: disable=R0201
+    return []
+
+
+class _ZstdDecompressor(object):
+  """Decompresses zstd images.
+
+  """
+  def __init__(self):
+    if zstandard is None:
+      raise errors.BlockDeviceError("Can't decompress zstd images, the"
+                                    " zstandard module is not available")
+    self._obj = zstandard.ZstdDecompressor().decompressobj()
+
+  def Decompress(self, data):
+    try:
+      yield self._obj.decompress(data)
+    except zstandard.ZstdError, err:
+      raise errors.BlockDeviceError("Invalid zstd image: %s" % err)
+
+  def Flush(self): # pylint: disable=R0201
+    return []
+
+
+_DECOMPRESSORS = {
+  IMAGE_RAW: _RawDecompressor,
+  IMAGE_GZIP: _GzipDecompressor,
+  IMAGE_XZ: _XzDecompressor,
+  IMAGE_ZSTD: _ZstdDecompressor,
+  }
+
+
+def DetectImageFormat(header):
+  """Determines the format of an image from its first bytes.
+
+  @type header: string
+  @param header: the start of the image
+  @rtype: string
+  @return: one of the C{IMAGE_*} formats
+
+  """
+  for (magic, fmt) in _MAGIC:
+    if header.startswith(magic):
+      return fmt
+  return IMAGE_RAW
+
+
+def _OpenTarget(path):
+  """Opens a device for writing, bypassing the page cache if possible.
+
+  @rtype: tuple; (int, bool)
+  @return: the file descriptor and whether the page cache is bypassed
+
+  """
+  try:
+    return (os.open(path, os.O_WRONLY | os.O_DIRECT), True)
+  except OSError, err:
+    # Some file systems don't support direct I/O
+    if err.errno != errno.EINVAL:
+      raise
+  return (os.open(path, os.O_WRONLY), False)
+
+
+class ImageWriter(object):
+  """Writes data sequentially to a device in large aligned blocks.
+
+  Data passed to L{Write} is collected in page-aligned buffers, which a
+  separate thread writes to the device once they are full. Blocks containing
+  only zeroes are not written, but zeroed on the device, which is usually
+  much faster and keeps thinly provisioned devices sparse.
+
+  """
+  def __init__(self, path, max_size, block_size=BLOCK_SIZE,
+               queue_depth=QUEUE_DEPTH):
+    """Initializes this class.
+
+    @type path: string
+    @param path: the device or file to write to
+    @type max_size: int
+    @param max_size: the maximum number of bytes to write
+    @type block_size: int
+    @param block_size: size of the blocks to write, must be a multiple of 4096
+    @type queue_depth: int
+    @param queue_depth: the number of blocks to buffer
+
+    """
+    assert block_size % _DIRECT_ALIGNMENT == 0
+    assert queue_depth >= 2
+
+    self._max_size = max_size
+    self._block_size = block_size
+    self._start = time.time()
+
+    try:
+      (self._fd, self._direct) = _OpenTarget(path)
+      self._zero_out = stat.S_ISBLK(os.fstat(self._fd).st_mode)
+    except EnvironmentError, err:
+      raise errors.BlockDeviceError("Can't open '%s' for writing: %s" %
+                                    (path, err))
+
+    self._zeroes = "\0" * block_size
+    self._zero_block = mmap.mmap(-1, block_size)
+
+    # Anonymous memory maps are page-aligned, as required for direct I/O
+    self._free = Queue.Queue()
+    for _ in range(queue_depth):
+      self._free.put(mmap.mmap(-1, block_size))
+    self._pending = Queue.Queue()
+    self._buf = self._free.get()
+    self._fill = 0
+
+    self._offset = 0
+    self._zero_run = 0
+    self._error = None
+
+    self.size = 0
+    self.written = 0
+    self.zeroed = 0
+
+    self._thread = threading.Thread(target=self._Run, name="image-writer")
+    self._thread.daemon = True
+    self._thread.start()
+
+  def _CheckError(self):
+    if self._error is not None:
+      raise errors.BlockDeviceError("Can't write image: %s" % self._error)
+
+  def _Submit(self):
+    """Queues the current buffer for writing and gets an empty one.
+
+    """
+    self._pending.put((self._buf, self._fill))
+    self._buf = self._free.get()
+    self._fill = 0
+    self._CheckError()
+
+  def Write(self, data):
+    """Writes data following the data written so far.
+
+    @type data: string
+    @param data: the data to write
+
+    """
+    if self.size + len(data) > self._max_size:
+      raise errors.BlockDeviceError("Disk image larger than the disk")
+    self.size += len(data)
+
+    offset = 0
+    while offset < len(data):
+      count = min(len(data) - offset, self._block_size - self._fill)
+      self._buf[self._fill:self._fill + count] = data[offset:offset + count]
+      self._fill += count
+      offset += count
+      if self._fill == self._block_size:
+        self._Submit()
+
+  def _Finish(self):
+    """Stops the writer thread after all queued blocks have been written.
+
+    """
+    if self._fd is None:
+      return
+    self._pending.put(None)
+    self._thread.join()
+    os.close(self._fd)
+    self._fd = None
+
+  def Close(self):
+    """Writes the remaining data and closes the device.
+
+    @rtype: dict
+    @return: statistics about the written image
+
+    """
+    if self._fill:
+      self._pending.put((self._buf, self._fill))
+    self._Finish()
+    self._CheckError()
+
+    return {
+      "size": self.size,
+      "written": self.written,
+      "zeroed": self.zeroed,
+      "duration": time.time() - self._start,
+      }
+
+  def Abort(self):
+    """Closes the device, discarding data not yet written.
+
+    """
+    self._Finish()
+
+  def _Run(self):
+    """Writes queued blocks until L{_Finish} is called.
+
+    """
+    while True:
+      item = self._pending.get()
+      if item is None:
+        break
+
+      (buf, length) = item
+      try:
+        # After an error blocks are only recycled, so that the main thread
+        # doesn't wait for buffers forever
+        if self._error is None:
+          self._WriteBlock(buf, length)
+      except Exception, err: # pylint: disable=W0703
+        # Any error must be recorded, as the main thread would wait for free
+        # buffers forever if this thread died
+        self._error = err
+      self._free.put(buf)
+
+    try:
+      if self._error is None:
+        self._FlushZeroRun()
+        os.fsync(self._fd)
+    except Exception, err: # pylint: disable=W0703
+      self._error = err
+
+  def _WriteBlock(self, buf, length):
+    """Writes a block, or records it as zeroes.
+
+    """
+    aligned = (length % _DIRECT_ALIGNMENT == 0)
+
+    # Buffer objects are compared without copying the data
+    if (self._zero_out and aligned and
+        buffer(buf, 0, length) == buffer(self._zeroes, 0, length)):
+      self._zero_run += length
+      return
+
+    self._FlushZeroRun()
+
+    if self._direct and not aligned:
+      # Only the last block can be partial; write it through the page cache
+      flags = fcntl.fcntl(self._fd, fcntl.F_GETFL)
+      fcntl.fcntl(self._fd, fcntl.F_SETFL, flags & ~os.O_DIRECT)
+      self._direct = False
+
+    self._WriteAll(buf, length)
+    self.written += length
+
+  def _WriteAll(self, buf, length):
+    done = 0
+    while done < length:
+      done += os.write(self._fd, buffer(buf, done, length - done))
+    self._offset += length
+
+  def _FlushZeroRun(self):
+    """Zeroes the range of the device skipped so far.
+
+    """
+    if not self._zero_run:
+      return
+
+    length = self._zero_run
+    self._zero_run = 0
+
+    if self._zero_out:
+      try:
+        fcntl.ioctl(self._fd, _BLKZEROOUT,
+                    struct.pack("QQ", self._offset, length))
+      except IOError, err:
+        if err.errno not in (errno.ENOTTY, errno.EOPNOTSUPP, errno.EINVAL):
+          raise
+        # Not supported by the device, write the zeroes instead
+        self._zero_out = False
+      else:
+        self._offset += length
+        os.lseek(self._fd, self._offset, os.SEEK_SET)
+        self.zeroed += length
+        return
+
+    while length:
+      count = min(length, self._block_size)
+      self._WriteAll(self._zero_block, count)
+      self.written += count
+      length -= count
+
+
+class ImageStream(object):
+  """Decompresses an image and writes it to a device.
+
+  """
+  def __init__(self, writer):
+    """Initializes this class.
+
+    @type writer: L{ImageWriter}
+    @param writer: the writer for the target device
+
+    """
+    self._writer = writer
+    self._header = ""
+    self._decompressor = None
+    self.format = None
+
+  def _Write(self, chunks):
+    for chunk in chunks:
+      if chunk:
+        self._writer.Write(chunk)
+
+  def Feed(self, data):
+    """Processes the next part of the image.
+
+    @type data: string
+    @param data: the image data following the data fed so far
+
+    """
+    if self._decompressor is None:
+      # The format is only known once the magic number has been received
+      self._header += data
+      if len(self._header) < _MAGIC_LEN:
+        return
+      data = self._StartDecompressor()
+
+    self._Write(self._decompressor.Decompress(data))
+
+  def _StartDecompressor(self):
+    self.format = DetectImageFormat(self._header)
+    self._decompressor = _DECOMPRESSORS[self.format]()
+    (data, self._header) = (self._header, "")
+    return data
+
+  def Finish(self):
+    """Writes the remaining data and closes the device.
+
+    @rtype: dict
+    @return: statistics about the written image, see L{ImageWriter.Close}
+
+    """
+    try:
+      if self._decompressor is None:
+        # The image is shorter than any magic number
+        data = self._StartDecompressor()
+        self._Write(self._decompressor.Decompress(data))
+      self._Write(self._decompressor.Flush())
+    except:
+      self.Abort()
+      raise
+
+    result = self._writer.Close()
+    result["format"] = self.format
+    return result
+
+  def Abort(self):
+    """Closes the device after an error.
+
+    """
+    self._writer.Abort()
+
+
+def DumpImageFile(source_path, target_path, max_size):
+  """Writes an image file, possibly compressed, to a device.
+
+  @type source_path: string
+  @param source_path: path of the image
+  @type target_path: string
+  @param target_path: path of the device
+  @type max_size: int
+  @param max_size: maximum number of bytes to write
+  @rtype: dict
+  @return: statistics about the written image, see L{ImageStream.Finish}
+
+  """
+  try:
+    source = open(source_path, "rb")
+  except EnvironmentError, err:
+    raise errors.BlockDeviceError("Can't open image '%s': %s" %
+                                  (source_path, err))
+
+  try:
+    stream = ImageStream(ImageWriter(target_path, max_size))
+    try:
+      while True:
+        try:
+          data = source.read(BLOCK_SIZE)
+        except EnvironmentError, err:
+          raise errors.BlockDeviceError("Can't read image '%s': %s" %
+                                        (source_path, err))
+        if not data:
+          break
+        stream.Feed(data)
+    except:
+      stream.Abort()
+      raise
+    return stream.Finish()
+  finally:
+    source.close()
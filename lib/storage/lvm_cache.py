@@ -0,0 +1,201 @@
+#
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Node-local cache for the output of LVM reporting commands.
+
+Running C{lvs}, C{pvs} or C{vgs} can take a long time on nodes with many
+logical volumes, and many node daemon RPCs run them. Their output is
+cached for a short time in L{pathutils.LVM_CACHE_DIR}, so that it is
+shared by all processes of the node daemon. A cached output is only used
+if it was obtained
+
+  - less than L{_CACHE_TTL} seconds ago,
+  - after the last call to L{Invalidate}, which has to follow every change
+    Ganeti makes to the LVM state, and
+  - after the last change of the device mapper devices in C{/dev/mapper},
+    which catches volumes created, removed or renamed outside of Ganeti.
+
+"""
+
+import errno
+import logging
+import os
+import time
+
+from ganeti import compat
+from ganeti import pathutils
+from ganeti import serializer
+from ganeti import utils
+
+
+#: Number of seconds a cached output is valid for
+_CACHE_TTL = 10.0
+
+#: Directory whose modification time changes whenever a device mapper device
+#: is created, removed or renamed
+_DM_DIR = "/dev/mapper"
+
+#: Name of the file whose contents change on every invalidation
+_GENERATION_FILE = "generation"
+
+
+def _GetCacheFile(cache_dir, cmd):
+  """Returns the path of the file caching the output of a command.
+
+  """
+  digest = compat.sha1_hash("\0".join(cmd)).hexdigest()
+  return utils.PathJoin(cache_dir, "report-%s" % digest)
+
+
+def _GetStamp(cache_dir, dm_dir):
+  """Returns an identifier for the current LVM state.
+
+  @rtype: list
+  @return: the current generation and the modification time of the device
+    mapper directory, either of them None if unavailable
+
+  """
+  try:
+    generation = utils.ReadFile(utils.PathJoin(cache_dir, _GENERATION_FILE))
+  except EnvironmentError:
+    generation = None
+
+  try:
+    dm_mtime = os.stat(dm_dir).st_mtime
+  except EnvironmentError:
+    dm_mtime = None
+
+  return [generation, dm_mtime]
+
+
+def _ReadCache(filename, cmd, stamp, now):
+  """Reads a cached command output.
+
+  @return: the cached standard output and error, or None if there is no
+    valid cached output
+
+  """
+  try:
+    cached = serializer.LoadJson(utils.ReadFile(filename))
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      logging.warning("Can't read LVM cache file %s: %s", filename, err)
+    return None
+  except ValueError, err:
+    logging.warning("Invalid LVM cache file %s: %s", filename, err)
+    return None
+
+  if (cached.get("cmd") != cmd or cached.get("stamp") != stamp or
+      not 0 <= now - cached.get("timestamp", 0) < _CACHE_TTL):
+    return None
+
+  return (cached["stdout"].encode("utf-8"), cached["stderr"].encode("utf-8"))
+
+
+def _WriteCache(filename, cmd, stamp, now, result):
+  """Stores a command output in the cache.
+
+  Nothing is cached if the cache directory doesn't exist.
+
+  """
+  try:
+    data = serializer.DumpJson({
+      "cmd": cmd,
+      "stamp": stamp,
+      "timestamp": now,
+      "stdout": result.stdout,
+      "stderr": result.stderr,
+      })
+  except (TypeError, ValueError), err:
+    logging.debug("Can't cache the output of %s: %s", cmd, err)
+    return
+
+  try:
+    utils.WriteFile(filename, data=data, mode=0600)
+  except EnvironmentError, err:
+    if err.errno != errno.ENOENT:
+      logging.warning("Can't write LVM cache file %s: %s", filename, err)
+
+
+def RunReportCmd(cmd, _run_cmd=None, _cache_dir=pathutils.LVM_CACHE_DIR,
+                 _dm_dir=_DM_DIR, _time_fn=time.time):
+  """Runs an LVM reporting command, using a cached output if possible.
+
+  Only the output of successful commands is cached.
+
+  @type cmd: list
+  @param cmd: the command, e.g. C{["lvs", "--noheadings", ...]}
+  @rtype: L{utils.process.RunResult}
+  @return: the result of the command
+
+  """
+  if _run_cmd is None:
+    _run_cmd = utils.RunCmd
+
+  filename = _GetCacheFile(_cache_dir, cmd)
+  stamp = _GetStamp(_cache_dir, _dm_dir)
+  now = _time_fn()
+
+  cached = _ReadCache(filename, cmd, stamp, now)
+  if cached is not None:
+    (stdout, stderr) = cached
+    # pylint: disable=W0212
+    return utils.RunResult(0, None, stdout, stderr, cmd,
+                           utils.process._TIMEOUT_NONE, None)
+
+  result = _run_cmd(cmd)
+  if not result.failed:
+    # The stamp from before running the command is stored, so that the output
+    # is discarded if the state changed while the command was running
+    _WriteCache(filename, cmd, stamp, now, result)
+
+  return result
+
+
+def Invalidate(_cache_dir=pathutils.LVM_CACHE_DIR):
+  """Invalidates all cached LVM command outputs of this node.
+
+  This has to be called after every change to logical volumes, physical
+  volumes or volume groups.
+
+  """
+  filename = utils.PathJoin(_cache_dir, _GENERATION_FILE)
+  try:
+    utils.WriteFile(filename, data=utils.NewUUID(), mode=0600)
+  except EnvironmentError, err:
+    if err.errno == errno.ENOENT:
+      # Without the cache directory, nothing has been cached
+      return
+    logging.error("Can't invalidate the LVM cache, removing it: %s", err)
+    try:
+      for name in utils.ListVisibleFiles(_cache_dir):
+        utils.RemoveFile(utils.PathJoin(_cache_dir, name))
+    except EnvironmentError, err:
+      logging.error("Can't remove the LVM cache: %s", err)
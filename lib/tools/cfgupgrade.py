@@ -46,12 +46,14 @@ from cStringIO import StringIO
 
 from ganeti import cli
 from ganeti import constants
+from ganeti import errors
 from ganeti import serializer
 from ganeti import utils
 from ganeti import bootstrap
 from ganeti import config
 from ganeti import pathutils
 from ganeti import netutils
+from ganeti import network
 
 from ganeti.utils import version
 
@@ -64,6 +66,8 @@ TARGET_MINOR = 18
 DOWNGRADE_MAJOR = 2
 #: Target minor version for downgrade
 DOWNGRADE_MINOR = 17
+#: Maximum number of addresses of a network in the downgrade version
+DOWNGRADE_MAX_NETWORK_ADDRESSES = 2 ** 16
 
 # map of legacy device types
 # (mapping differing old LD_* constants to new DT_* constants)
@@ -729,9 +733,31 @@ class CfgUpgrade(object):
 
   # DOWNGRADE ------------------------------------------------------------
 
+  @OrFail("Downgrading network address pools")
+  def DowngradeNetworks(self):
+    """Converts the address pools back to strings of 0s and 1s.
+
+    """
+    # pylint can't infer config_data type
+    # pylint: disable=E1103
+    for net in self.config_data.get("networks", {}).values():
+      for key in ["reservations", "ext_reservations"]:
+        value = net.get(key, None)
+        if value is None:
+          continue
+        try:
+          net[key] = network.ReservationsToBitString(
+            value, max_size=DOWNGRADE_MAX_NETWORK_ADDRESSES)
+        except errors.AddressPoolError, err:
+          raise Error("Can't downgrade network %s, version %s.%s only"
+                      " supports networks up to /16: %s" %
+                      (net.get("name"), DOWNGRADE_MAJOR, DOWNGRADE_MINOR,
+                       err))
+
   def DowngradeAll(self):
     self.config_data["version"] = version.BuildVersion(DOWNGRADE_MAJOR,
                                                        DOWNGRADE_MINOR, 0)
+    self.DowngradeNetworks()
 
     return not self.errors
 
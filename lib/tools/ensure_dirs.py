@@ -196,6 +196,8 @@ def GetPaths():
      getent.luxid_uid, getent.daemons_gid, False),
     (pathutils.BDEV_CACHE_DIR, DIR, 0755,
      getent.noded_uid, getent.masterd_gid),
+    (pathutils.LVM_CACHE_DIR, DIR, 0700,
+     getent.noded_uid, getent.masterd_gid),
     (pathutils.UIDPOOL_LOCKDIR, DIR, 0750,
      getent.noded_uid, getent.masterd_gid),
     (pathutils.DISK_LINKS_DIR, DIR, 0755,
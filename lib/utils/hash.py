@@ -33,6 +33,7 @@
 
 import os
 import hmac
+import stat
 
 from ganeti import compat
 
@@ -101,11 +102,50 @@ def _FingerprintFile(filename):
   return fp.hexdigest()
 
 
-def FingerprintFiles(files):
+def _CachedFingerprintFile(filename, cache):
+  """Compute the fingerprint of a file unless it's cached.
+
+  @type filename: str
+  @param filename: the filename to checksum
+  @type cache: dict
+  @param cache: filenames as keys, lists of inode number, modification
+      time, size and fingerprint as values
+  @rtype: str
+  @return: the hex digest of the sha checksum of the contents
+      of the file, or None if the file doesn't exist
+
+  """
+  try:
+    st = os.stat(filename)
+  except EnvironmentError:
+    st = None
+
+  if st is None or not stat.S_ISREG(st.st_mode):
+    cache.pop(filename, None)
+    return None
+
+  key = [st.st_ino, st.st_mtime, st.st_size]
+  entry = cache.get(filename)
+  if entry and list(entry[:3]) == key:
+    return entry[3]
+
+  cksum = _FingerprintFile(filename)
+  if cksum:
+    cache[filename] = key + [cksum]
+  else:
+    cache.pop(filename, None)
+  return cksum
+
+
+def FingerprintFiles(files, cache=None):
   """Compute fingerprints for a list of files.
 
   @type files: list
   @param files: the list of filename to fingerprint
+  @type cache: dict
+  @param cache: if given, files whose inode number, modification time and
+      size are unchanged aren't read again; the dictionary is updated to
+      hold exactly the files fingerprinted by this call
   @rtype: dict
   @return: a dictionary filename: fingerprint, holding only
       existing files
@@ -114,8 +154,15 @@ def FingerprintFiles(files):
   ret = {}
 
   for filename in files:
-    cksum = _FingerprintFile(filename)
+    if cache is None:
+      cksum = _FingerprintFile(filename)
+    else:
+      cksum = _CachedFingerprintFile(filename, cache)
     if cksum:
       ret[filename] = cksum
 
+  if cache is not None:
+    for filename in set(cache) - set(ret):
+      del cache[filename]
+
   return ret
@@ -332,6 +332,81 @@ def SafeWriteFile(file_name, file_id, **kwargs):
     os.close(fd)
 
 
+def GetDirectoryID(path):
+  """Returns the 'id' of a directory and the files in it.
+
+  The id changes whenever a file is added to, removed from or renamed in the
+  directory, and whenever the inode, mode, size or modification time of one
+  of its files changes. Symbolic links are followed.
+
+  @type path: string
+  @param path: the directory path
+  @return: a tuple of the directory's (device number, inode number, mtime)
+      and a sorted list of (name, inode number, mode, size, mtime) for the
+      files in it, the latter four being None for broken symlinks
+
+  """
+  st = os.stat(path)
+  files = []
+  for name in sorted(os.listdir(path)):
+    try:
+      fst = os.stat(PathJoin(path, name))
+    except EnvironmentError, err:
+      if err.errno != errno.ENOENT:
+        raise
+      files.append((name, None, None, None, None))
+    else:
+      files.append((name, fst.st_ino, fst.st_mode, fst.st_size,
+                    fst.st_mtime))
+
+  return ((st.st_dev, st.st_ino, st.st_mtime), files)
+
+
+class DirectoryCache(object):
+  """Cache for values computed from the contents of directories.
+
+  A cached value is only returned as long as the L{GetDirectoryID} of its
+  directory doesn't change. Cached values are shared between callers and
+  must not be modified.
+
+  """
+  def __init__(self, load_fn, _id_fn=GetDirectoryID):
+    """Initializes this class.
+
+    @type load_fn: callable
+    @param load_fn: function computing the value for a directory path
+
+    """
+    self._load_fn = load_fn
+    self._id_fn = _id_fn
+    self._entries = {}
+
+  def Get(self, path):
+    """Returns the value for a directory, computing it if necessary.
+
+    @type path: string
+    @param path: the directory path
+
+    """
+    try:
+      dir_id = self._id_fn(path)
+    except EnvironmentError, err:
+      logging.debug("Can't get the id of directory %s, not caching: %s",
+                    path, err)
+      self._entries.pop(path, None)
+      return self._load_fn(path)
+
+    entry = self._entries.get(path)
+    if entry is not None and entry[0] == dir_id:
+      return entry[1]
+
+    # The id is taken before loading the value, so that changes made while
+    # loading it cause it to be loaded again on the next call
+    value = self._load_fn(path)
+    self._entries[path] = (dir_id, value)
+    return value
+
+
 def ReadOneLineFile(file_name, strict=False):
   """Return the first non-empty line from a file.
 
@@ -721,6 +721,31 @@ hooksPhasePost = "post"
 hooksPhasePre :: String
 hooksPhasePre = "pre"
 
+-- | Phase used to run the asynchronous post-phase scripts of a node, after
+-- the other post-phase scripts reported them as deferred
+hooksPhasePostDeferred :: String
+hooksPhasePostDeferred = "post-deferred"
+
+-- | Prefix of the line in which a hook script declares its flags
+hooksScriptFlagsPrefix :: String
+hooksScriptFlagsPrefix = "# ganeti-hook:"
+
+-- | Flag of hook scripts that can run concurrently with the other scripts
+hooksFlagIndependent :: String
+hooksFlagIndependent = "independent"
+
+-- | Flag of post-phase hook scripts that run without delaying the operation
+hooksFlagAsync :: String
+hooksFlagAsync = "async"
+
+-- | Time in seconds independent hook scripts of a directory have to finish
+hooksIndependentTimeout :: Int
+hooksIndependentTimeout = 5 * 60
+
+-- | Maximum number of hook scripts run at the same time on a node
+hooksMaxConcurrent :: Int
+hooksMaxConcurrent = 8
+
 hooksVersion :: Int
 hooksVersion = 2
 
@@ -772,6 +797,9 @@ hkrFail = 1
 hkrSuccess :: Int
 hkrSuccess = 2
 
+hkrDeferred :: Int
+hkrDeferred = 3
+
 -- * Storage types
 
 stBlock :: String
@@ -3412,6 +3440,34 @@ nvSshSetup = "ssh-setup"
 nvSshClutter :: String
 nvSshClutter = "ssh-clutter"
 
+-- | Result-only key of node verify, holding the latency of the
+-- successful 'nvNodelist' and 'nvNodenettest' probes
+nvLatency :: String
+nvLatency = "latency"
+
+-- | Node names mapped to the tokens returned by their last node verify;
+-- in the result, the new token and the digests of all sections. Sections
+-- unchanged since the given token are left out of the result.
+nvIncremental :: String
+nvIncremental = "incremental"
+
+-- | Maximum number of concurrent connectivity probes in node verify
+nodeVerifyProbeThreads :: Int
+nodeVerifyProbeThreads = 16
+
+-- | Time limit (in seconds) for all connectivity probes of one node
+-- verify; probes not started within it are reported as failed
+nodeVerifyProbeTimeout :: Int
+nodeVerifyProbeTimeout = 5 * 60
+
+-- | SSH latency (in seconds) above which cluster verify warns
+nodeVerifySlowSsh :: Double
+nodeVerifySlowSsh = 5.0
+
+-- | TCP connect latency (in seconds) above which cluster verify warns
+nodeVerifySlowTcp :: Double
+nodeVerifySlowTcp = 1.0
+
 -- * Instance status
 
 inststAdmindown :: String
@@ -3502,6 +3558,11 @@ sslCertExpirationWarn = 30
 iallocatorVersion :: Int
 iallocatorVersion = 2
 
+-- | Time (in seconds) for which the live node data gathered for an
+-- allocator run is reused by later runs
+iallocatorNodeDataTtl :: Int
+iallocatorNodeDataTtl = 15
+
 iallocatorDirIn :: String
 iallocatorDirIn = Types.iAllocatorTestDirToRaw IAllocatorDirIn
 
@@ -3575,6 +3636,11 @@ jobQueueSizeHardLimit = 5000
 jobQueueFilesPerms :: Int
 jobQueueFilesPerms = 0o640
 
+-- | Suffix of the file holding the log entries appended to a running job
+-- since its job file was last written
+jobLogSegmentSuffix :: String
+jobLogSegmentSuffix = ".log"
+
 -- * Unchanged job return
 
 jobNotchanged :: String
@@ -5143,6 +5209,9 @@ luxiReqSubmitManyJobs = "SubmitManyJobs"
 luxiReqWaitForJobChange :: String
 luxiReqWaitForJobChange = "WaitForJobChange"
 
+luxiReqWaitForJobsChange :: String
+luxiReqWaitForJobsChange = "WaitForJobsChange"
+
 luxiReqPickupJob :: String
 luxiReqPickupJob = "PickupJob"
 
@@ -5230,6 +5299,7 @@ luxiReqAll =
   , luxiReqSubmitJobToDrainedQueue
   , luxiReqSubmitManyJobs
   , luxiReqWaitForJobChange
+  , luxiReqWaitForJobsChange
   , luxiReqPickupJob
   , luxiReqQueryFilters
   , luxiReqReplaceFilter
@@ -5516,11 +5586,8 @@ ipv4NetworkMinSize :: Int
 ipv4NetworkMinSize = 30
 
 -- The maximum size of a network.
---
--- FIXME: This limit is for performance reasons. Remove when refactoring
--- for performance tuning was successful.
 ipv4NetworkMaxSize :: Int
-ipv4NetworkMaxSize = 30
+ipv4NetworkMaxSize = 8
 
 -- * Data Collectors
 
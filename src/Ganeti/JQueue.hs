@@ -56,6 +56,7 @@ module Ganeti.JQueue
     , calcJobPriority
     , jobFileName
     , liveJobFile
+    , liveJobLogSegment
     , archivedJobFile
     , determineJobDirectories
     , getJobIDs
@@ -132,7 +133,8 @@ import Ganeti.OpCodes.Lens (metaParamsL, opReasonL)
 import Ganeti.Path
 import Ganeti.Query.Exec as Exec
 import Ganeti.Rpc (executeRpcCall, ERpcError, logRpcErrors,
-                   RpcCallJobqueueUpdate(..), RpcCallJobqueueRename(..))
+                   RpcCallJobqueueUpdate(..), RpcCallJobqueueUpdateMany(..),
+                   RpcCallJobqueueRename(..))
 import Ganeti.Runtime (GanetiDaemon(..), GanetiGroup(..), MiscGroup(..))
 import Ganeti.Types
 import Ganeti.Utils
@@ -328,6 +330,11 @@ parseJobFileId path =
 liveJobFile :: FilePath -> JobId -> FilePath
 liveJobFile rootdir jid = rootdir </> jobFileName jid
 
+-- | Computes the full path to the log segment of a live job, holding the
+-- log entries appended since its job file was last written.
+liveJobLogSegment :: FilePath -> JobId -> FilePath
+liveJobLogSegment rootdir jid = liveJobFile rootdir jid ++ C.jobLogSegmentSuffix
+
 -- | Computes the full path to an archives job. BROKEN.
 archivedJobFile :: FilePath -> JobId -> FilePath
 archivedJobFile rootdir jid =
@@ -454,9 +461,42 @@ readJobDataFromDisk rootdir archived jid = do
 noSuchJob :: Result (QueuedJob, Bool)
 noSuchJob = Bad "Can't load job file"
 
+-- | Reads the log segment of a live job, as pairs of opcode index and
+-- log entry. Lines which can't be parsed, in particular an incomplete
+-- last line of a concurrent append, are ignored.
+readJobLogSegment :: FilePath -> JobId
+                     -> IO [(Int, (Int, Timestamp, ELogType, JSValue))]
+readJobLogSegment rootdir jid = do
+  let path = liveJobLogSegment rootdir jid
+  contents <- (readFile path >>= \s -> length s `seq` return s)
+                `Control.Exception.catch`
+                ignoreIOError "" True ("Failed to read log segment " ++ path)
+  let complete = if null contents || last contents == '\n'
+                   then lines contents
+                   else init $ lines contents
+      decodeLine l = case Text.JSON.decode l of
+                       Text.JSON.Ok entry -> Just entry
+                       Text.JSON.Error _ -> Nothing
+  return $ mapMaybe decodeLine complete
+
+-- | Adds the entries of a job's log segment which are newer than all the
+-- log entries in its job file.
+mergeJobLogSegment :: [(Int, (Int, Timestamp, ELogType, JSValue))]
+                      -> QueuedJob -> QueuedJob
+mergeJobLogSegment [] job = job
+mergeJobLogSegment entries job =
+  let serial = maximum $ 0 : [ s | op <- qjOps job, (s, _, _, _) <- qoLog op ]
+      new = filter (\(_, (s, _, _, _)) -> s > serial) entries
+      addEntries idx op =
+        op { qoLog = qoLog op ++ [ e | (i, e) <- new, i == idx ] }
+  in job { qjOps = zipWith addEntries [0..] (qjOps job) }
+
 -- | Loads a job from disk.
 loadJobFromDisk :: FilePath -> Bool -> JobId -> IO (Result (QueuedJob, Bool))
 loadJobFromDisk rootdir archived jid = do
+  -- the log segment has to be read first, as its entries are removed once
+  -- they have been written to the job file
+  segment <- readJobLogSegment rootdir jid
   raw <- readJobDataFromDisk rootdir archived jid
   -- note: we need some stricness below, otherwise the wrapping in a
   -- Result will create too much lazyness, and not close the file
@@ -464,7 +504,7 @@ loadJobFromDisk rootdir archived jid = do
   return $! case raw of
              Nothing -> noSuchJob
              Just (str, arch) ->
-               liftM (\qj -> (qj, arch)) .
+               liftM (\qj -> (mergeJobLogSegment segment qj, arch)) .
                fromJResult "Parsing job file" $ Text.JSON.decode str
 
 -- | Write a job to disk.
@@ -487,10 +527,17 @@ replicateJob rootdir mastercandidates job = do
   _ <- logRpcErrors result
   return result
 
--- | Replicate many jobs to all master candidates.
+-- | Replicate many jobs to all master candidates, using a single RPC call.
 replicateManyJobs :: FilePath -> [Node] -> [QueuedJob] -> IO ()
-replicateManyJobs rootdir mastercandidates =
-  mapM_ (replicateJob rootdir mastercandidates)
+replicateManyJobs _ _ [] = return ()
+replicateManyJobs rootdir mastercandidates jobs = do
+  let update job = do
+        filename' <- makeVirtualPath . liveJobFile rootdir $ qjId job
+        return (filename', Text.JSON.encode $ Text.JSON.showJSON job)
+  updates <- mapM update jobs
+  callresult <- executeRpcCall mastercandidates
+                  $ RpcCallJobqueueUpdateMany updates
+  void . logRpcErrors $ map (second (() <$)) callresult
 
 -- | Writes a job to a file and replicates it to master candidates.
 writeAndReplicateJob :: (FromString e)
@@ -714,6 +761,11 @@ archiveSomeJobsUntil replicateFn qDir endt cutt arch torepl (jid:jids) = do
                                  ++ " failed unexpectedly: " ++ s
                   continue
                 Ok () -> do
+                  -- a log segment left behind is fully contained in the
+                  -- archived job file
+                  let segment = liveJobLogSegment qDir jid
+                  removeFile segment `Control.Exception.catch`
+                    ignoreIOError () True ("Failed to remove " ++ segment)
                   let torepl' = jid:torepl
                   if length torepl' >= 10
                     then do
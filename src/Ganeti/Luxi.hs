@@ -166,6 +166,10 @@ $(genLuxiOp "LuxiOp"
      , simpleField "prev_log" [t| JSValue |]
      , simpleField "tmout"    [t| Int     |]
      ])
+  , (luxiReqWaitForJobsChange,
+     [ simpleField "jobs"  [t| [(JobId, JSValue)] |]
+     , simpleField "tmout" [t| Int                |]
+     ])
   , (luxiReqPickupJob,
      [ simpleField "job" [t| JobId |] ]
     )
@@ -306,6 +310,9 @@ decodeLuxiCall method args = do
                     J.readJSON e
                   _ -> J.Error "Not enough values"
               return $ WaitForJobChange jid fields pinfo pidx wtmout
+    ReqWaitForJobsChange -> do
+              (jobs, wtmout) <- fromJVal args
+              return $ WaitForJobsChange jobs wtmout
     ReqPickupJob -> do
               [jid] <- fromJVal args
               return $ PickupJob jid
@@ -104,11 +104,11 @@ newPoolArray net = do
   when (numhosts > ipv4NetworkMaxNumHosts) . failError $
     "A big network with " ++ show numhosts ++ " host(s) is currently"
     ++ " not supported, please specify at most a /"
-    ++ show ipv4NetworkMaxNumHosts ++ " network"
+    ++ show C.ipv4NetworkMaxSize ++ " network"
   when (numhosts < ipv4NetworkMinNumHosts) . failError $
     "A network with only " ++ show numhosts ++ " host(s) is too small,"
     ++ " please specify at least a /"
-    ++ show ipv4NetworkMinNumHosts ++ " network"
+    ++ show C.ipv4NetworkMinSize ++ " network"
   return $ BA.zeroes (fromInteger numhosts)
 
 -- | Creates a new bit array pool of the appropriate size
@@ -133,6 +133,7 @@ import qualified Ganeti.Constants as C
 import qualified Ganeti.ConstantUtils as ConstantUtils
 import Ganeti.JSON (DictObject(..), Container, emptyContainer, GenericContainer)
 import Ganeti.Objects.BitArray (BitArray)
+import qualified Ganeti.Objects.BitArray as BA
 import Ganeti.Objects.Disk
 import Ganeti.Objects.Maintenance
 import Ganeti.Objects.Nic
@@ -239,9 +240,44 @@ instance JSON Ip4Network where
 newtype AddressPool = AddressPool { apReservations :: BitArray }
   deriving (Eq, Ord, Show)
 
+-- | Converts an address pool into its compact representation,
+-- @size:ranges@, where the ranges of reserved addresses are separated by
+-- commas and given as @first-last@, or just as the index of a single address.
+addressPoolToString :: AddressPool -> String
+addressPoolToString (AddressPool ba) =
+  show (BA.size ba) ++ ":" ++ intercalate "," (map showRange $ BA.ranges ba)
+  where
+    showRange (i, j) | i == j    = show i
+                     | otherwise = show i ++ "-" ++ show j
+
+-- | Parses the compact representation of an address pool, see
+-- 'addressPoolToString'.
+addressPoolFromString :: String -> J.Result AddressPool
+addressPoolFromString s =
+  case sepSplit ':' s of
+    [sz, rs] -> do
+      sz' <- tryRead "address pool size" sz
+      rs' <- mapM readRange . filter (not . null) $ sepSplit ',' rs
+      either J.Error (return . AddressPool) $ BA.fromRanges sz' rs'
+    _ -> fail $ "Can't parse address pool from string " ++ s
+  where
+    readRange r =
+      case sepSplit '-' r of
+        [i] -> liftM (\i' -> (i', i')) $ tryRead "address index" i
+        [i, j] -> liftM2 (,) (tryRead "first address index" i)
+                             (tryRead "last address index" j)
+        _ -> fail $ "Can't parse address range " ++ r
+
+-- | Address pools are serialized in their compact representation. The former
+-- representation as a string of @0@ and @1@ for each address is still
+-- accepted.
 instance JSON AddressPool where
-  showJSON = showJSON . apReservations
-  readJSON = liftM AddressPool . readJSON
+  showJSON = showJSON . addressPoolToString
+  readJSON v = do
+    s <- readJSON v
+    if ':' `elem` s
+      then addressPoolFromString s
+      else liftM AddressPool $ readJSON v
 
 -- ** Ganeti \"network\" config object.
 
@@ -53,6 +53,9 @@ module Ganeti.Objects.BitArray
   , asString
   , fromList
   , toList
+  , toIndexList
+  , ranges
+  , fromRanges
   ) where
 
 import Prelude hiding (foldr)
@@ -151,6 +154,30 @@ fromList xs =
   -- in one pass.
   BitArray (length xs) (IS.fromList . map fst . filter snd . zip [0..] $ xs)
 
+-- | Lists the indices of all bits set in an array, in ascending order.
+toIndexList :: BitArray -> [Int]
+toIndexList (BitArray _ bits) = IS.toAscList bits
+
+-- | Lists the maximal ranges of bits set in an array, as pairs of their
+-- first and last index, in ascending order.
+ranges :: BitArray -> [(Int, Int)]
+ranges = start . toIndexList
+  where
+    start [] = []
+    start (i:is) = extend i i is
+    extend i j (k:ks) | k == j + 1 = extend i k ks
+    extend i j ks = (i, j) : start ks
+
+-- | Creates an array of a given size with the given ranges of bits set,
+-- each given by its first and last index. Fails if a range is outside of the
+-- array.
+fromRanges :: (MonadError e m, FromString e)
+           => Int -> [(Int, Int)] -> m BitArray
+fromRanges s rs = do
+  forM_ rs $ \(i, j) -> when ((i < 0) || (j < i) || (j >= s)) . failError $
+    "Range " ++ show i ++ "-" ++ show j ++ " out of bounds"
+  return . BitArray s . IS.fromList $ concatMap (uncurry enumFromTo) rs
+
 instance J.JSON BitArray where
   showJSON = J.JSString . J.toJSString . show
   readJSON j = do
@@ -164,6 +164,7 @@ $(genOpCode "OpCode"
      , pVerbose
      , pOptGroupName
      , pVerifyClutter
+     , pVerifyIncremental
      ],
      [])
   , ("OpClusterVerifyConfig",
@@ -185,6 +186,7 @@ $(genOpCode "OpCode"
      , pIgnoreErrors
      , pVerbose
      , pVerifyClutter
+     , pVerifyIncremental
      ],
      "group_name")
   , ("OpClusterVerifyDisks",
@@ -509,6 +511,7 @@ $(genOpCode "OpCode"
      , pSrcNodeUuid
      , pSrcPath
      , pBackupCompress
+     , pTransferStreams
      , pStartInstance
      , pForthcoming
      , pCommit
@@ -653,6 +656,7 @@ $(genOpCode "OpCode"
      , pMoveTargetNode
      , pMoveTargetNodeUuid
      , pMoveCompress
+     , pTransferStreams
      , pIgnoreConsistency
      ],
      "instance_name")
@@ -845,6 +849,7 @@ $(genOpCode "OpCode"
      [ pInstanceName
      , pInstanceUuid
      , pBackupCompress
+     , pTransferStreams
      , pShutdownTimeout
      , pExportTargetNode
      , pExportTargetNodeUuid
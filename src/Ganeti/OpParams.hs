@@ -97,6 +97,7 @@ module Ganeti.OpParams
   , pMoveTargetNode
   , pMoveTargetNodeUuid
   , pMoveCompress
+  , pTransferStreams
   , pBackupCompress
   , pStartupPaused
   , pVerbose
@@ -319,6 +320,7 @@ module Ganeti.OpParams
   , pRenewSshKeys
   , pNodeSetup
   , pVerifyClutter
+  , pVerifyIncremental
   , pLongSleep
   , pIsStrict
   , pEnabledPredictiveQueue
@@ -1531,6 +1533,12 @@ pMoveCompress =
   defaultField [| C.iecNone |] $
   simpleField "compress" [t| String |]
 
+pTransferStreams :: Field
+pTransferStreams =
+  withDoc "Number of parallel streams used to copy each disk" .
+  defaultField [| 1 |] $
+  simpleField "transfer_streams" [t| Int |]
+
 pBackupCompress :: Field
 pBackupCompress =
   withDoc "Compression mode to use for moves during backups/imports" .
@@ -2020,6 +2028,13 @@ pVerifyClutter =
   defaultField [| False |] $
   simpleField "verify_clutter" [t| Bool |]
 
+pVerifyIncremental :: Field
+pVerifyIncremental =
+  withDoc "Whether to only re-check what changed since the last\
+          \ incremental verification." .
+  defaultField [| False |] $
+  simpleField "incremental" [t| Bool |]
+
 pLongSleep :: Field
 pLongSleep =
   withDoc "Whether to allow long instance shutdowns during exports" .
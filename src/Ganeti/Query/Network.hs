@@ -171,9 +171,9 @@ getNetworkUuid cfg name =
 getReservations :: Ip4Network -> Maybe AddressPool -> [Ip4Address]
 getReservations _ Nothing = []
 getReservations net (Just pool) =
-  map snd . filter fst
-  $ zip (BA.toList . apReservations $ pool)
-        (iterate nextIp4Address $ ip4BaseAddr net)
+  let base = ip4AddressToNumber $ ip4BaseAddr net
+  in map (ip4AddressFromNumber . (base +) . toInteger)
+     . BA.toIndexList . apReservations $ pool
 
 -- | Computes the external reservations as string for a network.
 getExtReservationsString :: Network -> ResultEntry
@@ -92,8 +92,8 @@ import Ganeti.Query.Filter (makeSimpleFilter)
 import Ganeti.THH.HsRPC (runRpcClient, RpcClientMonad)
 import Ganeti.Types
 import qualified Ganeti.UDSServer as U (Handler(..), listener)
-import Ganeti.Utils ( lockFile, exitIfBad, exitUnless, watchFile
-                    , safeRenameFile, newUUID, isUUID )
+import Ganeti.Utils ( lockFile, exitIfBad, exitUnless
+                    , watchFilesBy, safeRenameFile, newUUID, isUUID )
 import Ganeti.Utils.Monad (orM)
 import Ganeti.Utils.MVarLock
 import qualified Ganeti.Version as Version
@@ -463,6 +463,9 @@ handleCall qlock qstat cfg (SubmitManyJobs lops) =
 handleCall _ _ cfg (WaitForJobChange jid fields prev_job prev_log tmout) =
   waitForJobChange jid prev_job tmout $ computeJobUpdate cfg jid fields prev_log
 
+handleCall _ _ _ (WaitForJobsChange jobs tmout) =
+  handleWaitForJobsChange jobs tmout
+
 handleCall _ _ cfg (SetWatcherPause time) = do
   let mcs = Config.getMasterOrCandidates cfg
   _ <- executeRpcCall mcs $ RpcCallSetWatcherPause time
@@ -578,12 +581,38 @@ waitForJobChange jid prev_job tmout compute_fn = do
   case jobresult of
     Bad s -> return . Bad $ JobLost s
     Ok (job, _) | not (jobFinalized job) -> do
-      let jobfile = liveJobFile qDir jid
-      answer <- watchFile jobfile (min tmout C.luxiWfjcTimeout)
-                  (prev_job, JSArray []) compute_fn
+      -- log entries are appended to the job's log segment without the job
+      -- file being rewritten, so both need to be watched
+      let jobfiles = [liveJobFile qDir jid, liveJobLogSegment qDir jid]
+      answer <- watchFilesBy jobfiles (min tmout C.luxiWfjcTimeout)
+                  (/= (prev_job, JSArray [])) compute_fn
       return . Ok $ showJSON answer
     _ -> liftM (Ok . showJSON) compute_fn
 
+-- | Handler for the WaitForJobsChange RPC call. Waits until the status of
+-- any of the given jobs differs from the given previous one and returns
+-- the jobs whose status changed, or an empty list after the timeout.
+-- Jobs which can't be loaded are reported with a null status. Like
+-- 'handleWaitForJobChangeStatus', this doesn't require the configuration.
+handleWaitForJobsChange :: [(JobId, JSValue)] -> Int
+                           -> IO (ErrorResult JSValue)
+handleWaitForJobsChange jobs tmout = do
+  qDir <- queueDir
+  let loadStatus jid = do
+        result <- loadJobFromDisk qDir True jid
+        return $ case result of
+          Ok (job, _) -> showJSON $ calcJobStatus job
+          Bad _ -> JSNull
+      compute_fn = do
+        statuses <- mapM (loadStatus . fst) jobs
+        return [ (jid, status) | ((jid, prev), status) <- zip jobs statuses
+                               , status /= prev ]
+  logDebug $ "Waiting for changes of jobs "
+             ++ show (map (fromJobId . fst) jobs)
+  answer <- watchFilesBy (map (liveJobFile qDir . fst) jobs)
+              (min tmout C.luxiWfjcTimeout) (not . null) compute_fn
+  return . Ok $ showJSON answer
+
 -- | Query the status of a job and return the requested fields
 -- and the logs newer than the given log number.
 computeJobUpdate :: ConfigData -> JobId -> [String] -> JSValue
@@ -643,6 +672,9 @@ luxiExec (qlock, qstat, creader) args =
       | fields == ["status"] -> do
         result <- handleWaitForJobChangeStatus jid prev_job prev_log tmout
         return (True, result)
+    WaitForJobsChange jobs tmout -> do
+        result <- handleWaitForJobsChange jobs tmout
+        return (True, result)
     _ -> do
      cfg <- creader
      result <- handleCallWrapper qlock qstat cfg args
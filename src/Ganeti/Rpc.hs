@@ -98,6 +98,7 @@ module Ganeti.Rpc
   , RpcResultExportList(..)
 
   , RpcCallJobqueueUpdate(..)
+  , RpcCallJobqueueUpdateMany(..)
   , RpcCallJobqueueRename(..)
   , RpcCallSetWatcherPause(..)
   , RpcCallSetDrainFlag(..)
@@ -688,6 +689,30 @@ instance Rpc RpcCallJobqueueUpdate RpcResultJobQueueUpdate where
       _ -> Left $ JsonDecodeError
            ("Expected JSNull, got " ++ show (pp_value res))
 
+-- | Update several job queue files. Deltas against previous versions of
+-- the files, as sent by the Python job queue, aren't used here; all files
+-- are sent in full.
+
+$(buildObject "RpcCallJobqueueUpdateMany" "rpcCallJobqueueUpdateMany"
+  [ simpleField "updates" [t| [(String, String)] |]
+  ])
+
+$(buildObject "RpcResultJobqueueUpdateMany" "rpcResultJobqueueUpdateMany"
+  [ simpleField "resync" [t| [String] |]
+  ])
+
+instance RpcCall RpcCallJobqueueUpdateMany where
+  rpcCallName _          = "jobqueue_update_many"
+  rpcCallTimeout _       = rpcTimeoutToRaw Fast
+  rpcCallAcceptOffline _ = False
+  rpcCallData call       = J.encode
+    [ J.showJSON [ (name, J.JSNull, toCompressed content)
+                 | (name, content) <- rpcCallJobqueueUpdateManyUpdates call ]
+    ]
+
+instance Rpc RpcCallJobqueueUpdateMany RpcResultJobqueueUpdateMany where
+  rpcResultFill _ res = fromJSValueToRes res RpcResultJobqueueUpdateMany
+
 -- | Rename a file in the job queue
 
 $(buildObject "RpcCallJobqueueRename" "rpcCallJobqueueRename"
@@ -94,6 +94,7 @@ module Ganeti.Utils
   , needsReload
   , watchFile
   , watchFileBy
+  , watchFilesBy
   , safeRenameFile
   , FilePermissions(..)
   , ensurePermissions
@@ -755,27 +756,41 @@ watchFileEx endtime base ref check read_fn = do
 -- the given file changes on disk. If the file does not exist on disk, return
 -- immediately.
 watchFileBy :: FilePath -> Int -> (a -> Bool) -> IO a -> IO a
-watchFileBy fpath timeout check read_fn = do
+watchFileBy fpath = watchFilesBy [fpath]
+
+-- | Like 'watchFileBy', but for a method whose output only changes if
+-- any of the given files changes on disk. All files are watched using a
+-- single inotify instance; files which can't be watched, e.g. because
+-- they have been removed in the meantime, are skipped.
+watchFilesBy :: [FilePath] -> Int -> (a -> Bool) -> IO a -> IO a
+watchFilesBy fpaths timeout check read_fn = do
   current <- getCurrentTimeUSec
   let endtime = current + fromIntegral timeout * 1000000
-  fstat <- getFStatSafe fpath
-  ref <- newIORef fstat
+  fstats <- mapM getFStatSafe fpaths
+  ref <- newIORef fstats
   bracket initINotify killINotify $ \inotify -> do
-    let do_watch e = do
-                       logDebug $ "Notified of change in " ++ fpath
-                                    ++ "; event: " ++ show e
-                       when (e == Ignored)
-                         (addWatch inotify [Modify, Delete] fpath do_watch
-                            >> return ())
-                       fstat' <- getFStatSafe fpath
-                       writeIORef ref fstat'
-    _ <- addWatch inotify [Modify, Delete] fpath do_watch
+    forM_ (zip [0..] fpaths) $ \(idx, fpath) ->
+      let do_watch e = do
+                         logDebug $ "Notified of change in " ++ fpath
+                                      ++ "; event: " ++ show e
+                         when (e == Ignored)
+                           (addWatch inotify [Modify, Delete] fpath do_watch
+                              >> return ())
+                         fstat' <- getFStatSafe fpath
+                         atomicModifyIORef ref $ \cur ->
+                           (take idx cur ++ fstat' : drop (idx + 1) cur, ())
+      in do
+        result <- try (addWatch inotify [Modify, Delete] fpath do_watch)
+                    :: IO (Either IOError WatchDescriptor)
+        either (\err -> logDebug $ "Can't watch " ++ fpath ++ ": "
+                                    ++ show err)
+               (const $ return ()) result
     newval <- read_fn
     if check newval
       then do
-        logDebug $ "File " ++ fpath ++ " changed during setup of inotify"
+        logDebug $ "Files " ++ show fpaths ++ " changed during setup of inotify"
         return newval
-      else watchFileEx endtime fstat ref check read_fn
+      else watchFileEx endtime fstats ref check read_fn
 
 -- | Within the given timeout (in seconds), wait for for the output
 -- of the given method to change and return the new value; make use of
@@ -0,0 +1,145 @@
+{-# LANGUAGE TemplateHaskell #-}
+
+{-| Incremental transfer of the configuration between WConfd and its clients.
+
+A 'ConfigDelta' describes how to get from one version of the configuration
+to another. The cluster, the maintenance data and the top-level fields are
+always included in full, while the object containers only hold the objects
+that were added or changed; removed objects have a @null@ value.
+
+-}
+
+{-
+
+Copyright (C) 2016 Google Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are
+met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright
+notice, this list of conditions and the following disclaimer in the
+documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+-}
+
+module Ganeti.WConfd.ConfigDelta
+  ( ConfigDelta(..)
+  , configDelta
+  , applyConfigDelta
+  ) where
+
+import Prelude ()
+import Ganeti.Prelude
+
+import qualified Data.Map as M
+import Data.Maybe (isNothing)
+
+import Ganeti.JSON (Container, GenericContainer(..), MaybeForJSON(..)
+                   , emptyContainer)
+import Ganeti.Objects
+import Ganeti.THH
+import Ganeti.THH.Field
+
+$(buildObject "ConfigDelta" "cdelta" $
+  [ simpleField "base"        [t| Int                               |]
+  , simpleField "full"        [t| Bool                              |]
+  , simpleField "version"     [t| Int                               |]
+  , simpleField "cluster"     [t| Cluster                           |]
+  , simpleField "nodes"       [t| Container (MaybeForJSON Node)      |]
+  , simpleField "nodegroups"  [t| Container (MaybeForJSON NodeGroup) |]
+  , simpleField "instances"   [t| Container (MaybeForJSON Instance)  |]
+  , simpleField "networks"    [t| Container (MaybeForJSON Network)   |]
+  , simpleField "disks"       [t| Container (MaybeForJSON Disk)      |]
+  , simpleField "filters"     [t| Container (MaybeForJSON FilterRule) |]
+  , simpleField "maintenance" [t| MaintenanceData                   |]
+  ]
+  ++ timeStampFields
+  ++ serialFields)
+
+-- | Computes the changes from one container to another. If there is no
+-- original container, all objects are included.
+diffContainer :: (Eq a)
+              => Maybe (Container a) -> Container a
+              -> Container (MaybeForJSON a)
+diffContainer Nothing new = fmap (MaybeForJSON . Just) new
+diffContainer (Just (GenericContainer old)) (GenericContainer new) =
+  GenericContainer $ M.union changed removed
+  where
+    changed = M.map (MaybeForJSON . Just) $ M.differenceWith keepChanged new old
+    keepChanged n o = if n == o then Nothing else Just n
+    removed = M.map (const $ MaybeForJSON Nothing) $ M.difference old new
+
+-- | Applies the changes of a delta to a container.
+applyContainer :: Container (MaybeForJSON a) -> Container a -> Container a
+applyContainer (GenericContainer delta) (GenericContainer cont) =
+  GenericContainer $ M.foldrWithKey apply cont delta
+  where
+    apply key (MaybeForJSON (Just obj)) = M.insert key obj
+    apply key (MaybeForJSON Nothing) = M.delete key
+
+-- | Computes the delta leading from the first configuration to the second
+-- one. If the first configuration is not known, the result is a full delta,
+-- which contains all objects and applies to any configuration.
+configDelta :: Maybe ConfigData -> ConfigData -> ConfigDelta
+configDelta old new =
+  ConfigDelta { cdeltaBase = maybe 0 configSerial old
+              , cdeltaFull = isNothing old
+              , cdeltaVersion = configVersion new
+              , cdeltaCluster = configCluster new
+              , cdeltaNodes = diff configNodes
+              , cdeltaNodegroups = diff configNodegroups
+              , cdeltaInstances = diff configInstances
+              , cdeltaNetworks = diff configNetworks
+              , cdeltaDisks = diff configDisks
+              , cdeltaFilters = diff configFilters
+              , cdeltaMaintenance = configMaintenance new
+              , cdeltaCtime = configCtime new
+              , cdeltaMtime = configMtime new
+              , cdeltaSerial = configSerial new
+              }
+  where
+    diff :: (Eq a) => (ConfigData -> Container a) -> Container (MaybeForJSON a)
+    diff field = diffContainer (field <$> old) (field new)
+
+-- | Applies a delta to a configuration. The caller is responsible for
+-- checking that the delta is based on the given configuration (see
+-- 'cdeltaBase'), unless it is a full delta.
+applyConfigDelta :: ConfigDelta -> ConfigData -> ConfigData
+applyConfigDelta delta cfg =
+  cfg { configVersion = cdeltaVersion delta
+      , configCluster = cdeltaCluster delta
+      , configNodes = apply cdeltaNodes configNodes
+      , configNodegroups = apply cdeltaNodegroups configNodegroups
+      , configInstances = apply cdeltaInstances configInstances
+      , configNetworks = apply cdeltaNetworks configNetworks
+      , configDisks = apply cdeltaDisks configDisks
+      , configFilters = apply cdeltaFilters configFilters
+      , configMaintenance = cdeltaMaintenance delta
+      , configCtime = cdeltaCtime delta
+      , configMtime = cdeltaMtime delta
+      , configSerial = cdeltaSerial delta
+      }
+  where
+    apply :: (ConfigDelta -> Container (MaybeForJSON a))
+          -> (ConfigData -> Container a)
+          -> Container a
+    apply dfield cfield =
+      applyContainer (dfield delta)
+                     (if cdeltaFull delta then emptyContainer else cfield cfg)
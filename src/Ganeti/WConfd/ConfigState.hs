@@ -38,7 +38,11 @@ module Ganeti.WConfd.ConfigState
   ( ConfigState
   , csConfigData
   , csConfigDataL
+  , csHistory
   , mkConfigState
+  , maxConfigHistory
+  , recordHistory
+  , configBySerial
   , bumpSerial
   , needsFullDist
   ) where
@@ -47,6 +51,7 @@ import Prelude ()
 import Ganeti.Prelude
 
 import Data.Function (on)
+import Data.List (find)
 import System.Time (ClockTime(..))
 
 import Ganeti.Config
@@ -54,19 +59,43 @@ import Ganeti.Lens
 import Ganeti.Objects
 import Ganeti.Objects.Lens
 
--- | In future this data type will include the current configuration
--- ('ConfigData') and the last 'FStat' of its file.
+-- | The current configuration ('ConfigData') together with a few of its
+-- previous versions, newest first. The previous versions are kept so that
+-- clients can ask for the changes since the version they already have.
+-- In future this data type will include the last 'FStat' of its file.
 data ConfigState = ConfigState
   { csConfigData :: ConfigData
+  , csHistory :: [ConfigData]
   }
-  deriving (Eq, Show)
+  deriving (Show)
+
+-- | Two states are equal if their current configurations are; the history
+-- is just a cache of older versions.
+instance Eq ConfigState where
+  (==) = (==) `on` csConfigData
 
 $(makeCustomLenses ''ConfigState)
 
--- | Creates a new configuration state.
--- This method will expand as more fields are added to 'ConfigState'.
+-- | Creates a new configuration state with an empty history.
 mkConfigState :: ConfigData -> ConfigState
-mkConfigState = ConfigState
+mkConfigState cd = ConfigState cd []
+
+-- | The number of previous versions of the configuration to keep. As the
+-- versions share most of their structure, this is cheap.
+maxConfigHistory :: Int
+maxConfigHistory = 8
+
+-- | Records the current configuration of the first state in the history
+-- of the second one.
+recordHistory :: ConfigState -> ConfigState -> ConfigState
+recordHistory old =
+  over csHistoryL (take maxConfigHistory . (csConfigData old :))
+
+-- | Looks up the version of the configuration with the given serial number,
+-- if it is still known.
+configBySerial :: Int -> ConfigState -> Maybe ConfigData
+configBySerial serial cs =
+  find ((== serial) . configSerial) (csConfigData cs : csHistory cs)
 
 bumpSerial :: (SerialNoObjectL a, TimeStampObjectL a) => ClockTime -> a -> a
 bumpSerial now = set mTimeL now . over serialL succ
@@ -38,6 +38,8 @@ module Ganeti.WConfd.ConfigWriter
   ( loadConfigFromFile
   , readConfig
   , writeConfig
+  , readConfigDelta
+  , writeConfigDelta
   , saveConfigAsyncTask
   , distMCsAsyncTask
   , distSSConfAsyncTask
@@ -48,7 +50,7 @@ import Ganeti.Prelude
 
 import Control.Monad ((>=>), liftM, unless)
 import Control.Monad.Base
-import Control.Monad.Error.Class (MonadError)
+import Control.Monad.Error.Class (MonadError, throwError)
 import qualified Control.Monad.State.Strict as S
 import Control.Monad.Trans.Class (lift)
 import Control.Monad.Trans.Control
@@ -58,6 +60,7 @@ import qualified Data.Set as Set
 import Ganeti.BasicTypes
 import Ganeti.Errors
 import Ganeti.Config
+import Ganeti.Lens (set)
 import Ganeti.Logging
 import Ganeti.Objects
 import Ganeti.Rpc
@@ -65,6 +68,7 @@ import Ganeti.Runtime
 import Ganeti.Utils
 import Ganeti.Utils.Atomic
 import Ganeti.Utils.AsyncWorker
+import Ganeti.WConfd.ConfigDelta
 import Ganeti.WConfd.ConfigState
 import Ganeti.WConfd.Monad
 import Ganeti.WConfd.Ssconf
@@ -109,7 +113,26 @@ readConfig = csConfigData <$> readConfigState
 
 -- Replaces the current configuration state within the 'WConfdMonad'.
 writeConfig :: ConfigData -> WConfdMonad ()
-writeConfig cd = modifyConfigState $ const ((), mkConfigState cd)
+writeConfig cd = modifyConfigState $ \cs -> ((), set csConfigDataL cd cs)
+
+-- | Returns the changes of the configuration since its version with the
+-- given serial number. If that version isn't known any more, the delta
+-- contains the full configuration.
+readConfigDelta :: Int -> WConfdMonad ConfigDelta
+readConfigDelta serial = do
+  cs <- readConfigState
+  return $ configDelta (configBySerial serial cs) (csConfigData cs)
+
+-- | Applies a configuration delta to the current configuration. Unless the
+-- delta is a full one, it must be based on the current version.
+writeConfigDelta :: ConfigDelta -> WConfdMonad ()
+writeConfigDelta delta = modifyConfigDataErr_ $ \_ cd -> do
+  unless (cdeltaFull delta || cdeltaBase delta == configSerial cd)
+    . throwError . ConfigurationError
+    $ "Configuration delta is based on serial number "
+      ++ show (cdeltaBase delta) ++ ", but the current one is "
+      ++ show (configSerial cd)
+  return $ applyConfigDelta delta cd
 
 -- * Asynchronous tasks
 
@@ -68,6 +68,7 @@ import Ganeti.Objects ( ConfigData, DRBDSecret, LogicalVolume, Ip4Address
                       )
 import Ganeti.Objects.Lens (configClusterL, clusterMasterNodeL)
 import Ganeti.Types (JobId)
+import Ganeti.WConfd.ConfigDelta (ConfigDelta)
 import Ganeti.WConfd.ConfigState (csConfigDataL)
 import qualified Ganeti.WConfd.ConfigVerify as V
 import Ganeti.WConfd.DeathDetection (cleanupLocks)
@@ -160,6 +161,46 @@ writeConfigAndUnlock cid cdata = do
                    ++ " the config lock"
       return False
 
+-- | Read the changes of the configuration since its version with the given
+-- serial number.
+readConfigDelta :: Int -> WConfdMonad ConfigDelta
+readConfigDelta = CW.readConfigDelta
+
+-- | Write a configuration delta, checking that an exclusive lock is held.
+-- If not, the call fails.
+writeConfigDelta :: ClientId -> ConfigDelta -> WConfdMonad ()
+writeConfigDelta ident delta = do
+  checkConfigLock ident L.OwnExclusive
+  CW.writeConfigDelta delta
+
+-- | Like 'lockConfig', but if the lock was successfully acquired, returns
+-- only the changes of the configuration since its version with the given
+-- serial number.
+lockConfigDelta
+    :: ClientId
+    -> Bool -- ^ set to 'True' if the lock should be shared
+    -> Int -- ^ the serial number of the configuration the client has
+    -> WConfdMonad (J.MaybeForJSON ConfigDelta)
+lockConfigDelta cid shared serial = do
+  locked <- lockConfig cid shared
+  case J.unMaybeForJSON locked of
+    Nothing -> return $ J.MaybeForJSON Nothing
+    Just _  -> liftM (J.MaybeForJSON . Just) $ CW.readConfigDelta serial
+
+-- | Like 'writeConfigAndUnlock', but writes a configuration delta.
+writeConfigDeltaAndUnlock :: ClientId -> ConfigDelta -> WConfdMonad Bool
+writeConfigDeltaAndUnlock cid delta = do
+  la <- readLockAllocation
+  if L.holdsLock cid ConfigLock L.OwnExclusive la
+    then do
+      CW.writeConfigDelta delta
+      unlockConfig cid
+      return True
+    else do
+      logWarning $ show cid ++ " tried writeConfigDeltaAndUnlock without"
+                   ++ " owning the config lock"
+      return False
+
 -- | Force the distribution of configuration without actually modifying it.
 -- It is not necessary to hold a lock for this operation.
 flushConfig :: WConfdMonad ()
@@ -423,6 +464,10 @@ exportedFunctions = [ 'echo
                     , 'lockConfig
                     , 'unlockConfig
                     , 'writeConfigAndUnlock
+                    , 'readConfigDelta
+                    , 'lockConfigDelta
+                    , 'writeConfigDelta
+                    , 'writeConfigDeltaAndUnlock
                     , 'flushConfig
                     , 'flushConfigGroup
                     , 'maintenanceRoundDelay
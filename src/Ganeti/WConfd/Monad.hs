@@ -238,7 +238,9 @@ unpackConfigResult :: ClockTime -> ConfigState
                       -> (a, ConfigState) -> ((a, Bool, Bool), ConfigState)
 unpackConfigResult now cs (r, cs')
                      | cs /= cs' = ( (r, True, needsFullDist cs cs')
-                                   , over csConfigDataL (bumpSerial now) cs'
+                                   , recordHistory cs
+                                     . over csConfigDataL (bumpSerial now)
+                                     $ cs'
                                    )
                      | otherwise = ((r, False, False), cs')
 
@@ -100,6 +100,17 @@ prop_BitArray_countsSum :: BitArray -> Property
 prop_BitArray_countsSum a =
   count0 a + count1 a ==? size a
 
+-- | Check that the ranges of set bits describe the array.
+prop_BitArray_ranges :: BitArray -> Property
+prop_BitArray_ranges a =
+  (fromRanges (size a) (ranges a) :: Either String BitArray) ==? Right a
+
+-- | Check that the ranges of set bits are disjoint and not adjacent.
+prop_BitArray_rangesDisjoint :: BitArray -> Property
+prop_BitArray_rangesDisjoint a =
+  let rs = ranges a
+  in conjoin $ zipWith (\(_, j) (k, _) -> property (j + 1 < k)) rs (drop 1 rs)
+
 testSuite "Objects_BitArray"
   [ 'prop_BitArray_serialisation
   , 'prop_BitArray_foldr
@@ -108,4 +119,6 @@ testSuite "Objects_BitArray"
   , 'prop_BitArray_or
   , 'prop_BitArray_counts
   , 'prop_BitArray_countsSum
+  , 'prop_BitArray_ranges
+  , 'prop_BitArray_rangesDisjoint
   ]
@@ -184,14 +184,14 @@ genOpCodeFromId op_id cfg =
     "OP_CLUSTER_VERIFY" ->
       OpCodes.OpClusterVerify <$> arbitrary <*> arbitrary <*>
         genListSet Nothing <*> genListSet Nothing <*> arbitrary <*>
-        genMaybe getGroupName <*> arbitrary
+        genMaybe getGroupName <*> arbitrary <*> arbitrary
     "OP_CLUSTER_VERIFY_CONFIG" ->
       OpCodes.OpClusterVerifyConfig <$> arbitrary <*> arbitrary <*>
         genListSet Nothing <*> arbitrary
     "OP_CLUSTER_VERIFY_GROUP" ->
       OpCodes.OpClusterVerifyGroup <$> getGroupName <*> arbitrary <*>
         arbitrary <*> genListSet Nothing <*> genListSet Nothing <*>
-        arbitrary <*> arbitrary
+        arbitrary <*> arbitrary <*> arbitrary
     "OP_CLUSTER_VERIFY_DISKS" ->
       OpCodes.OpClusterVerifyDisks <$> genMaybe getGroupName <*> arbitrary
     "OP_GROUP_VERIFY_DISKS" ->
@@ -353,6 +353,7 @@ genOpCodeFromId op_id cfg =
         <*> genMaybe genNodeNameNE          -- src_node_uuid
         <*> genMaybe genNameNE              -- src_path
         <*> genPrintableAsciiString         -- compress
+        <*> arbitrary                       -- transfer_streams
         <*> arbitrary                       -- start
         <*> arbitrary                       -- forthcoming
         <*> arbitrary                       -- commit
@@ -396,7 +397,8 @@ genOpCodeFromId op_id cfg =
     "OP_INSTANCE_MOVE" ->
       OpCodes.OpInstanceMove <$> getInstanceName <*> return Nothing <*>
         arbitrary <*> arbitrary <*> getNodeName <*>
-        return Nothing <*> genPrintableAsciiString <*> arbitrary
+        return Nothing <*> genPrintableAsciiString <*> arbitrary <*>
+        arbitrary
     "OP_INSTANCE_CONSOLE" -> OpCodes.OpInstanceConsole <$> getInstanceName <*>
         return Nothing
     "OP_INSTANCE_ACTIVATE_DISKS" ->
@@ -483,6 +485,7 @@ genOpCodeFromId op_id cfg =
         <$> getInstanceName          -- instance_name
         <*> return Nothing           -- instance_uuid
         <*> genPrintableAsciiString  -- compress
+        <*> arbitrary                -- transfer_streams
         <*> arbitrary                -- shutdown_timeout
         <*> arbitrary                -- target_node
         <*> return Nothing           -- target_node_uuid
@@ -0,0 +1,79 @@
+{-# LANGUAGE TemplateHaskell #-}
+
+{-| Unittests for configuration deltas
+
+-}
+
+{-
+
+Copyright (C) 2016 Google Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are
+met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright
+notice, this list of conditions and the following disclaimer in the
+documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+-}
+
+module Test.Ganeti.WConfd.ConfigDelta (testWConfd_ConfigDelta) where
+
+import Test.QuickCheck
+
+import qualified Data.Map as M
+
+import Test.Ganeti.Objects ()
+import Test.Ganeti.TestHelper
+import Test.Ganeti.TestCommon
+
+import Ganeti.JSON (fromContainer)
+import Ganeti.Objects (ConfigData)
+import Ganeti.WConfd.ConfigDelta
+
+-- | Applying the delta between two configurations to the first one
+-- results in the second one.
+prop_applyConfigDelta :: ConfigData -> ConfigData -> Property
+prop_applyConfigDelta old new =
+  applyConfigDelta (configDelta (Just old) new) old ==? new
+
+-- | A full delta results in the new configuration, whatever it is applied
+-- to.
+prop_applyConfigDelta_full :: ConfigData -> ConfigData -> Property
+prop_applyConfigDelta_full old new =
+  applyConfigDelta (configDelta Nothing new) old ==? new
+
+-- | The delta of a configuration to itself contains no objects.
+prop_configDelta_unchanged :: ConfigData -> Property
+prop_configDelta_unchanged cfg =
+  let delta = configDelta (Just cfg) cfg
+  in conjoin [ M.null . fromContainer $ cdeltaNodes delta
+             , M.null . fromContainer $ cdeltaNodegroups delta
+             , M.null . fromContainer $ cdeltaInstances delta
+             , M.null . fromContainer $ cdeltaNetworks delta
+             , M.null . fromContainer $ cdeltaDisks delta
+             , M.null . fromContainer $ cdeltaFilters delta
+             ]
+
+testSuite "WConfd/ConfigDelta"
+  [ 'prop_applyConfigDelta
+  , 'prop_applyConfigDelta_full
+  , 'prop_configDelta_unchanged
+  ]
@@ -98,6 +98,7 @@ import Test.Ganeti.Types
 import Test.Ganeti.Utils
 import Test.Ganeti.Utils.MultiMap
 import Test.Ganeti.Utils.Statistics
+import Test.Ganeti.WConfd.ConfigDelta
 import Test.Ganeti.WConfd.Ssconf
 import Test.Ganeti.WConfd.TempRes
 
@@ -172,6 +173,7 @@ allTests =
   , testUtils
   , testUtils_MultiMap
   , testUtils_Statistics
+  , testWConfd_ConfigDelta
   , testWConfd_Ssconf
   , testWConfd_TempRes
   ]
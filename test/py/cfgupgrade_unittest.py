@@ -455,6 +455,30 @@ class TestCfgupgrade(unittest.TestCase):
     newconf = self._LoadTestDataConfig("cluster_config_2.17.json")
     self.assertEqual(oldconf, newconf)
 
+  def testDowngradeNetworkReservations(self):
+    cfg = self._LoadTestDataConfig("cluster_config_2.18.json")
+    (net, ) = cfg["networks"].values()
+    net["reservations"] = "256:"
+    net["ext_reservations"] = "256:0,255"
+    self._TestUpgradeFromData(cfg, False)
+    _RunUpgrade(self.tmpdir, False, True, downgrade=True)
+    oldconf = self._LoadConfig()
+    newconf = self._LoadTestDataConfig("cluster_config_2.17.json")
+    self.assertEqual(oldconf, newconf)
+
+  def testDowngradeLargeNetwork(self):
+    cfg = self._LoadTestDataConfig("cluster_config_2.18.json")
+    (net, ) = cfg["networks"].values()
+    net["network"] = "10.0.0.0/15"
+    net["reservations"] = "131072:"
+    net["ext_reservations"] = "131072:0,131071"
+    self._TestUpgradeFromData(cfg, False)
+    oldconf = self._LoadConfig()
+    self.assertRaises(Exception, _RunUpgrade, self.tmpdir, False, True,
+                      downgrade=True)
+    # The configuration is left unchanged
+    self.assertEqual(self._LoadConfig(), oldconf)
+
   def testUpgradeCurrent(self):
     self._TestSimpleUpgrade(constants.CONFIG_VERSION, False)
 
@@ -191,6 +191,11 @@ class TestLUBackupExportLocalExport(TestLUBackupExportBase):
     self._PrepareInstance(online=True)
     self.ExecOpCode(self.op)
 
+  @InstanceRemoved(False)
+  def testInvalidTransferStreams(self):
+    op = self.CopyOpCode(self.op, transfer_streams=0)
+    self.ExecOpCodeExpectOpPrereqError(op, "number of transfer streams")
+
   @TrySnapshots(False)
   @InstanceRemoved(False)
   def testFileExportWithShutdown(self):
@@ -285,6 +290,11 @@ class TestLUBackupExportRemoteExport(TestLUBackupExportBase):
     self.ExecOpCodeExpectOpPrereqError(op,
                                        "Missing destination X509 CA")
 
+  @InstanceRemoved(False)
+  def testRemoteExportWithTransferStreams(self):
+    op = self.CopyOpCode(self.op, transfer_streams=4)
+    self.ExecOpCodeExpectOpPrereqError(op, "Several transfer streams")
+
 
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
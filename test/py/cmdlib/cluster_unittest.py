@@ -39,6 +39,7 @@ import unittest
 import re
 import shutil
 import os
+import tempfile
 
 from ganeti.cmdlib import cluster
 from ganeti.cmdlib.cluster import verify
@@ -50,6 +51,7 @@ from ganeti import opcodes
 from ganeti import utils
 from ganeti import pathutils
 from ganeti import query
+from ganeti import serializer
 from ganeti.hypervisor import hv_xen
 
 from testsupport import *
@@ -1217,6 +1219,147 @@ class TestLUClusterVerifyGroup(CmdlibTestCase):
 
     self.ExecOpCode(op)
 
+  def testPhaseTimings(self):
+    op = opcodes.OpClusterVerifyGroup(group_name="default", verbose=True)
+
+    self.ExecOpCode(op)
+
+    self.mcpu.assertLogContainsRegex("Time spent per phase")
+    self.mcpu.assertLogContainsRegex(r"Verifying node status: [\d.]+ seconds")
+
+  @patchPathutils("cluster.verify")
+  def testIncremental(self, pathutils):
+    tmpdir = tempfile.mkdtemp()
+    try:
+      pathutils.CLUSTER_VERIFY_GROUP_CACHE_FILE = \
+        utils.PathJoin(tmpdir, "cluster-verify.%s.data")
+      self.cfg.AddNewInstance(disks=[])
+
+      self.rpc.call_node_verify.return_value = \
+        RpcResultsBuilder() \
+          .AddSuccessfulNode(self.master, {
+            constants.NV_INCREMENTAL: ("token", {}),
+            }) \
+          .Build()
+
+      op = opcodes.OpClusterVerifyGroup(group_name="default",
+                                        incremental=True)
+      self.ExecOpCode(op)
+
+      (_, params, _, _) = self.rpc.call_node_verify.call_args[0]
+      self.assertEqual(params[constants.NV_INCREMENTAL], {})
+
+      cache = verify._LoadVerifyCache(self.group.uuid)
+      self.assertEqual(cache["nodes"][self.master.uuid]["token"], "token")
+
+      self.ExecOpCode(op)
+
+      (_, params, _, _) = self.rpc.call_node_verify.call_args[0]
+      self.assertEqual(params[constants.NV_INCREMENTAL],
+                       {self.master.name: "token"})
+    finally:
+      shutil.rmtree(tmpdir)
+
+  @patchPathutils("cluster.verify")
+  def testIncrementalMissingSections(self, pathutils):
+    tmpdir = tempfile.mkdtemp()
+    try:
+      pathutils.CLUSTER_VERIFY_GROUP_CACHE_FILE = \
+        utils.PathJoin(tmpdir, "cluster-verify.%s.data")
+      self.cfg.AddNewInstance(disks=[])
+      digests = {constants.NV_VERSION: "digest"}
+
+      def _NodeVerify(node_uuids, params, *_):
+        if params[constants.NV_INCREMENTAL]:
+          # The node claims the section is unchanged, but it isn't cached
+          data = {}
+        else:
+          data = {constants.NV_VERSION: (constants.PROTOCOL_VERSION,
+                                         constants.RELEASE_VERSION)}
+        data[constants.NV_INCREMENTAL] = ("token", digests)
+        return RpcResultsBuilder() \
+          .AddSuccessfulNode(self.master, data) \
+          .Build()
+
+      self.rpc.call_node_verify.side_effect = _NodeVerify
+      utils.WriteFile(pathutils.CLUSTER_VERIFY_GROUP_CACHE_FILE %
+                      self.group.uuid,
+                      data=serializer.DumpJson({
+                        "nodes": {
+                          self.master.uuid: {"token": "token", "payload": {}},
+                          },
+                        }))
+
+      op = opcodes.OpClusterVerifyGroup(group_name="default",
+                                        incremental=True)
+      self.ExecOpCode(op)
+
+      # The node is asked again for all sections
+      calls = self.rpc.call_node_verify.call_args_list
+      self.assertEqual(len(calls), 2)
+      (node_uuids, params, _, _) = calls[1][0]
+      self.assertEqual(node_uuids, [self.master.uuid])
+      self.assertEqual(params[constants.NV_INCREMENTAL], {})
+      self.mcpu.assertLogContainsRegex("incomplete results")
+
+      cache = verify._LoadVerifyCache(self.group.uuid)
+      self.assertEqual(cache["nodes"][self.master.uuid]["payload"].keys(),
+                       [constants.NV_VERSION])
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def testMergeIncrementalResults(self):
+    node = self.cfg.AddNewNode()
+    all_nvinfo = RpcResultsBuilder() \
+      .AddSuccessfulNode(self.master, {
+        constants.NV_TIME: (1234, 5678),
+        constants.NV_VERSION: (1, "2.18"),
+        constants.NV_INCREMENTAL: ("new-token", {
+          constants.NV_VERSION: "digest1",
+          constants.NV_LVLIST: "digest2",
+          }),
+        }) \
+      .AddSuccessfulNode(node, {constants.NV_VERSION: (1, "2.17")}) \
+      .Build()
+    cached_nodes = {
+      self.master.uuid: {
+        "token": "old-token",
+        "payload": {constants.NV_LVLIST: {"xenvg/lv1": (1024, False, True)}},
+        },
+      }
+
+    (new_nodes, node_digests, incomplete) = \
+      verify._MergeIncrementalResults(all_nvinfo, cached_nodes)
+
+    payload = all_nvinfo[self.master.uuid].payload
+    self.assertEqual(payload[constants.NV_LVLIST],
+                     {"xenvg/lv1": (1024, False, True)})
+    self.assertFalse(constants.NV_INCREMENTAL in payload)
+    self.assertEqual(new_nodes.keys(), [self.master.uuid])
+    self.assertEqual(new_nodes[self.master.uuid]["token"], "new-token")
+    self.assertEqual(sorted(new_nodes[self.master.uuid]["payload"].keys()),
+                     sorted([constants.NV_VERSION, constants.NV_LVLIST]))
+    self.assertEqual(node_digests.keys(), [self.master.uuid])
+    self.assertEqual(incomplete, [])
+
+  def testMergeIncrementalResultsMissing(self):
+    all_nvinfo = RpcResultsBuilder() \
+      .AddSuccessfulNode(self.master, {
+        constants.NV_VERSION: (1, "2.18"),
+        constants.NV_INCREMENTAL: ("new-token", {
+          constants.NV_VERSION: "digest1",
+          constants.NV_LVLIST: "digest2",
+          }),
+        }) \
+      .Build()
+
+    (new_nodes, node_digests, incomplete) = \
+      verify._MergeIncrementalResults(all_nvinfo, {})
+
+    self.assertEqual(new_nodes, {})
+    self.assertEqual(node_digests, {})
+    self.assertEqual(incomplete, [self.master.uuid])
+
   def testVerifyNodeDrbdSuccess(self):
     ninfo = self.cfg.AddNewNode()
     disk = self.cfg.CreateDisk(dev_type=constants.DT_DRBD8,
@@ -1669,6 +1812,22 @@ class TestLUClusterVerifyGroupVerifyNodeNetwork(
     lu._VerifyNodeNetwork(self.master, self.VALID_NRESULT)
     self.mcpu.assertLogContainsRegex("tcp communication with node 'mock_node'")
 
+  @withLockedLU
+  def testSlowLinks(self, lu):
+    self.VALID_NRESULT.update({
+      constants.NV_LATENCY: {
+        "fast_node": {"ssh": 0.1, "primary": 0.001},
+        "slow_node": {"ssh": constants.NODE_VERIFY_SLOW_SSH + 1,
+                      "secondary": constants.NODE_VERIFY_SLOW_TCP + 1},
+      }
+    })
+    lu._VerifyNodeNetwork(self.master, self.VALID_NRESULT)
+    self.mcpu.assertLogContainsRegex(
+      "slow ssh communication with node 'slow_node'")
+    self.mcpu.assertLogContainsRegex(
+      "slow secondary communication with node 'slow_node'")
+    self.assertFalse(lu.bad)
+
   @withLockedLU
   def testMasterIpNotReachable(self, lu):
     self.VALID_NRESULT.update({
@@ -415,6 +415,12 @@ class TestLUInstanceCreate(CmdlibTestCase):
     self.ExecOpCodeExpectOpPrereqError(
       op, "Disk adoption not allowed for instance import")
 
+  def testTransferStreamsWithoutImport(self):
+    op = self.CopyOpCode(self.diskless_op,
+                         transfer_streams=2)
+    self.ExecOpCodeExpectOpPrereqError(
+      op, "Several transfer streams can only be used when importing")
+
   def testArgumentCombinations(self):
     op = self.CopyOpCode(self.diskless_op,
                          # start flag will be flipped
@@ -42,9 +42,11 @@ import testutils_ssh
 import unittest
 
 from ganeti import backend
+from ganeti import compat
 from ganeti import constants
 from ganeti import errors
 from ganeti import hypervisor
+from ganeti import jstore
 from ganeti import netutils
 from ganeti import objects
 from ganeti import serializer
@@ -184,7 +186,7 @@ class TestNodeVerify(testutils.GanetiTestCase):
     local_data = ([(my_name, "any", "any")], [my_name])
 
     # we just test that whatever TcpPing returns, VerifyNode returns too
-    netutils.TcpPing = lambda a, b, source=None: True
+    netutils.TcpPing = lambda a, b, source=None, timeout=None: True
     result = backend.VerifyNode({constants.NV_NODENETTEST: local_data},
                                 None, {})
 
@@ -192,6 +194,63 @@ class TestNodeVerify(testutils.GanetiTestCase):
                     "NodeNetTest data not returned")
     self.failUnless(result[constants.NV_NODENETTEST] == {},
                     "NodeNetTest failed")
+    self.assertEqual(result[constants.NV_LATENCY].keys(), [my_name])
+
+  def testVerifyNodeNetTestConcurrent(self):
+    my_name = "node0.example.com"
+    nodes = [("node%d.example.com" % i, "192.0.2.%d" % i, "198.51.100.%d" % i)
+             for i in range(50)]
+    unreachable = set(["192.0.2.7", "198.51.100.9"])
+
+    def _TcpPing(target, port, source=None, timeout=None):
+      self.assertTrue(timeout > 0)
+      return target not in unreachable
+
+    with testutils.patch_object(netutils, "TcpPing", new=_TcpPing):
+      latency = {}
+      result = backend.VerifyNodeNetTest(my_name, (nodes, [my_name]),
+                                         latency=latency)
+
+    self.assertEqual(result, {
+      "node7.example.com": "failure using the primary interface(s)",
+      "node9.example.com": "failure using the secondary interface(s)",
+      })
+    self.assertEqual(len(latency), 50)
+    self.assertEqual(latency["node7.example.com"].keys(), ["secondary"])
+    self.assertEqual(sorted(latency["node1.example.com"].keys()),
+                     ["primary", "secondary"])
+
+  def testVerifyNodeNetTestTimeout(self):
+    my_name = "node0.example.com"
+    nodes = [(my_name, "192.0.2.1", "198.51.100.1")]
+    timeouts = []
+
+    def _TcpPing(target, port, source=None, timeout=None):
+      timeouts.append(timeout)
+      return True
+
+    # Each ping is limited to the usual timeout, not the whole time limit
+    with testutils.patch_object(netutils, "TcpPing", new=_TcpPing):
+      result = backend.VerifyNodeNetTest(my_name, (nodes, [my_name]),
+                                         deadline=time.time() + 300)
+    self.assertEqual(result, {})
+    self.assertEqual(timeouts, [constants.TCP_PING_TIMEOUT] * 2)
+
+    # ... but to the remaining time if that's shorter
+    del timeouts[:]
+    with testutils.patch_object(netutils, "TcpPing", new=_TcpPing):
+      result = backend.VerifyNodeNetTest(my_name, (nodes, [my_name]),
+                                         deadline=time.time() + 5)
+    self.assertEqual(result, {})
+    self.assertEqual(len(timeouts), 2)
+    self.assertTrue(compat.all(0 < t <= 5 for t in timeouts))
+
+  def testVerifyNodeNetTestDeadline(self):
+    my_name = "node0.example.com"
+    nodes = [(my_name, "192.0.2.1", "192.0.2.1")]
+    result = backend.VerifyNodeNetTest(my_name, (nodes, [my_name]),
+                                       deadline=time.time() - 1)
+    self.assertTrue("not checked" in result[my_name])
 
   def testVerifyNodeNetSkipTest(self):
     local_data = ([('n1.test.com', "any", "any")], [])
@@ -246,6 +305,65 @@ class TestNodeVerify(testutils.GanetiTestCase):
     self.assertEqual(constants.CV_ERROR, errcode)
 
 
+class TestIncrementalNodeVerify(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.cache_file = utils.PathJoin(self.tmpdir, "node-verify.data")
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _GetResult(self):
+    return {
+      constants.NV_TIME: (1234, 5678),
+      constants.NV_VERSION: (constants.PROTOCOL_VERSION,
+                             constants.RELEASE_VERSION),
+      constants.NV_LVLIST: {"xenvg/lv1": (2048, False, True)},
+      }
+
+  def testLoadMissing(self):
+    cache = backend._LoadNodeVerifyCache(cache_file=self.cache_file)
+    self.assertEqual(cache, {"fingerprints": {}, "token": None,
+                             "digests": {}})
+
+  def testLoadBroken(self):
+    utils.WriteFile(self.cache_file, data="{broken")
+    cache = backend._LoadNodeVerifyCache(cache_file=self.cache_file)
+    self.assertEqual(cache["token"], None)
+
+  def testUnchangedSections(self):
+    cache = backend._LoadNodeVerifyCache(cache_file=self.cache_file)
+
+    result = self._GetResult()
+    backend._MakeIncrementalResult(None, result, cache)
+    (token, digests) = result[constants.NV_INCREMENTAL]
+    self.assertEqual(sorted(digests.keys()),
+                     sorted([constants.NV_VERSION, constants.NV_LVLIST]))
+    self.assertTrue(constants.NV_LVLIST in result)
+
+    backend._SaveNodeVerifyCache(cache, cache_file=self.cache_file)
+    cache = backend._LoadNodeVerifyCache(cache_file=self.cache_file)
+
+    result = self._GetResult()
+    result[constants.NV_LVLIST]["xenvg/lv2"] = (1024, False, True)
+    backend._MakeIncrementalResult(token, result, cache)
+    self.assertEqual(sorted(result.keys()),
+                     sorted([constants.NV_TIME, constants.NV_LVLIST,
+                             constants.NV_INCREMENTAL]))
+    (new_token, _) = result[constants.NV_INCREMENTAL]
+    self.assertNotEqual(token, new_token)
+
+  def testUnknownToken(self):
+    cache = backend._LoadNodeVerifyCache(cache_file=self.cache_file)
+    result = self._GetResult()
+    backend._MakeIncrementalResult(None, result, cache)
+
+    result = self._GetResult()
+    backend._MakeIncrementalResult("some-other-token", result, cache)
+    self.assertTrue(constants.NV_VERSION in result)
+    self.assertTrue(constants.NV_LVLIST in result)
+
+
 def _DefRestrictedCmdOwner():
   return (os.getuid(), os.getgid())
 
@@ -670,6 +788,67 @@ class TestSetWatcherPause(unittest.TestCase):
       self.assertEqual(os.stat(self.filename).st_mode & 0777, 0644)
 
 
+class TestJobQueueUpdateMany(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.filename = utils.PathJoin(self.tmpdir, "job-1")
+    ents = mock.Mock(masterd_uid=os.getuid(), daemons_gid=os.getgid())
+    self._patchers = [
+      testutils.patch_object(backend, "_EnsureJobQueueFile"),
+      testutils.patch_object(backend.runtime, "GetEnts", return_value=ents),
+      ]
+    for patcher in self._patchers:
+      patcher.start()
+
+  def tearDown(self):
+    for patcher in self._patchers:
+      patcher.stop()
+    shutil.rmtree(self.tmpdir)
+
+  @staticmethod
+  def _Content(data):
+    return (constants.RPC_ENCODING_NONE, data)
+
+  def testFull(self):
+    result = backend.JobQueueUpdateMany([
+      (self.filename, None, self._Content("full contents")),
+      ])
+    self.assertEqual(result, [])
+    self.assertEqual(utils.ReadFile(self.filename), "full contents")
+
+  def testDelta(self):
+    old = "x" * 100 + "a" + "y" * 100
+    new = "x" * 100 + "bc" + "y" * 100
+    utils.WriteFile(self.filename, data=old)
+    (base, replacement) = jstore.MakeFileDelta(old, new)
+    result = backend.JobQueueUpdateMany([
+      (self.filename, base, self._Content(replacement)),
+      ])
+    self.assertEqual(result, [])
+    self.assertEqual(utils.ReadFile(self.filename), new)
+
+  def testDigestMismatch(self):
+    (base, replacement) = jstore.MakeFileDelta("old contents", "new contents")
+    utils.WriteFile(self.filename, data="other contents")
+    other = utils.PathJoin(self.tmpdir, "job-2")
+    result = backend.JobQueueUpdateMany([
+      (self.filename, base, self._Content(replacement)),
+      (other, None, self._Content("job 2")),
+      ])
+    # The outdated file is left alone and requested in full
+    self.assertEqual(result, [self.filename])
+    self.assertEqual(utils.ReadFile(self.filename), "other contents")
+    self.assertEqual(utils.ReadFile(other), "job 2")
+
+  def testMissingFile(self):
+    (base, replacement) = jstore.MakeFileDelta("old contents", "new contents")
+    result = backend.JobQueueUpdateMany([
+      (self.filename, base, self._Content(replacement)),
+      ])
+    self.assertEqual(result, [self.filename])
+    self.assertFalse(os.path.exists(self.filename))
+
+
 class TestGetBlockDevSymlinkPath(unittest.TestCase):
   def setUp(self):
     self.tmpdir = tempfile.mkdtemp()
@@ -2209,6 +2388,58 @@ class TestVerifySshSetup(testutils.GanetiTestCase):
     self.assertTrue(self._NODE3_UUID in result[0])
 
 
+class TestTryOSFromDisk(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.os_dir = utils.PathJoin(self.tmpdir, "myos")
+    os.mkdir(self.os_dir)
+    utils.WriteFile(utils.PathJoin(self.os_dir, constants.OS_API_FILE),
+                    data="%s\n" % constants.OS_API_V20)
+    for script in constants.OS_SCRIPTS:
+      utils.WriteFile(utils.PathJoin(self.os_dir, script), data="",
+                      mode=0700)
+    utils.WriteFile(utils.PathJoin(self.os_dir, constants.OS_PARAMETERS_FILE),
+                    data="param1 Some parameter\n")
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def testValid(self):
+    (status, os_obj) = backend._TryOSFromDisk("myos", base_dir=self.tmpdir)
+    self.assertTrue(status)
+    self.assertEqual(os_obj.name, "myos")
+    self.assertEqual(os_obj.path, self.os_dir)
+    self.assertEqual(os_obj.supported_parameters,
+                     [["param1", "Some parameter"]])
+    self.assertEqual(os_obj.api_versions, [constants.OS_API_V20])
+
+  def testNotFound(self):
+    (status, msg) = backend._TryOSFromDisk("other", base_dir=self.tmpdir)
+    self.assertFalse(status)
+    self.assertTrue("not found" in msg)
+
+  def testCached(self):
+    (_, os_obj) = backend._TryOSFromDisk("myos", base_dir=self.tmpdir)
+    (_, os_obj2) = backend._TryOSFromDisk("myos", base_dir=self.tmpdir)
+    self.assertTrue(os_obj2 is os_obj)
+
+  def testReloadNewFile(self):
+    (_, os_obj) = backend._TryOSFromDisk("myos", base_dir=self.tmpdir)
+    self.assertEqual(os_obj.supported_variants, [])
+    utils.WriteFile(utils.PathJoin(self.os_dir, constants.OS_VARIANTS_FILE),
+                    data="default\nminimal\n")
+    (_, os_obj2) = backend._TryOSFromDisk("myos", base_dir=self.tmpdir)
+    self.assertEqual(os_obj2.supported_variants, ["default", "minimal"])
+
+  def testReloadNotExecutable(self):
+    (status, _) = backend._TryOSFromDisk("myos", base_dir=self.tmpdir)
+    self.assertTrue(status)
+    os.chmod(utils.PathJoin(self.os_dir, constants.OS_SCRIPT_RENAME), 0600)
+    (status, msg) = backend._TryOSFromDisk("myos", base_dir=self.tmpdir)
+    self.assertFalse(status)
+    self.assertTrue("not executable" in msg)
+
+
 class TestOSEnvironment(unittest.TestCase):
   """Ensure the presence of public and private parameters.
 
@@ -399,6 +399,111 @@ class TestFormatQueryResult(unittest.TestCase):
     self.assertEqual(cli.FormatQueryResult(response, header=True),
                      (cli.QR_NORMAL, ["ID Name"]))
 
+
+class TestIterFormatTable(unittest.TestCase):
+  COLUMNS = [
+    cli.TableColumn("Name", str, False),
+    cli.TableColumn("Size", str, True),
+    cli.TableColumn("Desc", str, False),
+    ]
+
+  ROWS = [
+    ["a", 1, "x"],
+    ["bcd", 12345, "yy"],
+    ["efghijkl", 7, "zzz"],
+    ]
+
+  def _Rows(self, consumed):
+    for row in self.ROWS:
+      consumed.append(row)
+      yield row
+
+  def testAllRows(self):
+    for header in [False, True]:
+      for separator in [None, ":"]:
+        self.assertEqual(list(cli.IterFormatTable(self.ROWS, self.COLUMNS,
+                                                  header, separator)),
+                         cli.FormatTable(self.ROWS, self.COLUMNS, header,
+                                         separator))
+
+  def testSeparator(self):
+    consumed = []
+    lines = cli.IterFormatTable(self._Rows(consumed), self.COLUMNS, True, "|",
+                                width_sample=1)
+    self.assertEqual(lines.next(), "Name|Size|Desc")
+    self.assertEqual(consumed, [])
+    self.assertEqual(lines.next(), "a|1|x")
+    self.assertEqual(consumed, self.ROWS[:1])
+    self.assertEqual(list(lines), ["bcd|12345|yy", "efghijkl|7|zzz"])
+
+  def testWidthSample(self):
+    consumed = []
+    lines = cli.IterFormatTable(self._Rows(consumed), self.COLUMNS, True, None,
+                                width_sample=2)
+    self.assertEqual(lines.next(), "Name  Size Desc")
+    self.assertEqual(consumed, self.ROWS[:2])
+    self.assertEqual(list(lines), [
+      "a        1 x",
+      "bcd  12345 yy",
+      "efghijkl     7 zzz",
+      ])
+
+    self.assertEqual(list(cli.IterFormatTable(self.ROWS, self.COLUMNS, False,
+                                              None, width_sample=0)),
+                     ["a 1 x", "bcd 12345 yy", "efghijkl 7 zzz"])
+
+
+class TestQueryPages(unittest.TestCase):
+  class _FakeClient:
+    def __init__(self, names):
+      self._names = names
+      self.queries = []
+
+    def Query(self, res, fields, qfilter):
+      self.queries.append((fields, qfilter))
+
+      if fields == ["name"]:
+        data = [[(constants.RS_NORMAL, name)] for name in self._names]
+      else:
+        assert qfilter[0] == qlang.OP_OR
+        data = [[(constants.RS_NORMAL, value), (constants.RS_NORMAL, 1)]
+                for (_, _, value) in qfilter[1:]]
+
+      return objects.QueryResponse(fields=None, data=data)
+
+  def test(self):
+    names = ["node%s" % i for i in range(7)]
+    qfilter = ["=~", "name", "node"]
+
+    for page_size in [1, 3, 7, 100]:
+      cl = self._FakeClient(names)
+      rows = cli._QueryPages(cl, constants.QR_NODE, ["name", "size"], qfilter,
+                             "name", page_size)
+      self.assertEqual(cl.queries, [])
+      self.assertEqual(list(rows),
+                       [[(constants.RS_NORMAL, name), (constants.RS_NORMAL, 1)]
+                        for name in names])
+      self.assertEqual(cl.queries[0], (["name"], qfilter))
+      self.assertEqual(cl.queries[1:], [
+        (["name", "size"],
+         qlang.MakeSimpleFilter("name", names[start:start + page_size]))
+        for start in range(0, len(names), page_size)
+        ])
+
+  def testEmpty(self):
+    cl = self._FakeClient([])
+    self.assertEqual(list(cli._QueryPages(cl, constants.QR_NODE, ["name"],
+                                          None, "name", 10)), [])
+    self.assertEqual(cl.queries, [(["name"], None)])
+
+  def testInvalidPageSize(self):
+    for page_size in [0, -1, -100]:
+      cl = self._FakeClient(["node1"])
+      self.assertRaises(errors.OpPrereqError, cli.GenericList,
+                        constants.QR_NODE, ["name"], None, None, None, True,
+                        cl=cl, page_size=page_size)
+      self.assertEqual(cl.queries, [])
+
   def testNoDataWithUnknown(self):
     fields = [
       objects.QueryFieldDefinition(name="id", title="ID",
@@ -688,6 +793,65 @@ class TestGenericPollJob(testutils.GanetiTestCase):
                          job_id, cbs, cbs, cancel_fn=(lambda: False)))
     cbs.CheckEmpty()
 
+
+class _FakeJobExecutorClient:
+  def __init__(self, statuses):
+    self._statuses = statuses
+    self.waits = []
+    self.polled = []
+
+  def SubmitManyJobs(self, jobs):
+    return [(True, job_id) for job_id in sorted(self._statuses)[:len(jobs)]]
+
+  def QueryJobs(self, job_ids, fields):
+    if fields == ["status"]:
+      return [[self._statuses[job_id]] if self._statuses[job_id] else None
+              for job_id in job_ids]
+
+    (job_id, ) = job_ids
+    return [[self._statuses[job_id], [constants.OP_STATUS_SUCCESS],
+             ["result%s" % job_id]]]
+
+  def WaitForJobsChangeOnce(self, jobs):
+    job_ids = sorted(job_id for (job_id, _) in jobs)
+    self.waits.append(job_ids)
+
+    # Jobs finish in reverse order
+    self._statuses[job_ids[-1]] = constants.JOB_STATUS_SUCCESS
+
+    return [(job_ids[-1], constants.JOB_STATUS_SUCCESS)]
+
+  def WaitForJobChangeOnce(self, job_id, fields, prev_job_info,
+                           prev_log_serial, timeout=None):
+    self.polled.append(job_id)
+
+    if not self._statuses[job_id]:
+      return None
+
+    return ((self._statuses[job_id], ), [])
+
+
+class TestJobExecutor(unittest.TestCase):
+  def test(self):
+    cl = _FakeJobExecutorClient({
+      100: constants.JOB_STATUS_QUEUED,
+      101: None,
+      102: constants.JOB_STATUS_RUNNING,
+      })
+
+    jex = cli.JobExecutor(cl=cl, verbose=False, feedback_fn=lambda _: None)
+    for name in ["a", "b", "c"]:
+      jex.QueueJob(name)
+
+    results = jex.GetResults()
+
+    self.assertEqual(cl.waits, [[100, 102], [100]])
+    self.assertEqual(cl.polled, [101, 102, 100])
+    self.assertEqual(results[0], (True, ["result100"]))
+    self.assertFalse(results[1][0])
+    self.assertEqual(results[2], (True, ["result102"]))
+
+
 class TestFormatLogMessage(unittest.TestCase):
   def test(self):
     self.assertEqual(cli.FormatLogMessage(constants.ELOG_MESSAGE,
@@ -0,0 +1,140 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for unittesting the config.delta module"""
+
+import unittest
+
+from ganeti import objects
+from ganeti.config import delta
+
+import testutils
+
+
+def _MakeConfig(nodes):
+  return objects.ConfigData(version=1,
+                            cluster=objects.Cluster(cluster_name="cluster"),
+                            nodes=nodes, nodegroups={}, instances={},
+                            networks={}, disks={}, filters={},
+                            maintenance=objects.Maintenance(),
+                            ctime=1.0, mtime=2.0, serial_no=3)
+
+
+def _MakeNode(uuid, name):
+  return objects.Node(uuid=uuid, name=name, group="group", offline=False)
+
+
+class TestApplyDelta(unittest.TestCase):
+  def setUp(self):
+    self.node1 = _MakeNode("uuid1", "node1")
+    self.node2 = _MakeNode("uuid2", "node2")
+    self.cfg = _MakeConfig({"uuid1": self.node1, "uuid2": self.node2})
+    (self.delta, _) = delta.BuildDelta(self.cfg, delta.Baseline())
+    self.delta["serial_no"] = 4
+    for (name, _) in delta.CONTAINERS:
+      self.delta[name] = {}
+
+  def testUnchanged(self):
+    (new_cfg, changes) = delta.ApplyDelta(self.cfg, self.delta)
+    self.assertEqual(new_cfg.serial_no, 4)
+    self.assertEqual(self.cfg.serial_no, 3)
+    self.assertTrue(new_cfg.nodes["uuid1"] is self.node1)
+    self.assertTrue(new_cfg.nodes["uuid2"] is self.node2)
+    self.assertEqual(changes["nodes"], {})
+
+  def testChanged(self):
+    self.delta["nodes"] = {
+      "uuid1": None,
+      "uuid2": _MakeNode("uuid2", "node2").ToDict(),
+      "uuid3": _MakeNode("uuid3", "node3").ToDict(),
+      }
+    self.delta["nodes"]["uuid2"]["offline"] = True
+    (new_cfg, changes) = delta.ApplyDelta(self.cfg, self.delta)
+    self.assertEqual(sorted(new_cfg.nodes.keys()), ["uuid2", "uuid3"])
+    self.assertTrue(new_cfg.nodes["uuid2"].offline)
+    self.assertFalse(self.node2.offline)
+    self.assertEqual(sorted(self.cfg.nodes.keys()), ["uuid1", "uuid2"])
+    self.assertEqual(changes["nodes"], {
+      "uuid1": None,
+      "uuid2": new_cfg.nodes["uuid2"],
+      "uuid3": new_cfg.nodes["uuid3"],
+      })
+
+  def testFull(self):
+    self.delta["full"] = True
+    self.delta["nodes"] = {"uuid3": _MakeNode("uuid3", "node3").ToDict()}
+    (new_cfg, _) = delta.ApplyDelta(self.cfg, self.delta)
+    self.assertEqual(new_cfg.nodes.keys(), ["uuid3"])
+
+
+class TestBuildDelta(unittest.TestCase):
+  def setUp(self):
+    self.node1 = _MakeNode("uuid1", "node1")
+    self.node2 = _MakeNode("uuid2", "node2")
+    self.cfg = _MakeConfig({"uuid1": self.node1, "uuid2": self.node2})
+    self.baseline = delta.Baseline.FromConfig(self.cfg)
+
+  def testUnchanged(self):
+    (result, changes) = delta.BuildDelta(self.cfg, self.baseline)
+    self.assertEqual(result["base"], 3)
+    self.assertFalse(result["full"])
+    self.assertEqual(result["nodes"], {})
+    self.assertEqual(result["cluster"]["cluster_name"], "cluster")
+    self.assertEqual(changes["nodes"], {})
+
+  def testChanged(self):
+    self.node1.offline = True
+    del self.cfg.nodes["uuid2"]
+    node3 = self.cfg.nodes["uuid3"] = _MakeNode("uuid3", "node3")
+    (result, changes) = delta.BuildDelta(self.cfg, self.baseline)
+    self.assertEqual(result["nodes"], {
+      "uuid1": self.node1.ToDict(),
+      "uuid2": None,
+      "uuid3": node3.ToDict(),
+      })
+    self.assertEqual(changes["nodes"], {
+      "uuid1": self.node1,
+      "uuid2": None,
+      "uuid3": node3,
+      })
+
+    # Once the changes are known to WConfd, they aren't sent again
+    self.baseline.Update(changes)
+    (result, _) = delta.BuildDelta(self.cfg, self.baseline)
+    self.assertEqual(result["nodes"], {})
+
+  def testReplaced(self):
+    self.cfg.nodes["uuid1"] = _MakeNode("uuid1", "node1")
+    (result, _) = delta.BuildDelta(self.cfg, self.baseline)
+    self.assertEqual(result["nodes"].keys(), ["uuid1"])
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for unittesting the config.index module"""
+
+import unittest
+
+from ganeti import objects
+from ganeti.config import index
+
+import testutils
+
+
+class _CountingDict(dict):
+  """Dictionary counting how often all of its values are retrieved.
+
+  """
+  def __init__(self, *args, **kwargs):
+    dict.__init__(self, *args, **kwargs)
+    self.scans = 0
+
+  def values(self):
+    self.scans += 1
+    return dict.values(self)
+
+
+def _MakeConfig(count):
+  nodes = _CountingDict()
+  instances = _CountingDict()
+  disks = _CountingDict()
+  for i in range(count):
+    nodes["node%d-uuid" % i] = \
+      objects.Node(uuid="node%d-uuid" % i, name="node%d" % i)
+  for i in range(count):
+    pnode = "node%d-uuid" % i
+    snode = "node%d-uuid" % ((i + 1) % count)
+    disks["disk%d-uuid" % i] = \
+      objects.Disk(uuid="disk%d-uuid" % i, name="disk%d" % i,
+                   nodes=[pnode, snode])
+    instances["inst%d-uuid" % i] = \
+      objects.Instance(uuid="inst%d-uuid" % i, name="inst%d" % i,
+                       primary_node=pnode, disks=["disk%d-uuid" % i])
+  groups = _CountingDict({
+    "group-uuid": objects.NodeGroup(uuid="group-uuid", name="default"),
+    })
+  return objects.ConfigData(nodes=nodes, instances=instances, disks=disks,
+                            nodegroups=groups, serial_no=1)
+
+
+class TestConfigIndex(unittest.TestCase):
+  def setUp(self):
+    self.cfg = _MakeConfig(3)
+    self.index = index.ConfigIndex()
+
+  def testLookups(self):
+    self.assertEqual(self.index.LookupInstance(self.cfg, "inst1"),
+                     "inst1-uuid")
+    self.assertEqual(self.index.LookupInstance(self.cfg, "inst9"), None)
+    self.assertEqual(self.index.LookupNode(self.cfg, "node2"), "node2-uuid")
+    self.assertEqual(self.index.LookupNodeGroup(self.cfg, "default"),
+                     "group-uuid")
+    self.assertEqual(self.index.LookupDisks(self.cfg, "disk0"),
+                     ["disk0-uuid"])
+    self.assertEqual(self.index.LookupDisks(self.cfg, "disk9"), [])
+    self.assertEqual(self.index.LookupDiskInstance(self.cfg, "disk2-uuid"),
+                     "inst2-uuid")
+    self.assertEqual(self.index.LookupNodeInstances(self.cfg, "node1-uuid"),
+                     (["inst1-uuid"], ["inst0-uuid"]))
+    self.assertEqual(self.index.LookupNodeInstances(self.cfg, "node9-uuid"),
+                     ([], []))
+
+  def testDuplicateDiskNames(self):
+    self.cfg.disks["disk1-uuid"].name = "disk0"
+    self.assertEqual(sorted(self.index.LookupDisks(self.cfg, "disk0")),
+                     ["disk0-uuid", "disk1-uuid"])
+
+  def testRenamedInPlace(self):
+    self.assertEqual(self.index.LookupInstance(self.cfg, "inst1"),
+                     "inst1-uuid")
+    self.cfg.instances["inst1-uuid"].name = "inst9"
+    self.cfg.instances["inst2-uuid"].name = "inst1"
+    self.assertEqual(self.index.LookupInstance(self.cfg, "inst1"),
+                     "inst2-uuid")
+
+  def testLookupNewNameAfterRename(self):
+    self.assertEqual(self.index.LookupInstance(self.cfg, "inst1"),
+                     "inst1-uuid")
+    self.assertEqual(self.index.LookupNode(self.cfg, "node1"), "node1-uuid")
+    self.cfg.instances["inst1-uuid"].name = "inst1-renamed"
+    self.cfg.nodes["node1-uuid"].name = "node1-renamed"
+    self.assertEqual(self.index.LookupInstance(self.cfg, "inst1-renamed"),
+                     "inst1-uuid")
+    self.assertEqual(self.index.LookupInstance(self.cfg, "inst1"), None)
+    self.assertEqual(self.index.LookupNode(self.cfg, "node1-renamed"),
+                     "node1-uuid")
+
+  def testAddedInPlace(self):
+    self.assertEqual(self.index.LookupInstance(self.cfg, "inst9"), None)
+    self.assertEqual(self.index.LookupDisks(self.cfg, "disk9"), [])
+    self.assertEqual(self.index.LookupDiskInstance(self.cfg, "disk9-uuid"),
+                     None)
+    self.cfg.disks["disk9-uuid"] = \
+      objects.Disk(uuid="disk9-uuid", name="disk9", nodes=["node0-uuid"])
+    self.cfg.instances["inst9-uuid"] = \
+      objects.Instance(uuid="inst9-uuid", name="inst9",
+                       primary_node="node0-uuid", disks=["disk9-uuid"])
+    self.assertEqual(self.index.LookupInstance(self.cfg, "inst9"),
+                     "inst9-uuid")
+    self.assertEqual(self.index.LookupDisks(self.cfg, "disk9"),
+                     ["disk9-uuid"])
+    self.assertEqual(self.index.LookupDiskInstance(self.cfg, "disk9-uuid"),
+                     "inst9-uuid")
+
+  def testDiskMovedInPlace(self):
+    self.assertEqual(self.index.LookupDiskInstance(self.cfg, "disk0-uuid"),
+                     "inst0-uuid")
+    self.cfg.instances["inst0-uuid"].disks = []
+    self.cfg.instances["inst1-uuid"].disks.append("disk0-uuid")
+    self.assertEqual(self.index.LookupDiskInstance(self.cfg, "disk0-uuid"),
+                     "inst1-uuid")
+
+  def testMissRebuildsOnce(self):
+    for _ in range(3):
+      self.assertEqual(self.index.LookupInstance(self.cfg, "inst9"), None)
+    # built by the first lookup, rebuilt by each of the two following misses
+    self.assertEqual(self.cfg.instances.scans, 3)
+
+  def testInvalidation(self):
+    self.assertEqual(self.index.LookupDiskInstance(self.cfg, "disk0-uuid"),
+                     "inst0-uuid")
+    self.cfg.instances["inst0-uuid"].disks = []
+
+    self.index.Invalidate()
+    self.assertEqual(self.index.LookupDiskInstance(self.cfg, "disk0-uuid"),
+                     None)
+
+    # a new serial number invalidates the indexes as well
+    self.cfg.instances["inst0-uuid"].disks = ["disk0-uuid"]
+    self.cfg.serial_no += 1
+    self.assertEqual(self.index.LookupDiskInstance(self.cfg, "disk0-uuid"),
+                     "inst0-uuid")
+
+    # and so does new configuration data
+    cfg = _MakeConfig(1)
+    self.assertEqual(self.index.LookupNode(cfg, "node1"), None)
+    self.assertEqual(self.index.LookupNode(cfg, "node0"), "node0-uuid")
+
+  def testLookupCost(self):
+    # Once built, the cost of a lookup doesn't depend on the cluster size
+    for count in [10, 1000]:
+      cfg = _MakeConfig(count)
+      for i in range(count):
+        self.assertEqual(self.index.LookupInstance(cfg, "inst%d" % i),
+                         "inst%d-uuid" % i)
+        self.assertEqual(self.index.LookupNode(cfg, "node%d" % i),
+                         "node%d-uuid" % i)
+        self.assertEqual(self.index.LookupDiskInstance(cfg,
+                                                       "disk%d-uuid" % i),
+                         "inst%d-uuid" % i)
+        self.assertEqual(self.index.LookupNodeInstances(cfg,
+                                                        "node%d-uuid" % i)[0],
+                         ["inst%d-uuid" % i])
+      # the instances are scanned for the name, disk and node indexes
+      self.assertEqual(cfg.instances.scans, 3)
+      self.assertEqual(cfg.nodes.scans, 1)
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -46,7 +46,8 @@ from ganeti import cmdlib
 from ganeti.rpc import node as rpc
 from ganeti import compat
 from ganeti import pathutils
-from ganeti.constants import HKR_SUCCESS, HKR_FAIL, HKR_SKIP
+from ganeti import utils
+from ganeti.constants import HKR_SUCCESS, HKR_FAIL, HKR_SKIP, HKR_DEFERRED
 
 from mocks import FakeConfig, FakeProc, FakeContext
 
@@ -194,6 +195,77 @@ class TestHooksRunner(unittest.TestCase):
       expect.sort()
       self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}), expect)
 
+  def _WriteScript(self, phase, name, body):
+    fname = "%s/%s" % (self.ph_dirs[phase], name)
+    utils.WriteFile(fname, data="#!/bin/sh\n%s\n" % body, mode=0700)
+    self.torm.append((fname, False))
+    return fname
+
+  def testIndependent(self):
+    """Test independent scripts"""
+    for phase in (constants.HOOKS_PHASE_PRE, constants.HOOKS_PHASE_POST):
+      expect = []
+      for (fbase, body, rs) in [
+        ("00first", "# ganeti-hook: independent\nexit 0", HKR_SUCCESS),
+        ("10second", "exit 1", HKR_FAIL),
+        ("20third", "# ganeti-hook: foo, independent\nexit 1", HKR_FAIL),
+        ("30fourth", "exit 0", HKR_SUCCESS),
+        ]:
+        fname = self._WriteScript(phase, fbase, body)
+        expect.append((self._rname(fname), rs, ""))
+      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}), expect)
+
+  def testIndependentTimeout(self):
+    """Test the timeout of independent scripts"""
+    phase = constants.HOOKS_PHASE_POST
+    fname = self._WriteScript(phase, "slow",
+                              "# ganeti-hook: independent\nexec sleep 60")
+    old_timeout = constants.HOOKS_INDEPENDENT_TIMEOUT
+    constants.HOOKS_INDEPENDENT_TIMEOUT = 1
+    try:
+      start = time.time()
+      result = self.hr.RunHooks(self.hpath, phase, {})
+    finally:
+      constants.HOOKS_INDEPENDENT_TIMEOUT = old_timeout
+    self.assertTrue(time.time() - start < 30)
+    [(script, hkr, output)] = result
+    self.assertEqual(script, self._rname(fname))
+    self.assertEqual(hkr, HKR_FAIL)
+    self.assertTrue("timeout" in output)
+
+  def testAsync(self):
+    """Test asynchronous scripts"""
+    marker = "%s/async-ran" % self.tmpdir
+    for phase in (constants.HOOKS_PHASE_PRE, constants.HOOKS_PHASE_POST):
+      self._WriteScript(phase, "00sync", "exit 0")
+      self._WriteScript(phase, "10async",
+                        "# ganeti-hook: async\necho -n ran > %s" % marker)
+      fname = "%s/20skip" % self.ph_dirs[phase]
+      utils.WriteFile(fname, data="")
+      self.torm.append((fname, False))
+
+    # Asynchronous scripts are only special in the post phase
+    self.failUnlessEqual(
+      self.hr.RunHooks(self.hpath, constants.HOOKS_PHASE_PRE, {}),
+      [("fake-pre.d/00sync", HKR_SUCCESS, ""),
+       ("fake-pre.d/10async", HKR_SUCCESS, ""),
+       ("fake-pre.d/20skip", HKR_SKIP, "")])
+    self.assertEqual(utils.ReadFile(marker), "ran")
+    os.unlink(marker)
+
+    self.failUnlessEqual(
+      self.hr.RunHooks(self.hpath, constants.HOOKS_PHASE_POST, {}),
+      [("fake-post.d/00sync", HKR_SUCCESS, ""),
+       ("fake-post.d/10async", HKR_DEFERRED, ""),
+       ("fake-post.d/20skip", HKR_SKIP, "")])
+    self.assertFalse(os.path.exists(marker))
+
+    self.failUnlessEqual(
+      self.hr.RunHooks(self.hpath, constants.HOOKS_PHASE_POST_DEFERRED, {}),
+      [("fake-post.d/10async", HKR_SUCCESS, "")])
+    self.assertEqual(utils.ReadFile(marker), "ran")
+    os.unlink(marker)
+
   def testEnv(self):
     """Test environment execution"""
     for phase in (constants.HOOKS_PHASE_PRE, constants.HOOKS_PHASE_POST):
@@ -286,6 +358,66 @@ class TestHooksMaster(unittest.TestCase):
     for phase in (constants.HOOKS_PHASE_PRE, constants.HOOKS_PHASE_POST):
       hm.RunPhase(phase)
 
+  def testDeferred(self):
+    """Test running deferred post hooks"""
+    node_uuids = ["aaaaaaaa-dead-beef-dead-beefdeadbeef",
+                  "bbbbbbbb-dead-beef-dead-beefdeadbeef"]
+    rpcs = []
+    logs = []
+
+    def _HooksRpc(node_list, hpath, phase, env):
+      rpcs.append((sorted(node_list), phase))
+      rr = rpc.RpcResult
+      if phase == constants.HOOKS_PHASE_POST_DEFERRED:
+        hooks_results = [("utest", constants.HKR_FAIL, "err")]
+      elif phase == constants.HOOKS_PHASE_POST:
+        hooks_results = [("utest", constants.HKR_DEFERRED, "")]
+      else:
+        hooks_results = [("utest", constants.HKR_SUCCESS, "")]
+      return dict((node, rr((True, hooks_results[node != node_uuids[0]:]),
+                            node=node, call="FakeScript"))
+                  for node in node_list)
+
+    def _Log(msg, *args):
+      logs.append(msg % args)
+
+    pending = []
+
+    def _Async(nodes, run_fn, process_fn):
+      self.assertEqual(nodes, node_uuids[:1])
+      pending.append((run_fn, process_fn))
+
+    for run_async in [False, True]:
+      del pending[:]
+      hm = hooksmaster.HooksMaster(self.op.OP_ID, "test",
+                                   (node_uuids, node_uuids), _HooksRpc,
+                                   hooksmaster.RpcResultsToHooksResults,
+                                   lambda: {}, None, _Log,
+                                   async_fn=[None, _Async][run_async])
+
+      hm.RunPhase(constants.HOOKS_PHASE_PRE)
+      hm.RunPhase(constants.HOOKS_PHASE_POST)
+      self.assertEqual(rpcs[:2], [
+        (node_uuids, constants.HOOKS_PHASE_PRE),
+        (node_uuids, constants.HOOKS_PHASE_POST),
+        ])
+      del rpcs[:2]
+
+      if run_async:
+        self.assertEqual(rpcs, [])
+        self.assertEqual(logs, [])
+        [(run_fn, process_fn)] = pending
+        process_fn(run_fn(execution_fn=_HooksRpc))
+
+      # Only the node reporting deferred scripts is called again
+      self.assertEqual(rpcs, [
+        (node_uuids[:1], constants.HOOKS_PHASE_POST_DEFERRED),
+        ])
+      self.assertEqual(logs, ["On %s asynchronous script utest failed,"
+                              " output: err" % node_uuids[0]])
+      del rpcs[:]
+      del logs[:]
+
 
 class FakeEnvLU(cmdlib.LogicalUnit):
   HPATH = "env_test_lu"
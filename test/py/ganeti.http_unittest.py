@@ -32,12 +32,15 @@
 
 
 import os
+import signal
+import socket
 import unittest
 import time
 import tempfile
 import pycurl
 import itertools
 import threading
+import zlib
 from cStringIO import StringIO
 
 from ganeti import http
@@ -122,6 +125,168 @@ class TestMisc(unittest.TestCase):
                   "Digest realm=secure foo=\"x,y\""))
 
 
+class TestMatchesEntityTag(unittest.TestCase):
+  def test(self):
+    etag = "\"1c0b\""
+    for (header, expected) in [
+      (None, False),
+      ("", False),
+      ("\"1c0b\"", True),
+      ("\"1c0a\"", False),
+      ("1c0b", False),
+      ("W/\"1c0b\"", True),
+      ("\"aaaa\", \"1c0b\"", True),
+      ("\"aaaa\",W/\"bbbb\"", False),
+      ("*", True),
+      ]:
+      self.assertEqual(http.MatchesEntityTag(header, etag), expected)
+
+
+class TestSelectContentEncoding(unittest.TestCase):
+  def test(self):
+    for (header, expected) in [
+      (None, None),
+      ("", None),
+      ("gzip", http.HTTP_ENCODING_GZIP),
+      ("deflate", http.HTTP_ENCODING_DEFLATE),
+      ("deflate, gzip", http.HTTP_ENCODING_GZIP),
+      ("gzip;q=0.5, deflate", http.HTTP_ENCODING_DEFLATE),
+      ("GZIP; q=0.8", http.HTTP_ENCODING_GZIP),
+      ("gzip;q=0", None),
+      ("gzip;q=x", None),
+      ("br", None),
+      ("*", http.HTTP_ENCODING_GZIP),
+      ("*;q=0.1, gzip;q=0", http.HTTP_ENCODING_DEFLATE),
+      ("identity", None),
+      ("identity, gzip;q=0.5", None),
+      ("identity;q=0.5, gzip", http.HTTP_ENCODING_GZIP),
+      ]:
+      self.assertEqual(http.SelectContentEncoding(header), expected)
+
+  def testSupported(self):
+    self.assertEqual(http.SelectContentEncoding("gzip, deflate",
+                                                supported=["deflate"]),
+                     http.HTTP_ENCODING_DEFLATE)
+
+
+class TestCompressChunks(unittest.TestCase):
+  def test(self):
+    chunks = ["Hello World\n" * 100, "", "x" * 10000]
+
+    for (encoding, wbits) in [(http.HTTP_ENCODING_GZIP, 16 + zlib.MAX_WBITS),
+                              (http.HTTP_ENCODING_DEFLATE, zlib.MAX_WBITS)]:
+      data = "".join(http.CompressChunks(chunks, encoding))
+      self.assertTrue(len(data) < len("".join(chunks)) / 10)
+      self.assertEqual(zlib.decompress(data, wbits), "".join(chunks))
+
+  def testUnknown(self):
+    self.assertRaises(http.HttpError, list,
+                      http.CompressChunks(["data"], "br"))
+
+
+class _CollectingMessageWriter(http.HttpMessageWriter):
+  @staticmethod
+  def _SendData(sock, buf, write_timeout):
+    sock.append(buf)
+
+
+class TestMessageWriter(unittest.TestCase):
+  def _Write(self, body, headers):
+    msg = http.HttpMessage()
+    msg.start_line = http.HttpServerToClientStartLine(http.HTTP_1_1,
+                                                      http.HTTP_OK, "OK")
+    msg.headers = headers
+    msg.body = body
+
+    buf = []
+    _CollectingMessageWriter(buf, msg, None)
+    return (msg, "".join(buf))
+
+  def testString(self):
+    (msg, data) = self._Write("Hello", {})
+    self.assertEqual(msg.headers[http.HTTP_CONTENT_LENGTH], 5)
+    self.assertTrue(data.endswith("\r\n\r\nHello"))
+
+  def testChunked(self):
+    (msg, data) = self._Write(iter(["Hello", "", "World" * 10]), {
+      http.HTTP_TRANSFER_ENCODING: http.HTTP_TRANSFER_CHUNKED,
+      })
+    self.assertFalse(http.HTTP_CONTENT_LENGTH in msg.headers)
+    self.assertTrue(data.endswith("\r\n\r\n5\r\nHello\r\n32\r\n%s\r\n"
+                                  "0\r\n\r\n" % ("World" * 10)))
+
+  def testUntilClose(self):
+    (_, data) = self._Write(iter(["Hello", "World"]), {})
+    self.assertTrue(data.endswith("\r\n\r\nHelloWorld"))
+
+
+class TestEncodeBody(unittest.TestCase):
+  def _Encode(self, version, accept, body, headers=None):
+    req = http.HttpMessage()
+    req.start_line = http.HttpClientToServerStartLine("GET", "/", version)
+    if accept is None:
+      req.headers = {}
+    else:
+      req.headers = { http.HTTP_ACCEPT_ENCODING: accept, }
+
+    resp = http.HttpMessage()
+    resp.start_line = http.HttpServerToClientStartLine(version, http.HTTP_OK,
+                                                       None)
+    resp.headers = dict(headers or {})
+    resp.body = body
+
+    http.server.HttpResponder._EncodeBody(req, resp)
+
+    return resp
+
+  def testSmallString(self):
+    resp = self._Encode(http.HTTP_1_1, "gzip", "Hello")
+    self.assertEqual(resp.body, "Hello")
+    self.assertEqual(resp.headers, {})
+
+  def testString(self):
+    body = "Hello World\n" * 1000
+    resp = self._Encode(http.HTTP_1_1, "gzip", body, headers={
+      http.HTTP_ETAG: "\"abc\"",
+      })
+    self.assertEqual(zlib.decompress(resp.body, 16 + zlib.MAX_WBITS), body)
+    self.assertEqual(resp.headers, {
+      http.HTTP_CONTENT_ENCODING: http.HTTP_ENCODING_GZIP,
+      http.HTTP_VARY: http.HTTP_ACCEPT_ENCODING,
+      http.HTTP_ETAG: "W/\"abc\"",
+      })
+
+  def testNotAccepted(self):
+    body = "Hello World\n" * 1000
+    for accept in [None, "", "br", "gzip;q=0"]:
+      resp = self._Encode(http.HTTP_1_1, accept, body)
+      self.assertEqual(resp.body, body)
+      self.assertEqual(resp.headers, {
+        http.HTTP_VARY: http.HTTP_ACCEPT_ENCODING,
+        })
+
+  def testChunked(self):
+    chunks = ["Hello", "World"]
+    resp = self._Encode(http.HTTP_1_1, "deflate", iter(chunks))
+    self.assertEqual(resp.headers[http.HTTP_TRANSFER_ENCODING],
+                     http.HTTP_TRANSFER_CHUNKED)
+    self.assertEqual(resp.headers[http.HTTP_CONTENT_ENCODING],
+                     http.HTTP_ENCODING_DEFLATE)
+    self.assertEqual(zlib.decompress("".join(resp.body)), "HelloWorld")
+
+  def testChunkedHttp10(self):
+    resp = self._Encode(http.HTTP_1_0, None, iter(["Hello", "World"]))
+    self.assertEqual(resp.body, "HelloWorld")
+    self.assertFalse(http.HTTP_TRANSFER_ENCODING in resp.headers)
+
+  def testAlreadyEncoded(self):
+    body = "x" * 10000
+    resp = self._Encode(http.HTTP_1_1, "gzip", body, headers={
+      http.HTTP_CONTENT_ENCODING: "br",
+      })
+    self.assertEqual(resp.body, body)
+
+
 class _FakeRequestAuth(http.auth.HttpServerRequestAuthentication):
   def __init__(self, realm, authreq, authenticator):
     http.auth.HttpServerRequestAuthentication.__init__(self)
@@ -781,5 +946,318 @@ class TestProcessRequests(unittest.TestCase):
                       _curl_multi=NotImplemented, _curl_process=NotImplemented)
 
 
+class _FakePoolCurl(_FakeCurl):
+  def __init__(self):
+    _FakeCurl.__init__(self)
+    self.resets = 0
+    self.closed = False
+
+  def reset(self):
+    self.opts = {}
+    self.resets += 1
+
+  def close(self):
+    self.closed = True
+
+
+class _FakePoolCurlMulti:
+  def __init__(self):
+    self.opts = {}
+    self.closed = False
+
+  def setopt(self, opt, value):
+    self.opts[opt] = value
+
+  def close(self):
+    self.closed = True
+
+
+class TestCurlHandlePool(unittest.TestCase):
+  def _MakeRequest(self, host, port, success):
+    req = http.client.HttpClientRequest(host, port, "POST", "/version")
+    req.success = success
+    return req
+
+  def testReuse(self):
+    pool = http.client.CurlHandlePool(_curl=_FakePoolCurl,
+                                      _curl_multi=_FakePoolCurlMulti)
+
+    multi = pool.GetMulti()
+    self.assertTrue(isinstance(multi, _FakePoolCurlMulti))
+    self.assertTrue(pool.GetMulti() is multi)
+
+    req = self._MakeRequest("node1", 1811, True)
+    curl = pool.GetHandle(req)
+    self.assertEqual(curl.resets, 0)
+
+    curl.info = { pycurl.NUM_CONNECTS: 1, }
+    pool.ReturnHandle(req, curl)
+    self.assertEqual(pool.GetStatistics(), (1, 0))
+
+    # Different port, new handle
+    other = pool.GetHandle(self._MakeRequest("node1", 1812, True))
+    self.assertFalse(other is curl)
+
+    # Same host and port, handle is reset and reused
+    req = self._MakeRequest("node1", 1811, True)
+    self.assertTrue(pool.GetHandle(req) is curl)
+    self.assertEqual(curl.resets, 1)
+
+    curl.info = { pycurl.NUM_CONNECTS: 0, }
+    pool.ReturnHandle(req, curl)
+    self.assertEqual(pool.GetStatistics(), (2, 1))
+
+    pool.Close()
+    self.assertTrue(curl.closed)
+    self.assertTrue(multi.closed)
+    self.assertFalse(pool.GetMulti() is multi)
+
+  def testFailedRequest(self):
+    pool = http.client.CurlHandlePool(_curl=_FakePoolCurl,
+                                      _curl_multi=_FakePoolCurlMulti)
+
+    req = self._MakeRequest("node1", 1811, False)
+    curl = pool.GetHandle(req)
+    pool.ReturnHandle(req, curl)
+    self.assertTrue(curl.closed)
+    self.assertEqual(pool.GetStatistics(), (0, 0))
+    self.assertFalse(pool.GetHandle(req) is curl)
+
+  def testLocking(self):
+    pool = http.client.CurlHandlePool(_curl=_FakePoolCurl,
+                                      _curl_multi=_FakePoolCurlMulti)
+    self.assertTrue(pool.TryAcquire())
+    self.assertFalse(pool.TryAcquire())
+    pool.Release()
+    self.assertTrue(pool.TryAcquire())
+    pool.Release()
+
+  def testProcessRequestsBusyPool(self):
+    pool = http.client.CurlHandlePool(_curl=NotImplemented,
+                                      _curl_multi=NotImplemented)
+    self.assertTrue(pool.TryAcquire())
+    try:
+      # Pool is not used while another thread owns it
+      http.client.ProcessRequests([], pool=pool, _curl=NotImplemented,
+                                  _curl_multi=_EmptyCurlMulti)
+    finally:
+      pool.Release()
+
+
+class TestPersistentConnection(unittest.TestCase):
+  class _FakeReader:
+    def __init__(self, peer_will_close):
+      self.peer_will_close = peer_will_close
+
+  def test(self):
+    fn = http.server._IsPersistentConnection
+    self.assertTrue(fn(True, self._FakeReader(False), False))
+    self.assertTrue(fn(True, self._FakeReader(None), False))
+    self.assertFalse(fn(False, self._FakeReader(False), False))
+    self.assertFalse(fn(True, self._FakeReader(True), False))
+    self.assertFalse(fn(True, self._FakeReader(False), True))
+    self.assertFalse(fn(True, None, False))
+
+  def testFinalize(self):
+    responses = http.server.HttpResponder.responses
+
+    for (persistent, body, connection, length) in [
+        (False, "Hello", "close", None),
+        (True, "Hello", "keep-alive", 5),
+        (True, None, "keep-alive", 0),
+        (True, iter(["Hello"]), "keep-alive", None),
+        ]:
+      msg = http.HttpMessage()
+      msg.start_line = http.HttpServerToClientStartLine(http.HTTP_1_1,
+                                                        http.HTTP_OK, None)
+      msg.body = body
+      if body is not None and not isinstance(body, basestring):
+        msg.headers = {
+          http.HTTP_TRANSFER_ENCODING: http.HTTP_TRANSFER_CHUNKED,
+          }
+      http.server.HttpResponder._Finalize(responses, msg, persistent)
+      self.assertEqual(msg.headers[http.HTTP_CONNECTION], connection)
+      self.assertEqual(msg.headers.get(http.HTTP_CONTENT_LENGTH), length)
+
+
+class _FakeMainloop:
+  def __init__(self):
+    self.signal_owners = []
+
+  def RegisterSignal(self, owner):
+    self.signal_owners.append(owner)
+
+
+class _FakeProcesses:
+  """Replaces C{os.fork} and C{os.waitpid} for the HTTP server.
+
+  """
+  def __init__(self):
+    self._pids = itertools.count(100)
+    self.forked = []
+    self.exited = set()
+
+  def Fork(self):
+    pid = self._pids.next()
+    self.forked.append(pid)
+    return pid
+
+  def WaitPid(self, pid, options):
+    assert options == os.WNOHANG
+    if pid in self.exited:
+      self.exited.remove(pid)
+      return (pid, 0)
+    return (0, 0)
+
+
+class TestHttpServerWorkers(unittest.TestCase):
+  def setUp(self):
+    self.procs = _FakeProcesses()
+    self.servers = []
+
+  def tearDown(self):
+    for server in self.servers:
+      server.Stop()
+      server.close()
+
+  def _CreateServer(self, **kwargs):
+    mainloop = _FakeMainloop()
+    server = http.server.HttpServer(mainloop, "127.0.0.1", 0, 20, None,
+                                    **kwargs)
+    self.servers.append(server)
+    self.assertEqual(mainloop.signal_owners, [server])
+    return server
+
+  def _StartServer(self, **kwargs):
+    server = self._CreateServer(**kwargs)
+    with testutils.patch_object(os, "fork", new=self.procs.Fork):
+      server.Start()
+    return server
+
+  def _Signal(self, server):
+    with testutils.patch_object(os, "fork", new=self.procs.Fork):
+      with testutils.patch_object(os, "waitpid", new=self.procs.WaitPid):
+        server.OnSignal(signal.SIGCHLD)
+
+  def testInvalidArguments(self):
+    self.assertRaises(AssertionError, http.server.HttpServer, _FakeMainloop(),
+                      "127.0.0.1", 0, 20, None, worker_count=-1)
+    self.assertRaises(AssertionError, http.server.HttpServer, _FakeMainloop(),
+                      "127.0.0.1", 0, 20, None, worker_max_requests=-1)
+
+  def testForkPerConnection(self):
+    server = self._StartServer()
+    self.assertTrue(server.readable())
+    self.assertEqual(self.procs.forked, [])
+    server.RestartWorkers()
+    self.assertEqual(self.procs.forked, [])
+
+  def testStart(self):
+    server = self._StartServer(worker_count=3)
+    self.assertFalse(server.readable())
+    self.assertEqual(self.procs.forked, [100, 101, 102])
+    self.assertEqual(server._workers, set([100, 101, 102]))
+
+  def testRespawnOnSigchld(self):
+    server = self._StartServer(worker_count=2)
+    self.assertEqual(server._workers, set([100, 101]))
+
+    # Nothing exited
+    self._Signal(server)
+    self.assertEqual(self.procs.forked, [100, 101])
+
+    self.procs.exited.add(100)
+    self._Signal(server)
+    self.assertEqual(self.procs.forked, [100, 101, 102])
+    self.assertEqual(server._workers, set([101, 102]))
+    self.assertEqual(sorted(server._children), [101, 102])
+
+  def testRestartWorkers(self):
+    server = self._StartServer(worker_count=2)
+    old_pipe = server._worker_pipe
+
+    with testutils.patch_object(os, "fork", new=self.procs.Fork):
+      server.RestartWorkers()
+    self.assertEqual(self.procs.forked, [100, 101, 102, 103])
+    self.assertEqual(server._workers, set([102, 103]))
+    self.assertTrue(server._worker_pipe is not old_pipe)
+
+    # The old workers are still collected, but not replaced
+    self.assertEqual(sorted(server._children), [100, 101, 102, 103])
+    self.procs.exited.update([100, 101])
+    self._Signal(server)
+    self.assertEqual(self.procs.forked, [100, 101, 102, 103])
+    self.assertEqual(sorted(server._children), [102, 103])
+
+    # Workers of the new generation are replaced
+    self.procs.exited.add(103)
+    self._Signal(server)
+    self.assertEqual(self.procs.forked, [100, 101, 102, 103, 104])
+    self.assertEqual(server._workers, set([102, 104]))
+
+  def testStop(self):
+    server = self._StartServer(worker_count=2)
+    server.Stop()
+    self.assertEqual(server._workers, set())
+
+    # Exiting workers are not replaced after stopping
+    self.procs.exited.update([100, 101])
+    self._Signal(server)
+    self.assertEqual(self.procs.forked, [100, 101])
+
+  def _RunWorker(self, server, connections, keep_pipe=True):
+    """Runs the main loop of a worker process in this process.
+
+    @return: the number of connections handled
+
+    """
+    handled = []
+
+    def _HandleConnection(connection, client_addr, _):
+      handled.append(client_addr)
+      connection.close()
+      return True
+
+    address = server.socket.getsockname()
+    clients = []
+    try:
+      for _ in range(connections):
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client.connect(address)
+        clients.append(client)
+
+      # The worker closes the write end of the worker pipe; unless asked
+      # otherwise, keep the pipe open like the parent process would
+      (read_fd, write_fd) = server._worker_pipe
+      if keep_pipe:
+        parent_fd = os.dup(write_fd)
+      else:
+        parent_fd = None
+
+      try:
+        with testutils.patch_object(signal, "signal"):
+          with testutils.patch_object(server, "_HandleConnection",
+                                      new=_HandleConnection):
+            server._RunWorker()
+      finally:
+        if parent_fd is not None:
+          os.close(parent_fd)
+        os.close(read_fd)
+        server._worker_pipe = None
+    finally:
+      for client in clients:
+        client.close()
+
+    return len(handled)
+
+  def testWorkerMaxRequests(self):
+    server = self._StartServer(worker_count=1, worker_max_requests=2)
+    self.assertEqual(self._RunWorker(server, 3), 2)
+
+  def testWorkerParentClosedPipe(self):
+    server = self._StartServer(worker_count=1)
+    self.assertEqual(self._RunWorker(server, 0, keep_pipe=False), 0)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
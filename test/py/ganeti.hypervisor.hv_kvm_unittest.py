@@ -246,6 +246,19 @@ class TestQmp(testutils.GanetiTestCase):
         response = qmp.Execute(request["execute"], request["arguments"])
         self.assertEqual(response, expected_response)
 
+  def testConnectionClosed(self):
+    socket_file = tempfile.NamedTemporaryFile()
+    os.remove(socket_file.name)
+    qmp_stub = QmpStub(socket_file.name, [])
+    qmp_stub.start()
+
+    qmp_connection = hv_kvm.QmpConnection(socket_file.name)
+    qmp_connection.connect()
+    # Connecting again must not wait for a second greeting
+    qmp_connection.connect()
+    self.assertRaises(errors.HypervisorError, qmp_connection.Execute,
+                      "query-kvm")
+
 
 class TestConsole(unittest.TestCase):
   def MakeConsole(self, instance, node, group, hvparams):
@@ -618,6 +631,150 @@ class TestKvmRuntime(testutils.GanetiTestCase):
     hypervisor.StartInstance(self.instance, [], False)
 
 
+class TestKvmMonitorCommands(testutils.GanetiTestCase):
+  def setUp(self):
+    super(TestKvmMonitorCommands, self).setUp()
+    kvm_class = "ganeti.hypervisor.hv_kvm.KVMHypervisor"
+    self.MockOut("qmp", mock.patch("ganeti.hypervisor.hv_kvm.QmpConnection"))
+    self.MockOut(mock.patch("ganeti.utils.EnsureDirs"))
+    self.MockOut("has_qmp", mock.patch(kvm_class + "._HasQmpMonitor",
+                                       return_value=True))
+    self.MockOut("monitor", mock.patch(kvm_class + "._CallMonitorCommand"))
+    self.instance = objects.Instance(name="inst1.example.com",
+                                     hypervisor=constants.HT_KVM)
+
+  def testMigrationStatus(self):
+    qmp = self.mocks["qmp"].return_value
+    qmp.Execute.return_value = {
+      "status": "active",
+      "ram": {"transferred": 2048 * 1024, "total": 4096 * 1024},
+      }
+    status = hv_kvm.KVMHypervisor().GetMigrationStatus(self.instance)
+    self.assertEqual(status.status, constants.HV_MIGRATION_ACTIVE)
+    self.assertEqual(status.transferred_ram, 2048)
+    self.assertEqual(status.total_ram, 4096)
+    qmp.Execute.assert_called_once_with("query-migrate", None)
+    self.assertFalse(self.mocks["monitor"].called)
+
+  def testConnectionReused(self):
+    qmp = self.mocks["qmp"].return_value
+    hypervisor = hv_kvm.KVMHypervisor()
+    hypervisor.BalloonInstanceMemory(self.instance, 128)
+    hypervisor.BalloonInstanceMemory(self.instance, 256)
+    self.assertEqual(self.mocks["qmp"].call_count, 1)
+    self.assertEqual(qmp.Execute.call_args_list, [
+      mock.call("balloon", {"value": 128 * 1048576}),
+      mock.call("balloon", {"value": 256 * 1048576}),
+      ])
+
+  def testConnectionDroppedOnError(self):
+    qmp = self.mocks["qmp"].return_value
+    qmp.Execute.side_effect = errors.HypervisorError("connection closed")
+    hypervisor = hv_kvm.KVMHypervisor()
+    self.assertRaises(errors.HypervisorError,
+                      hypervisor.BalloonInstanceMemory, self.instance, 128)
+    qmp.close.assert_called_once_with()
+    qmp.Execute.side_effect = None
+    hypervisor.BalloonInstanceMemory(self.instance, 128)
+    self.assertEqual(self.mocks["qmp"].call_count, 2)
+
+  def testHumanMonitorFallback(self):
+    self.mocks["has_qmp"].return_value = False
+    hv_kvm.KVMHypervisor().BalloonInstanceMemory(self.instance, 128)
+    self.assertFalse(self.mocks["qmp"].called)
+    self.mocks["monitor"].assert_called_once_with("inst1.example.com",
+                                                  "balloon 128", None)
+
+
+class TestGetProcessStartTime(unittest.TestCase):
+  STAT = ("1234 (qemu (inst1)) S 1 1234 1234 0 -1 4325696 1000 0 0 0 10 20 0"
+          " 0 20 0 3 0 987654 1000000 500 18446744073709551615")
+
+  def test(self):
+    with mock.patch("ganeti.utils.ReadFile", return_value=self.STAT):
+      self.assertEqual(hv_kvm._GetProcessStartTime(1234), 987654)
+
+  def testZombie(self):
+    stat = self.STAT.replace(") S ", ") Z ")
+    with mock.patch("ganeti.utils.ReadFile", return_value=stat):
+      self.assertEqual(hv_kvm._GetProcessStartTime(1234), None)
+
+  def testNoProcess(self):
+    with mock.patch("ganeti.utils.ReadFile",
+                    side_effect=EnvironmentError("not found")):
+      self.assertEqual(hv_kvm._GetProcessStartTime(1234), None)
+    self.assertEqual(hv_kvm._GetProcessStartTime(0), None)
+
+
+class TestKvmInstanceInfo(testutils.GanetiTestCase):
+  def setUp(self):
+    super(TestKvmInstanceInfo, self).setUp()
+    kvm_class = "ganeti.hypervisor.hv_kvm.KVMHypervisor"
+    self.MockOut(mock.patch("ganeti.utils.EnsureDirs"))
+    hv_kvm.KVMHypervisor._instance_info_cache.clear()
+    self.MockOut("read_pid", mock.patch("ganeti.utils.ReadPidFile",
+                                        return_value=100))
+    self.MockOut("start_time",
+                 mock.patch("ganeti.hypervisor.hv_kvm._GetProcessStartTime",
+                            return_value=5000))
+    self.MockOut("pid_info",
+                 mock.patch(kvm_class + "._InstancePidInfo",
+                            side_effect=lambda pid: ("inst%d" % pid, 512, 1)))
+    self.MockOut("qmp", mock.patch(kvm_class + "._CallQmpCommand",
+                                   side_effect=self._CallQmpCommand))
+    self.MockOut(mock.patch(kvm_class + "._IsUserShutdown",
+                            return_value=False))
+
+  @staticmethod
+  def _CallQmpCommand(instance_name, command):
+    if command == "query-cpus":
+      return [{}, {}]
+    return {"actual": 256 * 1048576}
+
+  def testCached(self):
+    hypervisor = hv_kvm.KVMHypervisor()
+    expected = ("inst100", 100, 256, 2, hv_kvm.hv_base.HvInstanceState.RUNNING,
+                0)
+    self.assertEqual(hypervisor.GetInstanceInfo("inst100"), expected)
+    self.assertEqual(self.mocks["qmp"].call_count, 2)
+    self.assertEqual(hv_kvm.KVMHypervisor().GetInstanceInfo("inst100"),
+                     expected)
+    self.assertEqual(self.mocks["qmp"].call_count, 2)
+
+    # A restarted process must be queried again
+    self.mocks["start_time"].return_value = 6000
+    self.assertEqual(hypervisor.GetInstanceInfo("inst100"), expected)
+    self.assertEqual(self.mocks["qmp"].call_count, 4)
+
+  def testNotRunning(self):
+    self.mocks["start_time"].return_value = None
+    self.assertEqual(hv_kvm.KVMHypervisor().GetInstanceInfo("inst100"), None)
+    self.assertFalse(self.mocks["pid_info"].called)
+
+    # The pid has been reused by another process
+    self.mocks["start_time"].return_value = 5000
+    self.assertEqual(hv_kvm.KVMHypervisor().GetInstanceInfo("other"), None)
+    self.assertFalse(self.mocks["qmp"].called)
+
+  def testGetAllInstancesInfo(self):
+    names = ["inst%d" % i for i in range(20)]
+    self.mocks["read_pid"].side_effect = \
+      lambda filename: int(os.path.basename(filename)[len("inst"):])
+    self.mocks["pid_info"].side_effect = \
+      lambda pid: ("inst%d" % (pid - (pid == 7)), 512, 1)
+    with mock.patch("os.listdir", return_value=names):
+      result = hv_kvm.KVMHypervisor().GetAllInstancesInfo()
+    self.assertEqual([info[0] for info in result],
+                     sorted(name for name in names if name != "inst7"))
+    self.assertEqual(self.mocks["qmp"].call_count, 2 * (len(names) - 1))
+
+  def testGetAllInstancesInfoError(self):
+    self.mocks["pid_info"].side_effect = errors.ProgrammerError("error")
+    with mock.patch("os.listdir", return_value=["inst1", "inst2"]):
+      self.assertRaises(errors.ProgrammerError,
+                        hv_kvm.KVMHypervisor().GetAllInstancesInfo)
+
+
 class TestKvmCpuPinning(testutils.GanetiTestCase):
   def setUp(self):
     super(TestKvmCpuPinning, self).setUp()
@@ -49,11 +49,14 @@ from ganeti import constants
 from ganeti import utils
 from ganeti import errors
 from ganeti import jqueue
+from ganeti import jstore
 from ganeti import opcodes
 from ganeti import compat
 from ganeti import mcpu
 from ganeti import query
+from ganeti import serializer
 from ganeti import workerpool
+from ganeti.rpc import node as rpc
 
 import testutils
 
@@ -461,6 +464,58 @@ class TestQueuedJob(unittest.TestCase):
         self.assertEqual(job.CalcStatus(), status)
 
 
+class TestJobLogSegment(unittest.TestCase):
+  def _MakeEntries(self):
+    return [
+      (0, (1, (1460000000, 0), constants.ELOG_MESSAGE, "Hello")),
+      (0, (2, (1460000001, 0), constants.ELOG_MESSAGE, "World")),
+      (1, (3, (1460000002, 0), constants.ELOG_JQUEUE_TEST, [1, 2, 3])),
+      ]
+
+  def testParse(self):
+    entries = self._MakeEntries()
+    data = "".join(serializer.DumpJson(i) for i in entries)
+    self.assertEqual(jqueue._ParseJobLogSegment(data),
+                     [(op_idx, serializer.LoadJson(serializer.DumpJson(entry)))
+                      for (op_idx, entry) in entries])
+    self.assertEqual(jqueue._ParseJobLogSegment(""), [])
+
+  def testParseIncomplete(self):
+    entries = self._MakeEntries()
+    data = "".join(serializer.DumpJson(i) for i in entries)
+    for cut in [1, 5, 10]:
+      result = jqueue._ParseJobLogSegment(data[:-cut])
+      self.assertEqual(len(result), len(entries) - 1)
+
+  def testParseInvalid(self):
+    data = "\n".join(["[0, [1, [1, 0], \"message\", \"a\"]]",
+                      "garbage", "[1]", "[0, [2, [1, 0], \"message\", \"b\"]]",
+                      ""])
+    result = jqueue._ParseJobLogSegment(data)
+    self.assertEqual([entry[0] for (_, entry) in result], [1, 2])
+
+  def testMerge(self):
+    job = jqueue._QueuedJob(None, 1, [opcodes.OpTestDelay(),
+                                      opcodes.OpTestDelay()], True)
+    job.ops[0].log.append((1, (1460000000, 0), constants.ELOG_MESSAGE,
+                           "Hello"))
+    job.log_serial = 1
+
+    entries = self._MakeEntries()
+    entries.append((7, (4, (1460000003, 0), constants.ELOG_MESSAGE, "x")))
+    jqueue._MergeJobLogSegment(job, entries)
+
+    self.assertEqual(job.log_serial, 3)
+    self.assertEqual([entry[0] for entry in job.ops[0].log], [1, 2])
+    self.assertEqual([entry[0] for entry in job.ops[1].log], [3])
+    self.assertEqual(len(job.GetLogEntries(1)), 2)
+
+    # Merging again doesn't add anything
+    jqueue._MergeJobLogSegment(job, entries)
+    self.assertEqual(job.log_serial, 3)
+    self.assertEqual(len(job.GetLogEntries(0)), 3)
+
+
 class _FakeDependencyManager:
   def __init__(self):
     self._checks = []
@@ -516,6 +571,7 @@ class _DisabledFakeDependencyManager:
 class _FakeQueueForProc:
   def __init__(self, depmgr=None):
     self._updates = []
+    self._log_appends = []
     self._submitted = []
 
     self._submit_count = itertools.count(1000)
@@ -531,9 +587,19 @@ class _FakeQueueForProc:
   def GetNextSubmittedJob(self):
     return self._submitted.pop(0)
 
+  def GetNextLogAppend(self):
+    return self._log_appends.pop(0)
+
   def UpdateJobUnlocked(self, job, replicate=True):
     self._updates.append((job, bool(replicate)))
 
+  def AppendJobLogUnlocked(self, job, entries):
+    self._log_appends.append((job, entries))
+
+  def UpdateFinalizedJobUnlocked(self, job):
+    assert job.CalcStatus() in constants.JOBS_FINALIZED
+    self._updates.append((job, "finalized"))
+
   def SubmitManyJobs(self, jobs):
     job_ids = [self._submit_count.next() for _ in jobs]
     self._submitted.extend(zip(job_ids, jobs))
@@ -644,6 +710,37 @@ class TestJobProcessor(unittest.TestCase, _JobProcessorTestUtils):
                        jqueue._JobProcessor.FINISHED)
       self.assertRaises(IndexError, queue.GetNextUpdate)
 
+  def testFinalizeFn(self):
+    queue = _FakeQueueForProc()
+    ops = [opcodes.OpTestDummy(result="Res%s" % i, fail=False)
+           for i in range(2)]
+    job = self._CreateJob(queue, 9253, ops)
+    opexec = _FakeExecOpCodeForProc(queue, None, None)
+    finalized = []
+
+    def _Finalize(cbs):
+      # The job has been finalized and written before
+      self.assertEqual(job.CalcStatus(), constants.JOB_STATUS_SUCCESS)
+      self.assertTrue(job.end_timestamp)
+      self.assertEqual(queue._updates[-1], (job, True))
+      del queue._updates[:]
+      cbs.Feedback("Background work failed")
+      finalized.append(True)
+
+    proc = jqueue._JobProcessor(queue, opexec, job, finalize_fn=_Finalize)
+    self.assertEqual(proc(), jqueue._JobProcessor.DEFER)
+    self.assertFalse(finalized)
+    del queue._updates[:]
+
+    self.assertEqual(proc(), jqueue._JobProcessor.FINISHED)
+    self.assertEqual(finalized, [True])
+
+    # The message is added to the finalized job's file, not to a log segment
+    self.assertEqual(queue.GetNextUpdate(), (job, "finalized"))
+    self.assertRaises(IndexError, queue.GetNextUpdate)
+    self.assertRaises(IndexError, queue.GetNextLogAppend)
+    self.assertEqual(job.ops[-1].log[-1][3], "Background work failed")
+
   def testOpcodeError(self):
     queue = _FakeQueueForProc()
 
@@ -1040,8 +1137,15 @@ class TestJobProcessor(unittest.TestCase, _JobProcessorTestUtils):
           cbs.Feedback(log_type, msg)
         else:
           cbs.Feedback(msg)
-        # Check for job update without replication
-        self.assertEqual(queue.GetNextUpdate(), (job, False))
+        # Check for log entry being appended instead of a job update
+        (log_job, entries) = queue.GetNextLogAppend()
+        self.assertEqual(log_job, job)
+        self.assertEqual(len(entries), 1)
+        (op_idx, (serial, _, _, log_msg)) = entries[0]
+        self.assertTrue(job.ops[op_idx].input is op)
+        self.assertEqual(serial, job.log_serial)
+        self.assertEqual(log_msg, msg)
+        self.assertRaises(IndexError, queue.GetNextLogAppend)
         self.assertRaises(IndexError, queue.GetNextUpdate)
 
     opexec = _FakeExecOpCodeForProc(queue, _BeforeStart, _AfterStart)
@@ -2003,5 +2107,126 @@ class TestJobDependencyManager(unittest.TestCase):
     self.assertFalse(jdm.JobWaiting(job))
 
 
+class _FakeJqUpdateRunner:
+  def __init__(self, result_fn):
+    self._result_fn = result_fn
+    self.calls = []
+
+  def call_jobqueue_update_many(self, names, updates):
+    self.calls.append((sorted(names), updates))
+    return dict((name, self._result_fn(name, updates)) for name in names)
+
+
+class TestReplicateJobQueueFiles(unittest.TestCase):
+  FILE_NAME = "/var/lib/ganeti/queue/job-1"
+
+  def setUp(self):
+    self.queue = object.__new__(jqueue.JobQueue)
+    self.queue._nodes = {
+      "node1": "192.0.2.1",
+      "node2": "192.0.2.2",
+      "node3": "192.0.2.3",
+      }
+    self.queue._replicated_files = {}
+    self.outdated = {}
+    self.failed = set()
+    self.runner = _FakeJqUpdateRunner(self._Result)
+    self.queue._GetRpc = lambda _: self.runner
+
+  def _Result(self, name, updates):
+    if name in self.failed:
+      return rpc.RpcResult(data="Node is down", failed=True, node=name,
+                           call="jobqueue_update_many")
+    outdated = [file_name for (file_name, base, _) in updates
+                if base is not None and file_name in self.outdated.get(name,
+                                                                       [])]
+    return rpc.RpcResult(data=(True, outdated), node=name,
+                         call="jobqueue_update_many")
+
+  def _Replicate(self, data):
+    self.runner.calls = []
+    self.queue._ReplicateJobQueueFiles([(self.FILE_NAME, data)])
+    return self.runner.calls
+
+  def _Synced(self):
+    return self.queue._replicated_files[self.FILE_NAME][1]
+
+  def testFullThenDelta(self):
+    old = "x" * 100 + "a"
+    new = "x" * 100 + "b"
+
+    calls = self._Replicate(old)
+    self.assertEqual(calls, [(["node1", "node2", "node3"],
+                              [(self.FILE_NAME, None, old)])])
+    self.assertEqual(self._Synced(), frozenset(["node1", "node2", "node3"]))
+
+    calls = self._Replicate(new)
+    self.assertEqual(len(calls), 1)
+    (names, [(file_name, base, replacement)]) = calls[0]
+    self.assertEqual(names, ["node1", "node2", "node3"])
+    self.assertEqual(file_name, self.FILE_NAME)
+    self.assertEqual(jstore.ApplyFileDelta(old, base, replacement), new)
+    self.assertEqual(self._Synced(), frozenset(["node1", "node2", "node3"]))
+
+  def testGroupByUpdateShape(self):
+    self._Replicate("x" * 100 + "a")
+    self.queue._replicated_files[self.FILE_NAME] = \
+      (self.queue._replicated_files[self.FILE_NAME][0],
+       frozenset(["node1", "node2"]))
+
+    calls = self._Replicate("x" * 100 + "b")
+    self.assertEqual(len(calls), 2)
+    shapes = sorted((names, [base is None for (_, base, _) in updates])
+                    for (names, updates) in calls)
+    self.assertEqual(shapes, [(["node1", "node2"], [False]),
+                              (["node3"], [True])])
+    self.assertEqual(self._Synced(), frozenset(["node1", "node2", "node3"]))
+
+  def testResync(self):
+    self._Replicate("x" * 100 + "a")
+
+    # node2's file has been modified by another process
+    self.outdated["node2"] = [self.FILE_NAME]
+    new = "x" * 100 + "b"
+    calls = self._Replicate(new)
+    self.assertEqual(len(calls), 2)
+    self.assertEqual(calls[0][0], ["node1", "node2", "node3"])
+    self.assertTrue(calls[0][1][0][1] is not None)
+    self.assertEqual(calls[1], (["node2"], [(self.FILE_NAME, None, new)]))
+    self.assertEqual(self._Synced(), frozenset(["node1", "node2", "node3"]))
+
+  def testFailedRpc(self):
+    self.failed.add("node3")
+    self._Replicate("x" * 100 + "a")
+    self.assertEqual(self._Synced(), frozenset(["node1", "node2"]))
+
+    # node3 is sent the full file once it's back
+    self.failed.clear()
+    new = "x" * 100 + "b"
+    calls = self._Replicate(new)
+    self.assertEqual(len(calls), 2)
+    self.assertTrue((["node3"], [(self.FILE_NAME, None, new)]) in calls)
+    self.assertEqual(self._Synced(), frozenset(["node1", "node2", "node3"]))
+
+    # A node failing while being resent the full file isn't synced either
+    self.outdated["node1"] = [self.FILE_NAME]
+    self.runner._result_fn = self._FailFullUpdates
+    self._Replicate("x" * 100 + "c")
+    self.assertEqual(self._Synced(), frozenset(["node2", "node3"]))
+
+  def _FailFullUpdates(self, name, updates):
+    if compat.any(base is None for (_, base, _) in updates):
+      return rpc.RpcResult(data="Node is down", failed=True, node=name,
+                           call="jobqueue_update_many")
+    return self._Result(name, updates)
+
+  def testLargeChange(self):
+    self._Replicate("a" * 100)
+    new = "b" * 100
+    calls = self._Replicate(new)
+    self.assertEqual(calls, [(["node1", "node2", "node3"],
+                              [(self.FILE_NAME, None, new)])])
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
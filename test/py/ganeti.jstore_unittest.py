@@ -106,5 +106,37 @@ class TestReadNumericFile(testutils.GanetiTestCase):
     self.assertRaises(errors.JobQueueError, jstore._ReadNumericFile, tmpfile)
 
 
+
+class TestFileDelta(unittest.TestCase):
+  def _Check(self, old, new):
+    (base, replacement) = jstore.MakeFileDelta(old, new)
+    self.assertEqual(jstore.ApplyFileDelta(old, base, replacement), new)
+    return (base, replacement)
+
+  def test(self):
+    old = '{"id": 1, "ops": [{"log": [], "status": "running"}]}'
+    new = '{"id": 1, "ops": [{"log": [[1, "Hello"]], "status": "running"}]}'
+    (base, replacement) = self._Check(old, new)
+    self.assertEqual(base[0], jstore.GetFileDigest(old))
+    self.assertEqual(replacement, '[1, "Hello"]')
+
+    for (old, new) in [("", ""), ("", "abc"), ("abc", ""), ("abc", "abc"),
+                       ("aaaa", "aa"), ("aa", "aaaa"), ("abcabc", "abc"),
+                       ("xyz", "abc")]:
+      self._Check(old, new)
+
+  def testRandom(self):
+    for _ in range(100):
+      old = "".join(random.choice("ab") for _ in range(random.randint(0, 30)))
+      new = "".join(random.choice("ab") for _ in range(random.randint(0, 30)))
+      self._Check(old, new)
+
+  def testWrongBase(self):
+    (base, replacement) = jstore.MakeFileDelta("Hello World", "Hello there")
+    self.assertTrue(jstore.ApplyFileDelta("Hello World!", base,
+                                          replacement) is None)
+    self.assertTrue(jstore.ApplyFileDelta("", base, replacement) is None)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
@@ -30,6 +30,9 @@
 
 """Script for testing ganeti.masterd.iallocator"""
 
+import os
+import shutil
+import tempfile
 import unittest
 
 from ganeti import compat
@@ -37,6 +40,7 @@ from ganeti import constants
 from ganeti import errors
 from ganeti import objects
 from ganeti import ht
+from ganeti import utils
 from ganeti.masterd import iallocator
 
 import testutils
@@ -239,5 +243,105 @@ class TestProcessStorageInfo(unittest.TestCase):
     self.assertEqual(0, free_disk)
     self.assertEqual(0, total_disk)
 
+
+class TestComputeNewDiskUsage(unittest.TestCase):
+  def _MakeDisk(self, uuid, dev_type, size, nodes, spindles=None):
+    return objects.Disk(uuid=uuid, dev_type=dev_type, size=size, nodes=nodes,
+                        spindles=spindles)
+
+  def setUp(self):
+    self.known = {"d1": (1024, ["n1"])}
+
+  def testEmpty(self):
+    self.assertEqual(iallocator.IAllocator._ComputeNewDiskUsage([], {}), {})
+
+  def testUnchanged(self):
+    disks = [self._MakeDisk("d1", constants.DT_PLAIN, 1024, ["n1"])]
+    self.assertEqual(
+      iallocator.IAllocator._ComputeNewDiskUsage(disks, self.known), {})
+
+  def testNewAndGrown(self):
+    disks = [
+      self._MakeDisk("d1", constants.DT_PLAIN, 2048, ["n1"]),
+      self._MakeDisk("d2", constants.DT_DRBD8, 1024, ["n1", "n2"],
+                     spindles=2),
+      self._MakeDisk("d3", constants.DT_FILE, 512, ["n2"]),
+      self._MakeDisk("d4", constants.DT_DISKLESS, 0, ["n3"]),
+      ]
+    drbd_size = 1024 + constants.DRBD_META_SIZE
+    self.assertEqual(
+      iallocator.IAllocator._ComputeNewDiskUsage(disks, self.known), {
+        "n1": {
+          constants.ST_LVM_VG: (1024 + drbd_size, 2),
+          },
+        "n2": {
+          constants.ST_LVM_VG: (drbd_size, 2),
+          constants.ST_FILE: (512, 0),
+          },
+        })
+
+  def testShrunk(self):
+    disks = [self._MakeDisk("d1", constants.DT_PLAIN, 512, ["n1"])]
+    self.assertEqual(
+      iallocator.IAllocator._ComputeNewDiskUsage(disks, self.known), {})
+
+  def testMoved(self):
+    disks = [self._MakeDisk("d1", constants.DT_DRBD8, 2048, ["n1", "n2"],
+                            spindles=1)]
+    self.assertEqual(
+      iallocator.IAllocator._ComputeNewDiskUsage(disks, self.known), {
+        "n1": {
+          constants.ST_LVM_VG: (1024, 0),
+          },
+        "n2": {
+          constants.ST_LVM_VG: (2048 + constants.DRBD_META_SIZE, 1),
+          },
+        })
+
+
+class TestNodeDataCache(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.cache_file = utils.PathJoin(self.tmpdir, "node-data")
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def testMissing(self):
+    self.assertTrue(iallocator._LoadNodeData("key",
+                                             cache_file=self.cache_file)
+                    is None)
+
+  def testBroken(self):
+    utils.WriteFile(self.cache_file, data="{")
+    self.assertTrue(iallocator._LoadNodeData("key",
+                                             cache_file=self.cache_file)
+                    is None)
+
+  def testSaveAndLoad(self):
+    data = [{"n1": [1, 2]}, {"n1": {}}, {"d1": 1024}]
+    iallocator._SaveNodeData("key", data, now=1000.0,
+                             cache_file=self.cache_file)
+    self.assertEqual(os.stat(self.cache_file).st_mode & 0777,
+                     constants.SECURE_FILE_MODE)
+    self.assertEqual(iallocator._LoadNodeData("key", now=1001.0,
+                                              cache_file=self.cache_file),
+                     data)
+
+  def testOtherKey(self):
+    iallocator._SaveNodeData("key", [{}, {}, {}], now=1000.0,
+                             cache_file=self.cache_file)
+    self.assertTrue(iallocator._LoadNodeData("other", now=1000.0,
+                                             cache_file=self.cache_file)
+                    is None)
+
+  def testExpired(self):
+    iallocator._SaveNodeData("key", [{}, {}, {}], now=1000.0,
+                             cache_file=self.cache_file)
+    for now in [1000.0 + constants.IALLOCATOR_NODE_DATA_TTL, 999.0]:
+      self.assertTrue(iallocator._LoadNodeData("key", now=now,
+                                               cache_file=self.cache_file)
+                      is None)
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
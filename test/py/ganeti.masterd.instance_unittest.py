@@ -38,12 +38,13 @@ from ganeti import constants
 from ganeti import errors
 from ganeti import utils
 from ganeti import masterd
+from ganeti import objects
 
 from ganeti.masterd.instance import \
   ImportExportTimeouts, _DiskImportExportBase, \
   ComputeRemoteExportHandshake, CheckRemoteExportHandshake, \
   ComputeRemoteImportDiskInfo, CheckRemoteExportDiskInfo, \
-  FormatProgress
+  FormatProgress, DiskTransfer, _SplitDiskTransfer
 
 import testutils
 
@@ -166,5 +167,67 @@ class TestFormatProgress(unittest.TestCase):
                      "1.5G, 12.0 MiB/s, 30%")
 
 
+
+class TestSplitDiskTransfer(unittest.TestCase):
+  def _Transfer(self, size, src_io=constants.IEIO_RAW_DISK, finished_fn=None):
+    disk = objects.Disk(size=size)
+    return DiskTransfer("disk/0", src_io, (disk, "inst"),
+                        constants.IEIO_RAW_DISK, (disk, "inst"), finished_fn)
+
+  def testSingleStream(self):
+    transfer = self._Transfer(1024)
+    self.assertEqual(_SplitDiskTransfer(transfer, 1), [transfer])
+
+  def testScript(self):
+    transfer = self._Transfer(1024, src_io=constants.IEIO_SCRIPT)
+    self.assertEqual(_SplitDiskTransfer(transfer, 4), [transfer])
+
+  def testFile(self):
+    disk = objects.Disk(size=1024)
+    for (src, dest) in [
+      ((constants.IEIO_FILE, ("/exports/disk0", )),
+       (constants.IEIO_RAW_DISK, (disk, "inst"))),
+      ((constants.IEIO_RAW_DISK, (disk, "inst")),
+       (constants.IEIO_FILE, ("/exports/disk0", ))),
+      ]:
+      transfer = DiskTransfer("disk/0", src[0], src[1], dest[0], dest[1],
+                              None)
+      parts = _SplitDiskTransfer(transfer, 2)
+      self.assertEqual([(part.src_io, part.src_ioargs) for part in parts],
+                       [(src[0], src[1] + ((0, 512), )),
+                        (src[0], src[1] + ((512, 512), ))])
+      self.assertEqual([(part.dest_io, part.dest_ioargs) for part in parts],
+                       [(dest[0], dest[1] + ((0, 512), )),
+                        (dest[0], dest[1] + ((512, 512), ))])
+
+  def testSplit(self):
+    transfer = self._Transfer(1025)
+    parts = _SplitDiskTransfer(transfer, 4)
+    self.assertEqual([part.name for part in parts],
+                     ["disk/0 [1/4]", "disk/0 [2/4]", "disk/0 [3/4]",
+                      "disk/0 [4/4]"])
+    self.assertEqual([part.src_ioargs[2] for part in parts],
+                     [(0, 257), (257, 257), (514, 257), (771, 254)])
+    for part in parts:
+      self.assertEqual(part.src_ioargs[:2], transfer.src_ioargs)
+      self.assertEqual(part.dest_ioargs[:2], transfer.dest_ioargs)
+      self.assertEqual(part.src_ioargs[2], part.dest_ioargs[2])
+
+  def testSmallDisk(self):
+    parts = _SplitDiskTransfer(self._Transfer(3), 8)
+    self.assertEqual([part.src_ioargs[2] for part in parts],
+                     [(0, 1), (1, 1), (2, 1)])
+
+  def testFinishedFn(self):
+    finished = []
+    transfer = self._Transfer(100, finished_fn=lambda: finished.append(True))
+    parts = _SplitDiskTransfer(transfer, 3)
+    self.assertEqual(len(parts), 3)
+    for part in parts:
+      self.assertFalse(finished)
+      part.finished_fn()
+    self.assertEqual(finished, [True])
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
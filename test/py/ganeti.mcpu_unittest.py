@@ -33,6 +33,7 @@
 
 import unittest
 import itertools
+import threading
 import mocks
 from cmdlib.testsupport.rpc_runner_mock import CreateRpcRunnerMock
 
@@ -45,6 +46,7 @@ from ganeti import locking
 from ganeti import serializer
 from ganeti import ht
 from ganeti import constants
+from ganeti.rpc import node as rpc
 from ganeti.constants import \
     LOCK_ATTEMPTS_TIMEOUT, \
     LOCK_ATTEMPTS_MAXWAIT, \
@@ -212,6 +214,78 @@ class TestExecLU(unittest.TestCase):
         lu, locking.LEVEL_CLUSTER, self.calc_timeout)
 
 
+class TestAsyncHooks(unittest.TestCase):
+  _NODE_UUID = "01234567-89ab-cdef-fedc-bbbbbbbbbbbb"
+
+  class _DeferringLU(mocks.FakeLU):
+    def BuildHooksNodes(self):
+      return ([], [TestAsyncHooks._NODE_UUID])
+
+    def PreparePostHookNodes(self, post_hook_node_uuids):
+      return post_hook_node_uuids
+
+  class _FakeCbs(mcpu.OpExecCbBase):
+    def __init__(self):
+      mcpu.OpExecCbBase.__init__(self)
+      self.feedback = []
+
+    def Feedback(self, *args):
+      self.feedback.append(args)
+
+  def setUp(self):
+    self.ctx = mocks.FakeContext()
+    self.cfg = self.ctx.GetConfig("ec_id")
+    self.rpc = CreateRpcRunnerMock()
+    self.rpc.call_hooks_runner.side_effect = self._HooksRpc
+    detached = self.rpc.GetDetachedRunner.return_value
+    detached.call_hooks_runner.side_effect = self._DetachedHooksRpc
+    self.proc = mcpu.Processor(self.ctx, "ec_id", enable_locks=False)
+    self.release = threading.Event()
+    self.phases = []
+
+  @staticmethod
+  def _Results(node_list, hkr, output=""):
+    return dict((node, rpc.RpcResult(data=(True, [("utest", hkr, output)]),
+                                     node=node, call="hooks_runner"))
+                for node in node_list)
+
+  def _HooksRpc(self, node_list, _hpath, phase, _env):
+    self.phases.append(phase)
+    if phase == constants.HOOKS_PHASE_POST:
+      return self._Results(node_list, constants.HKR_DEFERRED)
+    return self._Results(node_list, constants.HKR_SUCCESS)
+
+  def _DetachedHooksRpc(self, node_list, _hpath, phase, _env):
+    self.release.wait()
+    self.phases.append(phase)
+    return self._Results(node_list, constants.HKR_FAIL, "failed")
+
+  def testSecondOpcodeWhilePending(self):
+    for _ in range(2):
+      lu = self._DeferringLU(self.proc, TestExecLU.OpTest(), self.cfg,
+                             self.rpc, None)
+      self.proc._ExecLU(lu)
+
+    # The nodes are resolved in this thread, before the hooks are started
+    self.assertEqual(self.rpc.GetDetachedRunner.call_args_list,
+                     [(([self._NODE_UUID], ), {})] * 2)
+    self.assertFalse(constants.HOOKS_PHASE_POST_DEFERRED in self.phases)
+
+    cbs = self._FakeCbs()
+    self.release.set()
+    self.proc.WaitForAsyncHooks(cbs)
+
+    self.assertEqual(self.phases.count(constants.HOOKS_PHASE_POST_DEFERRED),
+                     2)
+    self.assertEqual(len(cbs.feedback), 2)
+    for (msg, ) in cbs.feedback:
+      self.assertTrue("asynchronous script utest failed" in msg)
+
+    # All pending hooks have been processed
+    self.proc.WaitForAsyncHooks(cbs)
+    self.assertEqual(len(cbs.feedback), 2)
+
+
 class TestSecretParams(unittest.TestCase):
   def testSecretParamsCheckNoError(self):
     op = opcodes.OpInstanceCreate(
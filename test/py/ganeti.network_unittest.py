@@ -0,0 +1,170 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2017 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for unittesting the network module"""
+
+import unittest
+
+from ganeti import errors
+from ganeti import network
+from ganeti import objects
+
+import testutils
+
+
+class TestReservations(unittest.TestCase):
+  def testAddAndRemove(self):
+    res = network._Reservations(16)
+    for idx in [3, 5, 4, 0, 15, 1]:
+      res.Add(idx)
+    self.assertEqual(res.GetRanges(), [(0, 1), (3, 5), (15, 15)])
+    self.assertEqual(len(res), 6)
+    self.assertTrue(4 in res)
+    self.assertFalse(2 in res)
+
+    res.Remove(4)
+    res.Remove(7)
+    self.assertEqual(res.GetRanges(), [(0, 1), (3, 3), (5, 5), (15, 15)])
+    self.assertEqual(len(res), 5)
+    self.assertEqual(list(res.GetIndices()), [0, 1, 3, 5, 15])
+
+    res.AddRange(2, 14)
+    self.assertEqual(res.GetRanges(), [(0, 15)])
+    self.assertEqual(len(res), 16)
+    self.assertEqual(res.GetFirstFree(), None)
+
+  def testFirstFree(self):
+    res = network._Reservations(8)
+    self.assertEqual(res.GetFirstFree(), 0)
+    res.Add(1)
+    self.assertEqual(res.GetFirstFree(), 0)
+    res.Add(0)
+    self.assertEqual(res.GetFirstFree(), 2)
+
+  def testUnion(self):
+    res = network._Reservations(8, [(0, 1), (6, 6)])
+    other = network._Reservations(8, [(2, 3), (7, 7)])
+    self.assertEqual(res.Union(other).GetRanges(), [(0, 3), (6, 7)])
+    self.assertEqual(res.GetRanges(), [(0, 1), (6, 6)])
+
+  def testToString(self):
+    self.assertEqual(network._Reservations(4).ToString(), "4:")
+    self.assertEqual(network._Reservations(256, [(0, 1), (255, 255)])
+                     .ToString(), "256:0-1,255")
+
+  def testFromString(self):
+    for value in ["256:0-1,255", "4:", "16777216:0,10-1000,16777215"]:
+      self.assertEqual(network._Reservations.FromString(value).ToString(),
+                       value)
+
+  def testFromBitString(self):
+    res = network._Reservations.FromString("1100101")
+    self.assertEqual(res.size, 7)
+    self.assertEqual(res.GetRanges(), [(0, 1), (4, 4), (6, 6)])
+
+  def testToBitString(self):
+    for value in ["", "0", "1100101", "0001", "1000", "0000"]:
+      self.assertEqual(network._Reservations.FromString(value).ToBitString(),
+                       value)
+    self.assertEqual(network.ReservationsToBitString("8:0-1,5"), "11000100")
+
+  def testToBitStringMaxSize(self):
+    self.assertEqual(network.ReservationsToBitString("4:3", max_size=4),
+                     "0001")
+    self.assertRaises(errors.AddressPoolError,
+                      network.ReservationsToBitString, "5:3", max_size=4)
+
+  def testFromStringInvalid(self):
+    for value in ["0120", "4:a", "4:2-1", "4:3-4", "4:-1", "a:"]:
+      self.assertRaises(errors.AddressPoolError,
+                        network._Reservations.FromString, value)
+
+
+class TestAddressPool(unittest.TestCase):
+  def _MakeNetwork(self, net, **kwargs):
+    nobj = objects.Network(name="net", network=net, **kwargs)
+    return network.AddressPool.InitializeNetwork(nobj)
+
+  def testInitialize(self):
+    pool = self._MakeNetwork("192.0.2.0/24", gateway="192.0.2.1")
+    self.assertEqual(pool.net.ext_reservations, "256:0-1,255")
+    self.assertEqual(pool.net.reservations, "256:")
+    self.assertEqual(pool.GetReservedCount(), 3)
+    self.assertEqual(pool.GetFreeCount(), 253)
+    self.assertEqual(pool.GetExternalReservations(),
+                     ["192.0.2.0", "192.0.2.1", "192.0.2.255"])
+
+  def testReserveAndRelease(self):
+    pool = self._MakeNetwork("192.0.2.0/29")
+    self.assertEqual(pool.GenerateFree(), "192.0.2.1")
+    self.assertEqual(pool.GetFreeAddress(), "192.0.2.1")
+    self.assertTrue(pool.IsReserved("192.0.2.1"))
+    self.assertRaises(errors.AddressPoolError, pool.Reserve, "192.0.2.1")
+    pool.Reserve("192.0.2.3")
+    self.assertEqual(pool.GetMap(), "XX.X...X")
+    self.assertEqual(pool.net.reservations, "8:1,3")
+
+    pool.Release("192.0.2.1")
+    self.assertRaises(errors.AddressPoolError, pool.Release, "192.0.2.1")
+    self.assertEqual(pool.GetMap(), "X..X...X")
+    self.assertFalse(pool.IsFull())
+
+    for _ in range(4):
+      pool.GetFreeAddress()
+    self.assertTrue(pool.IsFull())
+    self.assertRaises(errors.AddressPoolError, pool.GetFreeAddress)
+    self.assertRaises(errors.AddressPoolError, pool.GenerateFree)
+
+  def testFormerRepresentation(self):
+    nobj = objects.Network(name="net", network="192.0.2.0/29",
+                           reservations="01000000",
+                           ext_reservations="10000001")
+    pool = network.AddressPool(nobj)
+    self.assertTrue(pool.IsReserved("192.0.2.1"))
+    self.assertEqual(pool.GenerateFree(), "192.0.2.2")
+    pool.Update()
+    self.assertEqual(nobj.reservations, "8:1")
+    self.assertEqual(nobj.ext_reservations, "8:0,7")
+
+  def testLargeNetwork(self):
+    pool = self._MakeNetwork("10.0.0.0/8", gateway="10.0.0.1")
+    self.assertEqual(pool.GetFreeCount(), 2 ** 24 - 3)
+    self.assertEqual(pool.GetFreeAddress(), "10.0.0.2")
+    pool.Reserve("10.128.0.1", external=True)
+    self.assertEqual(pool.net.ext_reservations,
+                     "16777216:0-1,8388609,16777215")
+
+  def testNetworkSize(self):
+    for net in ["10.0.0.0/7", "192.0.2.0/31"]:
+      self.assertRaises(errors.AddressPoolError, self._MakeNetwork, net)
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -61,6 +61,69 @@ class TestDictState(unittest.TestCase):
     o2 = SimpleObject.FromDict(o1.ToDict())
     self.assertEquals(o1.ToDict(), {"a": 2, "b": 5})
 
+  def testFromDictUnknownField(self):
+    self.assertRaises(TypeError, SimpleObject.FromDict, {"a": 1, "c": 2})
+
+  def testFromDictUnicodeKeys(self):
+    o1 = SimpleObject.FromDict({u"a": 1})
+    self.assertEquals(o1.a, 1)
+    self.assertEquals(o1.b, None)
+    self.assertEquals(o1.ToDict(), {"a": 1})
+
+  def testUnknownAttribute(self):
+    o1 = SimpleObject(a=1)
+    self.assertRaises(AttributeError, getattr, o1, "c")
+
+
+class TestConfigDataSerialization(unittest.TestCase):
+  """Serialization of a large configuration"""
+
+  @staticmethod
+  def _MakeConfigDict(count):
+    cfg = objects.ConfigData(version=constants.CONFIG_VERSION,
+                             cluster=objects.Cluster(cluster_name="cluster"),
+                             nodes={}, nodegroups={}, instances={},
+                             networks={}, disks={}, filters={},
+                             maintenance=objects.Maintenance(), serial_no=1)
+    for i in range(count):
+      nic = objects.NIC(uuid="nic%d-uuid" % i, mac="aa:00:00:00:00:01",
+                        nicparams={})
+      disk = objects.Disk(uuid="disk%d-uuid" % i, dev_type=constants.DT_PLAIN,
+                          logical_id=("xenvg", "disk%d" % i), size=1024,
+                          mode=constants.DISK_RDWR, params={},
+                          nodes=["node-uuid"])
+      cfg.disks[disk.uuid] = disk
+      inst = objects.Instance(uuid="inst%d-uuid" % i, name="inst%d" % i,
+                              primary_node="node-uuid", os="debian",
+                              hypervisor=constants.HT_FAKE, hvparams={},
+                              beparams={}, osparams={}, nics=[nic],
+                              disks=[disk.uuid], admin_state="up",
+                              disks_active=True, serial_no=1, tags=set())
+      cfg.instances[inst.uuid] = inst
+    return cfg.ToDict()
+
+  def testRoundTrip(self):
+    cfg_dict = self._MakeConfigDict(10000)
+    cfg = objects.ConfigData.FromDict(cfg_dict)
+    self.assertEqual(len(cfg.instances), 10000)
+    self.assertEqual(cfg.ToDict(), cfg_dict)
+
+  def testLazy(self):
+    cfg_dict = self._MakeConfigDict(10000)
+    cfg = objects.ConfigData.FromDict(cfg_dict, lazy=True)
+    raw = dict.__getitem__(cfg.instances, "inst5-uuid")
+    self.assertFalse(isinstance(raw, objects.Instance))
+
+    inst = cfg.instances["inst5-uuid"]
+    self.assertTrue(isinstance(inst, objects.Instance))
+    self.assertEqual(inst.name, "inst5")
+    self.assertTrue(isinstance(inst.nics[0], objects.NIC))
+    self.assertTrue(cfg.instances["inst5-uuid"] is inst)
+    self.assertFalse(isinstance(dict.__getitem__(cfg.instances, "inst6-uuid"),
+                                objects.Instance))
+
+    self.assertEqual(cfg.ToDict(), cfg_dict)
+
 
 class TestClusterObject(unittest.TestCase):
   """Tests done on a L{objects.Cluster}"""
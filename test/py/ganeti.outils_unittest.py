@@ -112,5 +112,90 @@ class TestContainerFromDicts(unittest.TestCase):
                        cls())
 
 
+class _Slotted(outils.ValidatedSlots):
+  __slots__ = ["foo", "bar"]
+
+
+class _SlottedChild(_Slotted):
+  __slots__ = ["baz"]
+
+
+class TestValidatedSlots(unittest.TestCase):
+  def testSlots(self):
+    self.assertEqual(_Slotted.GetAllSlots(), ["foo", "bar"])
+    self.assertEqual(_SlottedChild.GetAllSlots(), ["baz", "foo", "bar"])
+    # the cache of the parent class must not be used for the child
+    self.assertEqual(_Slotted.GetAllSlots(), ["foo", "bar"])
+
+  def testGetAllSlotsCopy(self):
+    slots = _Slotted.GetAllSlots()
+    slots.append("other")
+    self.assertEqual(_Slotted.GetAllSlots(), ["foo", "bar"])
+
+  def testInit(self):
+    obj = _SlottedChild(foo=1, baz=2)
+    self.assertEqual((obj.foo, obj.baz), (1, 2))
+    self.assertRaises(TypeError, _SlottedChild, other=3)
+
+
+class _FakeObject(object):
+  created = 0
+
+  def __init__(self, value):
+    self.value = value
+
+  @classmethod
+  def FromDict(cls, val):
+    cls.created += 1
+    return cls(val["value"])
+
+
+class TestLazyContainer(unittest.TestCase):
+  def setUp(self):
+    _FakeObject.created = 0
+    source = dict(("key%d" % i, {"value": i}) for i in range(10))
+    self.container = outils.ContainerFromDicts(source, dict, _FakeObject,
+                                               lazy=True)
+
+  def testLookup(self):
+    self.assertTrue(isinstance(self.container, outils.LazyContainer))
+    self.assertEqual(_FakeObject.created, 0)
+    self.assertEqual(len(self.container), 10)
+    self.assertTrue("key3" in self.container)
+    self.assertEqual(_FakeObject.created, 0)
+
+    obj = self.container["key3"]
+    self.assertEqual(obj.value, 3)
+    self.assertTrue(self.container.get("key3") is obj)
+    self.assertEqual(self.container.get("key99"), None)
+    self.assertEqual(_FakeObject.created, 1)
+
+  def testValues(self):
+    self.assertEqual(sorted(obj.value for obj in self.container.values()),
+                     range(10))
+    self.assertEqual(sorted(obj.value
+                            for (_, obj) in self.container.iteritems()),
+                     range(10))
+    self.assertEqual(_FakeObject.created, 10)
+
+  def testPop(self):
+    self.assertEqual(self.container.pop("key5").value, 5)
+    self.assertFalse("key5" in self.container)
+    self.assertEqual(self.container.pop("key5", None), None)
+
+  def testCopy(self):
+    copied = self.container.copy()
+    self.assertEqual(_FakeObject.created, 0)
+    self.assertEqual(copied["key1"].value, 1)
+    self.assertFalse(isinstance(dict.__getitem__(self.container, "key1"),
+                                _FakeObject))
+
+  def testSet(self):
+    obj = _FakeObject(99)
+    self.container["key99"] = obj
+    self.assertTrue(self.container["key99"] is obj)
+    self.assertTrue(self.container.setdefault("key99", None) is obj)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
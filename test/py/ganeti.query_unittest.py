@@ -2019,5 +2019,115 @@ class TestQueryFilter(unittest.TestCase):
       ])
 
 
+class _ItemStateQueryData:
+  ITEM_ATTRS = ("curdouble", )
+
+  def __init__(self, data):
+    self.data = data
+    self.curdouble = None
+
+  def __iter__(self):
+    for item in self.data:
+      self.curdouble = item["size"] * 2
+      yield item
+
+
+class TestColumnarQuery(unittest.TestCase):
+  def setUp(self):
+    self.calls = []
+
+    def _Get(name, ctx, item):
+      self.calls.append((name, item["name"]))
+      return item[name]
+
+    def _GetDouble(ctx, item):
+      self.calls.append(("double", item["name"]))
+      if not hasattr(ctx, "curdouble"):
+        return item["size"] * 2
+      assert ctx.curdouble == item["size"] * 2
+      return ctx.curdouble
+
+    def _GetState(ctx, item):
+      if item["size"] % 3:
+        return "up"
+      return query._FS_NODATA
+
+    self.fielddefs = query._PrepareFieldList([
+      (query._MakeField("name", "Name", constants.QFT_TEXT, "Name"),
+       None, query.QFF_HOSTNAME, compat.partial(_Get, "name")),
+      (query._MakeField("size", "Size", constants.QFT_NUMBER, "Size"),
+       None, 0, compat.partial(_Get, "size")),
+      (query._MakeField("double", "Double", constants.QFT_NUMBER, "Double"),
+       None, 0, _GetDouble),
+      (query._MakeField("tags", "Tags", constants.QFT_OTHER, "Tags"),
+       None, 0, compat.partial(_Get, "tags")),
+      (query._MakeField("state", "State", constants.QFT_TEXT, "State"),
+       None, 0, _GetState),
+      ], [("alias", "name")])
+
+    self.data = [{
+      "name": "node%s.example.com" % i,
+      "size": (i * 7) % 11,
+      "tags": ["tag%s" % (i % 4)],
+      } for i in range(40)]
+
+  def testEngines(self):
+    for qfilter in [
+      None,
+      ["|"],
+      ["&"],
+      ["=", "name", "node3"],
+      ["=", "alias", "node3.example.com"],
+      ["!=", "name", "node3"],
+      ["<", "size", 5],
+      [">=", "double", 10],
+      ["=~", "name", r"^node1\d"],
+      ["==", "name", "node2"],
+      ["=", "state", "up"],
+      ["?", "size"],
+      ["!", ["?", "double"]],
+      ["=[]", "tags", "tag1"],
+      ["|", ["<", "size", 2], ["=~", "name", "9"], ["=", "size", 3]],
+      ["&", [">", "size", 2], ["!", ["=~", "name", "1"]], ["?", "double"]],
+      ["!", ["|", ["&", [">", "size", 5], ["<", "size", 8]],
+                  ["=", "name", "node4"]]],
+      ]:
+      for selected in [[], ["name"],
+                       ["size", "tags", "name", "state", "double"]]:
+        for sort_by_name in [False, True]:
+          q = query.Query(self.fielddefs, selected, qfilter=qfilter,
+                          namefield="name")
+          for ctx in [self.data, _ItemStateQueryData(self.data)]:
+            rows = q.Query(ctx, sort_by_name=sort_by_name, columnar=False)
+            self.assertEqual(q.Query(ctx, sort_by_name=sort_by_name), rows)
+            self.assertEqual(q.OldStyleQuery(ctx, sort_by_name=sort_by_name),
+                             [[value for (_, value) in row] for row in rows])
+
+  def testRetrieveOnce(self):
+    q = query.Query(self.fielddefs, ["double", "name", "alias"],
+                    qfilter=["|", ["<", "double", 4], [">", "double", 16],
+                                  ["=", "name", "node3"]],
+                    namefield="name")
+
+    result = q.Query(_ItemStateQueryData(self.data))
+    self.assertEqual([row[1] for row in result],
+                     [(constants.RS_NORMAL, item["name"])
+                      for item in self.data
+                      if (item["size"] < 2 or item["size"] > 8 or
+                          item["name"] == "node3.example.com")])
+
+    # Every field is retrieved at most once per item
+    self.assertEqual(utils.FindDuplicates(self.calls), [])
+    self.assertEqual(set(name for (kind, name) in self.calls
+                         if kind == "double"),
+                     set(item["name"] for item in self.data))
+
+  def testFilterShortCircuit(self):
+    q = query.Query(self.fielddefs, [],
+                    qfilter=["&", ["<", "size", 0], ["?", "double"]])
+    self.assertEqual(q.Query(self.data), [])
+    self.assertFalse(compat.any(kind == "double" for (kind, _) in self.calls))
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
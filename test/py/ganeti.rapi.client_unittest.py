@@ -110,6 +110,50 @@ class RapiMock(object):
     return (code, NotImplemented, response)
 
 
+class _EntityTagResponder(object):
+  def __init__(self, etag, body):
+    self._etag = etag
+    self._body = body
+    self.requests = []
+
+  def FetchResponse(self, path, method, headers, request_body):
+    self.requests.append((path, method, headers))
+
+    if headers.get(http.HTTP_IF_NONE_MATCH) == self._etag:
+      return (http.HTTP_NOT_MODIFIED, {}, None)
+
+    return (http.HTTP_OK, {http.HTTP_ETAG: self._etag}, self._body)
+
+
+class TestEntityTags(unittest.TestCase):
+  def testGetEntityTag(self):
+    self.assertEqual(client._GetEntityTag([]), None)
+    self.assertEqual(client._GetEntityTag([
+      "HTTP/1.1 200 OK\r\n",
+      "Content-Type: application/json\r\n",
+      "ETag: \"abc\"\r\n",
+      "\r\n",
+      ]), "\"abc\"")
+
+  def _Run(self, use_etags):
+    responder = _EntityTagResponder("\"f00\"", "[\"inst1\", \"inst2\"]")
+    curl = rapi.testutils.FakeCurl(responder)
+    cl = client.GanetiRapiClient("master.example.com", use_etags=use_etags,
+                                 curl_factory=lambda: curl)
+
+    for _ in range(3):
+      self.assertEqual(cl.GetInstances(), ["inst1", "inst2"])
+
+    return [headers.get(http.HTTP_IF_NONE_MATCH) == "\"f00\""
+            for (_, _, headers) in responder.requests]
+
+  def testCached(self):
+    self.assertEqual(self._Run(True), [False, True, True])
+
+  def testDisabled(self):
+    self.assertEqual(self._Run(False), [False, False, False])
+
+
 class TestConstants(unittest.TestCase):
   def test(self):
     self.assertEqual(client.GANETI_RAPI_PORT, constants.DEFAULT_RAPI_PORT)
@@ -496,6 +540,17 @@ class GanetiRapiClientTests(testutils.GanetiTestCase):
     self.assertHandler(rlib2.R_2_instances)
     self.assertBulk()
 
+  def testGetInstancesPage(self):
+    self.rapi.AddResponse("[]")
+    self.assertEqual([], self.client.GetInstances(bulk=True,
+                                                  fields=["name", "os"],
+                                                  limit=10, offset=20))
+    self.assertHandler(rlib2.R_2_instances)
+    self.assertBulk()
+    self.assertQuery("fields", ["name,os"])
+    self.assertQuery("limit", ["10"])
+    self.assertQuery("offset", ["20"])
+
   def testGetInstance(self):
     self.rapi.AddResponse("[]")
     self.assertEqual([], self.client.GetInstance("instance"))
@@ -888,6 +943,18 @@ class GanetiRapiClientTests(testutils.GanetiTestCase):
     self.assertHandler(rlib2.R_2_jobs_id_wait)
     self.assertItems(["123"])
 
+  def testWaitForJobsChange(self):
+    self.rapi.AddResponse(serializer.DumpJson({ "123": "success", }))
+    result = self.client.WaitForJobsChange({
+      123: "running",
+      124: None,
+      })
+    self.assertEqual(result, { "123": "success", })
+    self.assertHandler(rlib2.R_2_jobs_wait)
+    self.assertEqual(serializer.LoadJson(self.rapi.GetLastRequestData()), {
+      "jobs": { "123": "running", "124": None, },
+      })
+
   def testCancelJob(self):
     self.rapi.AddResponse("[true, \"Job 123 will be canceled\"]")
     self.assertEqual([True, "Job 123 will be canceled"],
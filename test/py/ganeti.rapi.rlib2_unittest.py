@@ -1596,5 +1596,134 @@ class TestForbiddenParams(RAPITestCase):
     handler = _CreateHandler(ForbiddenRAPI, [], {}, data, self._clfactory)
     self.assertRaises(http.HttpForbidden, handler.POST)
 
+
+class _FakeQueryClient:
+  def __init__(self, address=None):
+    self.queries = []
+
+  def _Query(self, fields):
+    self.queries.append(fields)
+    return [[("%s%s" % (field, idx)) for field in fields]
+            for idx in [3, 1, 2]]
+
+  def QueryInstances(self, names, fields, use_locking):
+    assert names == []
+    return self._Query(fields)
+
+  def QueryNodes(self, names, fields, use_locking):
+    assert names == []
+    return self._Query(fields)
+
+
+class TestBulkQueryParameters(unittest.TestCase):
+  def setUp(self):
+    self.clfactory = _FakeClientFactory(_FakeQueryClient)
+
+  def _Get(self, cls, queryargs):
+    handler = _CreateHandler(cls, [], queryargs, None, self.clfactory)
+    return handler.GET()
+
+  def testAllFields(self):
+    result = self._Get(rlib2.R_2_nodes, { "bulk": ["1"], })
+    cl = self.clfactory.GetNextClient()
+    self.assertEqual(cl.queries, [rlib2.N_FIELDS])
+    self.assertEqual(len(result), 3)
+    self.assertEqual(sorted(result[0].keys()), sorted(rlib2.N_FIELDS))
+
+  def testSelectFields(self):
+    result = self._Get(rlib2.R_2_nodes, {
+      "bulk": ["1"],
+      "fields": ["name, offline"],
+      })
+    cl = self.clfactory.GetNextClient()
+    self.assertEqual(cl.queries, [["name", "offline"]])
+    self.assertEqual(result, [
+      { "name": "name3", "offline": "offline3", },
+      { "name": "name1", "offline": "offline1", },
+      { "name": "name2", "offline": "offline2", },
+      ])
+
+  def testUnknownFields(self):
+    for fields in ["name,doesnotexist", "name,name", ","]:
+      self.assertRaises(http.HttpBadRequest, self._Get, rlib2.R_2_instances,
+                        { "bulk": ["1"], "fields": [fields], })
+
+  def testInstanceWithoutBeparams(self):
+    result = self._Get(rlib2.R_2_instances, {
+      "bulk": ["1"],
+      "fields": ["name"],
+      })
+    self.assertEqual(result, [{ "name": "name%s" % i, } for i in [3, 1, 2]])
+
+  def testPage(self):
+    for (offset, limit, expected) in [
+      (None, None, [1, 2, 3]),
+      ("1", None, [2, 3]),
+      (None, "2", [1, 2]),
+      ("1", "1", [2]),
+      ("2", "5", [3]),
+      ("5", None, []),
+      (None, "0", []),
+      ]:
+      queryargs = {}
+      if offset is not None:
+        queryargs["offset"] = [offset]
+      if limit is not None:
+        queryargs["limit"] = [limit]
+
+      result = self._Get(rlib2.R_2_instances, queryargs)
+      self.assertEqual([i["id"] for i in result],
+                       ["name%s" % i for i in expected])
+
+  def testNegativePage(self):
+    for name in ["offset", "limit"]:
+      self.assertRaises(http.HttpBadRequest, self._Get, rlib2.R_2_nodes,
+                        { name: ["-1"], })
+
+
+class _FakeWaitClient:
+  def __init__(self, address=None):
+    self.calls = []
+
+  def WaitForJobsChangeOnce(self, jobs, timeout=None):
+    self.calls.append(sorted(jobs))
+    return [(job_id, constants.JOB_STATUS_SUCCESS)
+            for (job_id, status) in jobs
+            if status == constants.JOB_STATUS_RUNNING]
+
+
+class TestJobsWait(unittest.TestCase):
+  def setUp(self):
+    self.clfactory = _FakeClientFactory(_FakeWaitClient)
+
+  def test(self):
+    handler = _CreateHandler(rlib2.R_2_jobs_wait, [], {}, {
+      "jobs": {
+        "19": constants.JOB_STATUS_RUNNING,
+        "20": None,
+        "21": constants.JOB_STATUS_QUEUED,
+        },
+      }, self.clfactory)
+    self.assertEqual(handler.GET(), {
+      "19": constants.JOB_STATUS_SUCCESS,
+      })
+
+    cl = self.clfactory.GetNextClient()
+    self.assertEqual(cl.calls, [[
+      (19, constants.JOB_STATUS_RUNNING),
+      (20, None),
+      (21, constants.JOB_STATUS_QUEUED),
+      ]])
+
+  def testInvalid(self):
+    for jobs in [None, {}, [], "19", { "x": None, }, { "19": 1, }]:
+      handler = _CreateHandler(rlib2.R_2_jobs_wait, [], {}, {
+        "jobs": jobs,
+        }, self.clfactory)
+      self.assertRaises(http.HttpBadRequest, handler.GET)
+
+    self.assertRaises(IndexError, self.clfactory.GetNextClient)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
@@ -34,6 +34,7 @@
 import doctest
 import unittest
 
+from ganeti import compat
 from ganeti import errors
 from ganeti import ht
 from ganeti import objects
@@ -224,6 +225,112 @@ class TestPrivate(unittest.TestCase):
     self.assertFalse(serializer.Private(""), "Private empty string is true")
 
 
+class TestJsonBackends(unittest.TestCase):
+  def setUp(self):
+    self.backend = serializer.GetJsonBackend()
+
+  def tearDown(self):
+    serializer.SetJsonBackend(self.backend)
+
+  def testDefault(self):
+    backends = serializer.GetJsonBackends()
+    self.assertEqual(backends[0], "simplejson")
+    self.assertEqual(self.backend, "simplejson")
+
+  def testUnknown(self):
+    self.assertRaises(errors.ProgrammerError, serializer.SetJsonBackend,
+                      "no-such-backend")
+    self.assertEqual(serializer.GetJsonBackend(), self.backend)
+
+  def testRoundtrip(self):
+    data = {
+      "name": u"inst1.example.com",
+      "disks": [{"size": 1024, "mode": "rw"}, {"size": 0, "mode": "ro"}],
+      "tags": ["a", "b\n\tc"],
+      "beparams": {"memory": 128, "auto_balance": True, "spindles": None},
+      }
+    for name in serializer.GetJsonBackends():
+      serializer.SetJsonBackend(name)
+      self.assertEqual(serializer.GetJsonBackend(), name)
+      txt = serializer.DumpJson(data)
+      self.assertTrue(txt.endswith("\n"))
+      self.assertFalse("\n" in txt[:-1])
+      self.assertEqual(serializer.LoadJson(txt), data)
+
+
+class TestLoadPrivate(unittest.TestCase):
+  def testNested(self):
+    txt = serializer.DumpJson({
+      "osparams_private": {"password": "foo"},
+      "ops": [{"osparams_secret": {"key": "bar"}, "osparams": {"x": "y"}}],
+      "nested": {"inner": {"osparams_private": {"a": "b"}}},
+      })
+    data = serializer.LoadJson(txt)
+
+    self.assertTrue(isinstance(data["osparams_private"],
+                               serializer.PrivateDict))
+    self.assertEqual(data["osparams_private"]["password"].Get(), "foo")
+    self.assertTrue(isinstance(data["ops"][0]["osparams_secret"],
+                               serializer.PrivateDict))
+    self.assertEqual(data["ops"][0]["osparams_secret"]["key"].Get(), "bar")
+    self.assertFalse(isinstance(data["ops"][0]["osparams"],
+                                serializer.PrivateDict))
+    self.assertEqual(data["nested"]["inner"]["osparams_private"]["a"].Get(),
+                     "b")
+
+  def testCluster(self):
+    data = serializer.LoadJson(serializer.DumpJson({
+      "osparams_private_cluster": {"debian": {"password": "foo"}},
+      }))
+    value = data["osparams_private_cluster"]
+    self.assertFalse(isinstance(value, serializer.PrivateDict))
+    self.assertTrue(isinstance(value["debian"], serializer.PrivateDict))
+    self.assertEqual(value["debian"]["password"].Get(), "foo")
+
+    data = serializer.LoadJson(serializer.DumpJson({
+      "osparams_private_cluster": None,
+      }))
+    self.assertEqual(data["osparams_private_cluster"], None)
+
+  def testSameAsWrapPrivateValues(self):
+    txt = serializer.DumpJson([
+      {"osparams_private": {"a": "b"}, "other": [1, 2, {"c": "d"}]},
+      {"osparams_private_cluster": {"os1": {"e": "f"}}},
+      ])
+    crawled = serializer.simplejson.loads(txt)
+    serializer.WrapPrivateValues(crawled)
+    self.assertEqual(serializer.LoadJson(txt), crawled)
+
+
+class TestDumpJsonChunks(unittest.TestCase):
+  def _Check(self, data, chunk_size=serializer.JSON_CHUNK_SIZE):
+    chunks = list(serializer.DumpJsonChunks(data, chunk_size=chunk_size))
+    self.assertTrue(chunks)
+    self.assertEqual("".join(chunks), serializer.DumpJson(data))
+    return chunks
+
+  def testNonList(self):
+    for data in [None, 1, "Hello", {}, { "a": [1, 2], "b": "c", }]:
+      self.assertEqual(len(self._Check(data)), 1)
+
+  def testList(self):
+    for data in [[], (), [1], ["a", None, {}], [[1, 2], [3]]]:
+      self.assertEqual(len(self._Check(data)), 1)
+
+  def testChunkSize(self):
+    data = [{ "name": "inst%s" % i, "tags": ["a", "b"], } for i in range(100)]
+    chunks = self._Check(data, chunk_size=100)
+    self.assertTrue(len(chunks) > 10)
+    self.assertTrue(compat.all(len(chunk) < 200 for chunk in chunks))
+
+  def testPrivate(self):
+    data = [{ "foo": serializer.Private("secret"), }]
+    self.assertFalse("secret" in "".join(serializer.DumpJsonChunks(data)))
+    self.assertEqual(serializer.LoadJson("".join(serializer.DumpJsonChunks(
+      data, private_encoder=serializer.EncodeWithPrivateFields))),
+      [{ "foo": "secret", }])
+
+
 class TestCheckDoctests(unittest.TestCase):
 
   def testCheckSerializer(self):
@@ -33,6 +33,10 @@
 
 import os
 import random
+import shutil
+import stat
+import struct
+import tempfile
 import unittest
 
 from ganeti import compat
@@ -40,6 +44,7 @@ from ganeti import constants
 from ganeti import errors
 from ganeti import objects
 from ganeti import utils
+from ganeti.storage import base
 from ganeti.storage import bdev
 
 import testutils
@@ -651,5 +656,57 @@ class TestPersistentBlockDevice(testutils.GanetiTestCase):
     self.assertEqual(dev.Attach(), False)
 
 
+class TestGetBlockDevSize(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.devpath = utils.PathJoin(self.tmpdir, "dev")
+    utils.WriteFile(self.devpath, data="")
+    self.sysfs = utils.PathJoin(self.tmpdir, "sysfs")
+    os.mkdir(self.sysfs)
+    os.mkdir(utils.PathJoin(self.sysfs, "0:0"))
+    self.ioctls = []
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _Stat(self, path):
+    self.assertEqual(path, self.devpath)
+    return FakeStatResult(stat.S_IFBLK)
+
+  def _Ioctl(self, fd, request, arg):
+    self.assertEqual(request, base._BLKGETSIZE64)
+    self.assertEqual(arg, struct.pack("Q", 0))
+    self.ioctls.append(fd)
+    return struct.pack("Q", 1024 ** 4)
+
+  def _GetSize(self):
+    return base.GetBlockDevSize(self.devpath, _stat_fn=self._Stat,
+                                _sysfs_dir=self.sysfs, _ioctl_fn=self._Ioctl)
+
+  def testSysfs(self):
+    utils.WriteFile(utils.PathJoin(self.sysfs, "0:0", "size"), data="2048\n")
+    self.assertEqual(self._GetSize(), 1024 * 1024)
+    self.assertFalse(self.ioctls)
+
+  def testIoctl(self):
+    self.assertEqual(self._GetSize(), 1024 ** 4)
+    self.assertEqual(len(self.ioctls), 1)
+
+  def testInvalidSysfs(self):
+    utils.WriteFile(utils.PathJoin(self.sysfs, "0:0", "size"), data="foo\n")
+    self.assertEqual(self._GetSize(), 1024 ** 4)
+    self.assertEqual(len(self.ioctls), 1)
+
+  def testNotBlockDevice(self):
+    self.assertRaises(EnvironmentError, base.GetBlockDevSize, self.devpath,
+                      _sysfs_dir=self.sysfs, _ioctl_fn=self._Ioctl)
+    self.assertFalse(self.ioctls)
+
+  def testMissing(self):
+    self.assertRaises(EnvironmentError, base.GetBlockDevSize,
+                      utils.PathJoin(self.tmpdir, "missing"),
+                      _sysfs_dir=self.sysfs, _ioctl_fn=self._Ioctl)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
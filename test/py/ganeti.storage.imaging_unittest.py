@@ -0,0 +1,209 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for unittesting the ganeti.storage.imaging module"""
+
+import gzip
+import os
+import shutil
+import StringIO
+import tempfile
+import unittest
+
+from ganeti import errors
+from ganeti import utils
+from ganeti.storage import imaging
+
+import testutils
+
+
+def _Gzip(data):
+  buf = StringIO.StringIO()
+  gz = gzip.GzipFile(fileobj=buf, mode="wb")
+  gz.write(data)
+  gz.close()
+  return buf.getvalue()
+
+
+class TestDetectImageFormat(unittest.TestCase):
+  def test(self):
+    self.assertEqual(imaging.DetectImageFormat(_Gzip("x")), imaging.IMAGE_GZIP)
+    self.assertEqual(imaging.DetectImageFormat("\xfd7zXZ\x00\x00"),
+                     imaging.IMAGE_XZ)
+    self.assertEqual(imaging.DetectImageFormat("\x28\xb5\x2f\xfd"),
+                     imaging.IMAGE_ZSTD)
+    self.assertEqual(imaging.DetectImageFormat("\x1f"), imaging.IMAGE_RAW)
+    self.assertEqual(imaging.DetectImageFormat("QFI\xfb"), imaging.IMAGE_RAW)
+    self.assertEqual(imaging.DetectImageFormat(""), imaging.IMAGE_RAW)
+
+
+class TestImageWriting(unittest.TestCase):
+  _BLOCK_SIZE = 16 * 1024
+
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.target = utils.PathJoin(self.tmpdir, "disk")
+    self.size = 10 * self._BLOCK_SIZE
+    utils.WriteFile(self.target, data="\xff" * self.size)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _Writer(self, max_size=None):
+    if max_size is None:
+      max_size = self.size
+    return imaging.ImageWriter(self.target, max_size,
+                               block_size=self._BLOCK_SIZE, queue_depth=2)
+
+  def _Stream(self, chunks):
+    stream = imaging.ImageStream(self._Writer())
+    for chunk in chunks:
+      stream.Feed(chunk)
+    return stream.Finish()
+
+  def _CheckTarget(self, data):
+    self.assertEqual(utils.ReadFile(self.target),
+                     data + "\xff" * (self.size - len(data)))
+
+  def testRaw(self):
+    data = "".join(chr(i % 251) for i in range(3 * self._BLOCK_SIZE + 100))
+    result = self._Stream([data[i:i + 1000]
+                           for i in range(0, len(data), 1000)])
+    self.assertEqual(result["format"], imaging.IMAGE_RAW)
+    self.assertEqual(result["size"], len(data))
+    self.assertEqual(result["written"], len(data))
+    self._CheckTarget(data)
+
+  def testShortImage(self):
+    result = self._Stream(["a", "b"])
+    self.assertEqual(result["format"], imaging.IMAGE_RAW)
+    self.assertEqual(result["size"], 2)
+    self._CheckTarget("ab")
+
+  def testEmptyImage(self):
+    result = self._Stream([])
+    self.assertEqual(result["size"], 0)
+    self._CheckTarget("")
+
+  def testGzip(self):
+    data = ("Hello World\n" * 10000) + "\0" * (2 * self._BLOCK_SIZE)
+    compressed = _Gzip(data)
+    result = self._Stream([compressed[i:i + 7]
+                           for i in range(0, len(compressed), 7)])
+    self.assertEqual(result["format"], imaging.IMAGE_GZIP)
+    self.assertEqual(result["size"], len(data))
+    self._CheckTarget(data)
+
+  def testGzipMultipleMembers(self):
+    result = self._Stream([_Gzip("foo") + _Gzip("bar")])
+    self.assertEqual(result["size"], 6)
+    self._CheckTarget("foobar")
+
+  def testInvalidGzip(self):
+    stream = imaging.ImageStream(self._Writer())
+    self.assertRaises(errors.BlockDeviceError, stream.Feed,
+                      "\x1f\x8bgarbage" * 10)
+    stream.Abort()
+
+  def testUnavailableDecompressor(self):
+    if imaging.zstandard is not None:
+      # Nothing to test
+      return
+    stream = imaging.ImageStream(self._Writer())
+    self.assertRaises(errors.BlockDeviceError, stream.Feed,
+                      "\x28\xb5\x2f\xfd" + "\0" * 100)
+    stream.Abort()
+
+  def testTooLarge(self):
+    writer = self._Writer(max_size=self._BLOCK_SIZE)
+    writer.Write("x" * self._BLOCK_SIZE)
+    self.assertRaises(errors.BlockDeviceError, writer.Write, "x")
+    writer.Abort()
+
+  def testZeroBlocks(self):
+    data = ("a" * self._BLOCK_SIZE + "\0" * (3 * self._BLOCK_SIZE) +
+            "b" * 10)
+    writer = self._Writer()
+    # Regular files can't be zeroed, so the zeroes are written after all
+    writer._zero_out = True
+    writer.Write(data)
+    result = writer.Close()
+    self.assertEqual(result["size"], len(data))
+    self.assertEqual(result["written"], len(data))
+    self.assertEqual(result["zeroed"], 0)
+    self._CheckTarget(data)
+
+  def testTrailingZeroBlocks(self):
+    data = "a" * 100 + "\0" * (2 * self._BLOCK_SIZE - 100)
+    writer = self._Writer()
+    writer._zero_out = True
+    writer.Write(data)
+    writer.Close()
+    self._CheckTarget(data)
+
+  def testUnexpectedWriteError(self):
+    writer = self._Writer()
+
+    def _WriteBlock(buf, length):
+      raise ValueError("Unexpected error")
+    writer._WriteBlock = _WriteBlock
+
+    try:
+      writer.Write("x" * (4 * self._BLOCK_SIZE))
+      writer.Close()
+    except errors.BlockDeviceError, err:
+      self.assertTrue("Unexpected error" in str(err))
+    else:
+      self.fail("Write error was not reported")
+    finally:
+      writer.Abort()
+
+  def testDumpImageFile(self):
+    data = "image data" * 5000
+    source = utils.PathJoin(self.tmpdir, "image.gz")
+    utils.WriteFile(source, data=_Gzip(data))
+    result = imaging.DumpImageFile(source, self.target, self.size)
+    self.assertEqual(result["format"], imaging.IMAGE_GZIP)
+    self.assertEqual(result["size"], len(data))
+    self._CheckTarget(data)
+
+  def testDumpImageFileTooLarge(self):
+    source = utils.PathJoin(self.tmpdir, "image")
+    utils.WriteFile(source, data="x" * (self.size + 1))
+    self.assertRaises(errors.BlockDeviceError, imaging.DumpImageFile,
+                      source, self.target, self.size)
+
+  def testMissingTarget(self):
+    self.assertRaises(errors.BlockDeviceError, imaging.ImageWriter,
+                      utils.PathJoin(self.tmpdir, "missing"), self.size)
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -0,0 +1,148 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2016 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for testing ganeti.storage.lvm_cache"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ganeti import utils
+from ganeti.storage import lvm_cache
+
+import testutils
+
+
+def _FakeRunCmd(success, stdout, cmd):
+  if success:
+    exit_code = 0
+  else:
+    exit_code = 1
+  return utils.RunResult(exit_code, None, stdout, "", cmd,
+                         utils.process._TIMEOUT_NONE, 5)
+
+
+class TestLvmCache(unittest.TestCase):
+  CMD = ["lvs", "--noheadings", "-ovg_name,lv_name"]
+
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.cache_dir = utils.PathJoin(self.tmpdir, "cache")
+    self.dm_dir = utils.PathJoin(self.tmpdir, "mapper")
+    os.mkdir(self.cache_dir)
+    os.mkdir(self.dm_dir)
+    self.now = 1000.0
+    self.runs = []
+    self.success = True
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _RunCmd(self, cmd):
+    self.runs.append(cmd)
+    return _FakeRunCmd(self.success, "xenvg|lv%d\n" % len(self.runs), cmd)
+
+  def _Run(self, cmd=None, cache_dir=None):
+    if cmd is None:
+      cmd = self.CMD
+    if cache_dir is None:
+      cache_dir = self.cache_dir
+    return lvm_cache.RunReportCmd(cmd, _run_cmd=self._RunCmd,
+                                  _cache_dir=cache_dir, _dm_dir=self.dm_dir,
+                                  _time_fn=lambda: self.now)
+
+  def testCached(self):
+    result = self._Run()
+    self.assertFalse(result.failed)
+    self.assertEqual(result.stdout, "xenvg|lv1\n")
+
+    for _ in range(3):
+      result = self._Run()
+      self.assertFalse(result.failed)
+      self.assertEqual(result.stdout, "xenvg|lv1\n")
+      self.assertTrue(isinstance(result.stdout, str))
+    self.assertEqual(len(self.runs), 1)
+
+    # Other commands are cached separately
+    self.assertEqual(self._Run(cmd=self.CMD + ["xenvg"]).stdout,
+                     "xenvg|lv2\n")
+    self.assertEqual(self._Run().stdout, "xenvg|lv1\n")
+    self.assertEqual(len(self.runs), 2)
+
+  def testExpired(self):
+    self._Run()
+    self.now += lvm_cache._CACHE_TTL / 2
+    self.assertEqual(self._Run().stdout, "xenvg|lv1\n")
+    self.now += lvm_cache._CACHE_TTL
+    self.assertEqual(self._Run().stdout, "xenvg|lv2\n")
+
+    # Time going backwards
+    self.now -= 100
+    self.assertEqual(self._Run().stdout, "xenvg|lv3\n")
+
+  def testInvalidate(self):
+    self._Run()
+    lvm_cache.Invalidate(_cache_dir=self.cache_dir)
+    self.assertEqual(self._Run().stdout, "xenvg|lv2\n")
+    self.assertEqual(self._Run().stdout, "xenvg|lv2\n")
+    lvm_cache.Invalidate(_cache_dir=self.cache_dir)
+    self.assertEqual(self._Run().stdout, "xenvg|lv3\n")
+
+  def testDeviceMapperChange(self):
+    self._Run()
+    os.utime(self.dm_dir, (0, 0))
+    self.assertEqual(self._Run().stdout, "xenvg|lv2\n")
+    self.assertEqual(self._Run().stdout, "xenvg|lv2\n")
+
+  def testFailedNotCached(self):
+    self.success = False
+    self.assertTrue(self._Run().failed)
+    self.assertTrue(self._Run().failed)
+    self.assertEqual(len(self.runs), 2)
+    self.assertFalse(os.listdir(self.cache_dir))
+
+  def testCorruptCache(self):
+    self._Run()
+    for name in os.listdir(self.cache_dir):
+      utils.WriteFile(utils.PathJoin(self.cache_dir, name), data="{invalid")
+    self.assertEqual(self._Run().stdout, "xenvg|lv2\n")
+    self.assertEqual(self._Run().stdout, "xenvg|lv2\n")
+
+  def testNoCacheDir(self):
+    cache_dir = utils.PathJoin(self.tmpdir, "nonexistent")
+    self.assertEqual(self._Run(cache_dir=cache_dir).stdout, "xenvg|lv1\n")
+    self.assertEqual(self._Run(cache_dir=cache_dir).stdout, "xenvg|lv2\n")
+    lvm_cache.Invalidate(_cache_dir=cache_dir)
+    self.assertFalse(os.path.exists(cache_dir))
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -116,6 +116,26 @@ class TestFingerprintFiles(unittest.TestCase):
     all_files.append("/no/such/file")
     self.assertEqual(utils.FingerprintFiles(self.results.keys()), self.results)
 
+  def testCache(self):
+    cache = {"/no/such/file": [1, 2, 3, "abc"]}
+    self.assertEqual(utils.FingerprintFiles(self.results.keys(), cache=cache),
+                     self.results)
+    self.assertEqual(sorted(cache.keys()), sorted(self.results.keys()))
+
+    # Unchanged files are not read again
+    cache[self.tmpfile.name][3] = "cached"
+    result = utils.FingerprintFiles(self.results.keys(), cache=cache)
+    self.assertEqual(result[self.tmpfile.name], "cached")
+
+    # A changed size invalidates the entry
+    self.tmpfile.write("A" * 8192)
+    self.tmpfile.flush()
+    result = utils.FingerprintFiles(self.results.keys(), cache=cache)
+    self.assertEqual(result[self.tmpfile.name],
+                     "35b6795ca20d6dc0aff8c7c110c96cd1070b8c38")
+    self.assertEqual(cache[self.tmpfile.name][3],
+                     "35b6795ca20d6dc0aff8c7c110c96cd1070b8c38")
+
 
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
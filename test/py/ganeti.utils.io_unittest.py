@@ -474,6 +474,90 @@ class TestFileID(testutils.GanetiTestCase):
                       path=t.name, fd=t.fileno())
 
 
+class TestGetDirectoryID(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def testEmpty(self):
+    (dir_id, files) = utils.GetDirectoryID(self.tmpdir)
+    self.assertEqual(dir_id, utils.GetFileID(path=self.tmpdir))
+    self.assertEqual(files, [])
+
+  def testFiles(self):
+    utils.WriteFile(utils.PathJoin(self.tmpdir, "b"), data="Hello")
+    utils.WriteFile(utils.PathJoin(self.tmpdir, "a"), data="", mode=0700)
+    os.symlink("missing", utils.PathJoin(self.tmpdir, "c"))
+    (_, files) = utils.GetDirectoryID(self.tmpdir)
+    self.assertEqual([name for (name, _, _, _, _) in files], ["a", "b", "c"])
+    self.assertEqual(stat.S_IMODE(files[0][2]), 0700)
+    self.assertEqual(files[1][3], 5)
+    self.assertEqual(files[2], ("c", None, None, None, None))
+
+  def testChanges(self):
+    name = utils.PathJoin(self.tmpdir, "a")
+    utils.WriteFile(name, data="")
+    ids = [utils.GetDirectoryID(self.tmpdir)]
+    utils.WriteFile(name, data="Hello")
+    ids.append(utils.GetDirectoryID(self.tmpdir))
+    os.chmod(name, 0700)
+    ids.append(utils.GetDirectoryID(self.tmpdir))
+    os.rename(name, utils.PathJoin(self.tmpdir, "b"))
+    ids.append(utils.GetDirectoryID(self.tmpdir))
+    self.assertEqual(len(set(map(repr, ids))), len(ids))
+
+  def testMissing(self):
+    self.assertRaises(EnvironmentError, utils.GetDirectoryID,
+                      utils.PathJoin(self.tmpdir, "missing"))
+
+
+class TestDirectoryCache(unittest.TestCase):
+  def setUp(self):
+    self.loaded = []
+    self.dir_ids = {}
+
+  def _Load(self, path):
+    self.loaded.append(path)
+    return object()
+
+  def _GetID(self, path):
+    try:
+      return self.dir_ids[path]
+    except KeyError:
+      raise EnvironmentError(errno.ENOENT, "No such directory", path)
+
+  def testCached(self):
+    cache = utils.DirectoryCache(self._Load, _id_fn=self._GetID)
+    self.dir_ids["/a"] = 1
+    self.dir_ids["/b"] = 1
+    value = cache.Get("/a")
+    self.assertTrue(cache.Get("/a") is value)
+    self.assertFalse(cache.Get("/b") is value)
+    self.assertEqual(self.loaded, ["/a", "/b"])
+
+  def testChanged(self):
+    cache = utils.DirectoryCache(self._Load, _id_fn=self._GetID)
+    self.dir_ids["/a"] = 1
+    value = cache.Get("/a")
+    self.dir_ids["/a"] = 2
+    value2 = cache.Get("/a")
+    self.assertFalse(value2 is value)
+    self.assertTrue(cache.Get("/a") is value2)
+    self.assertEqual(self.loaded, ["/a", "/a"])
+
+  def testNoID(self):
+    cache = utils.DirectoryCache(self._Load, _id_fn=self._GetID)
+    self.dir_ids["/a"] = 1
+    value = cache.Get("/a")
+    del self.dir_ids["/a"]
+    self.assertFalse(cache.Get("/a") is value)
+    self.dir_ids["/a"] = 1
+    self.assertFalse(cache.Get("/a") is value)
+    self.assertEqual(self.loaded, ["/a", "/a", "/a"])
+
+
 class TestRemoveFile(unittest.TestCase):
   """Test case for the RemoveFile function"""
 
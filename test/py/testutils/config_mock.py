@@ -874,6 +874,7 @@ class ConfigMock(config.ConfigWriter):
     instance.ctime = instance.mtime = time.time()
     self._ConfigData().instances[instance.uuid] = instance
     self._ConfigData().cluster.serial_no += 1 # pylint: disable=E1103
+    self._index.Invalidate()
     self.ReleaseDRBDMinors(instance.uuid)
     self._UnlockedCommitTemporaryIps(ec_id)
 
@@ -881,6 +882,7 @@ class ConfigMock(config.ConfigWriter):
     disk.UpgradeConfig()
     self._ConfigData().disks[disk.uuid] = disk
     self._ConfigData().cluster.serial_no += 1 # pylint: disable=E1103
+    self._index.Invalidate()
     self.ReleaseDRBDMinors(disk.uuid)
 
   def _UnlockedAttachInstanceDisk(self, inst_uuid, disk_uuid, idx=None):
@@ -888,6 +890,7 @@ class ConfigMock(config.ConfigWriter):
     if idx is None:
       idx = len(instance.disks)
     instance.disks.insert(idx, disk_uuid)
+    self._index.Invalidate()
     instance_disks = self._UnlockedGetInstanceDisks(inst_uuid)
     for (disk_idx, disk) in enumerate(instance_disks[idx:]):
       disk.iv_name = "disk/%s" % (idx + disk_idx)
@@ -931,6 +934,7 @@ class ConfigMock(config.ConfigWriter):
 
     target.serial_no += 1
     target.mtime = now = time.time()
+    self._index.Invalidate()
 
     if update_serial:
       self._ConfigData().cluster.serial_no += 1 # pylint: disable=E1103
@@ -938,6 +942,7 @@ class ConfigMock(config.ConfigWriter):
 
   def SetInstancePrimaryNode(self, inst_uuid, target_node_uuid):
     self._UnlockedGetInstanceInfo(inst_uuid).primary_node = target_node_uuid
+    self._index.Invalidate()
 
   def _SetInstanceStatus(self, inst_uuid, status,
                          disks_active, admin_state_source):
@@ -989,6 +994,7 @@ class ConfigMock(config.ConfigWriter):
 
     idx = instance.disks.index(disk_uuid)
     instance.disks.remove(disk_uuid)
+    self._index.Invalidate()
     instance_disks = self._UnlockedGetInstanceDisks(inst_uuid)
     _UpdateIvNames(idx, instance_disks[idx:])
     instance.serial_no += 1
@@ -1003,6 +1009,7 @@ class ConfigMock(config.ConfigWriter):
 
   def RemoveInstance(self, inst_uuid):
     del self._ConfigData().instances[inst_uuid]
+    self._index.Invalidate()
 
   def AddTcpUdpPort(self, port):
     self._ConfigData().cluster.tcpudp_port_pool.add(port)